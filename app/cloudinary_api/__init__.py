@@ -19,6 +19,8 @@ from .image_manager import (
     batch_upload_images,
     delete_image
 )
+from .manifest import Asset, AssetManifest, get_manifest
+from .cleanup import CleanupJob
 from .legacy_wrapper import upload_image_to_cloudinary, get_image_url_from_cloudinary
 
 # Удобные функции для быстрого использования
@@ -40,6 +42,14 @@ __all__ = [
     'batch_upload_images',
     'delete_image',
     
+    # Индекс загруженных фото
+    'Asset',
+    'AssetManifest',
+    'get_manifest',
+    
+    # Пакетная очистка
+    'CleanupJob',
+    
     # Legacy совместимость
     'upload_image_to_cloudinary',
     'get_image_url_from_cloudinary',
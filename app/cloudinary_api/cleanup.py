@@ -0,0 +1,313 @@
+"""
+Cleanup - фоновая пакетная очистка фото проданных автомобилей в Cloudinary
+
+Вместо destroy по одному public_id фото нескольких автомобилей собираются в
+пачки по 100 и удаляются одним запросом Admin API (delete_resources). Для
+автомобилей, которых нет в индексе фото (manifest.py), удаление идет по тегу
+car_id_<custom_id> и по префиксу car_<custom_id>_. Запросы Admin API
+ограничены CLOUDINARY_ADMIN_RATE в час, при ответе 420 задание ждет и
+повторяет пачку; ограничение и повтор действуют на каждый запрос, включая
+продолжения удаления по тегу и префиксу (partial). Прогресс пишется в
+checkpoint (JSONL): после перезапуска задание продолжается с необработанных
+автомобилей. Пока в checkpoint есть незавершенное задание, другое не
+запускается: его нужно продолжить (--resume) или сбросить (--discard).
+
+Запуск: /cleanup <custom_id> ... в боте или
+python -m app.cloudinary_api.cleanup <custom_id> ... | --file ids.txt | --resume | --discard
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+from typing import Optional, Dict, Any, List, Callable
+
+from app.monitoring.metrics import QUEUE_DEPTH
+from .cloudinary_client import CloudinaryClient, CloudinaryRateLimitError, DELETE_BATCH_SIZE
+from .manifest import AssetManifest, get_manifest
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_CLEANUP_CHECKPOINT = 'data/cloudinary_cleanup.jsonl'
+
+
+class CleanupConflictError(RuntimeError):
+    """В checkpoint незавершенное задание с другим списком автомобилей"""
+
+
+class CleanupJob:
+    """Задание очистки фото списка автомобилей"""
+
+    def __init__(self, custom_ids: List[str], checkpoint_path: str, client: Optional[CloudinaryClient] = None,
+                 manifest: Optional[AssetManifest] = None, rate_per_hour: float = 400,
+                 max_backoff: float = 600):
+        """
+        Args:
+            custom_ids: ID автомобилей
+            checkpoint_path: Файл прогресса (JSONL)
+            client: Клиент Cloudinary (по умолчанию общий)
+            manifest: Индекс фото (по умолчанию глобальный)
+            rate_per_hour: Запросов Admin API в час
+            max_backoff: Максимальная пауза при превышении лимита, секунд
+        """
+        self.custom_ids = list(dict.fromkeys(custom_ids))
+        self.checkpoint_path = checkpoint_path
+        self.client = client
+        self.manifest = manifest or get_manifest()
+        self.min_interval = 3600.0 / rate_per_hour if rate_per_hour > 0 else 0.0
+        self.max_backoff = max_backoff
+        self.done = set()
+        self.deleted = 0
+        self.failed: Dict[str, str] = {}
+        self.api_calls = 0
+        self._last_call = 0.0
+        self._stopped = threading.Event()
+
+    @classmethod
+    def from_env(cls, custom_ids: List[str], **kwargs) -> 'CleanupJob':
+        return cls(
+            custom_ids,
+            checkpoint_path=os.getenv('CLOUDINARY_CLEANUP_CHECKPOINT', CLOUDINARY_CLEANUP_CHECKPOINT),
+            rate_per_hour=float(os.getenv('CLOUDINARY_ADMIN_RATE', '400')),
+            **kwargs
+        )
+
+    @classmethod
+    def resume(cls, **kwargs) -> Optional['CleanupJob']:
+        """Незавершенное задание из checkpoint (None, если его нет)"""
+        path = os.getenv('CLOUDINARY_CLEANUP_CHECKPOINT', CLOUDINARY_CLEANUP_CHECKPOINT)
+        custom_ids = _checkpoint_job(path)
+        if custom_ids is None:
+            return None
+        job = cls.from_env(custom_ids, **kwargs)
+        job._load_checkpoint()
+        return None if job.finished else job
+
+    @staticmethod
+    def discard() -> bool:
+        """
+        Сбрасывает незавершенное задание (удаляет checkpoint)
+
+        Returns:
+            True, если checkpoint был
+        """
+        path = os.getenv('CLOUDINARY_CLEANUP_CHECKPOINT', CLOUDINARY_CLEANUP_CHECKPOINT)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        logger.info(f"Checkpoint очистки Cloudinary сброшен: {path}")
+        return True
+
+    @property
+    def pending(self) -> List[str]:
+        return [custom_id for custom_id in self.custom_ids if custom_id not in self.done]
+
+    @property
+    def finished(self) -> bool:
+        return not self.pending
+
+    def progress(self) -> Dict[str, Any]:
+        """Состояние задания для отчета"""
+        return {
+            'total': len(self.custom_ids),
+            'done': len(self.done),
+            'deleted': self.deleted,
+            'failed': len(self.failed),
+            'api_calls': self.api_calls,
+        }
+
+    def stop(self):
+        """Останавливает задание после текущей пачки"""
+        self._stopped.set()
+
+    def _load_checkpoint(self):
+        self.done, self.deleted = set(), 0
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            next(f)
+            for line in f:
+                record = json.loads(line)
+                self.done.add(record['custom_id'])
+                self.deleted += record.get('deleted', 0)
+
+    def _start_checkpoint(self):
+        """
+        Новое задание пишет заголовок; продолжение - дописывает в тот же файл
+
+        Raises:
+            CleanupConflictError: В checkpoint незавершенное задание с другим списком автомобилей
+        """
+        previous_ids = _checkpoint_job(self.checkpoint_path)
+        if previous_ids == self.custom_ids:
+            self._load_checkpoint()
+            return
+        if previous_ids is not None:
+            previous = CleanupJob(previous_ids, self.checkpoint_path, manifest=self.manifest)
+            previous._load_checkpoint()
+            if not previous.finished:
+                raise CleanupConflictError(
+                    f"Незавершенное задание очистки ({len(previous.pending)} из {len(previous_ids)} автомобилей) "
+                    f"в {self.checkpoint_path}: продолжите или сбросьте его"
+                )
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.checkpoint_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'job': self.custom_ids}) + '\n')
+
+    def _mark_done(self, results: Dict[str, int]):
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+            for custom_id, deleted in results.items():
+                f.write(json.dumps({'custom_id': custom_id, 'deleted': deleted}) + '\n')
+                self.done.add(custom_id)
+                self.deleted += deleted
+                self.failed.pop(custom_id, None)
+            f.flush()
+            os.fsync(f.fileno())
+        QUEUE_DEPTH.labels(queue='cloudinary_cleanup').set(len(self.pending))
+
+    def _call(self, func: Callable, *args) -> Dict[str, Any]:
+        """Запрос Admin API с ограничением частоты и ожиданием при 420"""
+        backoff = max(self.min_interval, 5.0)
+        while True:
+            wait = self._last_call + self.min_interval - time.monotonic()
+            if wait > 0:
+                self._stopped.wait(wait)
+            self._last_call = time.monotonic()
+            self.api_calls += 1
+            try:
+                return func(*args)
+            except CloudinaryRateLimitError as e:
+                logger.warning(f"{e}; пауза {backoff:.0f}с")
+                if self._stopped.wait(backoff):
+                    raise
+                backoff = min(backoff * 2, self.max_backoff)
+
+    def _batches(self, custom_ids: List[str]):
+        """Пачки автомобилей, чьи фото из индекса укладываются в один запрос"""
+        batch, public_ids = {}, []
+        for custom_id in custom_ids:
+            assets = [asset.public_id for asset in self.manifest.assets(custom_id)]
+            if batch and len(public_ids) + len(assets) > DELETE_BATCH_SIZE:
+                yield batch, public_ids
+                batch, public_ids = {}, []
+            batch[custom_id] = assets
+            public_ids.extend(assets)
+        if batch:
+            yield batch, public_ids
+
+    def run(self, on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Выполняет задание (синхронно; в боте - в отдельном потоке)
+
+        Args:
+            on_progress: Вызывается после каждой пачки с progress()
+
+        Returns:
+            Итоговый progress()
+        """
+        if self.client is None:
+            from .image_manager import _get_default_client
+            self.client = _get_default_client()
+        self._start_checkpoint()
+        QUEUE_DEPTH.labels(queue='cloudinary_cleanup').set(len(self.pending))
+        indexed = [custom_id for custom_id in self.pending if self.manifest.assets(custom_id)]
+        indexed_set = set(indexed)
+        legacy = [custom_id for custom_id in self.pending if custom_id not in indexed_set]
+
+        for batch, public_ids in self._batches(indexed):
+            if self._stopped.is_set():
+                break
+            try:
+                deleted = self.client.delete_images(public_ids, call=self._call)
+            except Exception as e:
+                self.failed.update({custom_id: str(e) for custom_id in batch})
+                logger.error(f"Ошибка удаления пачки фото ({len(batch)} автомобилей): {e}")
+                continue
+            self.manifest.remove(public_ids)
+            self._mark_done({
+                custom_id: sum(1 for public_id in assets if deleted.get(public_id) == 'deleted')
+                for custom_id, assets in batch.items()
+            })
+            if on_progress:
+                on_progress(self.progress())
+
+        # Автомобили без индекса: тег ставится при загрузке с custom_id, префикс - у старых загрузок
+        for custom_id in legacy:
+            if self._stopped.is_set():
+                break
+            try:
+                deleted = self.client.delete_images_by_tag(f"car_id_{custom_id}", call=self._call)
+                deleted.update(self.client.delete_images_by_prefix(f"car_{custom_id}_", call=self._call))
+            except Exception as e:
+                self.failed[custom_id] = str(e)
+                logger.error(f"Ошибка удаления фото {custom_id}: {e}")
+                continue
+            self._mark_done({custom_id: sum(1 for status in deleted.values() if status == 'deleted')})
+            if on_progress:
+                on_progress(self.progress())
+
+        progress = self.progress()
+        logger.info(f"Очистка Cloudinary: {progress}")
+        return progress
+
+
+def _checkpoint_job(path: str) -> Optional[List[str]]:
+    """Список автомобилей задания из заголовка checkpoint (None, если файла или заголовка нет)"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline() or 'null')
+    if not header or 'job' not in header:
+        return None
+    return header['job']
+
+
+def format_progress(progress: Dict[str, Any]) -> str:
+    """Текст прогресса для админа"""
+    text = (f"🧹 Очистка Cloudinary: {progress['done']}/{progress['total']} автомобилей, "
+            f"удалено фото: {progress['deleted']}, запросов API: {progress['api_calls']}")
+    if progress['failed']:
+        text += f"\n⚠️ С ошибками: {progress['failed']} (повтор: /cleanup resume)"
+    return text
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетное удаление фото автомобилей из Cloudinary")
+    parser.add_argument('custom_ids', nargs='*', help="ID автомобилей")
+    parser.add_argument('--file', help="Файл с ID автомобилей, по одному в строке")
+    parser.add_argument('--resume', action='store_true', help="Продолжить незавершенное задание")
+    parser.add_argument('--discard', action='store_true', help="Сбросить незавершенное задание")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.discard:
+        print("Незавершенное задание сброшено" if CleanupJob.discard() else "Незавершенных заданий нет")
+        return 0
+    if args.resume:
+        job = CleanupJob.resume()
+        if job is None:
+            print("Незавершенных заданий нет")
+            return 0
+    else:
+        custom_ids = list(args.custom_ids)
+        if args.file:
+            with open(args.file, encoding='utf-8') as f:
+                custom_ids.extend(line.strip() for line in f if line.strip())
+        if not custom_ids:
+            parser.error("укажите ID автомобилей, --file или --resume")
+        job = CleanupJob.from_env(custom_ids)
+
+    try:
+        progress = job.run(on_progress=lambda p: print(format_progress(p)))
+    except CleanupConflictError as e:
+        print(f"{e} (--resume или --discard)")
+        return 1
+    print(format_progress(progress))
+    return 1 if progress['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,7 +6,7 @@ Cloudinary API Client - основной клиент для работы с Clo
 import os
 import asyncio
 from dataclasses import dataclass
-from typing import Dict, Optional, List, Any, Union
+from typing import Callable, Dict, Optional, List, Any, Union
 import logging
 from pathlib import Path
 
@@ -15,10 +15,14 @@ try:
     import cloudinary.uploader
     import cloudinary.api
     from cloudinary.exceptions import Error as CloudinaryError
+    from cloudinary.exceptions import RateLimited as CloudinaryRateLimited
     CLOUDINARY_AVAILABLE = True
 except ImportError:
     CLOUDINARY_AVAILABLE = False
     CloudinaryError = Exception
+    CloudinaryRateLimited = Exception
+
+from app.monitoring.metrics import record_api_error, record_rate_limited
 
 logger = logging.getLogger(__name__)
 
@@ -72,6 +76,13 @@ class CloudinaryNetworkError(CloudinaryClientError):
     """Ошибка сети при работе с Cloudinary"""
     pass
 
+class CloudinaryRateLimitError(CloudinaryAPIError):
+    """Превышен лимит запросов Admin API"""
+    pass
+
+# Admin API удаляет не более 100 public_id за запрос
+DELETE_BATCH_SIZE = 100
+
 class CloudinaryClient:
     """
     Современный клиент для Cloudinary API с улучшенной обработкой ошибок
@@ -94,7 +105,7 @@ class CloudinaryClient:
         self._configure_cloudinary()
         
     def _configure_cloudinary(self):
-        """Настройка Cloudinary с проверкой конфигурации"""
+        """Настройка Cloudinary (без сетевых запросов; проверка ключей - validate())"""
         try:
             if self.config.cloudinary_url:
                 # Конфигурация через URL
@@ -115,20 +126,27 @@ class CloudinaryClient:
                     "Cloudinary не сконфигурирован. "
                     "Установите CLOUDINARY_URL или отдельные параметры (cloud_name, api_key, api_secret)"
                 )
-                
-            # Проверяем конфигурацию
-            self._validate_config()
+            
             logger.info("Cloudinary клиент успешно сконфигурирован")
             
         except CloudinaryError as e:
             raise CloudinaryConfigError(f"Ошибка конфигурации Cloudinary: {e}")
     
-    def _validate_config(self):
-        """Проверка валидности конфигурации"""
+    def validate(self):
+        """
+        Проверка ключей и имени облака запросом к Admin API
+        
+        Не выполняется при создании клиента: запрос стоит секунды на старте
+        бота и каждой CLI-утилиты, а неверные ключи и так проявятся при первой
+        загрузке. Вызывайте явно там, где нужна ранняя проверка.
+        
+        Raises:
+            CloudinaryConfigError: Неверный ключ, секрет или cloud_name
+        """
         try:
             # Простой тест конфигурации через получение информации о папках
             cloudinary.api.root_folders(max_results=1)
-        except CloudinaryError as e:
+        except Exception as e:
             if "Invalid API key" in str(e) or "Unauthorized" in str(e):
                 raise CloudinaryConfigError("Неверный API ключ или секрет")
             elif "Not Found" in str(e):
@@ -199,6 +217,10 @@ class CloudinaryClient:
             return result
             
         except CloudinaryError as e:
+            if CLOUDINARY_AVAILABLE and isinstance(e, CloudinaryRateLimited):
+                record_rate_limited('cloudinary')
+            else:
+                record_api_error('cloudinary', type(e).__name__)
             error_msg = f"Ошибка Cloudinary API при загрузке {image_path}: {e}"
             logger.error(error_msg)
             raise CloudinaryUploadError(error_msg)
@@ -249,7 +271,8 @@ class CloudinaryClient:
         self, 
         public_id: str, 
         transformations: Optional[Dict] = None,
-        secure: Optional[bool] = None
+        secure: Optional[bool] = None,
+        version: Optional[int] = None
     ) -> str:
         """
         Получение URL изображения с возможными трансформациями
@@ -258,6 +281,7 @@ class CloudinaryClient:
             public_id: Идентификатор изображения в Cloudinary
             transformations: Параметры трансформации (опционально)
             secure: Использовать HTTPS (опционально, по умолчанию из конфига)
+            version: Версия изображения из ответа upload (опционально)
         
         Returns:
             URL изображения
@@ -275,6 +299,9 @@ class CloudinaryClient:
             if transformations:
                 options['transformation'] = transformations
             
+            if version:
+                options['version'] = version
+            
             url = cloudinary.CloudinaryImage(public_id).build_url(**options)
             return url
             
@@ -305,6 +332,88 @@ class CloudinaryClient:
             logger.error(error_msg)
             raise CloudinaryAPIError(error_msg)
     
+    def _admin_call(self, description: str, func, *args, **kwargs) -> Dict[str, Any]:
+        """Вызов Admin API с единой обработкой ошибок и лимитов"""
+        try:
+            return func(*args, **kwargs)
+        except CloudinaryError as e:
+            if CLOUDINARY_AVAILABLE and isinstance(e, CloudinaryRateLimited):
+                record_rate_limited('cloudinary')
+                raise CloudinaryRateLimitError(f"Лимит Admin API при {description}: {e}")
+            record_api_error('cloudinary', type(e).__name__)
+            error_msg = f"Ошибка Admin API при {description}: {e}"
+            logger.error(error_msg)
+            raise CloudinaryAPIError(error_msg)
+    
+    @staticmethod
+    def _direct_call(func, *args) -> Dict[str, Any]:
+        return func(*args)
+    
+    def delete_images(self, public_ids: List[str], call: Optional[Callable] = None) -> Dict[str, str]:
+        """
+        Пакетное удаление изображений (Admin API delete_resources, по 100 за запрос)
+        
+        Args:
+            public_ids: Идентификаторы изображений
+            call: Обертка call(func, *args) для каждого запроса Admin API
+                (ограничение частоты и повтор при 420 в задании очистки)
+        
+        Returns:
+            Словарь public_id -> статус ('deleted' или 'not_found')
+        
+        Raises:
+            CloudinaryRateLimitError: При превышении лимита Admin API
+            CloudinaryAPIError: При ошибке API
+        """
+        call = call or self._direct_call
+        deleted = {}
+        for start in range(0, len(public_ids), DELETE_BATCH_SIZE):
+            batch = public_ids[start:start + DELETE_BATCH_SIZE]
+            result = call(self._admin_call, 'удалении изображений', cloudinary.api.delete_resources, batch)
+            deleted.update(result.get('deleted', {}))
+        logger.info(f"Удалено из Cloudinary: {len(deleted)} изображений")
+        return deleted
+    
+    def delete_images_by_tag(self, tag: str, call: Optional[Callable] = None) -> Dict[str, str]:
+        """
+        Удаление всех изображений с тегом (Admin API delete_resources_by_tag)
+        
+        Args:
+            tag: Тег, например car_id_<custom_id>
+            call: Обертка call(func, *args) для каждого запроса Admin API
+        
+        Returns:
+            Словарь public_id -> статус
+        """
+        call = call or self._direct_call
+        deleted = {}
+        while True:
+            result = call(self._admin_call, f"удалении по тегу {tag}", cloudinary.api.delete_resources_by_tag, tag)
+            deleted.update(result.get('deleted', {}))
+            # partial - удалена только часть (не более 1000 за запрос)
+            if not result.get('partial'):
+                return deleted
+    
+    def delete_images_by_prefix(self, prefix: str, call: Optional[Callable] = None) -> Dict[str, str]:
+        """
+        Удаление всех изображений с префиксом public_id (Admin API delete_resources_by_prefix)
+        
+        Args:
+            prefix: Префикс, например car_<custom_id>_
+            call: Обертка call(func, *args) для каждого запроса Admin API
+        
+        Returns:
+            Словарь public_id -> статус
+        """
+        call = call or self._direct_call
+        deleted = {}
+        while True:
+            result = call(self._admin_call, f"удалении по префиксу {prefix}",
+                          cloudinary.api.delete_resources_by_prefix, prefix)
+            deleted.update(result.get('deleted', {}))
+            if not result.get('partial'):
+                return deleted
+    
     def batch_upload(
         self, 
         image_paths: List[Union[str, Path]], 
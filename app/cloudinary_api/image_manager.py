@@ -3,11 +3,13 @@ Image Manager - высокоуровневые функции для работ
 Специализированные функции для автомобильных фотографий и batch операций
 """
 
-from typing import List, Dict, Optional, Union, Any
+from typing import List, Dict, Optional, Union, Any, Sequence, Tuple
 from pathlib import Path
+import os
 import logging
 
 from .cloudinary_client import CloudinaryClient, CloudinaryConfig, CloudinaryUploadError
+from .manifest import Asset, AssetManifest, get_manifest
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +24,96 @@ def _get_default_client() -> CloudinaryClient:
         _default_client = CloudinaryClient(config)
     return _default_client
 
+# Профили производных изображений для URL. f_auto выбирает формат под браузер при
+# запросе и отдает производную той же трансформации в этом формате, поэтому при
+# загрузке профиль заказывается без f_auto - в формате загрузки и в форматах
+# CLOUDINARY_DERIVATIVE_FORMATS: первый просмотр получает готовый файл.
+DERIVATIVE_PROFILES: Dict[str, Dict[str, Any]] = {
+    'thumbnail': {'width': 300, 'height': 200, 'crop': 'fill', 'quality': 'auto', 'fetch_format': 'auto'},
+    'large': {'width': 800, 'height': 600, 'crop': 'limit', 'quality': 'auto', 'fetch_format': 'auto'},
+    'web': {'width': 1200, 'crop': 'limit', 'quality': 'auto', 'fetch_format': 'auto', 'flags': 'progressive'},
+}
+
+# Профили, заказываемые при загрузке (CLOUDINARY_DERIVATIVES)
+DEFAULT_DERIVATIVES = 'thumbnail,large'
+
+# Форматы, которые f_auto выбирает для браузеров, кроме формата загрузки (CLOUDINARY_DERIVATIVE_FORMATS)
+DEFAULT_DERIVATIVE_FORMATS = 'webp'
+
+def derivative_profile(name: str) -> Dict[str, Any]:
+    """
+    Трансформация профиля производной
+    
+    Args:
+        name: Имя из DERIVATIVE_PROFILES или w<ширина> для адаптивного набора (w768)
+    
+    Returns:
+        Параметры трансформации (копия)
+    
+    Raises:
+        ValueError: Неизвестный профиль
+    """
+    if name in DERIVATIVE_PROFILES:
+        return dict(DERIVATIVE_PROFILES[name])
+    if name.startswith('w') and name[1:].isdigit():
+        return {'width': int(name[1:]), 'crop': 'limit', 'quality': 'auto', 'fetch_format': 'auto'}
+    raise ValueError(f"Неизвестный профиль производной: {name}")
+
+def configured_derivatives() -> List[str]:
+    """Профили из CLOUDINARY_DERIVATIVES (пустая строка - без eager)"""
+    value = os.getenv('CLOUDINARY_DERIVATIVES', DEFAULT_DERIVATIVES)
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+def configured_derivative_formats() -> List[str]:
+    """Форматы из CLOUDINARY_DERIVATIVE_FORMATS (пустая строка - только формат загрузки)"""
+    value = os.getenv('CLOUDINARY_DERIVATIVE_FORMATS', DEFAULT_DERIVATIVE_FORMATS)
+    return [name.strip().lower() for name in value.split(',') if name.strip()]
+
+def eager_upload_options(
+    derivatives: Sequence[str],
+    formats: Optional[Sequence[str]] = None
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """
+    Параметры upload для асинхронной генерации производных
+    
+    Args:
+        derivatives: Имена профилей
+        formats: Форматы, в которых профили заказываются кроме формата загрузки
+            (по умолчанию из CLOUDINARY_DERIVATIVE_FORMATS)
+    
+    Returns:
+        (параметры для upload, профиль[/формат] -> строка eager-трансформации для индекса)
+    """
+    if not derivatives:
+        return {}, {}
+    from cloudinary.utils import build_single_eager
+    
+    if formats is None:
+        formats = configured_derivative_formats()
+    eager = {}
+    for name in derivatives:
+        # f_auto выбирается при запросе и заранее не строится - заказываем каждый формат
+        profile = derivative_profile(name)
+        profile.pop('fetch_format', None)
+        eager[name] = profile
+        for file_format in formats:
+            eager[f"{name}/{file_format}"] = dict(profile, format=file_format)
+    transformations = {key: build_single_eager(dict(options)) for key, options in eager.items()}
+    return {'eager': list(eager.values()), 'eager_async': True}, transformations
+
+def record_upload(
+    manifest: AssetManifest,
+    custom_id: str,
+    result: Dict[str, Any],
+    transformations: Dict[str, str],
+    position: Optional[int] = None
+) -> Asset:
+    """Записывает загруженное фото и заказанные для него производные в индекс"""
+    asset = manifest.record(custom_id, result, position=position)
+    if transformations:
+        manifest.request_derivatives(asset.public_id, transformations, result.get('eager'))
+    return asset
+
 def upload_single_image(
     image_path: Union[str, Path],
     public_id: Optional[str] = None,
@@ -136,11 +228,26 @@ def delete_image(
 
 # Специализированные функции для автомобильных фотографий
 
+def _car_assets(custom_id: str, folder: str, manifest: Optional[AssetManifest]) -> List[Asset]:
+    """Фото автомобиля из индекса; для старых автомобилей - из Admin API не чаще раза в sync_ttl"""
+    if manifest is None:
+        manifest = get_manifest()
+    assets = manifest.assets(custom_id, folder)
+    if assets or manifest.synced_recently(custom_id, folder):
+        return assets
+    try:
+        return manifest.sync_from_cloudinary(custom_id, folder)
+    except Exception as e:
+        logger.warning(f"Не удалось получить список фото {custom_id} из Cloudinary: {e}")
+        return []
+
 def upload_car_photos(
     image_paths: List[Union[str, Path]],
     custom_id: str,
     folder: str = "cars",
-    client: Optional[CloudinaryClient] = None
+    client: Optional[CloudinaryClient] = None,
+    manifest: Optional[AssetManifest] = None,
+    derivatives: Optional[Sequence[str]] = None
 ) -> List[Dict[str, Any]]:
     """
     Загрузка фотографий автомобиля с автоматическими ID
@@ -150,12 +257,20 @@ def upload_car_photos(
         custom_id: Уникальный ID автомобиля
         folder: Папка в Cloudinary (по умолчанию "cars")
         client: Клиент Cloudinary (опционально)
+        manifest: Индекс загруженных фото (по умолчанию глобальный)
+        derivatives: Профили производных, генерируемых при загрузке
+            (по умолчанию из CLOUDINARY_DERIVATIVES, [] - без eager)
     
     Returns:
         Список результатов загрузки
     """
     if client is None:
         client = _get_default_client()
+    if manifest is None:
+        manifest = get_manifest()
+    if derivatives is None:
+        derivatives = configured_derivatives()
+    eager_options, transformations = eager_upload_options(derivatives)
     
     results = []
     for i, image_path in enumerate(image_paths, 1):
@@ -167,9 +282,11 @@ def upload_car_photos(
                 image_path=image_path,
                 public_id=public_id,
                 folder=folder,
-                tags=tags
+                tags=tags,
+                **eager_options
             )
             results.append(result)
+            record_upload(manifest, custom_id, result, transformations, position=i)
             logger.info(f"Загружено фото {i} для автомобиля {custom_id}")
         except CloudinaryUploadError as e:
             logger.error(f"Ошибка загрузки фото {i} для автомобиля {custom_id}: {e}")
@@ -181,93 +298,84 @@ def get_car_photos_urls(
     custom_id: str,
     count: int = 10,
     folder: str = "cars",
-    client: Optional[CloudinaryClient] = None
+    client: Optional[CloudinaryClient] = None,
+    manifest: Optional[AssetManifest] = None
 ) -> List[str]:
     """
     Получение URL всех фотографий автомобиля
     
     Args:
         custom_id: Уникальный ID автомобиля
-        count: Максимальное количество фотографий для поиска (по умолчанию 10)
+        count: Максимальное количество фотографий (по умолчанию 10)
         folder: Папка в Cloudinary (по умолчанию "cars")
         client: Клиент Cloudinary (опционально)
+        manifest: Индекс загруженных фото (по умолчанию глобальный)
     
     Returns:
-        Список URL фотографий
+        Список URL фотографий (только реально загруженных)
     """
-    if client is None:
-        client = _get_default_client()
-    
     photo_urls = []
-    for i in range(1, count + 1):
-        public_id = f"{folder}/car_{custom_id}_{i}" if folder else f"car_{custom_id}_{i}"
-        
-        try:
-            url = client.get_image_url(public_id)
-            if url:
-                photo_urls.append(url)
-        except Exception:
-            # Если фото с таким ID не найдено, прекращаем поиск
-            break
+    for asset in _car_assets(custom_id, folder, manifest)[:count]:
+        if asset.secure_url:
+            photo_urls.append(asset.secure_url)
+        else:
+            if client is None:
+                client = _get_default_client()
+            photo_urls.append(client.get_image_url(asset.public_id, version=asset.version))
     
     return photo_urls
 
+def _transformed_urls(
+    assets: List[Asset],
+    transformations: Dict[str, Any],
+    client: Optional[CloudinaryClient]
+) -> List[str]:
+    """URL с трансформацией для каждого фото (строятся локально)"""
+    if not assets:
+        return []
+    if client is None:
+        client = _get_default_client()
+    return [
+        client.get_image_url(public_id=asset.public_id, transformations=transformations, version=asset.version)
+        for asset in assets
+    ]
+
 def get_car_photo_thumbnails(
     custom_id: str,
     count: int = 10,
     width: int = 300,
     height: int = 200,
     folder: str = "cars",
-    client: Optional[CloudinaryClient] = None
+    client: Optional[CloudinaryClient] = None,
+    manifest: Optional[AssetManifest] = None
 ) -> List[str]:
     """
     Получение URL миниатюр всех фотографий автомобиля
     
     Args:
         custom_id: Уникальный ID автомобиля
-        count: Максимальное количество фотографий для поиска
+        count: Максимальное количество фотографий
         width: Ширина миниатюры (по умолчанию 300)
         height: Высота миниатюры (по умолчанию 200)
         folder: Папка в Cloudinary (по умолчанию "cars")
         client: Клиент Cloudinary (опционально)
+        manifest: Индекс загруженных фото (по умолчанию глобальный)
     
     Returns:
         Список URL миниатюр
     """
-    if client is None:
-        client = _get_default_client()
-    
-    thumbnail_urls = []
-    transformations = {
-        'width': width,
-        'height': height,
-        'crop': 'fill',
-        'quality': 'auto',
-        'fetch_format': 'auto'
-    }
-    
-    for i in range(1, count + 1):
-        public_id = f"{folder}/car_{custom_id}_{i}" if folder else f"car_{custom_id}_{i}"
-        
-        try:
-            url = client.get_image_url(
-                public_id=public_id,
-                transformations=transformations
-            )
-            if url:
-                thumbnail_urls.append(url)
-        except Exception:
-            # Если фото с таким ID не найдено, прекращаем поиск
-            break
+    # С размерами по умолчанию f_auto отдает eager-производную профиля thumbnail
+    transformations = dict(derivative_profile('thumbnail'), width=width, height=height)
     
-    return thumbnail_urls
+    return _transformed_urls(_car_assets(custom_id, folder, manifest)[:count], transformations, client)
 
 def create_car_gallery(
     custom_id: str,
     width: int = 800,
     height: int = 600,
     folder: str = "cars",
-    client: Optional[CloudinaryClient] = None
+    client: Optional[CloudinaryClient] = None,
+    manifest: Optional[AssetManifest] = None
 ) -> Dict[str, List[str]]:
     """
     Создание галереи автомобиля с фотографиями разных размеров
@@ -278,43 +386,26 @@ def create_car_gallery(
         height: Высота больших изображений
         folder: Папка в Cloudinary
         client: Клиент Cloudinary (опционально)
+        manifest: Индекс загруженных фото (по умолчанию глобальный)
     
     Returns:
         Словарь с URL оригинальных изображений, больших и миниатюр
     """
-    if client is None:
-        client = _get_default_client()
+    assets = _car_assets(custom_id, folder, manifest)
     
-    # Получаем оригинальные URL
-    original_urls = get_car_photos_urls(custom_id, folder=folder, client=client)
-    
-    # Создаем большие изображения
-    large_urls = []
-    for i in range(1, len(original_urls) + 1):
-        public_id = f"{folder}/car_{custom_id}_{i}" if folder else f"car_{custom_id}_{i}"
-        transformations = {
-            'width': width,
-            'height': height,
-            'crop': 'limit',
-            'quality': 'auto',
-            'fetch_format': 'auto'
-        }
-        
-        try:
-            url = client.get_image_url(
-                public_id=public_id,
-                transformations=transformations
-            )
-            large_urls.append(url)
-        except Exception:
-            break
+    # Оригинальные URL
+    original_urls = get_car_photos_urls(custom_id, count=len(assets), folder=folder, client=client, manifest=manifest)
+    
+    # Большие изображения
+    large_urls = _transformed_urls(assets, dict(derivative_profile('large'), width=width, height=height), client)
     
-    # Получаем миниатюры
+    # Миниатюры
     thumbnail_urls = get_car_photo_thumbnails(
         custom_id, 
-        count=len(original_urls),
+        count=len(assets),
         folder=folder,
-        client=client
+        client=client,
+        manifest=manifest
     )
     
     return {
@@ -347,13 +438,7 @@ def optimize_car_photo_for_web(
     if client is None:
         client = _get_default_client()
     
-    transformations = {
-        'width': max_width,
-        'crop': 'limit',
-        'quality': quality,
-        'fetch_format': format,
-        'flags': 'progressive'
-    }
+    transformations = dict(derivative_profile('web'), width=max_width, quality=quality, fetch_format=format)
     
     return client.get_image_url(
         public_id=public_id,
@@ -364,7 +449,8 @@ def delete_car_photos(
     custom_id: str,
     count: int = 10,
     folder: str = "cars",
-    client: Optional[CloudinaryClient] = None
+    client: Optional[CloudinaryClient] = None,
+    manifest: Optional[AssetManifest] = None
 ) -> List[Dict[str, Any]]:
     """
     Удаление всех фотографий автомобиля
@@ -374,26 +460,31 @@ def delete_car_photos(
         count: Максимальное количество фотографий для удаления
         folder: Папка в Cloudinary
         client: Клиент Cloudinary (опционально)
+        manifest: Индекс загруженных фото (по умолчанию глобальный)
     
     Returns:
         Список результатов удаления
     """
+    if manifest is None:
+        manifest = get_manifest()
+    assets = _car_assets(custom_id, folder, manifest)[:count]
+    if not assets:
+        return []
     if client is None:
         client = _get_default_client()
     
-    results = []
-    for i in range(1, count + 1):
-        public_id = f"{folder}/car_{custom_id}_{i}" if folder else f"car_{custom_id}_{i}"
-        
-        try:
-            result = client.delete_image(public_id)
-            results.append(result)
-            logger.info(f"Удалено фото {i} для автомобиля {custom_id}")
-        except Exception as e:
-            logger.error(f"Ошибка удаления фото {i} для автомобиля {custom_id}: {e}")
-            results.append({"error": str(e), "public_id": public_id})
-    
-    return results
+    # Один запрос Admin API на все фото автомобиля
+    public_ids = [asset.public_id for asset in assets]
+    try:
+        deleted = client.delete_images(public_ids)
+    except Exception as e:
+        logger.error(f"Ошибка удаления фото автомобиля {custom_id}: {e}")
+        return [{"error": str(e), "public_id": public_id} for public_id in public_ids]
+    manifest.remove(public_ids)
+    logger.info(f"Удалено {len(public_ids)} фото для автомобиля {custom_id}")
+    
+    return [{"result": "ok" if deleted.get(public_id) == 'deleted' else deleted.get(public_id, 'not_found'),
+             "public_id": public_id} for public_id in public_ids]
 
 # Функции для работы с трансформациями
 
@@ -422,16 +513,10 @@ def create_responsive_image_set(
     responsive_urls = {}
     
     for width in breakpoints:
-        transformations = {
-            'width': width,
-            'crop': 'limit',
-            'quality': 'auto',
-            'fetch_format': 'auto'
-        }
-        
+        # Совпадает с профилем w<ширина>, если он заказан в CLOUDINARY_DERIVATIVES
         url = client.get_image_url(
             public_id=public_id,
-            transformations=transformations
+            transformations=derivative_profile(f"w{width}")
         )
         responsive_urls[f"{width}w"] = url
     
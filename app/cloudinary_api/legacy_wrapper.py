@@ -10,6 +10,8 @@ import logging
 
 from .cloudinary_client import CloudinaryClient, CloudinaryConfig, CloudinaryUploadError, CloudinaryAPIError
 from .image_manager import get_car_photos_urls as _get_car_photos_urls, get_car_photo_thumbnails as _get_car_photo_thumbnails
+from .image_manager import configured_derivatives, eager_upload_options, record_upload
+from .manifest import get_manifest
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +35,7 @@ def _get_legacy_client() -> Optional[CloudinaryClient]:
             return None
     return _legacy_client
 
-def upload_image_to_cloudinary(image_path: str, public_id: str = None) -> Optional[Dict[str, Any]]:
+def upload_image_to_cloudinary(image_path: str, public_id: str = None, custom_id: str = None) -> Optional[Dict[str, Any]]:
     """
     Legacy функция для загрузки изображения в Cloudinary
     Эмулирует поведение старой функции из app.core.cloudinary_uploader
@@ -41,6 +43,7 @@ def upload_image_to_cloudinary(image_path: str, public_id: str = None) -> Option
     Args:
         image_path: Путь к локальному файлу изображения
         public_id: Уникальный идентификатор для файла в Cloudinary (опционально)
+        custom_id: ID автомобиля - загрузка записывается в индекс фото (опционально)
     
     Returns:
         Словарь с информацией о загруженном изображении от Cloudinary или None при ошибке
@@ -61,9 +64,16 @@ def upload_image_to_cloudinary(image_path: str, public_id: str = None) -> Option
     
     try:
         upload_options = {}
+        transformations = {}
         if public_id:
             upload_options['public_id'] = public_id
             upload_options['overwrite'] = True  # Соответствует старому поведению
+        if custom_id:
+            # Тот же тег, что у upload_car_photos: очистка через delete_resources_by_tag
+            upload_options['tags'] = ['car', f'car_id_{custom_id}']
+            # Миниатюры и большие фото строятся асинхронно при загрузке
+            eager_options, transformations = eager_upload_options(configured_derivatives())
+            upload_options.update(eager_options)
         
         result = client.upload_image(
             image_path=image_path,
@@ -71,6 +81,11 @@ def upload_image_to_cloudinary(image_path: str, public_id: str = None) -> Option
         )
         
         print(f"Изображение {image_path} успешно загружено в Cloudinary. URL: {result.get('secure_url')}")
+        if custom_id:
+            try:
+                record_upload(get_manifest(), custom_id, result, transformations)
+            except Exception as e:
+                logger.warning(f"Не удалось записать {result.get('public_id')} в индекс фото: {e}")
         return result
         
     except CloudinaryUploadError as e:
@@ -0,0 +1,318 @@
+"""
+Asset Manifest - локальный индекс загруженных в Cloudinary фотографий
+
+При загрузке каждое фото записывается в SQLite (CLOUDINARY_MANIFEST): к какому
+автомобилю относится, позиция, public_id, версия, формат, размеры и вес.
+URL, миниатюры и галереи строятся по индексу без сети и только для реально
+загруженных фото, удаление знает точный список public_id. Для автомобилей,
+загруженных до появления индекса, он заполняется одним запросом к Admin API
+(resources по префиксу public_id). Запрос запоминается и для автомобилей без
+фото: повторный поиск по Admin API - не раньше, чем через
+CLOUDINARY_MANIFEST_SYNC_TTL секунд, чтобы не расходовать его часовой лимит.
+
+Для каждого фото индекс хранит заказанные при загрузке eager-производные
+(миниатюра, большое фото) и их готовность: Cloudinary строит их асинхронно,
+готовность отмечается по ответу upload, уведомлению eager или refresh_derivatives.
+"""
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+CLOUDINARY_MANIFEST = 'data/cloudinary_manifest.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS assets (
+    public_id TEXT PRIMARY KEY,
+    custom_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    version INTEGER,
+    format TEXT,
+    width INTEGER,
+    height INTEGER,
+    bytes INTEGER,
+    secure_url TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assets_custom_id ON assets (custom_id, position);
+CREATE TABLE IF NOT EXISTS derivatives (
+    public_id TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    transformation TEXT NOT NULL,
+    ready INTEGER NOT NULL DEFAULT 0,
+    secure_url TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (public_id, profile)
+);
+CREATE TABLE IF NOT EXISTS synced (
+    custom_id TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (custom_id, folder)
+);
+"""
+
+_COLUMNS = 'public_id, custom_id, position, version, format, width, height, bytes, secure_url'
+
+
+@dataclass(frozen=True)
+class Asset:
+    """Загруженное фото автомобиля"""
+    public_id: str
+    custom_id: str
+    position: int
+    version: Optional[int] = None
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    bytes: Optional[int] = None
+    secure_url: Optional[str] = None
+
+    @property
+    def folder(self) -> str:
+        """Папка Cloudinary ('' для корня)"""
+        return self.public_id.rpartition('/')[0]
+
+
+def _position_from_public_id(public_id: str) -> int:
+    """Номер фото из public_id вида car_<custom_id>_<n>"""
+    suffix = public_id.rpartition('_')[2]
+    return int(suffix) if suffix.isdigit() else 0
+
+
+class AssetManifest:
+    """Индекс фото по custom_id в SQLite"""
+
+    def __init__(self, path: str, sync_ttl: float = 86400):
+        """
+        Args:
+            path: Файл SQLite (':memory:' - только для тестов)
+            sync_ttl: Сколько секунд не повторять поиск автомобиля в Admin API
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.sync_ttl = sync_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.executescript(_SCHEMA)
+
+    def record(self, custom_id: str, result: Dict[str, Any], position: Optional[int] = None) -> Asset:
+        """
+        Записывает результат загрузки (ответ upload или элемент resources Admin API)
+
+        Args:
+            custom_id: ID автомобиля
+            result: Ответ Cloudinary с public_id, version, format, width, height, bytes
+            position: Номер фото (по умолчанию из суффикса public_id)
+
+        Returns:
+            Записанный Asset
+        """
+        public_id = result['public_id']
+        asset = Asset(
+            public_id=public_id,
+            custom_id=custom_id,
+            position=position if position is not None else _position_from_public_id(public_id),
+            version=result.get('version'),
+            format=result.get('format'),
+            width=result.get('width'),
+            height=result.get('height'),
+            bytes=result.get('bytes'),
+            secure_url=result.get('secure_url'),
+        )
+        with self._lock:
+            self._db.execute(
+                f'INSERT OR REPLACE INTO assets ({_COLUMNS}, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (asset.public_id, asset.custom_id, asset.position, asset.version, asset.format,
+                 asset.width, asset.height, asset.bytes, asset.secure_url, time.time())
+            )
+        return asset
+
+    def assets(self, custom_id: str, folder: Optional[str] = None) -> List[Asset]:
+        """
+        Фото автомобиля по порядку
+
+        Args:
+            custom_id: ID автомобиля
+            folder: Только из этой папки ('' - корень, None - из любой)
+        """
+        with self._lock:
+            rows = self._db.execute(
+                f'SELECT {_COLUMNS} FROM assets WHERE custom_id = ? ORDER BY position, public_id',
+                (custom_id,)
+            ).fetchall()
+        assets = [Asset(*row) for row in rows]
+        if folder is not None:
+            assets = [asset for asset in assets if asset.folder == folder]
+        return assets
+
+    def remove(self, public_ids: List[str]):
+        """Удаляет записи о фото (после удаления из Cloudinary)"""
+        if not public_ids:
+            return
+        with self._lock:
+            self._db.executemany('DELETE FROM assets WHERE public_id = ?', [(p,) for p in public_ids])
+            self._db.executemany('DELETE FROM derivatives WHERE public_id = ?', [(p,) for p in public_ids])
+
+    def request_derivatives(self, public_id: str, transformations: Dict[str, str],
+                            eager: Optional[List[Dict[str, Any]]] = None):
+        """
+        Записывает заказанные при загрузке производные
+
+        Args:
+            public_id: Идентификатор фото
+            transformations: Профиль -> строка трансформации (c_fill,h_200,...)
+            eager: Поле eager из ответа upload (готовые отмечаются сразу)
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO derivatives (public_id, profile, transformation, ready, updated_at) '
+                'VALUES (?, ?, ?, 0, ?)',
+                [(public_id, profile, transformation, now) for profile, transformation in transformations.items()]
+            )
+        if eager:
+            self.mark_derived(public_id, eager)
+
+    def mark_derived(self, public_id: str, derived: List[Dict[str, Any]]) -> int:
+        """
+        Отмечает готовые производные
+
+        Args:
+            public_id: Идентификатор фото
+            derived: Элементы eager из ответа upload или уведомления Cloudinary,
+                либо derived из Admin API resource - с transformation и secure_url
+
+        Returns:
+            Число отмеченных производных
+        """
+        ready = [
+            (item.get('secure_url'), time.time(), public_id, item['transformation'])
+            for item in derived
+            if item.get('transformation') and item.get('status', 'ready') not in ('processing', 'pending', 'failed')
+        ]
+        if not ready:
+            return 0
+        with self._lock:
+            before = self._db.total_changes
+            self._db.executemany(
+                'UPDATE derivatives SET ready = 1, secure_url = ?, updated_at = ? '
+                'WHERE public_id = ? AND transformation = ? AND ready = 0',
+                ready
+            )
+            return self._db.total_changes - before
+
+    def derivatives(self, custom_id: str) -> Dict[str, Dict[str, bool]]:
+        """
+        Готовность производных фото автомобиля
+
+        Returns:
+            public_id -> {профиль: готова ли}
+        """
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT d.public_id, d.profile, d.ready FROM derivatives d '
+                'JOIN assets a ON a.public_id = d.public_id WHERE a.custom_id = ? ORDER BY a.position, d.profile',
+                (custom_id,)
+            ).fetchall()
+        result: Dict[str, Dict[str, bool]] = {}
+        for public_id, profile, ready in rows:
+            result.setdefault(public_id, {})[profile] = bool(ready)
+        return result
+
+    def pending_derivatives(self) -> int:
+        """Число заказанных, но еще не готовых производных"""
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM derivatives WHERE ready = 0').fetchone()[0]
+
+    def refresh_derivatives(self, custom_id: str) -> int:
+        """
+        Проверяет неготовые производные автомобиля через Admin API (resource)
+
+        Нужен, если уведомления eager не принимаются: один запрос на фото,
+        у которого остались неготовые производные.
+
+        Returns:
+            Число производных, ставших готовыми
+        """
+        import cloudinary.api
+
+        marked = 0
+        for public_id, profiles in self.derivatives(custom_id).items():
+            if all(profiles.values()):
+                continue
+            resource = cloudinary.api.resource(public_id)
+            marked += self.mark_derived(public_id, resource.get('derived', []))
+        return marked
+
+    def custom_ids(self) -> List[str]:
+        """Все автомобили с фото в индексе"""
+        with self._lock:
+            return [row[0] for row in self._db.execute('SELECT DISTINCT custom_id FROM assets')]
+
+    def sync_from_cloudinary(self, custom_id: str, folder: str = '') -> List[Asset]:
+        """
+        Заполняет индекс для автомобиля, загруженного до его появления
+
+        Один запрос Admin API по префиксу car_<custom_id>_ вместо перебора номеров.
+
+        Args:
+            custom_id: ID автомобиля
+            folder: Папка Cloudinary
+
+        Returns:
+            Найденные фото
+        """
+        import cloudinary.api
+
+        prefix = f"{folder}/car_{custom_id}_" if folder else f"car_{custom_id}_"
+        response = cloudinary.api.resources(type='upload', prefix=prefix, max_results=100)
+        for resource in response.get('resources', []):
+            # Префикс car_1_ совпадает и с car_1_10, но не с car_12_1: номер проверяем отдельно
+            if resource['public_id'][len(prefix):].isdigit():
+                self.record(custom_id, resource)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO synced (custom_id, folder, synced_at) VALUES (?, ?, ?)',
+                (custom_id, folder, time.time())
+            )
+        assets = self.assets(custom_id, folder)
+        logger.info(f"Индекс Cloudinary для {custom_id} заполнен из Admin API: {len(assets)} фото")
+        return assets
+
+    def synced_recently(self, custom_id: str, folder: str = '') -> bool:
+        """Поиск автомобиля в Admin API был не раньше sync_ttl секунд назад (в том числе пустой)"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT synced_at FROM synced WHERE custom_id = ? AND folder = ?', (custom_id, folder)
+            ).fetchone()
+        return row is not None and time.time() - row[0] < self.sync_ttl
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_manifest: Optional[AssetManifest] = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest() -> AssetManifest:
+    """Глобальный индекс (путь из CLOUDINARY_MANIFEST)"""
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            _manifest = AssetManifest(
+                os.getenv('CLOUDINARY_MANIFEST', CLOUDINARY_MANIFEST),
+                sync_ttl=float(os.getenv('CLOUDINARY_MANIFEST_SYNC_TTL', '86400')),
+            )
+        return _manifest
@@ -27,6 +27,7 @@ from .image_manager import (
     create_car_gallery,
     delete_car_photos
 )
+from .manifest import AssetManifest
 from .legacy_wrapper import (
     upload_image_to_cloudinary,
     get_image_url_from_cloudinary,
@@ -104,8 +105,11 @@ class TestCloudinaryClient:
         """Тест неудачной валидации конфигурации"""
         mock_cloudinary.api.root_folders.side_effect = Exception("Invalid API key")
         
+        # Создание клиента не обращается к API, ключи проверяет validate()
+        client = CloudinaryClient(self.config)
+        mock_cloudinary.api.root_folders.assert_not_called()
         with pytest.raises(CloudinaryConfigError):
-            CloudinaryClient(self.config)
+            client.validate()
     
     @patch('app.cloudinary_api.cloudinary_client.CLOUDINARY_AVAILABLE', True)
     @patch('app.cloudinary_api.cloudinary_client.cloudinary')
@@ -180,7 +184,7 @@ class TestCloudinaryClient:
     @patch('app.cloudinary_api.cloudinary_client.cloudinary')
     def test_test_connection_failure(self, mock_cloudinary):
         """Тест неудачного тестирования соединения"""
-        mock_cloudinary.api.root_folders.side_effect = [{"folders": []}, Exception("Connection failed")]
+        mock_cloudinary.api.root_folders.side_effect = Exception("Connection failed")
         
         client = CloudinaryClient(self.config)
         assert client.test_connection() is False
@@ -226,50 +230,49 @@ class TestImageManager:
         ]
         mock_get_client.return_value = mock_client
         
-        results = upload_car_photos(["photo1.jpg", "photo2.jpg"], "123")
+        manifest = AssetManifest(':memory:')
+        results = upload_car_photos(["photo1.jpg", "photo2.jpg"], "123", manifest=manifest)
         
         assert len(results) == 2
         assert results[0]["public_id"] == "car_123_1"
         assert results[1]["public_id"] == "car_123_2"
         assert mock_client.upload_image.call_count == 2
+        assert [asset.public_id for asset in manifest.assets("123")] == ["car_123_1", "car_123_2"]
     
     @patch('app.cloudinary_api.image_manager._get_default_client')
     def test_get_car_photos_urls(self, mock_get_client):
         """Тест получения URL фотографий автомобиля"""
-        mock_client = MagicMock()
-        mock_client.get_image_url.side_effect = [
-            "https://cloudinary.com/cars/car_123_1.jpg",
-            "https://cloudinary.com/cars/car_123_2.jpg",
-            Exception("Not found")  # Для остановки поиска
-        ]
-        mock_get_client.return_value = mock_client
+        manifest = AssetManifest(':memory:')
+        for i in (1, 2):
+            manifest.record("123", {"public_id": f"cars/car_123_{i}", "version": 1,
+                                    "secure_url": f"https://cloudinary.com/cars/car_123_{i}.jpg"})
         
-        urls = get_car_photos_urls("123", count=5, folder="cars")
+        urls = get_car_photos_urls("123", count=5, folder="cars", manifest=manifest)
         
+        # URL берутся из индекса: только загруженные фото и без обращения к клиенту
         assert len(urls) == 2
         assert "car_123_1" in urls[0]
         assert "car_123_2" in urls[1]
+        mock_get_client.assert_not_called()
     
     @patch('app.cloudinary_api.image_manager._get_default_client')
     def test_create_car_gallery(self, mock_get_client):
         """Тест создания галереи автомобиля"""
         mock_client = MagicMock()
-        # Мок для получения оригинальных URL
         mock_client.get_image_url.side_effect = [
-            "https://original1.jpg",
-            "https://original2.jpg", 
-            Exception("Not found"),  # Остановка поиска оригиналов
             "https://large1.jpg",    # Большие версии
             "https://large2.jpg",
             "https://thumb1.jpg",    # Миниатюры
             "https://thumb2.jpg",
-            Exception("Not found")   # Остановка поиска миниатюр
         ]
         mock_get_client.return_value = mock_client
+        manifest = AssetManifest(':memory:')
+        for i in (1, 2):
+            manifest.record("123", {"public_id": f"cars/car_123_{i}", "secure_url": f"https://original{i}.jpg"})
         
-        gallery = create_car_gallery("123", folder="cars")
+        gallery = create_car_gallery("123", folder="cars", manifest=manifest)
         
-        assert len(gallery["original"]) == 2
+        assert gallery["original"] == ["https://original1.jpg", "https://original2.jpg"]
         assert len(gallery["large"]) == 2
         assert len(gallery["thumbnails"]) == 2
         assert gallery["count"] == 2
@@ -323,15 +326,13 @@ class TestLegacyWrapper:
     @patch.dict(os.environ, {'CLOUDINARY_URL': 'cloudinary://test'})
     def test_legacy_get_car_photos_urls(self, mock_get_client):
         """Тест legacy функции получения URL фотографий автомобиля"""
-        mock_client = MagicMock()
-        mock_client.get_image_url.side_effect = [
-            "https://cloudinary.com/car_123_1.jpg",
-            "https://cloudinary.com/car_123_2.jpg",
-            Exception("Not found")
-        ]
-        mock_get_client.return_value = mock_client
+        mock_get_client.return_value = MagicMock()
+        manifest = AssetManifest(':memory:')
+        for i in (1, 2):
+            manifest.record("123", {"public_id": f"car_123_{i}", "secure_url": f"https://cloudinary.com/car_123_{i}.jpg"})
         
-        urls = legacy_get_car_photos_urls("123", count=5)
+        with patch('app.cloudinary_api.image_manager.get_manifest', return_value=manifest):
+            urls = legacy_get_car_photos_urls("123", count=5)
         assert len(urls) == 2
     
     @patch('app.cloudinary_api.legacy_wrapper._get_legacy_client')
@@ -4,6 +4,10 @@ from telegram.ext import ContextTypes, ConversationHandler, CommandHandler, Mess
 from app.utils.config import set_pricing_config
 from app.utils.announcement_processor import process_single_announcement
 from app.utils.channel_parser import fetch_announcements_from_channel
+from app.monitoring.metrics import QUEUE_DEPTH
+from app.monitoring.profiling import get_profiler
+from app.monitoring.shadow import shadow_entry, get_shadow_config
+from app.cloudinary_api.cleanup import CleanupJob, CleanupConflictError, format_progress
 import asyncio
 
 # Эти переменные должны импортироваться из main.py или передаваться через context.application.bot_data
@@ -12,6 +16,9 @@ import asyncio
 # Состояния для диалога админ-панели
 SET_MARKUP, PARSER_CHANNEL, PARSER_COUNT = range(3)
 
+# Ссылки на фоновые задачи: event loop хранит только слабые ссылки
+_background_tasks = set()
+
 async def get_admin_keyboard():
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("📊 Статистика", callback_data='admin_stats')],
@@ -271,16 +278,20 @@ async def run_parser_task(context, channel, count, message_id, chat_id):
         # Обрабатываем каждое объявление через единый процессор
         processed_count = 0
         error_count = 0
+        QUEUE_DEPTH.labels(queue='admin_parser').set(len(announcements))
         
         for i, announcement in enumerate(announcements, 1):
+            QUEUE_DEPTH.labels(queue='admin_parser').set(len(announcements) - i)
             print(f"\n--- Админ-парсинг: Обработка {i}/{len(announcements)} ---")
             try:
-                await process_single_announcement(
-                    ann=announcement,
-                    perplexity_processor=perplexity_processor,
-                    source_channel=channel,
-                    markup_percentage=MARKUP_PERCENTAGE
-                )
+                # SHADOW_MODE=1/parser: обработка без публикации и сохранения
+                with shadow_entry('parser'):
+                    await process_single_announcement(
+                        ann=announcement,
+                        perplexity_processor=perplexity_processor,
+                        source_channel=channel,
+                        markup_percentage=MARKUP_PERCENTAGE
+                    )
                 processed_count += 1
             except Exception as e:
                 error_count += 1
@@ -299,7 +310,12 @@ async def run_parser_task(context, channel, count, message_id, chat_id):
         if error_count > 0:
             result_text += f"Ошибок: {error_count}\n"
         
-        result_text += f"\n🚗 Объявления добавлены в каталог."
+        shadow_config = get_shadow_config()
+        if shadow_config.is_shadow('parser'):
+            sink = f"`{shadow_config.sink_channel}`" if shadow_config.sink_channel else "не выполнялась"
+            result_text += f"\n👥 Shadow-режим: публикация - {sink}, в каталог не сохранено."
+        else:
+            result_text += f"\n🚗 Объявления добавлены в каталог."
         
         await context.bot.edit_message_text(
             chat_id=chat_id,
@@ -327,6 +343,141 @@ async def cancel_conversation(update: Update, context: ContextTypes.DEFAULT_TYPE
     await update.message.reply_text("❌ Операция отменена.")
     return ConversationHandler.END
 
+async def profile_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /profile calls N - профилировать следующие N объявлений (cProfile)
+    /profile window S - выборочное профилирование процесса на S секунд
+    /profile stop - остановить окно профилирования
+    /profile - текущее состояние
+    """
+    ADMIN_USER_IDS = context.application.bot_data['ADMIN_USER_IDS']
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("⛔️ Доступ запрещен.")
+        return
+
+    profiler = get_profiler()
+    args = context.args or []
+    try:
+        if len(args) == 2 and args[0] == 'calls':
+            remaining = profiler.arm_calls(int(args[1]))
+            text = f"🔬 Профилирование включено для следующих {remaining} объявлений.\nФайл .prof появится в `{profiler.output_dir}/`."
+        elif len(args) == 2 and args[0] == 'window':
+            path = profiler.start_window(float(args[1]))
+            text = f"🔬 Профилирование процесса на {args[1]}с запущено.\nСтеки: `{path}`"
+        elif args == ['stop']:
+            profiler.stop_window()
+            text = "⏹ Окно профилирования остановлено."
+        elif not args:
+            status = profiler.status()
+            outputs = "\n".join(f"• {mode}: `{path}`" for mode, path in status['last_outputs'].items()) or "нет"
+            text = (
+                f"🔬 **Профилирование**\n\n"
+                f"Осталось объявлений: {status['calls_remaining']}\n"
+                f"Окно запущено: {'да' if status['window_running'] else 'нет'}\n"
+                f"Последние файлы:\n{outputs}\n\n"
+                f"Использование: `/profile calls 5`, `/profile window 60`, `/profile stop`"
+            )
+        else:
+            text = "Использование: `/profile calls 5`, `/profile window 60`, `/profile stop`"
+    except (ValueError, RuntimeError) as e:
+        text = f"❌ {e}"
+    await update.message.reply_text(text, parse_mode='Markdown')
+
+async def cleanup_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /cleanup <custom_id> ... - удалить фото автомобилей из Cloudinary (фоновое задание)
+    /cleanup resume - продолжить незавершенное задание
+    /cleanup discard - сбросить незавершенное задание
+    /cleanup stop - остановить текущее задание
+    /cleanup - текущее состояние
+    """
+    ADMIN_USER_IDS = context.application.bot_data['ADMIN_USER_IDS']
+    if update.effective_user.id not in ADMIN_USER_IDS:
+        await update.message.reply_text("⛔️ Доступ запрещен.")
+        return
+
+    args = context.args or []
+    job = context.application.bot_data.get('cleanup_job')
+    running = context.application.bot_data.get('cleanup_running', False)
+    usage = "Использование: `/cleanup <custom_id> ...`, `/cleanup resume`, `/cleanup discard`, `/cleanup stop`"
+
+    if args == ['stop']:
+        if running:
+            job.stop()
+            text = "⏹ Очистка будет остановлена после текущей пачки. Продолжить: `/cleanup resume`"
+        else:
+            text = "Очистка не запущена."
+        await update.message.reply_text(text, parse_mode='Markdown')
+        return
+    if not args:
+        text = format_progress(job.progress()) if job else "Очистка не запускалась."
+        await update.message.reply_text(f"{text}\n\n{usage}", parse_mode='Markdown')
+        return
+    if running:
+        await update.message.reply_text("⏳ Очистка уже выполняется: `/cleanup` - состояние, `/cleanup stop` - остановка.",
+                                        parse_mode='Markdown')
+        return
+
+    if args == ['discard']:
+        text = "🗑 Незавершенное задание сброшено." if CleanupJob.discard() else "Незавершенных заданий нет."
+        await update.message.reply_text(text)
+        return
+    unfinished = CleanupJob.resume()
+    if args == ['resume']:
+        job = unfinished
+    elif unfinished and unfinished.custom_ids != list(dict.fromkeys(args)):
+        await update.message.reply_text(
+            f"⚠️ Есть незавершенное задание ({len(unfinished.pending)} из {len(unfinished.custom_ids)} автомобилей). "
+            "Продолжить: `/cleanup resume`, сбросить: `/cleanup discard`.",
+            parse_mode='Markdown'
+        )
+        return
+    else:
+        job = CleanupJob.from_env(args)
+    if job is None:
+        await update.message.reply_text("Незавершенных заданий нет.")
+        return
+    context.application.bot_data['cleanup_job'] = job
+    context.application.bot_data['cleanup_running'] = True
+    message = await update.message.reply_text(format_progress(job.progress()))
+    task = asyncio.create_task(run_cleanup_task(context, job, message))
+    _background_tasks.add(task)
+    task.add_done_callback(_cleanup_task_done)
+
+def _cleanup_task_done(task):
+    _background_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"❌ Задача очистки Cloudinary завершилась с ошибкой: {task.exception()!r}")
+
+async def run_cleanup_task(context, job, message):
+    """Выполняет задание очистки в потоке и обновляет сообщение с прогрессом"""
+    loop = asyncio.get_running_loop()
+    last_edit = 0.0
+
+    async def edit(text):
+        try:
+            await message.edit_text(text)
+        except Exception as e:
+            print(f"⚠️ Не удалось обновить прогресс очистки: {e}")
+
+    def on_progress(progress):
+        nonlocal last_edit
+        # Не чаще раза в 5 секунд: лимит Telegram на редактирование сообщений
+        if loop.time() - last_edit >= 5:
+            last_edit = loop.time()
+            asyncio.run_coroutine_threadsafe(edit(format_progress(progress)), loop)
+
+    try:
+        progress = await asyncio.to_thread(job.run, on_progress)
+        status_icon = "✅" if job.finished else "⏹"
+        await edit(f"{status_icon} {format_progress(progress)}")
+    except CleanupConflictError as e:
+        await edit(f"⚠️ {e}\nПродолжить: /cleanup resume, сбросить: /cleanup discard")
+    except Exception as e:
+        await edit(f"❌ Ошибка очистки Cloudinary: {e}\nПродолжить: /cleanup resume")
+    finally:
+        context.application.bot_data['cleanup_running'] = False
+
 def register_admin_handlers(application):
     """Регистрирует все обработчики для админ-панели"""
     
@@ -359,4 +510,6 @@ def register_admin_handlers(application):
         per_chat=False
     )
     
-    application.add_handler(admin_conv_handler) 
\ No newline at end of file
+    application.add_handler(admin_conv_handler)
+    application.add_handler(CommandHandler("profile", profile_command))
+    application.add_handler(CommandHandler("cleanup", cleanup_command)) 
\ No newline at end of file
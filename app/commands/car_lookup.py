@@ -0,0 +1,210 @@
+"""
+Поиск автомобиля для /getauto: общий HTTP-клиент, LRU/TTL-кэш и single-flight
+
+Популярный пост приводит к сотням одновременных /getauto с одним ID. Все
+обращения идут через один aiohttp.ClientSession; записи кэшируются в памяти
+процесса (GETAUTO_CACHE_SIZE записей на GETAUTO_CACHE_TTL секунд, отсутствие
+авто - на GETAUTO_NEGATIVE_TTL), а одновременные запросы одного custom_id
+ждут единственный запрос к API. Фото скачиваются параллельно, не более
+GETAUTO_PHOTO_CONCURRENCY одновременно.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from io import BytesIO
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+import aiohttp
+
+from app.monitoring.metrics import record_api_error, record_cache
+
+logger = logging.getLogger(__name__)
+
+NODE_API_URL = f"http://localhost:{os.getenv('NODE_PORT', 3001)}/api"
+
+_MISSING = object()
+
+
+class CarLookup:
+    """Чтение автомобилей из Node.js API через кэш"""
+
+    def __init__(self, api_url: str = NODE_API_URL, cache_size: int = 1000, ttl: float = 300.0,
+                 negative_ttl: float = 30.0, photo_concurrency: int = 5, timeout: float = 15.0):
+        """
+        Args:
+            api_url: Базовый URL Node.js API
+            cache_size: Максимум записей в кэше
+            ttl: Время жизни найденного автомобиля, секунд
+            negative_ttl: Время жизни ответа "не найден", секунд
+            photo_concurrency: Одновременных скачиваний фото
+            timeout: Таймаут запроса, секунд
+        """
+        self.api_url = api_url
+        self.cache_size = cache_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.photo_concurrency = photo_concurrency
+        self.timeout = timeout
+        self._cache: 'OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_env(cls) -> 'CarLookup':
+        return cls(
+            cache_size=int(os.getenv('GETAUTO_CACHE_SIZE', '1000')),
+            ttl=float(os.getenv('GETAUTO_CACHE_TTL', '300')),
+            negative_ttl=float(os.getenv('GETAUTO_NEGATIVE_TTL', '30')),
+            photo_concurrency=int(os.getenv('GETAUTO_PHOTO_CONCURRENCY', '5')),
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Общая сессия (создается при первом запросе в текущем event loop)"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        """Закрытие сессии"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _cached(self, custom_id: str):
+        entry = self._cache.get(custom_id)
+        if entry is None:
+            return _MISSING
+        expires_at, car = entry
+        if time.monotonic() >= expires_at:
+            del self._cache[custom_id]
+            return _MISSING
+        self._cache.move_to_end(custom_id)
+        return car
+
+    def _store(self, custom_id: str, car: Optional[Dict[str, Any]]):
+        ttl = self.ttl if car is not None else self.negative_ttl
+        self._cache[custom_id] = (time.monotonic() + ttl, car)
+        self._cache.move_to_end(custom_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, custom_id: str):
+        """Удаляет автомобиль из кэша (после изменения в базе)"""
+        self._cache.pop(custom_id, None)
+
+    async def get_car(self, custom_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Автомобиль по custom_id
+
+        Args:
+            custom_id: ID автомобиля
+
+        Returns:
+            Данные автомобиля или None (не найден или API недоступен)
+        """
+        car = self._cached(custom_id)
+        if car is not _MISSING:
+            record_cache('getauto', hit=True)
+            return car
+        record_cache('getauto', hit=False)
+
+        task = self._inflight.get(custom_id)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_car(custom_id))
+            self._inflight[custom_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(custom_id, None))
+        # shield: отмена одного ожидающего не отменяет запрос остальным
+        return await asyncio.shield(task)
+
+    async def _fetch_car(self, custom_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            async with self.session.get(f"{self.api_url}/cars/{custom_id}") as response:
+                if response.status == 200:
+                    car = await response.json()
+                elif response.status == 404:
+                    car = None
+                else:
+                    record_api_error('storage_api', response.status)
+                    logger.warning(f"Storage API вернул {response.status} для {custom_id}")
+                    return None
+        except Exception as e:
+            record_api_error('storage_api', type(e).__name__)
+            logger.error(f"❌ Ошибка подключения к API: {e}")
+            return None
+        # Ошибки API не кэшируются, только ответы 200 и 404
+        self._store(custom_id, car)
+        return car
+
+    async def save_photo_file_ids(self, custom_id: str, file_ids: List[str]) -> bool:
+        """
+        Сохраняет file_id фото, полученные от Telegram, в базу и в кэш
+
+        Args:
+            custom_id: ID автомобиля
+            file_ids: file_id в порядке photos
+
+        Returns:
+            True при успешном сохранении в базу
+        """
+        entry = self._cache.get(custom_id)
+        if entry is not None and entry[1] is not None:
+            entry[1]['photo_file_ids'] = file_ids
+        try:
+            async with self.session.put(f"{self.api_url}/cars/{custom_id}",
+                                        json={'photo_file_ids': file_ids}) as response:
+                if response.status == 200:
+                    return True
+                record_api_error('storage_api', response.status)
+                return False
+        except Exception as e:
+            record_api_error('storage_api', type(e).__name__)
+            logger.warning(f"Не удалось сохранить file_id фото {custom_id}: {e}")
+            return False
+
+    async def download_image(self, url: str) -> Optional[BytesIO]:
+        """Скачивает изображение по URL и возвращает BytesIO объект"""
+        try:
+            async with self.session.get(url) as response:
+                if response.status == 200:
+                    return BytesIO(await response.read())
+                return None
+        except Exception as e:
+            logger.warning(f"⚠️  Ошибка скачивания изображения {url}: {e}")
+            return None
+
+    async def download_images(self, urls: List[str]) -> List[BytesIO]:
+        """
+        Скачивает фото параллельно
+
+        Returns:
+            Успешно скачанные фото в исходном порядке
+        """
+        semaphore = asyncio.Semaphore(self.photo_concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                return await self.download_image(url)
+
+        photos = await asyncio.gather(*(fetch(url) for url in urls))
+        return [photo for photo in photos if photo is not None]
+
+
+_lookup: Optional[CarLookup] = None
+
+
+def get_car_lookup() -> CarLookup:
+    """Глобальный экземпляр поиска автомобилей"""
+    global _lookup
+    if _lookup is None:
+        _lookup = CarLookup.from_env()
+    return _lookup
+
+
+async def close_car_lookup():
+    """Закрывает сессию глобального экземпляра (при остановке бота)"""
+    if _lookup is not None:
+        await _lookup.close()
@@ -1,46 +1,24 @@
 """
 Команда /getauto для получения информации об автомобиле по custom_id
 """
-import asyncio
-import aiohttp
 import logging
-import os
 from io import BytesIO
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
+from app.commands.car_lookup import get_car_lookup
+
 # Настройки
 logger = logging.getLogger(__name__)
-NODE_API_URL = f"http://localhost:{os.getenv('NODE_PORT', 3001)}/api"
 
 async def get_car_from_api(custom_id: str):
-    """Получает данные автомобиля из Node.js API"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{NODE_API_URL}/cars/{custom_id}") as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 404:
-                    return None
-                else:
-                    return None
-    except Exception as e:
-        print(f"❌ Ошибка подключения к API: {e}")
-        return None
+    """Получает данные автомобиля из Node.js API (через кэш, см. car_lookup.py)"""
+    return await get_car_lookup().get_car(custom_id)
 
 async def download_image(url: str) -> BytesIO:
     """Скачивает изображение по URL и возвращает BytesIO объект"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    image_data = await response.read()
-                    return BytesIO(image_data)
-                else:
-                    return None
-    except Exception as e:
-        print(f"⚠️  Ошибка скачивания изображения {url}: {e}")
-        return None
+    return await get_car_lookup().download_image(url)
 
 def format_car_message(car_data: dict) -> str:
     """Форматирует информацию об автомобиле для отправки (HTML)"""
@@ -87,6 +65,57 @@ def format_car_message(car_data: dict) -> str:
         message = message[:950] + "...\n\n📞 <b>Контакт:</b> @VroomMarketManager"
     return message
 
+async def _reply_photos(update: Update, context: ContextTypes.DEFAULT_TYPE, photos: list, caption: str) -> list:
+    """Отправляет фото (file_id, URL или BytesIO) с подписью к первому, возвращает сообщения"""
+    if len(photos) == 1:
+        return [await update.message.reply_photo(photo=photos[0], caption=caption, parse_mode='HTML')]
+    media_group = [
+        InputMediaPhoto(photo, caption=caption, parse_mode='HTML') if i == 0 else InputMediaPhoto(photo)
+        for i, photo in enumerate(photos)
+    ]
+    return list(await context.bot.send_media_group(chat_id=update.effective_chat.id, media=media_group))
+
+async def send_car_photos(update: Update, context: ContextTypes.DEFAULT_TYPE, car_data: dict, caption: str) -> bool:
+    """
+    Отправляет фото автомобиля, не пропуская байты через бота, когда это возможно
+    
+    Порядок: сохраненные file_id (мгновенно), URL Cloudinary (Telegram скачивает
+    сам), скачивание и загрузка байтов. Если file_id не было (первый /getauto
+    после публикации) или Telegram их не принял (истекли, другой бот), file_id
+    из ответа Bot API сохраняются с автомобилем. При публикации file_id не
+    сохраняются: пользовательская сессия Telethon выдает идентификаторы,
+    которые бот отправить не может.
+    
+    Returns:
+        True, если фото отправлены
+    """
+    lookup = get_car_lookup()
+    custom_id = car_data.get('custom_id')
+    file_ids = (car_data.get('photo_file_ids') or [])[:10]
+    urls = (car_data.get('photos') or [])[:10]
+    
+    sent = None
+    for source, photos in (('file_id', file_ids), ('url', urls)):
+        if not photos:
+            continue
+        try:
+            sent = await _reply_photos(update, context, photos, caption)
+            break
+        except BadRequest as e:
+            logger.info(f"Telegram не принял {source} фото {custom_id}: {e}")
+    else:
+        photo_files = await lookup.download_images(urls)
+        if not photo_files:
+            return False
+        source = 'upload'
+        sent = await _reply_photos(update, context, photo_files, caption)
+    
+    if source != 'file_id':
+        new_file_ids = [msg.photo[-1].file_id for msg in sent if msg.photo]
+        if new_file_ids:
+            await lookup.save_photo_file_ids(custom_id, new_file_ids)
+    return True
+
 async def getauto_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /getauto"""
     user_id = update.effective_user.id
@@ -142,89 +171,44 @@ async def getauto_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         message = format_car_message(car_data)
         
         # Получаем фотографии
-        photos = car_data.get('photos', [])
-        if photos and len(photos) > 0:
-            # Ограничиваем максимум 10 фото
-            photos = photos[:10]
-            # Обновляем статус: загрузка фото
+        photos = (car_data.get('photos') or [])[:10]
+        if photos or car_data.get('photo_file_ids'):
+            # Обновляем статус: отправка результата
             await loading_message.edit_text(
                 f"🔍 Поиск автомобиля с ID: `{custom_id}`...\n"
                 f"✅ Данные получены\n"
                 f"✅ Информация обработана\n"
-                f"📸 Загрузка фотографий ({len(photos)} шт.)...",
+                f"📤 Отправка результата...",
                 parse_mode='HTML'
             )
-            # Скачиваем фотографии
-            photo_files = []
-            for i, photo_url in enumerate(photos):
-                photo_data = await download_image(photo_url)
-                if photo_data:
-                    photo_files.append(photo_data)
-                # Небольшая задержка между скачиваниями
-                if i < len(photos) - 1 and len(photos) > 1:
-                    await asyncio.sleep(0.3)
             
-            if photo_files:
-                # Обновляем статус: отправка результата
-                await loading_message.edit_text(
-                    f"🔍 Поиск автомобиля с ID: `{custom_id}`...\n"
-                    f"✅ Данные получены\n"
-                    f"✅ Информация обработана\n"
-                    f"✅ Фотографии загружены ({len(photo_files)} шт.)\n"
-                    f"📤 Отправка результата...",
-                    parse_mode='HTML'
-                )
-                
-                try:
-                    if len(photo_files) == 1:
-                        # Одно фото - отправляем с подписью
+            try:
+                sent = await send_car_photos(update, context, car_data, message)
+            except Exception as e:
+                if "flood" in str(e).lower() or "too many requests" in str(e).lower():
+                    logger.warning(f"Telegram флуд-лимит при отправке фото: {e}")
+                    try:
+                        # Пробуем отправить только первое фото
+                        first_photo = (car_data.get('photo_file_ids') or photos)[0]
                         await update.message.reply_photo(
-                            photo=photo_files[0],
-                            caption=message,
+                            photo=first_photo,
+                            caption=f"{message}\n\n⚠️ Остальные фото временно недоступны из-за ограничений Telegram",
                             parse_mode='HTML'
                         )
-                        
-                        # Удаляем сообщение загрузки
-                        await loading_message.delete()
-                    else:
-                        # Много фото - отправляем медиа-группу с подписью к первому фото
-                        from telegram import InputMediaPhoto as TelegramInputMediaPhoto
-                        
-                        media_group = []
-                        for i, photo_file in enumerate(photo_files):
-                            if i == 0:
-                                # К первому фото добавляем подпись
-                                media_group.append(TelegramInputMediaPhoto(photo_file, caption=message, parse_mode='HTML'))
-                            else:
-                                media_group.append(TelegramInputMediaPhoto(photo_file))
-                        
-                        # Отправляем фотографии с подписью
-                        await context.bot.send_media_group(
-                            chat_id=update.effective_chat.id,
-                            media=media_group
+                    except:
+                        await update.message.reply_text(
+                            f"⚠️ Фотографии временно недоступны из-за ограничений Telegram\n\n{message}",
+                            parse_mode='HTML'
                         )
-                        
-                        # Удаляем сообщение загрузки
-                        await loading_message.delete()
-                except Exception as e:
-                    if "flood" in str(e).lower() or "too many requests" in str(e).lower():
-                        logger.warning(f"Telegram флуд-лимит при отправке фото: {e}")
-                        try:
-                            # Пробуем отправить только первое фото
-                            await update.message.reply_photo(
-                                photo=photo_files[0],
-                                caption=f"{message}\n\n⚠️ Остальные фото временно недоступны из-за ограничений Telegram",
-                                parse_mode='HTML'
-                            )
-                        except:
-                            await update.message.reply_text(
-                                f"⚠️ Фотографии временно недоступны из-за ограничений Telegram\n\n{message}",
-                                parse_mode='HTML'
-                            )
-                    else:
-                        raise e
-            else:
-                # Если фото не удалось скачать, отправляем только текст
+                    sent = None
+                else:
+                    raise e
+            
+            if sent:
+                # Удаляем сообщение загрузки
+                await loading_message.delete()
+            elif sent is not None:
+                # Если фото не удалось отправить, отправляем только текст
                 await update.message.reply_text(
                     f"⚠️ Фотографии временно недоступны\n\n{message}",
                     parse_mode='HTML'
@@ -1,33 +1,23 @@
 import os
 import asyncio
-from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.sessions import StringSession
 from telethon.tl.types import InputMediaPhoto
 from telethon.tl.custom import Button
+from telethon.errors import FloodWaitError
 
-load_dotenv()
-
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
-
-if not session_string:
-    raise ValueError(
-        "TELEGRAM_SESSION_STRING not found in environment variables. "
-        "Please run 'python generate_session.py' to generate it."
-    )
+from app.monitoring.metrics import record_api_error, record_rate_limited
+from app.monitoring.tracing import set_span_attribute
+from app.core.telethon_client import create_client
 
 async def get_client():
     """Получить подключенный Telethon клиент"""
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     if not client.is_connected():
         await client.connect()
     return client
 
 async def get_channel_id(channel_username):
     """Получить ID канала по его username"""
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     try:
         await client.start()
         entity = await client.get_entity(channel_username)
@@ -50,7 +40,7 @@ async def send_to_channel(channel_id, message, photo_path=None):
     Returns:
         Отправленное сообщение или None при ошибке
     """
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     try:
         await client.start()
         
@@ -91,7 +81,7 @@ async def get_messages_from_channel(channel_username, limit=10, start_from_id=No
     Returns:
         Список сообщений
     """
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     try:
         await client.start()
         
@@ -118,13 +108,13 @@ async def get_messages_from_channel(channel_username, limit=10, start_from_id=No
 # Для обратной совместимости - создаем глобальный клиент
 async def get_legacy_client():
     """Создать клиент для использования с async with"""
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     return client
 
 # Функция для получения определенного сообщения
 async def get_message_by_id(channel_username, message_id):
     """Получить конкретное сообщение по ID"""
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
+    async with create_client() as client:
         try:
             entity = await client.get_entity(channel_username)
             message = await client.get_messages(entity, ids=message_id)
@@ -149,7 +139,7 @@ async def send_message_to_channel(message: str, button_text: str = None, button_
             [Button.url(button_text, button_url)]
         ]
 
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     await client.start()
     await client.send_message(channel_id, message, buttons=buttons, parse_mode='html')
     await client.disconnect()
@@ -168,7 +158,7 @@ async def fetch_text_photo_pairs(source_channel, limit=500, download_dir="downlo
     Пары ищутся по принципу: ближайший текст и ближайшее фото (включая документы-изображения), даже если между ними есть другие сообщения.
     Фото скачиваются с уникальным именем по id сообщения с фото.
     """
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     await client.start()
     if not os.path.exists(download_dir):
         os.makedirs(download_dir)
@@ -209,12 +199,15 @@ async def fetch_text_photo_pairs(source_channel, limit=500, download_dir="downlo
     await client.disconnect()
     return pairs
 
-async def send_message_with_photos_to_channel(text: str, photo_paths: list):
+async def send_message_with_photos_to_channel(text: str, photo_paths: list, target_channel: str = None):
     """
     Отправляет пост с фотографиями и текстом в целевой канал.
-    Возвращает ID созданного поста и список file_id фотографий.
+    Возвращает ID созданного поста и список ID фотографий.
+    ID привязаны к пользовательской сессии Telethon и ботом не отправляются:
+    file_id для /getauto сохраняет сам бот после первой отправки фото.
+    target_channel переопределяет TARGET_CHANNEL_ID (например, канал-приемник shadow-режима).
     """
-    target_channel = os.getenv("TARGET_CHANNEL_ID")
+    target_channel = target_channel or os.getenv("TARGET_CHANNEL_ID")
     
     # Поддержка как числовых ID, так и username каналов
     try:
@@ -228,7 +221,7 @@ async def send_message_with_photos_to_channel(text: str, photo_paths: list):
     if len(text) > max_caption_length:
         text = text[:max_caption_length-3] + "..."
 
-    async with TelegramClient(StringSession(session_string), api_id, api_hash) as client:
+    async with create_client() as client:
         try:
             # Отправляем пост
             if not photo_paths:
@@ -238,20 +231,23 @@ async def send_message_with_photos_to_channel(text: str, photo_paths: list):
                 sent_message = await client.send_file(target_channel_id, photo_paths, caption=text, parse_mode='html')
                 # Если это альбом, sent_message будет списком. Берем первый для ID.
                 message_to_process = sent_message[0] if isinstance(sent_message, list) else sent_message
-                # Извлекаем file_id для каждой фотографии
+                # Извлекаем ID каждой фотографии
                 photo_file_ids = []
-                if isinstance(sent_message, list):
-                    for msg in sent_message:
-                        if msg.media and hasattr(msg.media, 'photo'):
-                            photo_file_ids.append(msg.media.photo.id)
-                elif sent_message.media and hasattr(sent_message.media, 'photo'):
-                    photo_file_ids.append(sent_message.media.photo.id)
+                for msg in (sent_message if isinstance(sent_message, list) else [sent_message]):
+                    if msg.media and hasattr(msg.media, 'photo'):
+                        photo_file_ids.append(msg.media.photo.id)
                 target_message_id = message_to_process.id
             if not photo_paths:
                 message_to_process = sent_message
                 target_message_id = sent_message.id
             print(f">> Пост успешно отправлен в канал. ID поста: {target_message_id}")
             return target_message_id, photo_file_ids
+        except FloodWaitError as e:
+            record_rate_limited('telegram')
+            set_span_attribute('flood_wait_seconds', e.seconds)
+            print(f"❌ FloodWait при отправке сообщения в Telegram: {e.seconds}с")
+            return None, None
         except Exception as e:
+            record_api_error('telegram', type(e).__name__)
             print(f"❌ Ошибка при отправке сообщения в Telegram: {e}")
             return None, None 
\ No newline at end of file
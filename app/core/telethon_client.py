@@ -1,19 +1,61 @@
+"""
+Фабрика клиентов Telethon (StringSession)
+
+Учетные данные читаются и проверяются при первом создании клиента, а не при
+импорте: модули, которым Telethon нужен только в отдельных функциях, можно
+импортировать без TELEGRAM_SESSION_STRING (тесты, CLI-утилиты, healthcheck).
+"""
+
 import os
+from typing import Optional, Tuple
+
 from dotenv import load_dotenv
 from telethon import TelegramClient
 from telethon.sessions import StringSession
 
-load_dotenv()
 
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
+def get_credentials() -> Tuple[int, str, str]:
+    """
+    Учетные данные из окружения (.env загружается при первом вызове)
+
+    Returns:
+        (api_id, api_hash, session_string)
+
+    Raises:
+        ValueError: Не заданы TELEGRAM_API_ID или TELEGRAM_SESSION_STRING
+    """
+    load_dotenv()
+    api_id = os.getenv("TELEGRAM_API_ID")
+    session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
+    if not api_id:
+        raise ValueError("TELEGRAM_API_ID not found in environment variables.")
+    if not session_string:
+        raise ValueError(
+            "TELEGRAM_SESSION_STRING not found in environment variables. "
+            "Please run 'python generate_session.py' to generate it."
+        )
+    return int(api_id), os.getenv("TELEGRAM_API_HASH"), session_string
+
+
+def create_client() -> TelegramClient:
+    """Новый клиент со StringSession из окружения"""
+    api_id, api_hash, session_string = get_credentials()
+    return TelegramClient(StringSession(session_string), api_id, api_hash)
+
+
+_client: Optional[TelegramClient] = None
+
+
+def get_client() -> TelegramClient:
+    """Общий клиент модуля (создается при первом обращении)"""
+    global _client
+    if _client is None:
+        _client = create_client()
+    return _client
 
-if not session_string:
-    raise ValueError(
-        "TELEGRAM_SESSION_STRING not found in environment variables. "
-        "Please run 'python generate_session.py' to generate it."
-    )
 
-# Используем StringSession вместо файловой сессии
-client = TelegramClient(StringSession(session_string), api_id, api_hash) 
\ No newline at end of file
+def __getattr__(name):
+    # Совместимость: раньше клиент создавался при импорте как telethon_client.client
+    if name == 'client':
+        return get_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -21,6 +21,7 @@ async function createTableIfNotExists() {
       price DECIMAL(10,2),
       description TEXT,
       photos JSONB,
+      photo_file_ids JSONB DEFAULT '[]'::jsonb,
       status VARCHAR(50) DEFAULT 'available',
       created_at TIMESTAMP DEFAULT NOW(),
       updated_at TIMESTAMP DEFAULT NOW()
@@ -42,6 +43,9 @@ async function createTableIfNotExists() {
       EXCEPTION 
         WHEN others THEN NULL;
       END;
+      
+      -- file_id фото в Telegram (повторная отправка в /getauto без загрузки)
+      ALTER TABLE cars ADD COLUMN IF NOT EXISTS photo_file_ids JSONB DEFAULT '[]'::jsonb;
     END $$;
   `;
   
@@ -64,10 +68,10 @@ async function addCar(car) {
     const query = `
       INSERT INTO cars (
         custom_id, source_message_id, source_channel_name, target_channel_message_id,
-        brand, model, year, price, description, photos, status, created_at
+        brand, model, year, price, description, photos, photo_file_ids, status, created_at
       ) VALUES (
         $1, $2, $3, $4,
-        $5, $6, $7, $8, $9, $10, $11, NOW()
+        $5, $6, $7, $8, $9, $10, $11, $12, NOW()
       ) RETURNING *;
     `;
     
@@ -82,6 +86,7 @@ async function addCar(car) {
       car.price,
       car.description,
       JSON.stringify(car.photos || []),
+      JSON.stringify(car.photo_file_ids || []),
       car.status || 'available',
     ];
     
@@ -100,6 +105,129 @@ async function addCar(car) {
   }
 }
 
+// Повтор той же отправки: запись с этим custom_id создана из того же поста источника
+function isSameSource(row, car) {
+  return String(row.source_message_id) === String(car.source_message_id)
+    && (row.source_channel_name || '') === (car.source_channel_name || '');
+}
+
+// Разбирает автомобили, не вставленные из-за существующего custom_id:
+// повтор той же отправки считается сохраненным, другой автомобиль - конфликтом
+async function classifyConflicts(cars) {
+  const saved = [];
+  const failed = [];
+  if (!cars.length) {
+    return { saved, failed };
+  }
+  const result = await dbPool.executeQuery(
+    'SELECT custom_id, source_message_id, source_channel_name FROM cars WHERE custom_id = ANY($1)',
+    [cars.map(car => car.custom_id)]
+  );
+  const existing = new Map(result.rows.map(row => [row.custom_id, row]));
+  for (const car of cars) {
+    const row = existing.get(car.custom_id);
+    if (row && isSameSource(row, car)) {
+      saved.push(car.custom_id);
+    } else if (row) {
+      console.warn(`⚠️ Конфликт custom_id ${car.custom_id}: занят постом ${row.source_channel_name} #${row.source_message_id}`);
+      failed.push({
+        custom_id: car.custom_id,
+        error: `custom_id ${car.custom_id} занят другим автомобилем (${row.source_channel_name} #${row.source_message_id})`,
+        permanent: true,
+        reason: 'conflict'
+      });
+    } else {
+      failed.push({ custom_id: car.custom_id, error: 'Запись не вставлена' });
+    }
+  }
+  return { saved, failed };
+}
+
+// Пакетное добавление (write-behind очередь бота). Повторная отправка
+// безопасна: существующий custom_id из того же поста источника считается
+// сохраненным, другой автомобиль с тем же custom_id возвращается в failed
+// и остается в очереди бота.
+async function addCarsBulk(cars) {
+  console.log(`🚗 Пакетное добавление ${cars.length} автомобилей`);
+  await createTableIfNotExists();
+  
+  const columns = 12;
+  const values = [];
+  const rows = cars.map((car, index) => {
+    values.push(
+      car.custom_id,
+      car.source_message_id,
+      car.source_channel_name,
+      car.target_channel_message_id || null,
+      car.brand,
+      car.model,
+      car.year,
+      car.price,
+      car.description,
+      JSON.stringify(car.photos || []),
+      JSON.stringify(car.photo_file_ids || []),
+      car.status || 'available'
+    );
+    const params = Array.from({ length: columns }, (_, i) => `$${index * columns + i + 1}`);
+    return `(${params.join(', ')}, NOW())`;
+  });
+  
+  const query = `
+    INSERT INTO cars (
+      custom_id, source_message_id, source_channel_name, target_channel_message_id,
+      brand, model, year, price, description, photos, photo_file_ids, status, created_at
+    ) VALUES ${rows.join(', ')}
+    ON CONFLICT (custom_id) DO NOTHING
+    RETURNING custom_id;
+  `;
+  
+  let result;
+  try {
+    result = await dbPool.executeQuery(query, values);
+  } catch (err) {
+    // Одна некорректная запись не должна задерживать остальные
+    console.warn('⚠️ Пакетная вставка не удалась, сохраняем по одному:', err.message);
+    const saved = [];
+    const failed = [];
+    const conflicts = [];
+    for (const car of cars) {
+      try {
+        await addCar(car);
+        saved.push(car.custom_id);
+      } catch (carErr) {
+        if (carErr.message.includes('уже существует')) {
+          conflicts.push(car);
+        } else {
+          // Классы SQLSTATE 22 (данные) и 23 (ограничения): повтор той же записи не поможет
+          const permanent = /^2[23]/.test(carErr.code || '');
+          failed.push({
+            custom_id: car.custom_id,
+            error: carErr.message,
+            permanent,
+            reason: permanent ? 'rejected' : undefined
+          });
+        }
+      }
+    }
+    const checked = await classifyConflicts(conflicts);
+    return { saved: saved.concat(checked.saved), failed: failed.concat(checked.failed) };
+  }
+  
+  // Один custom_id может встретиться в пакете дважды: вставлена только первая запись
+  const inserted = new Set(result.rows.map(row => row.custom_id));
+  const saved = [];
+  const conflicts = [];
+  for (const car of cars) {
+    if (inserted.delete(car.custom_id)) {
+      saved.push(car.custom_id);
+    } else {
+      conflicts.push(car);
+    }
+  }
+  const checked = await classifyConflicts(conflicts);
+  return { saved: saved.concat(checked.saved), failed: checked.failed };
+}
+
 // Функция для получения автомобиля по custom_id
 async function getCar(custom_id) {
   console.log(`🔍 Поиск автомобиля с ID: ${custom_id}`);
@@ -144,6 +272,28 @@ async function getCar(custom_id) {
   }
 }
 
+// Безопасно приводит поле photos строки cars к массиву
+function parseCarPhotos(car) {
+  if (car.photos) {
+    try {
+      // Если photos уже объект (JSONB), используем как есть
+      if (typeof car.photos === 'object') {
+        // Уже распарсено PostgreSQL
+      } else if (typeof car.photos === 'string') {
+        // Если строка, пытаемся парсить
+        car.photos = JSON.parse(car.photos);
+      }
+    } catch (parseError) {
+      console.error('❌ Ошибка парсинга photos для автомобиля', car.custom_id, ':', parseError.message);
+      // Если не удалось парсить, устанавливаем пустой массив
+      car.photos = [];
+    }
+  } else {
+    car.photos = [];
+  }
+  return car;
+}
+
 // Функция для получения всех автомобилей с пагинацией
 async function getAllCars(limit = 10, offset = 0) {
   console.log(`📋 Получение списка автомобилей (limit: ${limit}, offset: ${offset})`);
@@ -161,27 +311,7 @@ async function getAllCars(limit = 10, offset = 0) {
     const countQuery = 'SELECT COUNT(*) FROM cars';
     const countResult = await dbPool.executeQuery(countQuery);
     
-    const cars = carsResult.rows.map(car => {
-      // Безопасно парсим JSON поле photos
-      if (car.photos) {
-        try {
-          // Если photos уже объект (JSONB), используем как есть
-          if (typeof car.photos === 'object') {
-            // Уже распарсено PostgreSQL
-          } else if (typeof car.photos === 'string') {
-            // Если строка, пытаемся парсить
-            car.photos = JSON.parse(car.photos);
-          }
-        } catch (parseError) {
-          console.error('❌ Ошибка парсинга photos для автомобиля', car.custom_id, ':', parseError.message);
-          // Если не удалось парсить, устанавливаем пустой массив
-          car.photos = [];
-        }
-      } else {
-        car.photos = [];
-      }
-      return car;
-    });
+    const cars = carsResult.rows.map(parseCarPhotos);
     
     const total = parseInt(countResult.rows[0].count);
     console.log(`✅ Получено ${cars.length} автомобилей из ${total} общих`);
@@ -197,6 +327,38 @@ async function getAllCars(limit = 10, offset = 0) {
   }
 }
 
+// Функция для получения автомобилей по курсору (custom_id по возрастанию)
+// Новые записи не сдвигают страницы, в отличие от LIMIT/OFFSET по created_at
+async function getCarsAfter(after = '', limit = 10) {
+  console.log(`📋 Получение списка автомобилей (after: ${after}, limit: ${limit})`);
+  
+  try {
+    const result = await dbPool.executeQuery(
+      'SELECT * FROM cars WHERE custom_id > $1 ORDER BY custom_id ASC LIMIT $2',
+      [after, limit]
+    );
+    const cars = result.rows.map(parseCarPhotos);
+    // Неполная страница - последняя
+    const nextAfter = cars.length === limit ? cars[cars.length - 1].custom_id : null;
+    return { cars, nextAfter };
+    
+  } catch (err) {
+    console.error('❌ Ошибка при получении списка автомобилей:', err.message);
+    throw err;
+  }
+}
+
+// Функция для получения всех custom_id (заполнение карты ID в боте)
+async function getAllCustomIds() {
+  try {
+    const result = await dbPool.executeQuery('SELECT custom_id FROM cars');
+    return result.rows.map(row => row.custom_id);
+  } catch (err) {
+    console.error('❌ Ошибка при получении списка custom_id:', err.message);
+    throw err;
+  }
+}
+
 async function checkConnection() {
   console.log('🔍 Проверка соединения с базой данных...');
   
@@ -259,7 +421,7 @@ async function updateCar(custom_id, updates) {
     let paramIndex = 1;
     
     for (const [key, value] of Object.entries(updates)) {
-      if (key === 'photos' && value) {
+      if ((key === 'photos' || key === 'photo_file_ids') && value) {
         updateFields.push(`${key} = $${paramIndex}`);
         values.push(JSON.stringify(value));
       } else if (value !== undefined) {
@@ -323,8 +485,11 @@ async function deleteCar(custom_id) {
 module.exports = {
   addCar,
   saveCar: addCar, // alias для совместимости
+  addCarsBulk,
   getCar,
   getAllCars,
+  getCarsAfter,
+  getAllCustomIds,
   checkConnection,
   checkDuplicate,
   updateCar,
@@ -13,7 +13,10 @@ const {
   checkConnection, 
   getCar, 
   getAllCars, 
+  getCarsAfter,
+  getAllCustomIds,
   checkDuplicate,
+  addCarsBulk,
   updateCar,
   deleteCar 
 } = require('./car_improved');
@@ -85,6 +88,27 @@ app.get('/api/health', async (req, res) => {
   }
 });
 
+// Get all custom_id values (seeds the bot's custom ID bitmap at startup)
+app.get('/api/custom-ids', async (req, res) => {
+  try {
+    const customIds = await getAllCustomIds();
+    res.json({ custom_ids: customIds, total: customIds.length });
+  } catch (error) {
+    serverHealth.errors++;
+    serverHealth.lastError = {
+      message: error.message,
+      endpoint: req.path,
+      timestamp: new Date().toISOString()
+    };
+    
+    console.error('❌ Error getting custom ids:', error.message);
+    res.status(500).json({ 
+      error: 'Internal server error',
+      message: error.message 
+    });
+  }
+});
+
 // Get single car by custom_id с retry логикой
 app.get('/api/cars/:custom_id', async (req, res) => {
   try {
@@ -116,10 +140,24 @@ app.get('/api/cars/:custom_id', async (req, res) => {
 });
 
 // Get all cars with pagination
+// ?after=<custom_id> - keyset pagination by custom_id, stable under concurrent inserts
 app.get('/api/cars', async (req, res) => {
   try {
-    const page = parseInt(req.query.page) || 1;
     const limit = parseInt(req.query.limit) || 10;
+    if (req.query.after !== undefined) {
+      const after = String(req.query.after);
+      const { cars, nextAfter } = await getCarsAfter(after, limit);
+      return res.json({
+        cars,
+        pagination: {
+          after,
+          limit,
+          next_after: nextAfter
+        }
+      });
+    }
+    
+    const page = parseInt(req.query.page) || 1;
     const offset = (page - 1) * limit;
     
     const { cars, total } = await getAllCars(limit, offset);
@@ -237,6 +275,40 @@ app.post('/api/cars', async (req, res) => {
   }
 });
 
+// Bulk add (write-behind spool of the bot), idempotent by custom_id
+app.post('/api/cars/bulk', async (req, res) => {
+  const startTime = Date.now();
+  const cars = Array.isArray(req.body.cars) ? req.body.cars : [];
+  
+  if (cars.length === 0) {
+    return res.status(400).json({ error: 'Field "cars" must be a non-empty array' });
+  }
+  
+  try {
+    const result = await addCarsBulk(cars);
+    const duration = Date.now() - startTime;
+    console.log(`✅ Пакет: сохранено ${result.saved.length}, ошибок ${result.failed.length} за ${duration}мс`);
+    
+    res.json({ ...result, duration: `${duration}ms` });
+  } catch (error) {
+    const duration = Date.now() - startTime;
+    serverHealth.errors++;
+    serverHealth.lastError = {
+      message: error.message,
+      endpoint: req.path,
+      duration: `${duration}ms`,
+      timestamp: new Date().toISOString()
+    };
+    
+    console.error(`❌ Error saving cars bulk (${duration}ms):`, error.message);
+    res.status(503).json({ 
+      error: 'Failed to save cars',
+      message: error.message,
+      duration: `${duration}ms`
+    });
+  }
+});
+
 // Update car endpoint
 app.put('/api/cars/:custom_id', async (req, res) => {
   try {
@@ -0,0 +1,65 @@
+"""
+Monitoring Module
+
+Метрики Prometheus для конвейера обработки объявлений, HTTP-сервер /metrics
+трейсинг объявлений в JSONL, профилирование по требованию и контроль задержки
+event loop, SLO свежести публикаций, запись объявлений в кассеты,
+shadow-режим и пробы /healthz, /readyz.
+"""
+
+from .metrics import (
+    PROMETHEUS_AVAILABLE,
+    track_stage,
+    record_api_error,
+    record_rate_limited,
+    record_cache,
+    record_perplexity_usage,
+    render_metrics,
+    start_metrics_server
+)
+from .tracing import (
+    span,
+    current_span,
+    current_trace_id,
+    set_span_attribute,
+    incr_span_attribute
+)
+from .profiling import Profiler, get_profiler
+from .loop_monitor import LoopMonitor, start_loop_monitor, install_event_loop_policy
+from .freshness import FreshnessTracker, get_freshness_tracker
+from .cassette import Cassette, record_announcement, tape_call, tape_await
+from .shadow import ShadowConfig, get_shadow_config, shadow_entry, is_shadow_run
+from .health import HealthChecker, get_health_checker
+
+__all__ = [
+    'PROMETHEUS_AVAILABLE',
+    'track_stage',
+    'record_api_error',
+    'record_rate_limited',
+    'record_cache',
+    'record_perplexity_usage',
+    'render_metrics',
+    'start_metrics_server',
+    'span',
+    'current_span',
+    'current_trace_id',
+    'set_span_attribute',
+    'incr_span_attribute',
+    'Profiler',
+    'get_profiler',
+    'LoopMonitor',
+    'start_loop_monitor',
+    'install_event_loop_policy',
+    'FreshnessTracker',
+    'get_freshness_tracker',
+    'Cassette',
+    'record_announcement',
+    'tape_call',
+    'tape_await',
+    'ShadowConfig',
+    'get_shadow_config',
+    'shadow_entry',
+    'is_shadow_run',
+    'HealthChecker',
+    'get_health_checker'
+]
@@ -0,0 +1,314 @@
+"""
+Cassette - запись и воспроизведение реальных объявлений
+
+В режиме записи (CASSETTE_DIR) для каждого объявления сохраняется кассета:
+исходный текст, байты фото и ответ каждого внешнего вызова конвейера (custom_id,
+OCR, курс ЦБ, Perplexity, Cloudinary, публикация, сохранение) с длительностью и
+смещением от начала обработки. Формат - gzip JSONL: первая строка - заголовок с
+объявлением и фото (base64), далее по строке на вызов.
+
+При воспроизведении (python -m loadtest.replay) конвейер выполняется без сети:
+каждый вызов возвращает записанный ответ по порядку своего вида, на полной
+скорости или с записанными задержками. Ключ вызова (индекс фото, хеш промпта,
+хеш текста поста) сверяется с записанным - расхождения показывают, где изменился
+результат конвейера.
+
+Вне активной кассеты tape_call/tape_await просто вызывают функцию.
+"""
+
+import os
+import json
+import gzip
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import inspect
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, List, Callable, Deque
+from collections import defaultdict, deque
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+_active: ContextVar[Optional['Cassette']] = ContextVar('active_cassette', default=None)
+
+
+class CassetteMismatch(Exception):
+    """В кассете нет записанного ответа для вызова"""
+
+
+class ReplayedError(Exception):
+    """Ошибка внешнего вызова, записанная в кассету"""
+
+
+def fingerprint(value: Any) -> str:
+    """Короткий хеш для сверки аргументов (промпт, текст поста)"""
+    return hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:12]
+
+
+def _jsonable(value: Any) -> Any:
+    """Приводит ответ к JSON (кортежи - к спискам)"""
+    return json.loads(json.dumps(value, ensure_ascii=False, default=str))
+
+
+class Cassette:
+    """Записанное объявление и ответы внешних вызовов"""
+
+    def __init__(self, header: Dict[str, Any], events: Optional[List[Dict[str, Any]]] = None,
+                 mode: str = 'record', timing: bool = False):
+        """
+        Args:
+            header: Объявление, канал, фото и время записи
+            events: Записанные вызовы (для воспроизведения)
+            mode: 'record' или 'replay'
+            timing: При воспроизведении выдерживать записанные задержки
+        """
+        self.header = header
+        self.events: List[Dict[str, Any]] = events or []
+        self.mode = mode
+        self.timing = timing
+        self.mismatches: List[Dict[str, Any]] = []
+        self._queues: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        for event in self.events:
+            self._queues[event['kind']].append(event)
+        self._started = time.perf_counter()
+
+    # --- Запись ---
+
+    @classmethod
+    def from_announcement(cls, ann: Dict[str, Any], source_channel: str) -> 'Cassette':
+        """Создает кассету для записи; фото читаются сразу, до удаления временной папки"""
+        photos = []
+        for path in ann.get('photos') or []:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except OSError as e:
+                logger.warning(f"Кассета: не удалось прочитать фото {path}: {e}")
+                continue
+            photos.append({'name': os.path.basename(path), 'data': base64.b64encode(data).decode('ascii')})
+        date = ann.get('date')
+        return cls({
+            'version': CASSETTE_VERSION,
+            'id': ann.get('id'),
+            'source_channel': source_channel,
+            'date': date.isoformat() if isinstance(date, datetime) else date,
+            'text': ann.get('text', ''),
+            'photos': photos,
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+        })
+
+    def record(self, kind: str, key: Any, started: float, duration: float,
+               response: Any = None, error: Optional[BaseException] = None):
+        event = {
+            'kind': kind,
+            'key': key,
+            'offset': round(started - self._started, 6),
+            'duration': round(duration, 6),
+        }
+        if error is not None:
+            event['error'] = f"{type(error).__name__}: {error}"
+        else:
+            event['response'] = _jsonable(response)
+        self.events.append(event)
+
+    def save(self, path: str) -> str:
+        """Сохраняет кассету в gzip JSONL"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(self.header, ensure_ascii=False) + '\n')
+            for event in self.events:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        return path
+
+    # --- Воспроизведение ---
+
+    @classmethod
+    def load(cls, path: str, timing: bool = False) -> 'Cassette':
+        """Читает кассету для воспроизведения"""
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            events = [json.loads(line) for line in f if line.strip()]
+        if header.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Неподдерживаемая версия кассеты {header.get('version')}: {path}")
+        return cls(header, events, mode='replay', timing=timing)
+
+    def materialize(self, directory: str) -> Dict[str, Any]:
+        """
+        Восстанавливает объявление: фото пишутся в directory
+
+        Returns:
+            Объявление в формате fetch_announcements_from_channel
+        """
+        os.makedirs(directory, exist_ok=True)
+        photo_paths = []
+        for photo in self.header['photos']:
+            path = os.path.join(directory, photo['name'])
+            with open(path, 'wb') as f:
+                f.write(base64.b64decode(photo['data']))
+            photo_paths.append(path)
+        return {
+            'id': self.header['id'],
+            'date': None,
+            'text': self.header['text'],
+            'photos': photo_paths,
+            'temp_dir': directory,
+        }
+
+    def next_event(self, kind: str, key: Any) -> Dict[str, Any]:
+        """Следующий записанный ответ вида kind; расхождение ключа запоминается"""
+        queue = self._queues.get(kind)
+        if not queue:
+            raise CassetteMismatch(f"В кассете {self.header.get('id')} нет записанного вызова '{kind}'")
+        event = queue.popleft()
+        if event.get('key') != key:
+            self.mismatches.append({'kind': kind, 'recorded': event.get('key'), 'replayed': key})
+        return event
+
+    @staticmethod
+    def _result(event: Dict[str, Any]) -> Any:
+        if 'error' in event:
+            raise ReplayedError(event['error'])
+        return event['response']
+
+    @property
+    def unused(self) -> Dict[str, int]:
+        """Записанные вызовы, которые не понадобились при воспроизведении"""
+        return {kind: len(queue) for kind, queue in self._queues.items() if queue}
+
+
+def active_cassette() -> Optional[Cassette]:
+    return _active.get()
+
+
+@contextmanager
+def use_cassette(cassette: Optional[Cassette]):
+    """Делает кассету активной для текущей задачи"""
+    token = _active.set(cassette)
+    try:
+        yield cassette
+    finally:
+        _active.reset(token)
+
+
+def tape_call(kind: str, key: Any, func: Callable, *args, **kwargs) -> Any:
+    """
+    Синхронный внешний вызов через кассету
+
+    При воспроизведении с записанными задержками поток блокируется так же, как
+    блокировал его настоящий синхронный клиент.
+    """
+    cassette = _active.get()
+    if cassette is None:
+        return func(*args, **kwargs)
+    if cassette.mode == 'replay':
+        event = cassette.next_event(kind, key)
+        if cassette.timing:
+            time.sleep(event['duration'])
+        return Cassette._result(event)
+    started = time.perf_counter()
+    try:
+        response = func(*args, **kwargs)
+    except Exception as e:
+        cassette.record(kind, key, started, time.perf_counter() - started, error=e)
+        raise
+    cassette.record(kind, key, started, time.perf_counter() - started, response)
+    return response
+
+
+async def tape_await(kind: str, key: Any, func: Callable, *args, **kwargs) -> Any:
+    """Асинхронный внешний вызов через кассету"""
+    cassette = _active.get()
+    if cassette is None:
+        return await func(*args, **kwargs)
+    if cassette.mode == 'replay':
+        event = cassette.next_event(kind, key)
+        if cassette.timing:
+            await asyncio.sleep(event['duration'])
+        return Cassette._result(event)
+    started = time.perf_counter()
+    try:
+        result = func(*args, **kwargs)
+        response = await result if inspect.isawaitable(result) else result
+    except Exception as e:
+        cassette.record(kind, key, started, time.perf_counter() - started, error=e)
+        raise
+    cassette.record(kind, key, started, time.perf_counter() - started, response)
+    return response
+
+
+class CassetteRecorder:
+    """Пишет кассеты для доли объявлений в каталог"""
+
+    def __init__(self, directory: str, sample_rate: float = 1.0):
+        self.directory = directory
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def from_env(cls) -> Optional['CassetteRecorder']:
+        """CASSETTE_DIR включает запись, CASSETTE_SAMPLE_RATE - доля объявлений"""
+        directory = os.getenv('CASSETTE_DIR')
+        if not directory:
+            return None
+        return cls(directory, float(os.getenv('CASSETTE_SAMPLE_RATE', '1.0')))
+
+    def path_for(self, cassette: Cassette) -> str:
+        from .freshness import channel_label
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+        name = f"{channel_label(cassette.header['source_channel'])}-{cassette.header['id']}-{stamp}.jsonl.gz"
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def session(self, ann: Dict[str, Any], source_channel: str):
+        """Записывает кассету объявления; сохраняется и при ошибке конвейера"""
+        if _active.get() is not None or random.random() >= self.sample_rate:
+            yield None
+            return
+        cassette = Cassette.from_announcement(ann, source_channel)
+        with use_cassette(cassette):
+            try:
+                yield cassette
+            finally:
+                try:
+                    path = cassette.save(self.path_for(cassette))
+                    logger.info(f"Кассета записана: {path} ({len(cassette.events)} вызовов)")
+                except OSError as e:
+                    logger.error(f"Не удалось сохранить кассету: {e}")
+
+
+_recorder: Optional[CassetteRecorder] = None
+_recorder_loaded = False
+
+
+def get_recorder() -> Optional[CassetteRecorder]:
+    """Глобальный рекордер (None, если запись выключена)"""
+    global _recorder, _recorder_loaded
+    if not _recorder_loaded:
+        _recorder = CassetteRecorder.from_env()
+        _recorder_loaded = True
+    return _recorder
+
+
+def set_recorder(recorder: Optional[CassetteRecorder]):
+    global _recorder, _recorder_loaded
+    _recorder = recorder
+    _recorder_loaded = True
+
+
+@contextmanager
+def record_announcement(ann: Dict[str, Any], source_channel: str):
+    """Запись кассеты, если включена; иначе ничего не делает"""
+    recorder = get_recorder()
+    if recorder is None:
+        yield None
+        return
+    with recorder.session(ann, source_channel) as cassette:
+        yield cassette
@@ -0,0 +1,167 @@
+"""
+Freshness - SLO свежести публикаций
+
+Задержка от времени поста в канале-источнике (message.date) до публикации в
+нашем канале пишется в гистограмму по каналу-источнику. По скользящему окну
+считается p95; если он превышает SLO из секции [freshness] config.ini, в
+ADMIN_GROUP_ID отправляется алерт (не чаще одного за период охлаждения).
+"""
+
+import time
+import logging
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from typing import Optional, Dict, Callable, Awaitable, Deque, Tuple
+
+from .metrics import SOURCE_TO_PUBLISH, SOURCE_TO_PUBLISH_P95, FRESHNESS_SLO_BREACHES
+
+logger = logging.getLogger(__name__)
+
+
+def channel_label(source_channel: str) -> str:
+    """Нормализует канал для метки метрики: https://t.me/name и @name -> name"""
+    if not source_channel:
+        return 'unknown'
+    return source_channel.rstrip('/').rsplit('/', 1)[-1].lstrip('@')
+
+
+def _percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FreshnessTracker:
+    """Считает задержку публикации и проверяет SLO по каждому каналу"""
+
+    def __init__(self, slo_p95_seconds: float = 900, window_minutes: float = 60, min_samples: int = 10,
+                 alert_cooldown_minutes: float = 60, ignore_older_than_hours: float = 24,
+                 alert_sender: Optional[Callable[[str], Awaitable]] = None):
+        """
+        Args:
+            slo_p95_seconds: Допустимый p95 задержки, секунд
+            window_minutes: Скользящее окно для p95, минут
+            min_samples: Минимум публикаций в окне для проверки SLO
+            alert_cooldown_minutes: Пауза между алертами по одному каналу, минут
+            ignore_older_than_hours: Посты старше считаются догрузкой истории
+            alert_sender: async-функция отправки текста алерта
+        """
+        self.slo_p95 = slo_p95_seconds
+        self.window = window_minutes * 60
+        self.min_samples = min_samples
+        self.cooldown = alert_cooldown_minutes * 60
+        self.max_age = ignore_older_than_hours * 3600
+        self.alert_sender = alert_sender
+        self._samples: Dict[str, Deque[Tuple[float, float]]] = defaultdict(deque)
+        self._last_alert: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls) -> 'FreshnessTracker':
+        """Создает трекер из секции [freshness] config.ini"""
+        from app.utils.config import get_freshness_config
+        return cls(**get_freshness_config())
+
+    def observe(self, source_channel: str, source_date: datetime,
+                published_at: Optional[datetime] = None) -> Optional[float]:
+        """
+        Учитывает публикацию
+
+        Args:
+            source_channel: Канал-источник
+            source_date: Время поста в источнике (message.date)
+            published_at: Время публикации (по умолчанию сейчас)
+
+        Returns:
+            Задержка в секундах или None, если пост - догрузка истории
+        """
+        if source_date.tzinfo is None:
+            source_date = source_date.replace(tzinfo=timezone.utc)
+        published_at = published_at or datetime.now(timezone.utc)
+        latency = max(0.0, (published_at - source_date).total_seconds())
+        if latency > self.max_age:
+            logger.debug(f"Пост из {source_channel} старше {self.max_age}с - не учитывается в SLO")
+            return None
+
+        label = channel_label(source_channel)
+        SOURCE_TO_PUBLISH.labels(source_channel=label).observe(latency)
+
+        now = time.monotonic()
+        samples = self._samples[label]
+        samples.append((now, latency))
+        while samples and now - samples[0][0] > self.window:
+            samples.popleft()
+        SOURCE_TO_PUBLISH_P95.labels(source_channel=label).set(self.p95(label))
+        return latency
+
+    def p95(self, source_channel: str) -> float:
+        """p95 задержки по каналу за окно (0, если публикаций нет)"""
+        samples = self._samples.get(channel_label(source_channel))
+        if not samples:
+            return 0.0
+        return _percentile([latency for _, latency in samples], 0.95)
+
+    def check_slo(self, source_channel: str) -> Optional[str]:
+        """
+        Проверяет SLO канала
+
+        Returns:
+            Текст алерта, если SLO нарушен и период охлаждения прошел, иначе None
+        """
+        label = channel_label(source_channel)
+        samples = self._samples.get(label)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        p95 = self.p95(label)
+        if p95 <= self.slo_p95:
+            return None
+
+        now = time.monotonic()
+        last = self._last_alert.get(label)
+        if last is not None and now - last < self.cooldown:
+            return None
+        self._last_alert[label] = now
+        FRESHNESS_SLO_BREACHES.labels(source_channel=label).inc()
+        return (
+            f"⚠️ SLO свежести нарушен для {label}\n\n"
+            f"p95 задержки публикации: {p95 / 60:.1f} мин (SLO {self.slo_p95 / 60:.1f} мин)\n"
+            f"Публикаций за {self.window / 60:.0f} мин: {len(samples)}"
+        )
+
+    async def record(self, source_channel: str, source_date: Optional[datetime],
+                     published_at: Optional[datetime] = None) -> Optional[float]:
+        """
+        Учитывает публикацию и отправляет алерт при нарушении SLO
+
+        Returns:
+            Задержка в секундах или None
+        """
+        if source_date is None:
+            return None
+        latency = self.observe(source_channel, source_date, published_at)
+        if latency is None:
+            return None
+        alert = self.check_slo(source_channel)
+        if alert:
+            logger.warning(alert)
+            if self.alert_sender is not None:
+                try:
+                    await self.alert_sender(alert)
+                except Exception as e:
+                    logger.error(f"Не удалось отправить алерт SLO свежести: {e}")
+        return latency
+
+
+_tracker: Optional[FreshnessTracker] = None
+
+
+def get_freshness_tracker() -> FreshnessTracker:
+    """
+    Получить глобальный трекер свежести
+
+    Returns:
+        Экземпляр FreshnessTracker (настройки из config.ini)
+    """
+    global _tracker
+    if _tracker is None:
+        _tracker = FreshnessTracker.from_config()
+    return _tracker
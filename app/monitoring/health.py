@@ -0,0 +1,169 @@
+"""
+Health - проверки liveness и readiness внутри работающего бота
+
+Раньше k8s-пробы каждые 10-30 секунд запускали monitoring/health_check.py:
+холодный старт интерпретатора и импорт всего app на поде с 250m CPU. Теперь
+проверки выполняются в процессе бота фоновой задачей раз в HEALTH_INTERVAL
+секунд, а сервер метрик (порт 8000) отдает закэшированный результат:
+
+- /healthz (liveness) - процесс жив: event loop отвечает и фоновые проверки
+  обновлялись недавно. Сами проверки на liveness не влияют;
+- /readyz (readiness) - все проверки успешны: Telethon подключен, очереди не
+  длиннее HEALTH_MAX_QUEUE_DEPTH, ни у одного внешнего API нет "открытого
+  предохранителя" (HEALTH_BREAKER_ERRORS ошибок за HEALTH_BREAKER_WINDOW секунд).
+"""
+
+import os
+import time
+import asyncio
+import inspect
+import logging
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from .metrics import queue_depths, recent_api_errors
+
+logger = logging.getLogger(__name__)
+
+
+def _result(healthy: bool, **details) -> Dict[str, Any]:
+    return {'status': 'healthy' if healthy else 'unhealthy', **details}
+
+
+class HealthChecker:
+    """Периодические проверки состояния бота с кэшированием результата"""
+
+    def __init__(self, interval: float = 10.0, check_timeout: float = 5.0, max_queue_depth: int = 500,
+                 breaker_errors: int = 5, breaker_window: float = 60.0):
+        """
+        Args:
+            interval: Период обновления проверок, секунд
+            check_timeout: Таймаут одной проверки, секунд
+            max_queue_depth: Максимальная длина очереди для readiness
+            breaker_errors: Ошибок внешнего API за окно, после которых он считается недоступным
+            breaker_window: Окно подсчета ошибок, секунд
+        """
+        self.interval = interval
+        self.check_timeout = check_timeout
+        self.max_queue_depth = max_queue_depth
+        self.breaker_errors = breaker_errors
+        self.breaker_window = breaker_window
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.refreshed_at: Optional[float] = None
+        self._checks: Dict[str, Callable] = {
+            'queues': self.check_queues,
+            'downstream': self.check_downstream,
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls) -> 'HealthChecker':
+        """Создает проверки из переменных окружения"""
+        return cls(
+            interval=float(os.getenv('HEALTH_INTERVAL', '10')),
+            max_queue_depth=int(os.getenv('HEALTH_MAX_QUEUE_DEPTH', '500')),
+            breaker_errors=int(os.getenv('HEALTH_BREAKER_ERRORS', '5')),
+            breaker_window=float(os.getenv('HEALTH_BREAKER_WINDOW', '60')),
+        )
+
+    def add_check(self, name: str, check: Callable):
+        """
+        Добавляет проверку readiness
+
+        Args:
+            name: Имя проверки в ответе /readyz
+            check: Функция или корутина без аргументов; возвращает словарь со
+                status ('healthy' / 'unhealthy') или bool
+        """
+        self._checks[name] = check
+
+    def check_queues(self) -> Dict[str, Any]:
+        """Очереди (telegram_queue_depth) не длиннее max_queue_depth"""
+        depths = queue_depths()
+        overloaded = {queue: depth for queue, depth in depths.items() if depth > self.max_queue_depth}
+        return _result(not overloaded, depths=depths, limit=self.max_queue_depth)
+
+    def check_downstream(self) -> Dict[str, Any]:
+        """Внешние API без серии ошибок за последнее окно"""
+        errors = recent_api_errors(self.breaker_window)
+        open_services = sorted(service for service, count in errors.items() if count >= self.breaker_errors)
+        return _result(not open_services, open=open_services, errors=errors, window=self.breaker_window)
+
+    async def _run_check(self, check: Callable) -> Dict[str, Any]:
+        try:
+            result = check()
+            if inspect.isawaitable(result):
+                result = await asyncio.wait_for(result, self.check_timeout)
+        except Exception as e:
+            return _result(False, error=f"{type(e).__name__}: {e}")
+        if isinstance(result, bool):
+            return _result(result)
+        return result
+
+    async def refresh(self) -> Dict[str, Dict[str, Any]]:
+        """Выполняет все проверки параллельно и сохраняет результат"""
+        names = list(self._checks)
+        results = await asyncio.gather(*(self._run_check(self._checks[name]) for name in names))
+        self.results = dict(zip(names, results))
+        self.refreshed_at = time.monotonic()
+        return self.results
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Ошибка обновления проверок здоровья: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Запускает фоновое обновление в текущем event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Проверки здоровья запущены (каждые {self.interval}с)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def liveness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Жив ли процесс: проверки обновлялись не позже трех периодов назад"""
+        if self.refreshed_at is None:
+            # Первое обновление еще не завершилось (старт) - процесс считается живым
+            return True, {'status': 'starting'}
+        age = time.monotonic() - self.refreshed_at
+        alive = age <= self.interval * 3 + self.check_timeout
+        return alive, {'status': 'alive' if alive else 'stalled', 'refreshed_seconds_ago': round(age, 1)}
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Готов ли бот: все проверки последнего обновления успешны"""
+        ready = bool(self.results) and all(r.get('status') == 'healthy' for r in self.results.values())
+        return ready, {'status': 'ready' if ready else 'not_ready', 'checks': self.results}
+
+    def add_routes(self, app):
+        """Регистрирует /healthz и /readyz в aiohttp-приложении сервера метрик"""
+        from aiohttp import web
+
+        def handler(probe):
+            async def handle(request):
+                ok, body = probe()
+                return web.json_response(body, status=200 if ok else 503)
+            return handle
+
+        app.router.add_get('/healthz', handler(self.liveness))
+        app.router.add_get('/readyz', handler(self.readiness))
+
+
+_checker: Optional[HealthChecker] = None
+
+
+def get_health_checker() -> HealthChecker:
+    """Глобальный экземпляр проверок"""
+    global _checker
+    if _checker is None:
+        _checker = HealthChecker.from_env()
+    return _checker
@@ -0,0 +1,212 @@
+"""
+Loop Monitor - контроль задержки event loop и поиск блокирующих вызовов
+
+Telethon и python-telegram-bot работают в одном event loop, поэтому любой
+синхронный вызов (requests, загрузка в Cloudinary, OpenCV) останавливает оба
+клиента. Монитор состоит из двух частей:
+
+- корутина-пульс каждые `interval` секунд засыпает и измеряет, насколько позже
+  ее разбудили (задержка планирования), и пишет ее в метрики;
+- сторожевой поток замечает, что пульс не обновлялся дольше порога, и снимает
+  стек потока event loop - это и есть блокирующий вызов.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import deque, Counter
+from typing import Optional, List, Dict, Any
+
+from .metrics import LOOP_LAG, LOOP_LAG_QUANTILE, LOOP_BLOCKED
+
+logger = logging.getLogger(__name__)
+
+# Файлы, которые не интересны как место блокировки (сам asyncio и монитор)
+_SKIP_FILES = ('selectors.py', 'loop_monitor.py', 'threading.py')
+_SKIP_DIRS = (f"{os.sep}asyncio{os.sep}",)
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopMonitor:
+    """Измеряет задержку event loop и фиксирует стеки блокирующих вызовов"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.25, window: int = 600):
+        """
+        Args:
+            interval: Период пульса, секунд
+            threshold: Порог блокировки, секунд
+            window: Количество последних измерений для перцентилей
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.lags: deque = deque(maxlen=window)
+        self.blocking_sites: Counter = Counter()
+        self.last_block: Optional[Dict[str, Any]] = None
+        self.block_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+        self._watchdog: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls) -> 'LoopMonitor':
+        """Создает монитор из переменных окружения"""
+        return cls(
+            interval=float(os.getenv('LOOP_MONITOR_INTERVAL', '0.1')),
+            threshold=float(os.getenv('LOOP_LAG_THRESHOLD', '0.25'))
+        )
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Запускает пульс в event loop и сторожевой поток"""
+        self._loop = loop or asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._pulse())
+        self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._watchdog.start()
+        logger.info(f"Мониторинг event loop запущен (порог {self.threshold}с)")
+
+    async def stop(self):
+        """Останавливает монитор"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=1)
+
+    async def _pulse(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._heartbeat = time.monotonic()
+            self.record_lag(lag)
+
+    def record_lag(self, lag: float):
+        """Учитывает одно измерение задержки"""
+        self.lags.append(lag)
+        LOOP_LAG.observe(lag)
+        if len(self.lags) % 10 == 0:
+            for name, value in self.percentiles().items():
+                LOOP_LAG_QUANTILE.labels(quantile=name).set(value)
+
+    def percentiles(self) -> Dict[str, float]:
+        """p50 / p95 / p99 / max задержки за скользящее окно"""
+        if not self.lags:
+            return {}
+        values = list(self.lags)
+        return {
+            '0.5': _percentile(values, 0.5),
+            '0.95': _percentile(values, 0.95),
+            '0.99': _percentile(values, 0.99),
+            '1': max(values)
+        }
+
+    def _watch(self):
+        blocked_since = None
+        while not self._stop.wait(min(self.threshold / 2, self.interval)):
+            stalled = time.monotonic() - self._heartbeat - self.interval
+            if stalled < self.threshold:
+                if blocked_since is not None and self.last_block:
+                    logger.warning(
+                        f"Event loop был заблокирован {time.monotonic() - blocked_since:.2f}с "
+                        f"в {self.last_block['site']}"
+                    )
+                blocked_since = None
+                continue
+            if blocked_since is None:
+                blocked_since = self._heartbeat + self.interval
+                self.capture_block(stalled)
+
+    def capture_block(self, stalled: float) -> Optional[Dict[str, Any]]:
+        """
+        Снимает стек потока event loop во время блокировки
+
+        Args:
+            stalled: Сколько секунд loop уже не отвечает
+
+        Returns:
+            Описание блокировки: site (первый кадр не из asyncio), stack, stalled
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame)
+        site = next(
+            (f"{os.path.basename(item.filename)}:{item.lineno} {item.name}" for item in reversed(stack)
+             if os.path.basename(item.filename) not in _SKIP_FILES
+             and not any(skip in item.filename for skip in _SKIP_DIRS)),
+            'unknown'
+        )
+        self.block_count += 1
+        self.blocking_sites[site] += 1
+        self.last_block = {
+            'site': site,
+            'stalled': round(stalled, 3),
+            'stack': ''.join(traceback.format_list(stack))
+        }
+        LOOP_BLOCKED.inc()
+        logger.warning(
+            f"Event loop заблокирован >{self.threshold}с в {site}\n{self.last_block['stack']}"
+        )
+        return self.last_block
+
+    def stats(self) -> Dict[str, Any]:
+        """Сводка для /profile и отладки"""
+        return {
+            'percentiles': self.percentiles(),
+            'blocks': self.block_count,
+            'top_sites': self.blocking_sites.most_common(5)
+        }
+
+
+def install_event_loop_policy() -> bool:
+    """
+    Включает uvloop, если задано USE_UVLOOP=1 и пакет установлен
+
+    Вызывается до создания event loop (до application.run_polling()).
+
+    Returns:
+        True, если uvloop включен
+    """
+    if os.getenv('USE_UVLOOP', '0').lower() not in ('1', 'true', 'yes'):
+        return False
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("USE_UVLOOP=1, но uvloop не установлен - используется стандартный asyncio")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Event loop: uvloop")
+    return True
+
+
+def start_loop_monitor() -> Optional[LoopMonitor]:
+    """
+    Запускает монитор в текущем event loop, если не отключен LOOP_MONITOR_ENABLED=0
+
+    Returns:
+        LoopMonitor или None
+    """
+    if os.getenv('LOOP_MONITOR_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        return None
+    monitor = LoopMonitor.from_env()
+    monitor.start()
+    return monitor
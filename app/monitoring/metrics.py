@@ -0,0 +1,289 @@
+"""
+Metrics - метрики Prometheus для конвейера обработки объявлений
+
+Все метрики имеют префикс `telegram_` (его ожидают monitoring/prometheus.yml и
+monitoring/grafana-dashboard.json). Если prometheus_client не установлен,
+используются no-op заглушки: инструментированный код работает без изменений.
+"""
+
+import os
+import time
+import logging
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Deque
+
+from .tracing import span
+
+try:
+    from prometheus_client import (
+        Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Бакеты для этапов: от быстрых вызовов API до долгой загрузки альбома
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# Бакеты задержки event loop: от нормального шума до полной блокировки
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Бакеты свежести: от поста в источнике до публикации в нашем канале
+FRESHNESS_BUCKETS = (15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 21600, 86400)
+
+
+class _NoopMetric:
+    """Заглушка метрики на случай отсутствия prometheus_client"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount: float = 1):
+        pass
+
+    def dec(self, amount: float = 1):
+        pass
+
+    def set(self, value: float):
+        pass
+
+    def observe(self, value: float):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    BOT_STATUS = Gauge('telegram_bot_status', 'Бот запущен (1) или остановлен (0)')
+    MESSAGES_PROCESSED = Counter(
+        'telegram_messages_processed', 'Обработанные объявления', ['status']
+    )
+    STAGE_DURATION = Histogram(
+        'telegram_stage_duration_seconds', 'Длительность этапов конвейера',
+        ['stage'], buckets=STAGE_BUCKETS
+    )
+    OCR_DURATION = Histogram(
+        'telegram_ocr_duration_seconds', 'Длительность OCR одного изображения',
+        ['engine'], buckets=STAGE_BUCKETS
+    )
+    OCR_CASCADE = Counter(
+        'telegram_ocr_cascade', 'Ответы ступеней каскада OCR', ['tier', 'reason']
+    )
+    IN_FLIGHT = Gauge('telegram_announcements_in_flight', 'Объявления в обработке')
+    QUEUE_DEPTH = Gauge('telegram_queue_depth', 'Объявления, ожидающие обработки', ['queue'])
+    API_ERRORS = Counter(
+        'telegram_api_errors', 'Ошибки внешних API', ['service', 'kind']
+    )
+    API_RATE_LIMITED = Counter(
+        'telegram_api_rate_limited', 'Ответы 429 / FloodWait внешних API', ['service']
+    )
+    CACHE_REQUESTS = Counter(
+        'telegram_cache_requests', 'Обращения к кэшам', ['cache', 'result']
+    )
+    PERPLEXITY_TOKENS = Counter(
+        'telegram_perplexity_tokens', 'Токены Perplexity', ['type']
+    )
+    LOOP_LAG = Histogram(
+        'telegram_event_loop_lag_seconds', 'Задержка планирования event loop',
+        buckets=LOOP_LAG_BUCKETS
+    )
+    LOOP_LAG_QUANTILE = Gauge(
+        'telegram_event_loop_lag_quantile_seconds',
+        'Перцентили задержки event loop за скользящее окно', ['quantile']
+    )
+    LOOP_BLOCKED = Counter(
+        'telegram_event_loop_blocked', 'Блокировки event loop дольше порога'
+    )
+    SOURCE_TO_PUBLISH = Histogram(
+        'telegram_source_to_publish_seconds', 'Задержка от поста в источнике до публикации',
+        ['source_channel'], buckets=FRESHNESS_BUCKETS
+    )
+    SOURCE_TO_PUBLISH_P95 = Gauge(
+        'telegram_source_to_publish_p95_seconds',
+        'p95 задержки публикации за окно SLO', ['source_channel']
+    )
+    FRESHNESS_SLO_BREACHES = Counter(
+        'telegram_freshness_slo_breaches', 'Нарушения SLO свежести', ['source_channel']
+    )
+    CUSTOM_IDS_REMAINING = Gauge(
+        'telegram_custom_ids_remaining', 'Свободные custom ID XXX-XXX'
+    )
+    CHANNEL_BACKLOG = Gauge(
+        'telegram_channel_backlog', 'Объявления в очереди канала-источника', ['source_channel']
+    )
+    CHANNEL_IN_FLIGHT = Gauge(
+        'telegram_channel_in_flight', 'Объявления канала-источника в обработке', ['source_channel']
+    )
+    CHANNEL_WAIT = Histogram(
+        'telegram_channel_wait_seconds', 'Ожидание в очереди канала до начала обработки',
+        ['source_channel'], buckets=STAGE_BUCKETS
+    )
+    STORAGE_SPOOL_DEAD = Counter(
+        'telegram_storage_spool_dead_letters',
+        'Записи очереди Storage API, перенесенные в dead-letter', ['reason']
+    )
+else:
+    BOT_STATUS = MESSAGES_PROCESSED = STAGE_DURATION = OCR_DURATION = OCR_CASCADE = _NoopMetric()
+    IN_FLIGHT = QUEUE_DEPTH = API_ERRORS = API_RATE_LIMITED = _NoopMetric()
+    CACHE_REQUESTS = PERPLEXITY_TOKENS = _NoopMetric()
+    LOOP_LAG = LOOP_LAG_QUANTILE = LOOP_BLOCKED = _NoopMetric()
+    SOURCE_TO_PUBLISH = SOURCE_TO_PUBLISH_P95 = FRESHNESS_SLO_BREACHES = _NoopMetric()
+    CUSTOM_IDS_REMAINING = CHANNEL_BACKLOG = CHANNEL_IN_FLIGHT = CHANNEL_WAIT = _NoopMetric()
+    STORAGE_SPOOL_DEAD = _NoopMetric()
+
+
+# Время последних ошибок по сервисам: для readiness (см. health.py)
+_recent_errors: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=1000))
+
+_stage_durations: ContextVar[Optional[Dict[str, float]]] = ContextVar('stage_durations', default=None)
+
+
+@contextmanager
+def collect_stage_durations():
+    """
+    Собирает длительности этапов track_stage текущей задачи в словарь
+
+    Yields:
+        Словарь {этап: суммарная длительность, секунд}
+    """
+    durations: Dict[str, float] = {}
+    token = _stage_durations.set(durations)
+    try:
+        yield durations
+    finally:
+        _stage_durations.reset(token)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """
+    Измеряет длительность этапа конвейера
+
+    Этап также открывает спан трейса (см. tracing.py), поэтому длительности
+    попадают и в Prometheus, и в logs/traces.jsonl.
+
+    Args:
+        stage: Название этапа (download, ocr, perplexity, cloudinary, publish, save, ...)
+
+    Yields:
+        Span текущего этапа (в него можно дописать bytes, retries и т.п.)
+    """
+    started = time.perf_counter()
+    try:
+        with span(stage) as stage_span:
+            yield stage_span
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.labels(stage=stage).observe(elapsed)
+        durations = _stage_durations.get()
+        if durations is not None:
+            durations[stage] = durations.get(stage, 0.0) + elapsed
+
+
+def record_api_error(service: str, kind: str):
+    """
+    Учитывает ошибку внешнего API
+
+    Args:
+        service: Сервис (perplexity, yandex_vision, cloudinary, storage_api, telegram, cbr)
+        kind: Тип ошибки (HTTP-статус или имя исключения)
+    """
+    API_ERRORS.labels(service=service, kind=str(kind)).inc()
+    _recent_errors[service].append(time.monotonic())
+
+
+def record_rate_limited(service: str):
+    """Учитывает ответ 429 (или FloodWait) от внешнего API"""
+    API_RATE_LIMITED.labels(service=service).inc()
+    record_api_error(service, '429')
+
+
+def recent_api_errors(window: float) -> Dict[str, int]:
+    """
+    Ошибки внешних API за последние window секунд
+
+    Returns:
+        Словарь {сервис: количество ошибок} (только сервисы с ошибками)
+    """
+    since = time.monotonic() - window
+    counts = {service: sum(1 for at in times if at >= since) for service, times in list(_recent_errors.items())}
+    return {service: count for service, count in counts.items() if count}
+
+
+def queue_depths() -> Dict[str, float]:
+    """Текущие значения telegram_queue_depth по очередям ({} без prometheus_client)"""
+    if not PROMETHEUS_AVAILABLE:
+        return {}
+    return {
+        sample.labels['queue']: sample.value
+        for metric in QUEUE_DEPTH.collect()
+        for sample in metric.samples
+    }
+
+
+def record_cache(cache: str, hit: bool):
+    """Учитывает попадание или промах кэша"""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+def record_perplexity_usage(usage: Optional[Dict[str, Any]]):
+    """
+    Учитывает токены из поля usage ответа Perplexity
+
+    Args:
+        usage: Словарь usage (prompt_tokens, completion_tokens)
+    """
+    if not usage:
+        return
+    for token_type in ('prompt', 'completion'):
+        value = usage.get(f'{token_type}_tokens')
+        if value:
+            PERPLEXITY_TOKENS.labels(type=token_type).inc(value)
+
+
+def render_metrics() -> bytes:
+    """Текущие метрики в текстовом формате Prometheus"""
+    if not PROMETHEUS_AVAILABLE:
+        return "# prometheus_client не установлен\n".encode("utf-8")
+    return generate_latest(REGISTRY)
+
+
+async def start_metrics_server(host: Optional[str] = None, port: Optional[int] = None, health=None):
+    """
+    Запускает HTTP-сервер метрик в текущем event loop
+
+    Args:
+        host: Адрес (по умолчанию METRICS_HOST или 0.0.0.0)
+        port: Порт (по умолчанию METRICS_PORT или 8000)
+        health: HealthChecker - добавляет /healthz и /readyz (см. health.py)
+
+    Returns:
+        aiohttp AppRunner (для остановки через runner.cleanup()) или None,
+        если сервер отключен через METRICS_ENABLED=0
+    """
+    if os.getenv('METRICS_ENABLED', '1').lower() in ('0', 'false', 'no'):
+        logger.info("Сервер метрик отключен (METRICS_ENABLED=0)")
+        return None
+
+    from aiohttp import web
+
+    host = host or os.getenv('METRICS_HOST', '0.0.0.0')
+    port = port or int(os.getenv('METRICS_PORT', '8000'))
+
+    async def metrics_handler(request):
+        return web.Response(
+            body=render_metrics(),
+            headers={'Content-Type': CONTENT_TYPE_LATEST if PROMETHEUS_AVAILABLE else 'text/plain'}
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', metrics_handler)
+    if health is not None:
+        health.add_routes(app)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    logger.info(f"Сервер метрик запущен на http://{host}:{port}/metrics")
+    return runner
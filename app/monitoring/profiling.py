@@ -0,0 +1,286 @@
+"""
+Profiling - профилирование работающего бота без перезапуска
+
+Два режима:
+- calls: следующие N вызовов process_single_announcement выполняются под
+  cProfile, результат сохраняется в .prof (snakeviz, pstats) и текстовую сводку;
+- window: выборочный профайлер в отдельном потоке снимает стеки всех потоков
+  процесса каждые PROFILE_SAMPLE_INTERVAL секунд в течение окна и пишет их в
+  формате folded stacks (flamegraph.pl, speedscope).
+
+Включается командой администратора /profile, сигналом SIGUSR2 или
+переменными окружения PROFILE_CALLS / PROFILE_WINDOW при старте.
+"""
+
+import os
+import sys
+import time
+import signal
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = 'logs'
+
+
+def _timestamp() -> str:
+    return datetime.now().strftime('%Y%m%d-%H%M%S')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """Выборочный профайлер: периодически снимает стеки всех потоков"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample_once(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}"))
+            self.samples[';'.join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _run(self, duration: float):
+        deadline = time.monotonic() + duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            self._sample_once()
+            self._stop.wait(self.interval)
+
+    def start(self, duration: float):
+        self._thread = threading.Thread(target=self._run, args=(duration,), name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def write_folded(self, path: str):
+        """Сохраняет стеки в формате folded: `thread;f1;f2;f3 <count>`"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Управляет режимами профилирования процесса"""
+
+    def __init__(self, output_dir: Optional[str] = None, sample_interval: Optional[float] = None):
+        self.output_dir = output_dir or os.getenv('PROFILE_DIR', PROFILE_DIR)
+        self.sample_interval = sample_interval or float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.01'))
+        self._lock = threading.Lock()
+        self._calls_remaining = 0
+        self._calls_profiled = 0
+        self._active_calls = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._window_path: Optional[str] = None
+        self.last_outputs: Dict[str, str] = {}
+
+    # --- Режим calls (cProfile) ---
+
+    def arm_calls(self, count: int) -> int:
+        """
+        Включает cProfile для следующих count вызовов process_single_announcement
+
+        Args:
+            count: Количество вызовов
+
+        Returns:
+            Сколько вызовов осталось профилировать
+        """
+        if count <= 0:
+            raise ValueError("Количество вызовов должно быть положительным")
+        with self._lock:
+            if self._profile is None:
+                self._profile = cProfile.Profile()
+                self._calls_profiled = 0
+            self._calls_remaining += count
+            logger.info(f"Профилирование следующих {self._calls_remaining} объявлений включено")
+            return self._calls_remaining
+
+    @contextmanager
+    def announcement(self):
+        """
+        Оборачивает обработку одного объявления
+
+        Пока cProfile включен, в профиль попадают и другие корутины этого
+        event loop - это видно как общая нагрузка процесса в окне вызова.
+        """
+        with self._lock:
+            profiled = self._calls_remaining > 0
+            if profiled:
+                self._calls_remaining -= 1
+                self._active_calls += 1
+                if self._active_calls == 1:
+                    self._profile.enable()
+        try:
+            yield
+        finally:
+            if profiled:
+                with self._lock:
+                    self._active_calls -= 1
+                    self._calls_profiled += 1
+                    if self._active_calls == 0:
+                        self._profile.disable()
+                        if self._calls_remaining == 0:
+                            self._dump_calls()
+
+    def _dump_calls(self):
+        """Сохраняет накопленный cProfile (вызывается под self._lock)"""
+        profile, self._profile = self._profile, None
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"profile-{_timestamp()}-calls{self._calls_profiled}")
+        try:
+            profile.dump_stats(base + '.prof')
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                stats = pstats.Stats(profile, stream=f)
+                stats.sort_stats('cumulative').print_stats(60)
+                stats.sort_stats('tottime').print_stats(30)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль: {e}")
+            return
+        self.last_outputs['calls'] = base + '.prof'
+        logger.info(f"Профиль {self._calls_profiled} объявлений сохранен: {base}.prof")
+
+    # --- Режим window (выборочный профайлер) ---
+
+    def start_window(self, seconds: float) -> str:
+        """
+        Запускает выборочное профилирование всего процесса на seconds секунд
+
+        Args:
+            seconds: Длительность окна
+
+        Returns:
+            Путь к будущему файлу .folded
+        """
+        if seconds <= 0:
+            raise ValueError("Длительность окна должна быть положительной")
+        with self._lock:
+            if self._sampler is not None:
+                raise RuntimeError("Профилирование окна уже запущено")
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._window_path = os.path.join(self.output_dir, f"profile-{_timestamp()}-window{int(seconds)}s.folded")
+            self._sampler = StackSampler(self.sample_interval)
+            self._sampler.start(seconds)
+
+        threading.Thread(target=self._finish_window, name='profile-writer', daemon=True).start()
+        logger.info(f"Выборочное профилирование на {seconds}с запущено: {self._window_path}")
+        return self._window_path
+
+    def stop_window(self):
+        """Досрочно останавливает окно профилирования"""
+        sampler = self._sampler
+        if sampler is not None:
+            sampler.stop()
+
+    def wait_window(self, timeout: Optional[float] = None):
+        """Ожидает завершения окна профилирования"""
+        sampler = self._sampler
+        if sampler is not None:
+            sampler.join(timeout)
+        deadline = time.monotonic() + (timeout or 5)
+        while self._sampler is not None and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def _finish_window(self):
+        sampler = self._sampler
+        sampler.join()
+        try:
+            sampler.write_folded(self._window_path)
+            self.last_outputs['window'] = self._window_path
+            logger.info(f"Профиль окна сохранен ({sampler.sample_count} срезов): {self._window_path}")
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль окна: {e}")
+        finally:
+            with self._lock:
+                self._sampler = None
+
+    def status(self) -> Dict[str, Any]:
+        """Текущее состояние профилирования"""
+        return {
+            'calls_remaining': self._calls_remaining,
+            'calls_active': self._active_calls,
+            'window_running': self._sampler is not None,
+            'window_path': self._window_path if self._sampler is not None else None,
+            'last_outputs': dict(self.last_outputs)
+        }
+
+
+_profiler: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    """
+    Получить глобальный профайлер процесса
+
+    Returns:
+        Экземпляр Profiler
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = Profiler()
+    return _profiler
+
+
+def configure_from_env(loop=None):
+    """
+    Включает профилирование по переменным окружения и ставит обработчик SIGUSR2
+
+    PROFILE_CALLS=N - профилировать первые N объявлений,
+    PROFILE_WINDOW=S - профилировать первые S секунд работы процесса,
+    PROFILE_SIGNAL_WINDOW=S - длительность окна по SIGUSR2 (по умолчанию 30).
+
+    Args:
+        loop: Event loop для обработчика сигнала (по умолчанию текущий)
+    """
+    profiler = get_profiler()
+
+    calls = int(os.getenv('PROFILE_CALLS', '0') or 0)
+    if calls > 0:
+        profiler.arm_calls(calls)
+    window = float(os.getenv('PROFILE_WINDOW', '0') or 0)
+    if window > 0:
+        profiler.start_window(window)
+
+    if not hasattr(signal, 'SIGUSR2'):
+        return
+    signal_window = float(os.getenv('PROFILE_SIGNAL_WINDOW', '30'))
+
+    def on_signal():
+        try:
+            profiler.start_window(signal_window)
+        except RuntimeError as e:
+            logger.warning(f"SIGUSR2 проигнорирован: {e}")
+
+    try:
+        import asyncio
+        (loop or asyncio.get_running_loop()).add_signal_handler(signal.SIGUSR2, on_signal)
+    except (RuntimeError, NotImplementedError, ValueError) as e:
+        logger.debug(f"Обработчик SIGUSR2 не установлен: {e}")
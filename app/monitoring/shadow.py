@@ -0,0 +1,213 @@
+"""
+Shadow - обработка живого трафика без публикации
+
+Кандидат (новая конфигурация конкурентности, кэшей, OCR или новая сборка)
+запускается отдельным развертыванием с SHADOW_MODE: он слушает те же каналы и
+проходит весь конвейер, но публикует в SHADOW_SINK_CHANNEL (или никуда), не
+вызывает save_car_with_formatting и загружает фото в Cloudinary с префиксом
+shadow_. Каждое объявление пишется в SHADOW_LOG: длительность, этапы, результат
+OCR и разбора, текст поста.
+
+Продакшен с заданным SHADOW_LOG пишет такие же записи с вариантом primary -
+`python -m app.monitoring.shadow_report` сопоставляет их по (канал, id поста).
+
+SHADOW_MODE: 0 - выключено, 1/all - весь трафик, listener - только
+new_post_handler, parser - только админ-парсер.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, FrozenSet
+
+from .metrics import collect_stage_durations
+from .freshness import channel_label
+
+logger = logging.getLogger(__name__)
+
+SHADOW_LOG = 'logs/shadow.jsonl'
+ENTRY_POINTS = ('listener', 'parser')
+
+_current: ContextVar[Optional['ShadowRun']] = ContextVar('shadow_run', default=None)
+
+
+@dataclass
+class ShadowConfig:
+    """Настройки shadow-режима"""
+    scopes: FrozenSet[str] = frozenset()
+    sink_channel: Optional[str] = None
+    log_path: Optional[str] = None
+    variant: str = 'primary'
+    public_id_prefix: str = 'shadow_'
+
+    @classmethod
+    def from_env(cls) -> 'ShadowConfig':
+        """Читает SHADOW_MODE, SHADOW_SINK_CHANNEL, SHADOW_LOG и SHADOW_VARIANT"""
+        mode = os.getenv('SHADOW_MODE', '0').strip().lower()
+        if mode in ('', '0', 'false', 'no', 'off'):
+            scopes = frozenset()
+        elif mode in ('1', 'true', 'yes', 'on', 'all'):
+            scopes = frozenset(ENTRY_POINTS)
+        else:
+            scopes = frozenset(part.strip() for part in mode.split(',') if part.strip())
+            unknown = scopes - set(ENTRY_POINTS)
+            if unknown:
+                raise ValueError(
+                    f"Неизвестные значения SHADOW_MODE: {', '.join(sorted(unknown))}. "
+                    f"Допустимо: 0, 1, all, {', '.join(ENTRY_POINTS)}"
+                )
+        default_log = SHADOW_LOG if scopes else None
+        return cls(
+            scopes=scopes,
+            sink_channel=os.getenv('SHADOW_SINK_CHANNEL') or None,
+            log_path=os.getenv('SHADOW_LOG', default_log) or None,
+            variant=os.getenv('SHADOW_VARIANT', 'shadow' if scopes else 'primary'),
+        )
+
+    def is_shadow(self, entry: str) -> bool:
+        return entry in self.scopes
+
+
+@dataclass
+class ShadowRun:
+    """Обработка одного объявления: режим и собираемые результаты"""
+    shadow: bool
+    config: ShadowConfig
+    outputs: Dict[str, Any] = field(default_factory=dict)
+
+
+class ShadowLog:
+    """Пишет записи объявлений в JSONL (по строке на объявление)"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False, default=str) + '\n'
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+_config: Optional[ShadowConfig] = None
+_log: Optional[ShadowLog] = None
+
+
+def get_shadow_config() -> ShadowConfig:
+    """Глобальные настройки shadow-режима (из окружения при первом вызове)"""
+    global _config
+    if _config is None:
+        _config = ShadowConfig.from_env()
+        if _config.scopes:
+            logger.warning(
+                f"Shadow-режим ({', '.join(sorted(_config.scopes))}): публикация в "
+                f"{_config.sink_channel or 'никуда'}, сохранение в базу отключено"
+            )
+    return _config
+
+
+def set_shadow_config(config: Optional[ShadowConfig]):
+    """Заменяет настройки (None - перечитать из окружения)"""
+    global _config, _log
+    _config = config
+    _log = None
+
+
+def _get_log(path: str) -> ShadowLog:
+    global _log
+    if _log is None or _log.path != path:
+        _log = ShadowLog(path)
+    return _log
+
+
+def current_run() -> Optional[ShadowRun]:
+    return _current.get()
+
+
+def is_shadow_run() -> bool:
+    """True, если текущее объявление обрабатывается в shadow-режиме"""
+    run = _current.get()
+    return run is not None and run.shadow
+
+
+def note_output(key: str, value: Any):
+    """Запоминает результат этапа для сравнения shadow и продакшена"""
+    run = _current.get()
+    if run is not None:
+        run.outputs[key] = value
+
+
+@contextmanager
+def shadow_entry(entry: str):
+    """
+    Точка входа конвейера (listener или parser): включает shadow-режим, если
+    он задан для этой точки входа
+
+    Args:
+        entry: 'listener' (new_post_handler) или 'parser' (админ-парсер)
+
+    Yields:
+        True, если объявления этой точки входа обрабатываются в shadow-режиме
+    """
+    config = get_shadow_config()
+    run = ShadowRun(shadow=config.is_shadow(entry), config=config)
+    run.outputs['entry'] = entry
+    token = _current.set(run)
+    try:
+        yield run.shadow
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def record_run(ann: Dict[str, Any], source_channel: str):
+    """
+    Записывает длительность, этапы и результаты объявления в SHADOW_LOG
+
+    Без заданного лога (обычный продакшен) ничего не делает. Каждое объявление
+    получает свой ShadowRun, поэтому вложенные задачи не смешивают результаты.
+    """
+    parent = _current.get()
+    config = parent.config if parent else get_shadow_config()
+    if not config.log_path:
+        yield None
+        return
+    run = ShadowRun(shadow=parent.shadow if parent else False, config=config)
+    if parent:
+        run.outputs.update(parent.outputs)
+    token = _current.set(run)
+    started = time.perf_counter()
+    status, error = 'success', None
+    try:
+        with collect_stage_durations() as stages:
+            yield run
+    except Exception as e:
+        status, error = 'error', f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        record = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'variant': config.variant,
+            'shadow': run.shadow,
+            'source_channel': channel_label(source_channel),
+            'message_id': ann.get('id'),
+            'duration': round(time.perf_counter() - started, 4),
+            'stages': {name: round(value, 4) for name, value in stages.items()},
+            'status': status,
+            'error': error,
+            **run.outputs,
+        }
+        try:
+            _get_log(config.log_path).write(record)
+        except OSError as e:
+            logger.error(f"Не удалось записать shadow-лог: {e}")
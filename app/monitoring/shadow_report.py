@@ -0,0 +1,185 @@
+"""
+Shadow Report - сравнение shadow-варианта с продакшеном
+
+Читает записи SHADOW_LOG обоих развертываний, сопоставляет объявления по
+(канал, id поста) и сравнивает длительности, этапы, ошибки и результаты:
+OCR и разбор должны совпадать, текст поста от LLM сравнивается по похожести.
+
+Использование:
+    python -m app.monitoring.shadow_report logs/shadow-primary.jsonl logs/shadow.jsonl
+    python -m app.monitoring.shadow_report logs/*.jsonl --baseline primary --candidate shadow --diffs 5
+"""
+
+import sys
+import json
+import difflib
+import argparse
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+
+Key = Tuple[str, Any]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def load_records(paths: List[str]) -> Dict[str, Dict[Key, Dict[str, Any]]]:
+    """
+    Загружает записи и группирует по варианту
+
+    Returns:
+        {вариант: {(канал, id поста): запись}}; при повторах берется последняя
+    """
+    variants: Dict[str, Dict[Key, Dict[str, Any]]] = defaultdict(dict)
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                key = (record.get('source_channel'), record.get('message_id'))
+                variants[record.get('variant', 'primary')][key] = record
+    return variants
+
+
+def message_similarity(a: Optional[str], b: Optional[str]) -> float:
+    """Похожесть текстов постов от 0 до 1"""
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def compare(baseline: Dict[Key, Dict[str, Any]], candidate: Dict[Key, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Сравнивает два варианта по общим объявлениям
+
+    Returns:
+        Словарь: покрытие, длительности, этапы, ошибки, расхождения результатов
+    """
+    common = sorted(set(baseline) & set(candidate), key=str)
+    pairs = [(baseline[key], candidate[key]) for key in common]
+
+    def durations(records):
+        return [r['duration'] for r in records if r.get('status') == 'success']
+
+    stage_names = sorted({name for pair in pairs for record in pair for name in record.get('stages', {})})
+    stages = {}
+    for name in stage_names:
+        base = [b['stages'][name] for b, _ in pairs if name in b.get('stages', {})]
+        cand = [c['stages'][name] for _, c in pairs if name in c.get('stages', {})]
+        stages[name] = {
+            'baseline_p50': _percentile(base, 0.5), 'candidate_p50': _percentile(cand, 0.5),
+            'baseline_p95': _percentile(base, 0.95), 'candidate_p95': _percentile(cand, 0.95),
+        }
+
+    ocr_diffs, car_diffs, similarities, status_diffs = [], [], [], []
+    for key, (base, cand) in zip(common, pairs):
+        if base.get('status') != cand.get('status'):
+            status_diffs.append({'key': key, 'baseline': base.get('error') or 'success',
+                                 'candidate': cand.get('error') or 'success'})
+        if (base.get('ocr') or {}).get('hash') != (cand.get('ocr') or {}).get('hash'):
+            ocr_diffs.append({'key': key, 'baseline': base.get('ocr'), 'candidate': cand.get('ocr')})
+        if base.get('car') != cand.get('car'):
+            fields = {
+                field: (value, (cand.get('car') or {}).get(field))
+                for field, value in (base.get('car') or {}).items()
+                if value != (cand.get('car') or {}).get(field)
+            }
+            car_diffs.append({'key': key, 'fields': fields})
+        similarities.append((message_similarity(base.get('message'), cand.get('message')), key))
+
+    base_all, cand_all = [b for b, _ in pairs], [c for _, c in pairs]
+    return {
+        'baseline_total': len(baseline),
+        'candidate_total': len(candidate),
+        'common': len(common),
+        'only_baseline': len(set(baseline) - set(candidate)),
+        'only_candidate': len(set(candidate) - set(baseline)),
+        'duration': {
+            'baseline_p50': _percentile(durations(base_all), 0.5),
+            'candidate_p50': _percentile(durations(cand_all), 0.5),
+            'baseline_p95': _percentile(durations(base_all), 0.95),
+            'candidate_p95': _percentile(durations(cand_all), 0.95),
+        },
+        'errors': {
+            'baseline': sum(1 for r in base_all if r.get('status') != 'success'),
+            'candidate': sum(1 for r in cand_all if r.get('status') != 'success'),
+        },
+        'stages': stages,
+        'status_diffs': status_diffs,
+        'ocr_diffs': ocr_diffs,
+        'car_diffs': car_diffs,
+        'message_similarity_p50': _percentile([s for s, _ in similarities], 0.5),
+        'least_similar': sorted(similarities)[:10],
+    }
+
+
+def _delta(base: float, cand: float) -> str:
+    if not base:
+        return f"{base:.3f}s -> {cand:.3f}s"
+    return f"{base:.3f}s -> {cand:.3f}s ({(cand - base) / base * 100:+.0f}%)"
+
+
+def format_report(result: Dict[str, Any], baseline_name: str, candidate_name: str,
+                  baseline: Dict[Key, Dict[str, Any]], candidate: Dict[Key, Dict[str, Any]],
+                  diffs: int = 3) -> str:
+    """Текстовый отчет; diffs - сколько самых непохожих постов показать построчно"""
+    duration = result['duration']
+    lines = [
+        f"{baseline_name} -> {candidate_name}: общих объявлений {result['common']} "
+        f"(только {baseline_name}: {result['only_baseline']}, только {candidate_name}: {result['only_candidate']})",
+        f"Длительность p50: {_delta(duration['baseline_p50'], duration['candidate_p50'])}",
+        f"Длительность p95: {_delta(duration['baseline_p95'], duration['candidate_p95'])}",
+        f"Ошибки: {result['errors']['baseline']} -> {result['errors']['candidate']}",
+        f"Расхождения: статус {len(result['status_diffs'])}, OCR {len(result['ocr_diffs'])}, "
+        f"разбор {len(result['car_diffs'])}; похожесть постов p50 {result['message_similarity_p50']:.2f}",
+        "",
+        "Этапы (p95):",
+    ]
+    for name, stats in result['stages'].items():
+        lines.append(f"  {name:<14} {_delta(stats['baseline_p95'], stats['candidate_p95'])}")
+    for diff in result['status_diffs'][:5]:
+        lines.append(f"  статус {diff['key']}: {diff['baseline']} -> {diff['candidate']}")
+    for diff in result['car_diffs'][:5]:
+        lines.append(f"  разбор {diff['key']}: {diff['fields']}")
+    for similarity, key in result['least_similar'][:diffs]:
+        if similarity >= 1.0:
+            break
+        lines.append(f"\n--- {key} (похожесть {similarity:.2f})")
+        lines += list(difflib.unified_diff(
+            (baseline[key].get('message') or '').splitlines(),
+            (candidate[key].get('message') or '').splitlines(),
+            baseline_name, candidate_name, lineterm='', n=1
+        ))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сравнение shadow-варианта с продакшеном")
+    parser.add_argument('files', nargs='+', help="Файлы SHADOW_LOG обоих развертываний")
+    parser.add_argument('--baseline', default='primary', help="Вариант-эталон")
+    parser.add_argument('--candidate', default='shadow', help="Сравниваемый вариант")
+    parser.add_argument('--diffs', type=int, default=3, help="Сколько различающихся постов показать")
+    args = parser.parse_args(argv)
+
+    variants = load_records(args.files)
+    missing = [name for name in (args.baseline, args.candidate) if name not in variants]
+    if missing:
+        print(f"Нет записей варианта: {', '.join(missing)}. Найдены: {', '.join(sorted(variants)) or 'нет'}")
+        return 1
+    baseline, candidate = variants[args.baseline], variants[args.candidate]
+    result = compare(baseline, candidate)
+    print(format_report(result, args.baseline, args.candidate, baseline, candidate, args.diffs))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
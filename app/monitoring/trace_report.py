@@ -0,0 +1,217 @@
+"""
+Trace Report - сводка по трейсам из logs/traces.jsonl
+
+Использование:
+    python -m app.monitoring.trace_report --top 10
+    python -m app.monitoring.trace_report --trace 3f2a9c0d1b2e4f56
+"""
+
+import os
+import sys
+import json
+import glob
+import argparse
+from collections import defaultdict
+from typing import List, Dict, Any, Optional
+
+from .tracing import TRACE_FILE
+
+
+def load_spans(path: str = TRACE_FILE, include_rotated: bool = True) -> List[Dict[str, Any]]:
+    """
+    Загружает спаны из JSONL файла (и его ротированных копий)
+
+    Args:
+        path: Путь к файлу трейсов
+        include_rotated: Читать также path.1, path.2, ...
+
+    Returns:
+        Список спанов; битые строки пропускаются
+    """
+    paths = [path]
+    if include_rotated:
+        paths = sorted(glob.glob(f"{path}.*"), reverse=True) + paths
+
+    spans = []
+    for file_path in paths:
+        if not os.path.exists(file_path):
+            continue
+        with open(file_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return spans
+
+
+def group_traces(spans: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Группирует спаны по trace_id"""
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for item in spans:
+        traces[item['trace_id']].append(item)
+    return traces
+
+
+def find_root(trace: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Корневой спан трейса (без родителя)"""
+    roots = [item for item in trace if item.get('parent_id') is None]
+    if not roots:
+        return None
+    return max(roots, key=lambda item: item.get('duration') or 0)
+
+
+def critical_path(trace: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Критический путь трейса
+
+    Начиная с корня, на каждом уровне выбирается дочерний спан, завершившийся
+    последним - именно он определял момент окончания родителя.
+
+    Args:
+        trace: Спаны одного трейса
+
+    Returns:
+        Цепочка спанов от корня до листа
+    """
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for item in trace:
+        if item.get('parent_id'):
+            children[item['parent_id']].append(item)
+
+    path = []
+    current = find_root(trace)
+    while current is not None:
+        path.append(current)
+        kids = children.get(current['span_id'])
+        if not kids:
+            break
+        current = max(kids, key=lambda item: item['start'] + (item.get('duration') or 0))
+    return path
+
+
+def stage_breakdown(trace: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Суммарная длительность прямых потомков корня по именам"""
+    root = find_root(trace)
+    if root is None:
+        return {}
+    totals: Dict[str, float] = defaultdict(float)
+    for item in trace:
+        if item.get('parent_id') == root['span_id']:
+            totals[item['name']] += item.get('duration') or 0
+    return dict(totals)
+
+
+def slowest_traces(spans: List[Dict[str, Any]], top: int = 10) -> List[List[Dict[str, Any]]]:
+    """Трейсы с наибольшей длительностью корневого спана"""
+    traces = [trace for trace in group_traces(spans).values() if find_root(trace)]
+    traces.sort(key=lambda trace: find_root(trace).get('duration') or 0, reverse=True)
+    return traces[:top]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def span_stats(spans: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """p50 / p95 / max длительности по именам спанов"""
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for item in spans:
+        if item.get('duration') is not None:
+            durations[item['name']].append(item['duration'])
+    return {
+        name: {
+            'count': len(values),
+            'p50': _percentile(values, 0.5),
+            'p95': _percentile(values, 0.95),
+            'max': max(values)
+        }
+        for name, values in durations.items()
+    }
+
+
+def _format_span(item: Dict[str, Any]) -> str:
+    attrs = ', '.join(
+        f"{key}={value}" for key, value in item.get('attributes', {}).items()
+        if key in ('bytes', 'retries', 'http_status', 'tokens', 'flood_wait_seconds', 'chars')
+    )
+    status = '' if item.get('status') == 'ok' else f" [{item.get('error')}]"
+    return f"{item['name']} {item.get('duration', 0) * 1000:.0f}ms" + (f" ({attrs})" if attrs else '') + status
+
+
+def format_report(spans: List[Dict[str, Any]], top: int = 10) -> str:
+    """Текстовый отчет: самые медленные трейсы, их критические пути и статистика спанов"""
+    lines = []
+    if not spans:
+        return "Спаны не найдены"
+
+    lines.append(f"Самые медленные трейсы (top {top}):")
+    for trace in slowest_traces(spans, top):
+        root = find_root(trace)
+        attrs = root.get('attributes', {})
+        lines.append(
+            f"\n{root['trace_id']}  {root['duration']:.2f}s  "
+            f"message_id={attrs.get('message_id')}  source={attrs.get('source_channel')}"
+        )
+        breakdown = sorted(stage_breakdown(trace).items(), key=lambda kv: kv[1], reverse=True)
+        if breakdown:
+            lines.append("  этапы: " + ', '.join(f"{name}={value:.2f}s" for name, value in breakdown))
+        lines.append("  критический путь: " + ' -> '.join(_format_span(item) for item in critical_path(trace)))
+
+    lines.append("\nДлительность спанов:")
+    lines.append(f"  {'name':<24}{'count':>7}{'p50, ms':>10}{'p95, ms':>10}{'max, ms':>10}")
+    for name, stats in sorted(span_stats(spans).items(), key=lambda kv: kv[1]['p95'], reverse=True):
+        lines.append(
+            f"  {name:<24}{stats['count']:>7}{stats['p50'] * 1000:>10.0f}"
+            f"{stats['p95'] * 1000:>10.0f}{stats['max'] * 1000:>10.0f}"
+        )
+    return '\n'.join(lines)
+
+
+def format_trace(spans: List[Dict[str, Any]], trace_id: str) -> str:
+    """Дерево спанов одного трейса"""
+    trace = group_traces(spans).get(trace_id)
+    if not trace:
+        return f"Трейс {trace_id} не найден"
+
+    children: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for item in trace:
+        children[item.get('parent_id')].append(item)
+
+    root = find_root(trace)
+    on_path = {item['span_id'] for item in critical_path(trace)}
+    lines = []
+
+    def walk(item, depth):
+        offset = (item['start'] - root['start']) * 1000
+        marker = '*' if item['span_id'] in on_path else ' '
+        lines.append(f"{marker} {'  ' * depth}+{offset:.0f}ms {_format_span(item)}")
+        for child in sorted(children.get(item['span_id'], []), key=lambda c: c['start']):
+            walk(child, depth + 1)
+
+    walk(root, 0)
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Сводка по трейсам обработки объявлений")
+    parser.add_argument('--file', default=os.getenv('TRACE_FILE', TRACE_FILE), help="Файл трейсов")
+    parser.add_argument('--top', type=int, default=10, help="Количество самых медленных трейсов")
+    parser.add_argument('--trace', help="Показать дерево спанов одного трейса")
+    args = parser.parse_args(argv)
+
+    spans = load_spans(args.file)
+    if args.trace:
+        print(format_trace(spans, args.trace))
+    else:
+        print(format_report(spans, args.top))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Tracing - легковесные спаны для разбора задержек по объявлениям
+
+Каждое объявление обрабатывается в своем трейсе: корневой спан открывается в
+process_single_announcement, а вложенные спаны (OCR, LLM, загрузка,
+публикация, сохранение) наследуют trace_id через contextvars, поэтому
+идентификатор не нужно передавать явно. Завершенные спаны пишутся по одному
+JSON-объекту на строку в ротируемый файл (по умолчанию logs/traces.jsonl):
+спан только ставится в очередь, запись и ротация файла идут в отдельном
+потоке, а не в event loop.
+Сводку строит `python -m app.monitoring.trace_report`.
+"""
+
+import os
+import json
+import time
+import uuid
+import queue
+import atexit
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = 'logs/traces.jsonl'
+
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """Один измеренный участок работы внутри трейса"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'start', 'duration',
+                 'attributes', 'status', 'error', '_started')
+
+    def __init__(self, name: str, parent: Optional['Span'] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.name = name
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = 'ok'
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def set(self, key: str, value: Any):
+        """Устанавливает атрибут спана"""
+        self.attributes[key] = value
+
+    def incr(self, key: str, amount: int = 1):
+        """Увеличивает числовой атрибут спана (например, retries)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration': round(self.duration, 6) if self.duration is not None else None,
+            'status': self.status,
+            'error': self.error,
+            'attributes': self.attributes
+        }
+
+
+class JsonlSpanExporter:
+    """Пишет завершенные спаны в ротируемый JSONL файл из отдельного потока"""
+
+    def __init__(self, path: str = TRACE_FILE, max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        )
+        # export только кладет запись в очередь; файл пишет и ротирует поток QueueListener
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._queue_handler = logging.handlers.QueueHandler(self._queue)
+        self._listener = logging.handlers.QueueListener(self._queue, self._handler)
+        self._listener.start()
+        self._closed = False
+
+    def export(self, span: Span):
+        record = logging.makeLogRecord({
+            'msg': json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        })
+        self._queue_handler.emit(record)
+
+    def flush(self):
+        """Ждет, пока поток запишет все спаны из очереди (перед чтением файла)"""
+        if self._closed:
+            return
+        self._listener.stop()
+        self._handler.flush()
+        self._listener.start()
+
+    def close(self):
+        """Дописывает очередь и закрывает файл (повторный вызов ничего не делает)"""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        self._handler.close()
+
+
+_exporter: Optional[JsonlSpanExporter] = None
+_exporter_disabled = False
+
+
+def get_exporter() -> Optional[JsonlSpanExporter]:
+    """
+    Получить глобальный экспортер (создается при первом завершенном спане)
+
+    Returns:
+        JsonlSpanExporter или None, если трейсинг отключен (TRACING_ENABLED=0)
+    """
+    global _exporter, _exporter_disabled
+    if _exporter is None and not _exporter_disabled:
+        if os.getenv('TRACING_ENABLED', '1').lower() in ('0', 'false', 'no'):
+            _exporter_disabled = True
+            return None
+        try:
+            _exporter = JsonlSpanExporter(
+                path=os.getenv('TRACE_FILE', TRACE_FILE),
+                max_bytes=int(os.getenv('TRACE_MAX_BYTES', str(10 * 1024 * 1024))),
+                backup_count=int(os.getenv('TRACE_BACKUP_COUNT', '5'))
+            )
+            # Спаны из очереди дописываются при завершении процесса
+            atexit.register(_exporter.close)
+        except OSError as e:
+            logger.warning(f"Не удалось открыть файл трейсов: {e}")
+            _exporter_disabled = True
+    return _exporter
+
+
+def set_exporter(exporter: Optional[JsonlSpanExporter]):
+    """Подменяет глобальный экспортер (для тестов и нагрузочных прогонов)"""
+    global _exporter, _exporter_disabled
+    _exporter = exporter
+    _exporter_disabled = exporter is None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Открывает спан; без текущего спана начинается новый трейс
+
+    Args:
+        name: Имя спана (ocr, perplexity.request, cloudinary.upload, ...)
+        **attributes: Начальные атрибуты
+
+    Yields:
+        Span, в который можно дописывать атрибуты
+    """
+    current = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = 'error'
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.finish()
+        _current_span.reset(token)
+        exporter = get_exporter()
+        if exporter is not None:
+            try:
+                exporter.export(current)
+            except Exception as e:
+                logger.debug(f"Не удалось записать спан {name}: {e}")
+
+
+def current_span() -> Optional[Span]:
+    """Текущий спан (или None вне трейса)"""
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """trace_id текущего трейса (или None вне трейса)"""
+    current = _current_span.get()
+    return current.trace_id if current else None
+
+
+def set_span_attribute(key: str, value: Any):
+    """Устанавливает атрибут текущего спана, если он есть"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(key, value)
+
+
+def incr_span_attribute(key: str, amount: int = 1):
+    """Увеличивает числовой атрибут текущего спана, если он есть"""
+    current = _current_span.get()
+    if current is not None:
+        current.incr(key, amount)
@@ -5,15 +5,23 @@ OCR API Module
 Поддерживает Tesseract, PaddleOCR, Yandex Vision API и BLIP caption.
 """
 
-from .ocr_client import OCRClient, OCRConfig
+from .ocr_client import OCRClient, OCRConfig, OCRResult
 from .text_extractor import extract_text_from_image, extract_caption_from_image
 from .legacy_wrapper import process_images_ocr, extract_text_legacy
+from .text_detector import score_text_presence, TextPresenceResult
+from .caption_service import CaptionService, CaptionConfig, get_caption_service
 
 __all__ = [
     'OCRClient',
     'OCRConfig', 
+    'OCRResult',
     'extract_text_from_image',
     'extract_caption_from_image',
     'process_images_ocr',
-    'extract_text_legacy'
+    'extract_text_legacy',
+    'score_text_presence',
+    'TextPresenceResult',
+    'CaptionService',
+    'CaptionConfig',
+    'get_caption_service'
 ] 
\ No newline at end of file
@@ -0,0 +1,279 @@
+"""
+Caption Service - пакетная генерация описаний изображений моделью BLIP на CPU
+
+Модель загружается лениво при первом запросе и работает в отдельном потоке,
+чтобы не блокировать event loop. Одиночные запросы, пришедшие почти
+одновременно, объединяются в один батч. Поддерживаются динамическая
+int8-квантизация линейных слоев и более легкая base-модель.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Dict, Any, Set, Tuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Псевдонимы моделей для переменной окружения BLIP_MODEL
+BLIP_MODELS = {
+    'large': "Salesforce/blip-image-captioning-large",
+    'base': "Salesforce/blip-image-captioning-base",
+}
+
+
+@dataclass
+class CaptionConfig:
+    """Конфигурация сервиса описаний изображений"""
+    model_name: str = BLIP_MODELS['large']
+    quantize: bool = False
+    batch_size: int = 8
+    batch_window: float = 0.02
+    max_new_tokens: int = 30
+    num_threads: Optional[int] = None
+
+    @classmethod
+    def from_env(cls) -> 'CaptionConfig':
+        """Создает конфигурацию из переменных окружения"""
+        model = os.getenv('BLIP_MODEL', 'large')
+        threads = os.getenv('BLIP_THREADS')
+        return cls(
+            model_name=BLIP_MODELS.get(model, model),
+            quantize=os.getenv('BLIP_QUANTIZE', '0').lower() in ('1', 'true', 'yes'),
+            batch_size=int(os.getenv('BLIP_BATCH_SIZE', '8')),
+            num_threads=int(threads) if threads else None
+        )
+
+
+class CaptionService:
+    """
+    Сервис генерации описаний изображений с батчингом и выполнением вне event loop
+    """
+
+    def __init__(self, config: Optional[CaptionConfig] = None):
+        self.config = config or CaptionConfig.from_env()
+        self._processor = None
+        self._model = None
+        # Один поток: torch сам распараллеливает батч, а модель не потокобезопасна
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='blip')
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Ссылки на задачи батчей: event loop хранит только слабые ссылки
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats: Dict[str, Any] = {
+            'load_seconds': None,
+            'images': 0,
+            'failed': 0,
+            'batches': 0,
+            'inference_seconds': 0.0
+        }
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def processor(self):
+        """BLIP processor (загружается синхронно при первом обращении)"""
+        self._load()
+        return self._processor
+
+    @property
+    def model(self):
+        """BLIP model (загружается синхронно при первом обращении)"""
+        self._load()
+        return self._model
+
+    def _load(self):
+        """Загрузка модели (выполняется в потоке сервиса)"""
+        if self._model is not None:
+            return
+
+        import torch
+        from transformers import BlipProcessor, BlipForConditionalGeneration
+
+        if self.config.num_threads:
+            torch.set_num_threads(self.config.num_threads)
+
+        started = time.perf_counter()
+        processor = BlipProcessor.from_pretrained(self.config.model_name)
+        model = BlipForConditionalGeneration.from_pretrained(
+            self.config.model_name,
+            low_cpu_mem_usage=True
+        )
+        model.eval()
+
+        if self.config.quantize:
+            model = torch.ao.quantization.quantize_dynamic(
+                model, {torch.nn.Linear}, dtype=torch.qint8
+            )
+
+        self._processor = processor
+        self._model = model
+        self.stats['load_seconds'] = round(time.perf_counter() - started, 3)
+        logger.info(
+            f"BLIP модель {self.config.model_name} загружена за {self.stats['load_seconds']}с "
+            f"(int8: {self.config.quantize})"
+        )
+
+    def _generate(self, images: list) -> List[str]:
+        """Инференс BLIP для батча открытых изображений"""
+        import torch
+
+        processor, model = self._processor, self._model
+        inputs = processor(images=images, return_tensors="pt")
+        with torch.inference_mode():
+            output = model.generate(
+                **inputs,
+                max_new_tokens=self.config.max_new_tokens
+            )
+        return processor.batch_decode(output, skip_special_tokens=True)
+
+    def _open(self, path: str):
+        """Открывает изображение; нечитаемое или обрезанное - None"""
+        try:
+            return Image.open(path).convert('RGB')
+        except Exception as e:
+            logger.warning(f"Не удалось открыть изображение {path} для описания: {e}")
+            return None
+
+    def caption_batch_sync(self, image_paths: List[str]) -> List[str]:
+        """
+        Синхронная генерация описаний для списка изображений
+
+        Ошибка одного изображения не влияет на остальные: для него возвращается
+        пустая строка. Если падает инференс всего батча, изображения батча
+        описываются по одному.
+
+        Args:
+            image_paths: Список путей к изображениям
+
+        Returns:
+            Список описаний в том же порядке ('' для изображений с ошибкой)
+        """
+        self._load()
+
+        captions: List[str] = []
+        for start in range(0, len(image_paths), self.config.batch_size):
+            chunk = image_paths[start:start + self.config.batch_size]
+            opened = [(i, image) for i, image in enumerate(map(self._open, chunk)) if image is not None]
+            chunk_captions = [''] * len(chunk)
+
+            started = time.perf_counter()
+            if opened:
+                try:
+                    results = self._generate([image for _, image in opened])
+                except Exception as e:
+                    logger.warning(f"Ошибка описания батча из {len(opened)} изображений, описываем по одному: {e}")
+                    results = []
+                    for i, image in opened:
+                        try:
+                            results.extend(self._generate([image]))
+                        except Exception as image_error:
+                            logger.warning(f"Не удалось описать изображение {chunk[i]}: {image_error}")
+                            results.append('')
+                for (i, _), caption in zip(opened, results):
+                    chunk_captions[i] = caption
+            captions.extend(chunk_captions)
+
+            self.stats['inference_seconds'] += time.perf_counter() - started
+            self.stats['images'] += len(chunk)
+            self.stats['failed'] += chunk_captions.count('')
+            self.stats['batches'] += 1
+
+        return captions
+
+    async def caption_batch(self, image_paths: List[str]) -> List[str]:
+        """Асинхронная генерация описаний для списка изображений"""
+        if not image_paths:
+            return []
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.caption_batch_sync, list(image_paths))
+
+    def caption_batch_blocking(self, image_paths: List[str]) -> List[str]:
+        """Синхронная генерация описаний в потоке сервиса (для вызова вне event loop)"""
+        if not image_paths:
+            return []
+        return self._executor.submit(self.caption_batch_sync, list(image_paths)).result()
+
+    async def caption(self, image_path: str) -> str:
+        """
+        Описание одного изображения
+
+        Запросы, пришедшие в пределах batch_window, объединяются в один батч.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image_path, future))
+
+        if len(self._pending) >= self.config.batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.config.batch_window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Отправляет накопленные одиночные запросы одним батчем"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        async def run():
+            paths = [path for path, _ in pending]
+            try:
+                captions = await self.caption_batch(paths)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            for (_, future), caption in zip(pending, captions):
+                if not future.done():
+                    future.set_result(caption)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def warmup(self):
+        """Заранее загружает модель, чтобы первый запрос не платил за холодный старт"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._load)
+
+    def close(self):
+        """Останавливает поток сервиса и освобождает модель"""
+        self._executor.shutdown(wait=False)
+        self._model = None
+        self._processor = None
+
+
+# Глобальный сервис: модель загружается один раз на процесс
+_default_service: Optional[CaptionService] = None
+
+
+def get_caption_service(config: Optional[CaptionConfig] = None) -> CaptionService:
+    """
+    Получить глобальный экземпляр сервиса описаний
+
+    Args:
+        config: Конфигурация (опционально)
+
+    Returns:
+        Экземпляр CaptionService
+    """
+    global _default_service
+    if _default_service is None or config is not None:
+        # Прежний сервис держит поток и веса модели - освобождаем их
+        if _default_service is not None:
+            _default_service.close()
+        _default_service = CaptionService(config)
+    return _default_service
@@ -130,33 +130,14 @@ def blip_image_caption(image_path: str) -> str:
     Returns:
         Описание изображения
     """
-    import asyncio
-    from .text_extractor import extract_caption_from_image
+    from .ocr_client import BLIP_AVAILABLE
+    from .caption_service import get_caption_service
     
-    # Запускаем асинхронную функцию синхронно
-    try:
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # Если цикл уже запущен, создаем новый поток
-            import threading
-            import concurrent.futures
-            
-            def run_in_thread():
-                new_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(new_loop)
-                try:
-                    return new_loop.run_until_complete(extract_caption_from_image(image_path))
-                finally:
-                    new_loop.close()
-            
-            with concurrent.futures.ThreadPoolExecutor() as executor:
-                future = executor.submit(run_in_thread)
-                return future.result()
-        else:
-            return loop.run_until_complete(extract_caption_from_image(image_path))
-    except RuntimeError:
-        # Если нет активного цикла событий
-        return asyncio.run(extract_caption_from_image(image_path))
+    if not BLIP_AVAILABLE:
+        raise ImportError("BLIP модель не установлена")
+    
+    # Через поток сервиса: модель нельзя вызывать из нескольких потоков одновременно
+    return get_caption_service().caption_batch_blocking([image_path])[0]
 
 
 def test_ocr_connection() -> dict:
@@ -3,32 +3,52 @@ OCR Client - основной класс для обработки изобра
 """
 
 import os
-import cv2
+import asyncio
 import base64
+import logging
 import requests
-import numpy as np
+import time
+from importlib.util import find_spec
 from PIL import Image
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from dataclasses import dataclass
 from dotenv import load_dotenv
 
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
+from app.monitoring.metrics import OCR_DURATION, OCR_CASCADE, record_api_error, record_rate_limited
+from app.monitoring.tracing import incr_span_attribute
 
-try:
-    from paddleocr import PaddleOCR
-    PADDLE_AVAILABLE = True
-except ImportError:
-    PADDLE_AVAILABLE = False
+# Тяжелые бэкенды (OpenCV, PaddleOCR, transformers/torch) импортируются при первом
+# использовании; при импорте модуля только проверяется, что пакеты установлены
+TESSERACT_AVAILABLE = find_spec('pytesseract') is not None
+PADDLE_AVAILABLE = find_spec('paddleocr') is not None
+BLIP_AVAILABLE = find_spec('transformers') is not None
 
-try:
-    from transformers import BlipProcessor, BlipForConditionalGeneration
-    BLIP_AVAILABLE = True
-except ImportError:
-    BLIP_AVAILABLE = False
+logger = logging.getLogger(__name__)
+
+# Режимы предфильтра наличия текста перед платным OCR
+TEXT_PREFILTER_MODES = ('off', 'on', 'audit')
+
+# Локальные движки, которые могут быть первой ступенью каскада
+CASCADE_LOCAL_ENGINES = ('tesseract', 'paddle')
+
+YANDEX_VISION_URL = "https://vision.api.cloud.yandex.net/vision/v1/batchAnalyze"
+
+# Tesseract принимает коды ISO 639-3 (пакет tesseract-ocr-rus), PaddleOCR и Yandex - ISO 639-1
+TESSERACT_LANGUAGES = {'ru': 'rus', 'en': 'eng'}
+
+
+def tesseract_language(language: Optional[str]) -> str:
+    """
+    Код языка для Tesseract
+
+    Args:
+        language: Язык из OCRConfig ('ru', 'en'; несколько через + - 'ru+en')
+
+    Returns:
+        Код Tesseract: 'rus', 'eng', 'rus+eng'
+    """
+    codes = [code.strip() for code in (language or 'ru').split('+') if code.strip()]
+    return '+'.join(TESSERACT_LANGUAGES.get(code, code) for code in codes)
 
 
 @dataclass
@@ -42,6 +62,28 @@ class OCRConfig:
     preprocess_images: bool = True
     yandex_iam_token: Optional[str] = None
     yandex_folder_id: Optional[str] = None
+    # Адрес batchAnalyze (переопределяется YANDEX_VISION_URL, например для нагрузочных тестов)
+    yandex_vision_url: Optional[str] = None
+    # Предфильтр: 'off' - выключен, 'on' - пропускать фото без текста,
+    # 'audit' - только логировать, что было бы пропущено
+    text_prefilter: Optional[str] = None
+    text_prefilter_threshold: Optional[float] = None
+    # Каскад: сначала локальный движок, Yandex - только если локальный не справился
+    use_cascade: Optional[bool] = None
+    cascade_local: Optional[str] = None
+    cascade_min_confidence: Optional[float] = None
+    cascade_min_chars: Optional[int] = None
+    cascade_spec_sheet_lines: Optional[int] = None
+
+
+@dataclass
+class OCRResult:
+    """Результат OCR с информацией о том, какая ступень каскада ответила"""
+    text: str
+    tier: str
+    confidence: Optional[float] = None
+    escalated: bool = False
+    reason: Optional[str] = None
 
 
 class OCRClient:
@@ -52,8 +94,8 @@ class OCRClient:
     def __init__(self, config: Optional[OCRConfig] = None):
         self.config = config or OCRConfig()
         self._paddle_ocr = None
-        self._blip_processor = None
-        self._blip_model = None
+        self._caption_service = None
+        self.tier_stats: Dict[str, int] = {}
         
         # Загружаем переменные окружения
         load_dotenv()
@@ -68,34 +110,86 @@ class OCRClient:
                 self.config.yandex_folder_id or 
                 os.getenv('YANDEX_FOLDER_ID')
             )
+        
+        if self.config.yandex_vision_url is None:
+            self.config.yandex_vision_url = os.getenv('YANDEX_VISION_URL', YANDEX_VISION_URL)
+        
+        # Настройка предфильтра наличия текста
+        if self.config.text_prefilter is None:
+            self.config.text_prefilter = os.getenv('OCR_TEXT_PREFILTER', 'off').lower()
+        if self.config.text_prefilter not in TEXT_PREFILTER_MODES:
+            raise ValueError(
+                f"Неизвестный режим предфильтра: {self.config.text_prefilter}. "
+                f"Допустимые значения: {', '.join(TEXT_PREFILTER_MODES)}"
+            )
+        if self.config.text_prefilter_threshold is None:
+            self.config.text_prefilter_threshold = float(
+                os.getenv('OCR_TEXT_PREFILTER_THRESHOLD', '0.35')
+            )
+        
+        # Настройка каскада
+        if self.config.use_cascade is None:
+            self.config.use_cascade = os.getenv('OCR_CASCADE', '0').lower() in ('1', 'true', 'yes')
+        if self.config.cascade_local is None:
+            self.config.cascade_local = os.getenv('OCR_CASCADE_LOCAL', 'tesseract').lower()
+        if self.config.cascade_local not in CASCADE_LOCAL_ENGINES:
+            raise ValueError(
+                f"Неизвестный локальный движок каскада: {self.config.cascade_local}. "
+                f"Допустимые значения: {', '.join(CASCADE_LOCAL_ENGINES)}"
+            )
+        if self.config.cascade_min_confidence is None:
+            self.config.cascade_min_confidence = float(
+                os.getenv('OCR_CASCADE_MIN_CONFIDENCE', '70')
+            )
+        if self.config.cascade_min_chars is None:
+            self.config.cascade_min_chars = int(os.getenv('OCR_CASCADE_MIN_CHARS', '20'))
+        if self.config.cascade_spec_sheet_lines is None:
+            self.config.cascade_spec_sheet_lines = int(
+                os.getenv('OCR_CASCADE_SPEC_SHEET_LINES', '15')
+            )
+        if self.config.use_cascade:
+            # Yandex в каскаде - вторая ступень, поэтому токены нужны и без use_yandex
+            self.config.yandex_iam_token = (
+                self.config.yandex_iam_token or
+                os.getenv('YANDEX_IAM_TOKEN')
+            )
+            self.config.yandex_folder_id = (
+                self.config.yandex_folder_id or
+                os.getenv('YANDEX_FOLDER_ID')
+            )
     
     @property
     def paddle_ocr(self):
         """Ленивая инициализация PaddleOCR"""
         if self._paddle_ocr is None and PADDLE_AVAILABLE:
+            from paddleocr import PaddleOCR
             self._paddle_ocr = PaddleOCR(
                 use_angle_cls=True, 
                 lang=self.config.language
             )
         return self._paddle_ocr
     
+    @property
+    def caption_service(self):
+        """Ленивое получение общего сервиса BLIP описаний"""
+        if self._caption_service is None:
+            from .caption_service import get_caption_service
+            self._caption_service = get_caption_service()
+        return self._caption_service
+    
     @property
     def blip_processor(self):
         """Ленивая инициализация BLIP processor"""
-        if self._blip_processor is None and BLIP_AVAILABLE:
-            self._blip_processor = BlipProcessor.from_pretrained(
-                "Salesforce/blip-image-captioning-large"
-            )
-        return self._blip_processor
+        if BLIP_AVAILABLE:
+            return self.caption_service.processor
+        return None
     
     @property
     def blip_model(self):
         """Ленивая инициализация BLIP model"""
-        if self._blip_model is None and BLIP_AVAILABLE:
-            self._blip_model = BlipForConditionalGeneration.from_pretrained(
-                "Salesforce/blip-image-captioning-large"
-            )
-        return self._blip_model
+        if BLIP_AVAILABLE:
+            return self.caption_service.model
+        return None
     
     def preprocess_image(self, image_path: str) -> str:
         """
@@ -107,6 +201,8 @@ class OCRClient:
         Returns:
             Путь к обработанному изображению
         """
+        import cv2
+        
         try:
             # Загрузка изображения
             img = cv2.imread(image_path)
@@ -143,6 +239,7 @@ class OCRClient:
         """
         if not TESSERACT_AVAILABLE:
             raise ImportError("Tesseract не установлен")
+        import pytesseract
         
         try:
             processed_path = image_path
@@ -152,7 +249,7 @@ class OCRClient:
             # Извлечение текста
             text = pytesseract.image_to_string(
                 Image.open(processed_path),
-                lang=self.config.language,
+                lang=tesseract_language(self.config.language),
                 config='--psm 3 --oem 3'
             )
             
@@ -191,6 +288,71 @@ class OCRClient:
         except Exception as e:
             raise Exception(f"Ошибка PaddleOCR: {str(e)}")
     
+    def tesseract_with_confidence(self, image_path: str) -> Tuple[str, float]:
+        """
+        Tesseract OCR со средней уверенностью распознанных слов
+        
+        Args:
+            image_path: Путь к изображению
+            
+        Returns:
+            Кортеж (текст, уверенность 0..100)
+        """
+        if not TESSERACT_AVAILABLE:
+            raise ImportError("Tesseract не установлен")
+        import pytesseract
+        
+        processed_path = image_path
+        if self.config.preprocess_images:
+            processed_path = self.preprocess_image(image_path)
+        
+        try:
+            data = pytesseract.image_to_data(
+                Image.open(processed_path),
+                lang=tesseract_language(self.config.language),
+                config='--psm 3 --oem 3',
+                output_type=pytesseract.Output.DICT
+            )
+        finally:
+            if processed_path != image_path and os.path.exists(processed_path):
+                os.remove(processed_path)
+        
+        words = []
+        confidences = []
+        for word, conf in zip(data.get('text', []), data.get('conf', [])):
+            word = word.strip()
+            conf = float(conf)
+            # conf = -1 у служебных блоков (страница, абзац, строка)
+            if not word or conf < 0:
+                continue
+            words.append(word)
+            confidences.append(conf)
+        
+        confidence = sum(confidences) / len(confidences) if confidences else 0.0
+        return ' '.join(words), round(confidence, 2)
+    
+    def paddle_with_confidence(self, image_path: str) -> Tuple[str, float]:
+        """
+        PaddleOCR со средней уверенностью распознанных строк
+        
+        Args:
+            image_path: Путь к изображению
+            
+        Returns:
+            Кортеж (текст, уверенность 0..100)
+        """
+        if not PADDLE_AVAILABLE:
+            raise ImportError("PaddleOCR не установлен")
+        
+        result = self.paddle_ocr.ocr(image_path, cls=True)
+        lines = [line[1] for line in (result[0] if result and result[0] else []) if line[1]]
+        if not lines:
+            return "", 0.0
+        
+        text = ' '.join(text for text, _ in lines)
+        confidence = sum(score for _, score in lines) / len(lines) * 100
+        return text, round(confidence, 2)
+    
     async def extract_text_yandex(self, image_path: str) -> str:
         """
         Извлечение текста с помощью Yandex Vision API
@@ -211,7 +373,7 @@ class OCRClient:
             img_b64 = base64.b64encode(img_data).decode("utf-8")
             
             # Подготовка запроса
-            url = "https://vision.api.cloud.yandex.net/vision/v1/batchAnalyze"
+            url = self.config.yandex_vision_url
             headers = {"Authorization": f"Bearer {self.config.yandex_iam_token}"}
             body = {
                 "folderId": self.config.yandex_folder_id,
@@ -249,6 +411,10 @@ class OCRClient:
             return '\n'.join(lines)
             
         except requests.exceptions.HTTPError as e:
+            if e.response.status_code == 429:
+                record_rate_limited('yandex_vision')
+            else:
+                record_api_error('yandex_vision', e.response.status_code)
             if e.response.status_code == 401:
                 # Попытка обновить токен через yandex_auth модуль
                 try:
@@ -262,6 +428,7 @@ class OCRClient:
             else:
                 raise Exception(f"Ошибка Yandex Vision API: {e}")
         except Exception as e:
+            record_api_error('yandex_vision', type(e).__name__)
             # Возвращаем пустую строку вместо ошибки для совместимости
             return ""
     
@@ -279,37 +446,212 @@ class OCRClient:
             raise ImportError("BLIP модель не установлена")
         
         try:
-            raw_image = Image.open(image_path).convert('RGB')
+            # Модель работает в потоке сервиса, одновременные запросы батчатся
+            return await self.caption_service.caption(image_path)
+        except Exception as e:
+            raise Exception(f"Ошибка генерации описания: {str(e)}")
+    
+    async def generate_image_captions(self, image_paths: List[str]) -> List[str]:
+        """
+        Пакетная генерация описаний изображений с помощью BLIP
+        
+        Args:
+            image_paths: Список путей к изображениям
             
-            # Генерация описания
-            inputs = self.blip_processor(raw_image, return_tensors="pt")
-            out = self.blip_model.generate(**inputs)
-            caption = self.blip_processor.decode(out[0], skip_special_tokens=True)
+        Returns:
+            Список описаний в том же порядке
+        """
+        if not BLIP_AVAILABLE:
+            raise ImportError("BLIP модель не установлена")
+        
+        try:
+            return await self.caption_service.caption_batch(image_paths)
+        except Exception as e:
+            raise Exception(f"Ошибка генерации описаний: {str(e)}")
+    
+    async def should_send_to_paid_ocr(self, image_path: str) -> bool:
+        """
+        Проверяет через предфильтр, стоит ли отправлять изображение в платный OCR
+        
+        Args:
+            image_path: Путь к изображению
             
-            return caption
+        Returns:
+            False, если предфильтр включен и текста на изображении, скорее всего, нет
+        """
+        if self.config.text_prefilter == 'off':
+            return True
+        
+        from .text_detector import score_text_presence
+        
+        try:
+            # cv2.imread, Canny и морфология по полному размеру фото - вне event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                None, score_text_presence, image_path, self.config.text_prefilter_threshold
+            )
+        except Exception as e:
+            # Предфильтр не должен ломать OCR - при ошибке отправляем как раньше
+            logger.warning(f"Ошибка предфильтра текста для {image_path}: {e}")
+            return True
+        
+        if result.likely_text:
+            return True
+        
+        if self.config.text_prefilter == 'audit':
+            self._log_prefilter_audit(image_path, result)
+            return True
+        
+        logger.info(f"OCR пропущен для {image_path}: score={result.score} ниже порога")
+        return False
+    
+    @staticmethod
+    def _log_prefilter_audit(image_path: str, result) -> None:
+        """Режим audit: только логирует, что предфильтр пропустил бы изображение"""
+        logger.info(
+            f"[audit] OCR был бы пропущен для {image_path}: score={result.score}, "
+            f"строк={result.text_lines}, границы={result.edge_density}"
+        )
+        incr_span_attribute('ocr_prefilter_audit_skips')
+    
+    def _record(self, result: OCRResult) -> OCRResult:
+        """Учитывает, какая ступень каскада ответила (метрика, спан, статистика клиента)"""
+        self.tier_stats[result.tier] = self.tier_stats.get(result.tier, 0) + 1
+        OCR_CASCADE.labels(tier=result.tier, reason=result.reason or 'none').inc()
+        incr_span_attribute(f'ocr_tier_{result.tier}')
+        if result.escalated:
+            incr_span_attribute('ocr_escalations')
+        logger.info(
+            f"OCR ответил {result.tier} (уверенность: {result.confidence}, "
+            f"эскалация: {result.escalated}, причина: {result.reason})"
+        )
+        return result
+    
+    async def extract_text_cascade(self, image_path: str) -> OCRResult:
+        """
+        Каскадное извлечение текста: локальный движок, затем Yandex Vision
+        
+        В Yandex отправляются только изображения, где локальный движок дал низкую
+        уверенность или слишком мало текста, а также плотные листы характеристик,
+        которые локальный движок заведомо распознает плохо.
+        
+        Args:
+            image_path: Путь к изображению
             
+        Returns:
+            OCRResult с текстом, ответившей ступенью и уверенностью
+        """
+        from .text_detector import score_text_presence
+        
+        yandex_ready = bool(self.config.yandex_iam_token and self.config.yandex_folder_id)
+        
+        loop = asyncio.get_running_loop()
+        presence = None
+        try:
+            # Детектор (Canny и морфология) нагружает CPU - вне event loop, как и OCR
+            presence = await loop.run_in_executor(
+                None, score_text_presence, image_path, self.config.text_prefilter_threshold
+            )
         except Exception as e:
-            raise Exception(f"Ошибка генерации описания: {str(e)}")
+            logger.warning(f"Ошибка оценки текста для {image_path}: {e}")
+        
+        if presence is not None and not presence.likely_text:
+            if self.config.text_prefilter == 'on':
+                return self._record(OCRResult(text="", tier='skipped', reason='no_text'))
+            if self.config.text_prefilter == 'audit':
+                self._log_prefilter_audit(image_path, presence)
+        
+        # Плотный лист характеристик - сразу в Yandex, локальный проход был бы лишним
+        if (
+            yandex_ready and presence is not None and
+            presence.text_lines >= self.config.cascade_spec_sheet_lines
+        ):
+            text = await self.extract_text_yandex(image_path)
+            return self._record(OCRResult(
+                text=text, tier='yandex', escalated=True, reason='spec_sheet'
+            ))
+        
+        local = (
+            self.paddle_with_confidence
+            if self.config.cascade_local == 'paddle'
+            else self.tesseract_with_confidence
+        )
+        try:
+            # Локальный OCR нагружает CPU, поэтому выполняется вне event loop
+            text, confidence = await loop.run_in_executor(None, local, image_path)
+        except Exception as e:
+            logger.warning(f"Локальный OCR ({self.config.cascade_local}) не сработал: {e}")
+            if not yandex_ready:
+                raise
+            text = await self.extract_text_yandex(image_path)
+            return self._record(OCRResult(
+                text=text, tier='yandex', escalated=True, reason='local_error'
+            ))
+        
+        reason = None
+        if confidence < self.config.cascade_min_confidence:
+            reason = 'low_confidence'
+        elif len(text) < self.config.cascade_min_chars:
+            reason = 'low_yield'
+        
+        if reason is None or not yandex_ready:
+            return self._record(OCRResult(
+                text=text, tier=self.config.cascade_local, confidence=confidence, reason=reason
+            ))
+        
+        yandex_text = await self.extract_text_yandex(image_path)
+        if not yandex_text:
+            # Yandex не ответил - лучше слабый локальный результат, чем ничего
+            return self._record(OCRResult(
+                text=text, tier=self.config.cascade_local, confidence=confidence,
+                escalated=True, reason=f'{reason}_yandex_empty'
+            ))
+        return self._record(OCRResult(
+            text=yandex_text, tier='yandex', confidence=confidence,
+            escalated=True, reason=reason
+        ))
     
-    async def extract_text(self, image_path: str) -> str:
+    async def extract_text_result(self, image_path: str) -> OCRResult:
         """
-        Универсальный метод извлечения текста
-        Использует настроенный в конфигурации метод OCR
+        Извлечение текста настроенным методом OCR вместе с ответившей ступенью
+        
+        Результат возвращается вызывающему, а не хранится в клиенте: один клиент
+        обрабатывает изображения параллельно.
         
         Args:
             image_path: Путь к изображению
             
         Returns:
-            Извлеченный текст
+            OCRResult (для некаскадных методов confidence не заполняется)
         """
-        if self.config.use_yandex:
-            return await self.extract_text_yandex(image_path)
+        started = time.perf_counter()
+        if self.config.use_cascade:
+            result = await self.extract_text_cascade(image_path)
+        elif self.config.use_yandex:
+            if not await self.should_send_to_paid_ocr(image_path):
+                return OCRResult(text="", tier='skipped', reason='no_text')
+            result = OCRResult(text=await self.extract_text_yandex(image_path), tier='yandex')
         elif self.config.use_paddle:
-            return await self.extract_text_paddle(image_path)
+            result = OCRResult(text=await self.extract_text_paddle(image_path), tier='paddle')
         elif self.config.use_tesseract:
-            return await self.extract_text_tesseract(image_path)
+            result = OCRResult(text=await self.extract_text_tesseract(image_path), tier='tesseract')
         else:
             raise ValueError("Не выбран метод OCR в конфигурации")
+        
+        OCR_DURATION.labels(engine=result.tier).observe(time.perf_counter() - started)
+        return result
+    
+    async def extract_text(self, image_path: str) -> str:
+        """
+        Универсальный метод извлечения текста
+        Использует настроенный в конфигурации метод OCR
+        
+        Args:
+            image_path: Путь к изображению
+            
+        Returns:
+            Извлеченный текст
+        """
+        return (await self.extract_text_result(image_path)).text
     
     async def process_multiple_images(self, image_paths: List[str]) -> List[Dict[str, Any]]:
         """
@@ -325,21 +667,16 @@ class OCRClient:
         
         for image_path in image_paths:
             try:
+                ocr_result = await self.extract_text_result(image_path)
                 result = {
                     'image_path': image_path,
-                    'text': await self.extract_text(image_path),
+                    'text': ocr_result.text,
                     'success': True,
                     'error': None
                 }
-                
-                # Добавляем описание если включено
-                if self.config.use_blip:
-                    try:
-                        result['caption'] = await self.generate_image_caption(image_path)
-                    except Exception as e:
-                        result['caption'] = ""
-                        result['caption_error'] = str(e)
-                
+                if self.config.use_cascade:
+                    result['tier'] = ocr_result.tier
+                    result['confidence'] = ocr_result.confidence
             except Exception as e:
                 result = {
                     'image_path': image_path,
@@ -350,6 +687,20 @@ class OCRClient:
             
             results.append(result)
         
+        # Описания генерируем одним батчем для всех успешно обработанных изображений
+        if self.config.use_blip:
+            captioned = [result for result in results if result['success']]
+            try:
+                captions = await self.generate_image_captions(
+                    [result['image_path'] for result in captioned]
+                )
+                for result, caption in zip(captioned, captions):
+                    result['caption'] = caption
+            except Exception as e:
+                for result in captioned:
+                    result['caption'] = ""
+                    result['caption_error'] = str(e)
+        
         return results
     
     def health_check(self) -> Dict[str, Any]:
@@ -370,8 +721,15 @@ class OCRClient:
             'blip': BLIP_AVAILABLE and self.config.use_blip,
             'config': {
                 'language': self.config.language,
-                'preprocess_images': self.config.preprocess_images
-            }
+                'preprocess_images': self.config.preprocess_images,
+                'text_prefilter': self.config.text_prefilter,
+                'text_prefilter_threshold': self.config.text_prefilter_threshold,
+                'cascade': self.config.use_cascade,
+                'cascade_local': self.config.cascade_local,
+                'cascade_min_confidence': self.config.cascade_min_confidence,
+                'cascade_min_chars': self.config.cascade_min_chars
+            },
+            'tier_stats': dict(self.tier_stats)
         }
         
         return status
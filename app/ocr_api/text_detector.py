@@ -0,0 +1,113 @@
+"""
+Text Detector - быстрая оценка наличия текста на изображении
+
+Используется как предфильтр перед платным OCR: большинство фото в объявлениях -
+экстерьер автомобиля без полезного текста, и отправлять их в Yandex Vision
+бессмысленно. Оценка считается на уменьшенной копии изображения по двум
+признакам: плотность границ (Canny) и статистика связных компонент, похожих
+на строки текста (морфологический градиент + горизонтальное замыкание).
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+# cv2 и numpy импортируются при первой оценке: импорт пакета не тянет OpenCV
+
+
+@dataclass
+class TextPresenceResult:
+    """Результат оценки наличия текста на изображении"""
+    score: float
+    edge_density: float
+    text_lines: int
+    text_area_ratio: float
+    likely_text: bool
+
+
+def _load_downscaled_gray(image_path: str, max_side: int) -> Optional['np.ndarray']:
+    """Загружает изображение в градациях серого и уменьшает до max_side"""
+    import cv2
+
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+
+    height, width = img.shape[:2]
+    scale = max_side / float(max(height, width))
+    if scale < 1.0:
+        img = cv2.resize(
+            img,
+            (int(width * scale), int(height * scale)),
+            interpolation=cv2.INTER_AREA
+        )
+    return img
+
+
+def score_text_presence(
+    image_path: str,
+    threshold: float = 0.35,
+    max_side: int = 640
+) -> TextPresenceResult:
+    """
+    Оценивает вероятность наличия текста на изображении
+
+    Args:
+        image_path: Путь к изображению
+        threshold: Порог score, начиная с которого считаем, что текст есть
+        max_side: Размер большей стороны уменьшенной копии
+
+    Returns:
+        TextPresenceResult со score от 0 до 1
+    """
+    import cv2
+    import numpy as np
+
+    gray = _load_downscaled_gray(image_path, max_side)
+    if gray is None:
+        raise FileNotFoundError(f"Не удалось открыть изображение: {image_path}")
+
+    height, width = gray.shape[:2]
+    image_area = float(height * width)
+
+    # Плотность границ по всему кадру
+    edges = cv2.Canny(gray, 100, 200)
+    edge_density = float(np.count_nonzero(edges)) / image_area
+
+    # Кандидаты в строки текста: градиент -> бинаризация -> склейка символов
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, kernel)
+    _, binary = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    line_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1))
+    connected = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, line_kernel)
+
+    contours, _ = cv2.findContours(connected, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    min_line_height = max(4, int(height * 0.008))
+    max_line_height = max(min_line_height + 1, int(height * 0.1))
+    text_lines = 0
+    text_area = 0
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        if h < min_line_height or h > max_line_height or w < 2 * h:
+            continue
+        region = binary[y:y + h, x:x + w]
+        fill_ratio = float(np.count_nonzero(region)) / float(w * h)
+        if fill_ratio < 0.35:
+            continue
+        text_lines += 1
+        text_area += w * h
+
+    text_area_ratio = text_area / image_area
+
+    # Нормированная комбинация признаков: строки текста весят больше границ
+    line_component = min(1.0, text_lines / 6.0) * 0.5 + min(1.0, text_area_ratio / 0.05) * 0.3
+    edge_component = min(1.0, edge_density / 0.12) * 0.2
+    score = round(line_component + edge_component, 4)
+
+    return TextPresenceResult(
+        score=score,
+        edge_density=round(edge_density, 4),
+        text_lines=text_lines,
+        text_area_ratio=round(text_area_ratio, 4),
+        likely_text=score >= threshold
+    )
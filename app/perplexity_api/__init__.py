@@ -13,7 +13,8 @@ from .perplexity_client import PerplexityClient, PerplexityConfig
 from .text_formatter import (
     format_car_announcement,
     create_car_description_prompt,
-    extract_car_info_from_text
+    extract_car_info_from_text,
+    extract_car_info_batch
 )
 from .legacy_wrapper import PerplexityProcessor
 
@@ -30,6 +31,7 @@ __all__ = [
     'format_car_announcement',
     'create_car_description_prompt',
     'extract_car_info_from_text',
+    'extract_car_info_batch',
     'format_announcement',  # Короткий псевдоним
 ]
 
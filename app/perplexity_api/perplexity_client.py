@@ -3,14 +3,18 @@ Perplexity API Client - основной клиент для работы с Per
 Поддерживает различные модели, конфигурацию и обработку ошибок
 """
 
+import os
 import aiohttp
 import json
 import asyncio
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Optional, List, Any
 from datetime import datetime
 import logging
 
+from app.monitoring.metrics import record_api_error, record_rate_limited, record_perplexity_usage
+from app.monitoring.tracing import set_span_attribute, incr_span_attribute
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -18,7 +22,7 @@ class PerplexityConfig:
     """Конфигурация для Perplexity API клиента"""
     api_key: str
     model: str = 'sonar-pro'
-    base_url: str = 'https://api.perplexity.ai'
+    base_url: str = field(default_factory=lambda: os.getenv('PERPLEXITY_BASE_URL', 'https://api.perplexity.ai'))
     temperature: float = 0.2
     max_tokens: int = 1000
     timeout: int = 60
@@ -106,11 +110,19 @@ class PerplexityClient:
                     if response.status == 200:
                         result = await response.json()
                         logger.debug("Perplexity API response received successfully")
+                        record_perplexity_usage(result.get('usage'))
+                        set_span_attribute('http_status', 200)
+                        set_span_attribute('tokens', (result.get('usage') or {}).get('total_tokens'))
                         return result
                     
                     # Обработка различных ошибок
                     error_text = await response.text()
                     
+                    if response.status == 429:
+                        record_rate_limited('perplexity')
+                    else:
+                        record_api_error('perplexity', response.status)
+                    
                     if response.status == 401:
                         raise PerplexityAuthError("Неверный API ключ Perplexity")
                     elif response.status == 429:
@@ -118,6 +130,7 @@ class PerplexityClient:
                         if attempt < self.config.max_retries - 1:
                             wait_time = self.config.retry_delay * (2 ** attempt)
                             logger.warning(f"Rate limit hit, waiting {wait_time}s")
+                            incr_span_attribute('retries')
                             await asyncio.sleep(wait_time)
                             continue
                         raise PerplexityRateLimitError("Превышен лимит запросов Perplexity")
@@ -126,6 +139,7 @@ class PerplexityClient:
                         if attempt < self.config.max_retries - 1:
                             wait_time = self.config.retry_delay * (attempt + 1)
                             logger.warning(f"Server error {response.status}, retrying in {wait_time}s")
+                            incr_span_attribute('retries')
                             await asyncio.sleep(wait_time)
                             continue
                         raise PerplexityServerError(f"Ошибка сервера Perplexity: {response.status}")
@@ -133,9 +147,11 @@ class PerplexityClient:
                         raise PerplexityAPIError(f"Perplexity API error: {response.status} {error_text}")
                         
             except aiohttp.ClientError as e:
+                record_api_error('perplexity', 'network')
                 if attempt < self.config.max_retries - 1:
                     wait_time = self.config.retry_delay * (attempt + 1)
                     logger.warning(f"Network error, retrying in {wait_time}s: {e}")
+                    incr_span_attribute('retries')
                     await asyncio.sleep(wait_time)
                     continue
                 raise PerplexityNetworkError(f"Ошибка сети при обращении к Perplexity: {e}")
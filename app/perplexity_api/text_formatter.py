@@ -4,11 +4,15 @@ Text Formatter - форматирование текста и создание 
 """
 
 import re
-from typing import Dict, Optional, Tuple, List
-from dataclasses import dataclass
+import logging
+from typing import Dict, Optional, Tuple, List, Iterable
+from dataclasses import dataclass, replace
+from functools import lru_cache
 from datetime import datetime
 from app.utils.cbr_exchange_rate import get_cbr_usd_rate_with_markup
 
+logger = logging.getLogger(__name__)
+
 @dataclass
 class CarInfo:
     """Структура данных об автомобиле"""
@@ -27,18 +31,348 @@ class CarInfo:
     condition: Optional[str] = None
     custom_id: Optional[str] = None
 
+# Расширенный список марок с вариантами написания
+# Порядок важен: при поиске по всему тексту побеждает марка, стоящая выше
+BRANDS_MAPPING = {
+    # Китайские марки
+    'geely': ['geely', 'джили', 'гили'],
+    'chery': ['chery', 'чери', 'черри'],
+    'byd': ['byd', 'бид', 'би-ай-ди'],
+    'haval': ['haval', 'хавал', 'хаваль'],
+    'great wall': ['great wall', 'грейт волл', 'великая стена'],
+    'changan': ['changan', 'чанган', 'чангань'],
+    'dongfeng': ['dongfeng', 'донгфенг'],
+    'faw': ['faw', 'фав'],
+    'jac': ['jac', 'жак', 'джак'],
+    'lifan': ['lifan', 'лифан'],
+    'zotye': ['zotye', 'зотье'],
+    'brilliance': ['brilliance', 'бриллианс'],
+    'foton': ['foton', 'фотон'],
+    'maxus': ['maxus', 'максус'],
+    'tank': ['tank', 'танк'],
+    'ora': ['ora', 'ора'],
+    'nio': ['nio', 'нио'],
+    'xpeng': ['xpeng', 'икспенг'],
+    'hongqi': ['hongqi', 'хунци'],
+    'gac': ['gac', 'гак'],
+    'roewe': ['roewe', 'роеве'],
+    'mg': ['mg', 'мг'],
+    'baojun': ['baojun', 'баоцзюнь'],
+    'wuling': ['wuling', 'вулинг'],
+    'lynk': ['lynk', 'линк'],
+    'lixiang': ['lixiang', 'лисян', 'лисянг', 'li xiang'],
+    # Составные европейские/премиум
+    'mercedes-benz': ['mercedes-benz', 'мерседес-бенц', 'mercedes benz'],
+    'land rover': ['land rover', 'лэнд ровер', 'ленд ровер'],
+    'range rover': ['range rover', 'рэндж ровер', 'рейндж ровер'],
+    'rolls-royce': ['rolls-royce', 'роллс-ройс', 'rolls royce'],
+    'alfa romeo': ['alfa romeo', 'альфа ромео'],
+    'aston martin': ['aston martin', 'астон мартин'],
+    'mini cooper': ['mini cooper', 'мини купер'],
+    # Европейские
+    'audi': ['audi', 'ауди'],
+    'bmw': ['bmw', 'бмв'],
+    'volkswagen': ['volkswagen', 'фольксваген', 'vw'],
+    'opel': ['opel', 'опель'],
+    'peugeot': ['peugeot', 'пежо'],
+    'renault': ['renault', 'рено'],
+    'skoda': ['skoda', 'шкода'],
+    'citroen': ['citroen', 'ситроен', 'ситроэн'],
+    'fiat': ['fiat', 'фиат'],
+    'seat': ['seat', 'сеат'],
+    'volvo': ['volvo', 'вольво'],
+    'saab': ['saab', 'сааб'],
+    'smart': ['smart', 'смарт'],
+    'dacia': ['dacia', 'дачия', 'дача'],
+    'lancia': ['lancia', 'ланча', 'лансия'],
+    'lotus': ['lotus', 'лотус'],
+    'porsche': ['porsche', 'порше'],
+    'jaguar': ['jaguar', 'ягуар'],
+    'bentley': ['bentley', 'бентли'],
+    'bugatti': ['bugatti', 'бугатти'],
+    'maserati': ['maserati', 'масерати'],
+    'ferrari': ['ferrari', 'феррари'],
+    'lamborghini': ['lamborghini', 'ламборгини'],
+    'mini': ['mini', 'мини'],
+    # Японские
+    'toyota': ['toyota', 'тойота'],
+    'honda': ['honda', 'хонда'],
+    'nissan': ['nissan', 'ниссан'],
+    'mazda': ['mazda', 'мазда'],
+    'mitsubishi': ['mitsubishi', 'митсубиси', 'мицубиси'],
+    'subaru': ['subaru', 'субару'],
+    'suzuki': ['suzuki', 'сузуки'],
+    'lexus': ['lexus', 'лексус'],
+    'infiniti': ['infiniti', 'инфинити'],
+    'acura': ['acura', 'акура'],
+    'daihatsu': ['daihatsu', 'дайхатсу'],
+    'isuzu': ['isuzu', 'исузу'],
+    # Корейские
+    'hyundai': ['hyundai', 'хюндай', 'хендай'],
+    'kia': ['kia', 'киа'],
+    'ssangyong': ['ssangyong', 'ссангйонг', 'сангёнг'],
+    'genesis': ['genesis', 'генезис'],
+    'daewoo': ['daewoo', 'дэу', 'деу'],
+    # Американские
+    'ford': ['ford', 'форд'],
+    'chevrolet': ['chevrolet', 'шевроле'],
+    'cadillac': ['cadillac', 'кадиллак'],
+    'chrysler': ['chrysler', 'крайслер'],
+    'dodge': ['dodge', 'додж'],
+    'jeep': ['jeep', 'джип'],
+    'lincoln': ['lincoln', 'линкольн'],
+    'buick': ['buick', 'бьюик'],
+    'gmc': ['gmc', 'джиэмси'],
+    'hummer': ['hummer', 'хаммер'],
+    'tesla': ['tesla', 'тесла'],
+    'ram': ['ram', 'рам'],
+    # Российские
+    'lada': ['lada', 'ваз', 'лада'],
+    'uaz': ['uaz', 'уаз'],
+    'gaz': ['gaz', 'газ'],
+    'volga': ['volga', 'волга'],
+    'moskvich': ['moskvich', 'москвич'],
+    'zaz': ['zaz', 'заз'],
+    'luaz': ['luaz', 'луаз'],
+    # Прочие
+    'mercedes': ['mercedes'],  # Одиночный mercedes в конце списка
+    # Экзотика, редкие, нишевые, новые электромобили и др.
+    'aixam': ['aixam', 'айксам'],
+    'ariel': ['ariel', 'ариэль'],
+    'baic': ['baic', 'байк'],
+    'baw': ['baw', 'бав'],
+    'belgee': ['belgee', 'белджи', 'белджи'],
+    'borgward': ['borgward', 'боргвард'],
+    'brabus': ['brabus', 'брабус'],
+    'bufori': ['bufori', 'буфори'],
+    'byton': ['byton', 'байтон'],
+    'changhe': ['changhe', 'чанхе'],
+    'datsun': ['datsun', 'датсун'],
+    'derways': ['derways', 'дервейс'],
+    'dfm': ['dfm', 'дфм'],
+    'dr': ['dr', 'др'],
+    'ds': ['ds', 'дс'],
+    'exeed': ['exeed', 'эксид'],
+    'fisker': ['fisker', 'фискер'],
+    'haima': ['haima', 'хайма'],
+    'hino': ['hino', 'хино'],
+    'iran khodro': ['iran khodro', 'иран ходро'],
+    'jetour': ['jetour', 'жетур'],
+    'jmc': ['jmc', 'джмс'],
+    'kamaz': ['kamaz', 'камаз'],
+    'king long': ['king long', 'кинг лонг'],
+    'landwind': ['landwind', 'лэндвинд'],
+    'leapmotor': ['leapmotor', 'липмотор'],
+    'mahindra': ['mahindra', 'махиндра'],
+    'maruti': ['maruti', 'марути'],
+    'maybach': ['maybach', 'майбах'],
+    'microcar': ['microcar', 'микрокар'],
+    'perodua': ['perodua', 'перодуа'],
+    'proton': ['proton', 'протон'],
+    'ravon': ['ravon', 'равон'],
+    'saipa': ['saipa', 'сайпа'],
+    'scion': ['scion', 'сайон'],
+    'shineray': ['shineray', 'шайнерей'],
+    'tata': ['tata', 'тата'],
+    'vortex': ['vortex', 'вортекс'],
+    'weling': ['weling', 'велинг'],
+    'zx': ['zx', 'зх'],
+    # Электромобили и новые бренды
+    'neta': ['neta', 'нета'],
+    'seres': ['seres', 'серес'],
+    'voyah': ['voyah', 'воя'],
+    'skywell': ['skywell', 'скайвелл'],
+    'weltmeister': ['weltmeister', 'вельтмайстер'],
+    'wm motor': ['wm motor', 'вм мотор'],
+    'zeekr': ['zeekr', 'зикр'],
+    # Кастом/тюнинг
+    'mansory': ['mansory', 'мансори'],
+    'hamann': ['hamann', 'хаман'],
+    'g-power': ['g-power', 'джи-пауэр', 'g power'],
+}
+
+# Служебные слова, которые не могут быть частью модели
+SERVICE_WORDS_MODEL = {
+    'год', 'тип', 'комплектация', 'бизнес', 'класс', 'new', 'новый', 'без', 'учета',
+    'таможенных', 'таможни', 'авто', 'машина', 'car', 'auto'
+}
+
+# Служебные слова, которые не могут быть маркой (этап 2)
+SERVICE_WORDS_BRAND = {'продам', 'продается', 'авто', 'автомобиль', 'машина', 'цена', 'год', 'состояние'}
+
+# Стоп-слова экстренного fallback (этап 4)
+SERVICE_WORDS_FALLBACK = {
+    'продам', 'продается', 'авто', 'автомобиль', 'машина', 'цена', 'год', 'состояние', 'пробег',
+    'минск', 'минске', 'без', 'в', 'на', 'купить', 'продажа', 'новый', 'б/у', 'комплектация',
+    'цвет', 'документы', 'объявление', 'или', 'и', 'с', 'по', 'за', 'от', 'до', 'новая', 'новое',
+    'новые', 'новых', 'нового', 'новой', 'новым', 'новыми',
+}
+
+TRANSMISSION_KEYWORDS = {
+    'автомат': ['автомат', 'automatic', 'акпп', 'auto'],
+    'механика': ['механика', 'manual', 'мкпп', 'мех'],
+    'вариатор': ['вариатор', 'cvt'],
+    'робот': ['робот', 'dsg', 'amt']
+}
+
+DRIVE_KEYWORDS = {
+    'полный': ['полный', 'awd', '4wd', 'quattro'],
+    'передний': ['передний', 'fwd', 'front'],
+    'задний': ['задний', 'rwd', 'rear']
+}
+
+# Заранее скомпилированные паттерны
+MODEL_TAIL_YEAR_PATTERN = re.compile(r'\s*(19|20)\d{2}.*')
+MODEL_JUNK_PATTERN = re.compile(r'[^\w\s-]')
+YEAR_WORD_PATTERN = re.compile(r'^(19|20)\d{2}$')
+FALLBACK_CLEAN_PATTERN = re.compile(r'[^-а-яА-ЯёЁ\s-]')
+BRAND_MODEL_PATTERNS = [
+    re.compile(r'^([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+?)\s*(\d{4})'),  # Марка Модель Год
+    re.compile(r'^([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+)'),  # Марка Модель
+    re.compile(r'([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+?)\s*(\d{4})'),  # Марка Модель Год (в любом месте)
+]
+YEAR_PATTERN = re.compile(r'\b(19[8-9]\d|20[0-2]\d)\b')
+# Паттерны цены и пробега с обязательным литералом: если его нет в тексте,
+# паттерн заведомо не совпадет, и дорогой поиск с цифр можно пропустить
+PRICE_PATTERNS = [
+    (re.compile(r'(\d{1,3}(?:\s\d{3})*)\s*\$', re.IGNORECASE), '$'),  # 40 400$ (с пробелами)
+    (re.compile(r'\$(\d{1,3}(?:,\d{3})*)', re.IGNORECASE), '$'),  # $25,000
+    (re.compile(r'(\d{1,3}(?:,\d{3})*)\s*\$', re.IGNORECASE), '$'),  # 25,000$
+    (re.compile(r'(\d{1,3}(?:,\d{3})*)\s*долл', re.IGNORECASE), None),  # 25000 долл
+    (re.compile(r'(\d+)\s*тыс.*долл', re.IGNORECASE), None),  # 25 тыс долл
+    (re.compile(r'price.*\$(\d{1,3}(?:,\d{3})*)', re.IGNORECASE), '$'),  # price: $25,000
+    (re.compile(r'цена.*(\d{1,3}(?:,\d{3})*)\s*\$', re.IGNORECASE), '$'),  # цена 25,000$
+]
+MILEAGE_PATTERNS = [
+    (re.compile(r'(\d{1,3}(?:,\d{3})*)\s*км'), 'км'),  # 150,000 км
+    (re.compile(r'пробег.*?(\d{1,3}(?:,\d{3})*)'), 'пробег'),  # пробег: 150000
+    (re.compile(r'(\d+)\s*тыс.*км'), 'км'),  # 150 тыс км
+    (re.compile(r'mileage.*?(\d{1,3}(?:,\d{3})*)'), 'mileage'),  # mileage: 150000
+]
+ENGINE_PATTERNS = [
+    re.compile(r'(\d\.?\d?)\s*[лl]'),  # 2.0л или 2л
+    re.compile(r'двигат.*?(\d\.?\d?)\s*[лl]'),  # двигатель 2.0л
+    re.compile(r'engine.*?(\d\.?\d?)\s*[lL]'),  # engine 2.0L
+]
+
+
+def _compile_variant_matcher(variants: List[str], word_boundaries: bool) -> re.Pattern:
+    """
+    Собирает все варианты написания в одно регулярное выражение
+
+    Альтернативы сгруппированы по первому символу, поэтому в каждой позиции
+    проверяется только одна группа. Поиск идет через lookahead, чтобы находить
+    и пересекающиеся вхождения; внутри группы сохраняется порядок вариантов,
+    так что в каждой позиции совпадает вариант с наименьшим приоритетом.
+
+    Args:
+        variants: Варианты в порядке приоритета
+        word_boundaries: Требовать границы слова с обеих сторон
+
+    Returns:
+        Скомпилированный паттерн с одной группой - найденным вариантом
+    """
+    groups: Dict[str, List[str]] = {}
+    for variant in variants:
+        groups.setdefault(variant[0], []).append(re.escape(variant[1:]))
+
+    alternation = '|'.join(
+        f"{re.escape(first)}(?:{'|'.join(tails)})" for first, tails in groups.items()
+    )
+    if word_boundaries:
+        return re.compile(rf'\b(?=({alternation})\b)')
+    return re.compile(rf'(?=({alternation}))')
+
+
+@lru_cache(maxsize=None)
+def _brand_index():
+    """
+    Индексы вариантов и скомпилированные матчеры для всех этапов поиска марки
+
+    Строятся при первом поиске марки, а не при импорте: компиляция матчеров
+    занимает ~90 мс и не нужна процессам, которые марку не ищут.
+    """
+    # Этап 1: сначала марки из нескольких слов (стабильная сортировка по числу слов)
+    sorted_brands = sorted(
+        BRANDS_MAPPING.items(),
+        key=lambda item: -max(len(v.split()) for v in item[1])
+    )
+    first_line_rank: Dict[str, int] = {}
+    first_line_clean_rank: Dict[str, int] = {}
+    for rank, (_, variants) in enumerate(sorted_brands):
+        for variant in variants:
+            first_line_rank.setdefault(variant, rank)
+            first_line_clean_rank.setdefault(variant.replace('-', ' ').lower(), rank)
+
+    # Этап 3: порядок марок и вариантов как в BRANDS_MAPPING
+    text_rank: Dict[str, Tuple[int, int]] = {}
+    text_brands = list(BRANDS_MAPPING)
+    for rank, variants in enumerate(BRANDS_MAPPING.values()):
+        for index, variant in enumerate(variants):
+            text_rank.setdefault(variant, (rank, index))
+
+    return {
+        'sorted_brands': [brand for brand, _ in sorted_brands],
+        'first_line_rank': first_line_rank,
+        'first_line_clean_rank': first_line_clean_rank,
+        'first_line': _compile_variant_matcher(list(first_line_rank), word_boundaries=False),
+        'first_line_clean': _compile_variant_matcher(list(first_line_clean_rank), word_boundaries=False),
+        'text_brands': text_brands,
+        'text_rank': text_rank,
+        'text': _compile_variant_matcher(list(text_rank), word_boundaries=True),
+    }
+
+
+def _find_brand_in_first_line(first_line_lower: str) -> Optional[str]:
+    """Марка с наивысшим приоритетом, любой вариант которой входит в первую строку"""
+    index = _brand_index()
+    best = None
+    for matcher, ranks, line in (
+        (index['first_line'], index['first_line_rank'], first_line_lower),
+        (index['first_line_clean'], index['first_line_clean_rank'],
+         first_line_lower.replace('-', ' ')),
+    ):
+        for match in matcher.finditer(line):
+            rank = ranks[match.group(1)]
+            if best is None or rank < best:
+                best = rank
+    if best is None:
+        return None
+    return index['sorted_brands'][best]
+
+
+def _find_brand_in_text(text_lower: str) -> Optional[Tuple[str, re.Match]]:
+    """Первая по порядку BRANDS_MAPPING марка, найденная в тексте как отдельное слово"""
+    index = _brand_index()
+    ranks = index['text_rank']
+    best_key = None
+    best_match = None
+    for match in index['text'].finditer(text_lower):
+        key = ranks[match.group(1)]
+        if best_key is None or key < best_key:
+            best_key = key
+            best_match = match
+    if best_match is None:
+        return None
+    return index['text_brands'][best_key[0]], best_match
+
+
 def extract_car_info_from_text(text: str) -> CarInfo:
     """
     Извлекает информацию об автомобиле из текста объявления
     Многоэтапная система с несколькими уровнями fallback
     
+    Отладочный вывод этапов пишется в logger на уровне DEBUG.
+    
     Args:
         text: Текст объявления
         
     Returns:
         CarInfo с извлеченными данными
     """
-    print(f"🔍 ЭТАП 0: Входной текст ({len(text)} символов):\n{text[:300]}...")
+    debug = logger.isEnabledFor(logging.DEBUG)
+    if debug:
+        logger.debug("ЭТАП 0: Входной текст (%d символов):\n%s...", len(text), text[:300])
     
     car_info = CarInfo()
     text_lower = text.lower()
@@ -47,200 +381,15 @@ def extract_car_info_from_text(text: str) -> CarInfo:
     lines = [line.strip() for line in text.strip().split('\n') if line.strip()]
     first_line = lines[0] if lines else ""
     
-    print(f"🔍 ЭТАП 1: Анализ первой строки: '{first_line}'")
-    
-    # Расширенный список марок с вариантами написания
-    brands_mapping = {
-        # Китайские марки
-        'geely': ['geely', 'джили', 'гили'],
-        'chery': ['chery', 'чери', 'черри'],
-        'byd': ['byd', 'бид', 'би-ай-ди'],
-        'haval': ['haval', 'хавал', 'хаваль'],
-        'great wall': ['great wall', 'грейт волл', 'великая стена'],
-        'changan': ['changan', 'чанган', 'чангань'],
-        'dongfeng': ['dongfeng', 'донгфенг'],
-        'faw': ['faw', 'фав'],
-        'jac': ['jac', 'жак', 'джак'],
-        'lifan': ['lifan', 'лифан'],
-        'zotye': ['zotye', 'зотье'],
-        'brilliance': ['brilliance', 'бриллианс'],
-        'foton': ['foton', 'фотон'],
-        'maxus': ['maxus', 'максус'],
-        'tank': ['tank', 'танк'],
-        'ora': ['ora', 'ора'],
-        'nio': ['nio', 'нио'],
-        'xpeng': ['xpeng', 'икспенг'],
-        'hongqi': ['hongqi', 'хунци'],
-        'gac': ['gac', 'гак'],
-        'roewe': ['roewe', 'роеве'],
-        'mg': ['mg', 'мг'],
-        'baojun': ['baojun', 'баоцзюнь'],
-        'wuling': ['wuling', 'вулинг'],
-        'lynk': ['lynk', 'линк'],
-        'lixiang': ['lixiang', 'лисян', 'лисянг', 'li xiang'],
-        # Составные европейские/премиум
-        'mercedes-benz': ['mercedes-benz', 'мерседес-бенц', 'mercedes benz'],
-        'land rover': ['land rover', 'лэнд ровер', 'ленд ровер'],
-        'range rover': ['range rover', 'рэндж ровер', 'рейндж ровер'],
-        'rolls-royce': ['rolls-royce', 'роллс-ройс', 'rolls royce'],
-        'alfa romeo': ['alfa romeo', 'альфа ромео'],
-        'aston martin': ['aston martin', 'астон мартин'],
-        'mini cooper': ['mini cooper', 'мини купер'],
-        # Европейские
-        'audi': ['audi', 'ауди'],
-        'bmw': ['bmw', 'бмв'],
-        'volkswagen': ['volkswagen', 'фольксваген', 'vw'],
-        'opel': ['opel', 'опель'],
-        'peugeot': ['peugeot', 'пежо'],
-        'renault': ['renault', 'рено'],
-        'skoda': ['skoda', 'шкода'],
-        'citroen': ['citroen', 'ситроен', 'ситроэн'],
-        'fiat': ['fiat', 'фиат'],
-        'seat': ['seat', 'сеат'],
-        'volvo': ['volvo', 'вольво'],
-        'saab': ['saab', 'сааб'],
-        'smart': ['smart', 'смарт'],
-        'dacia': ['dacia', 'дачия', 'дача'],
-        'lancia': ['lancia', 'ланча', 'лансия'],
-        'lotus': ['lotus', 'лотус'],
-        'porsche': ['porsche', 'порше'],
-        'jaguar': ['jaguar', 'ягуар'],
-        'bentley': ['bentley', 'бентли'],
-        'bugatti': ['bugatti', 'бугатти'],
-        'maserati': ['maserati', 'масерати'],
-        'ferrari': ['ferrari', 'феррари'],
-        'lamborghini': ['lamborghini', 'ламборгини'],
-        'mini': ['mini', 'мини'],
-        # Японские
-        'toyota': ['toyota', 'тойота'],
-        'honda': ['honda', 'хонда'],
-        'nissan': ['nissan', 'ниссан'],
-        'mazda': ['mazda', 'мазда'],
-        'mitsubishi': ['mitsubishi', 'митсубиси', 'мицубиси'],
-        'subaru': ['subaru', 'субару'],
-        'suzuki': ['suzuki', 'сузуки'],
-        'lexus': ['lexus', 'лексус'],
-        'infiniti': ['infiniti', 'инфинити'],
-        'acura': ['acura', 'акура'],
-        'daihatsu': ['daihatsu', 'дайхатсу'],
-        'isuzu': ['isuzu', 'исузу'],
-        # Корейские
-        'hyundai': ['hyundai', 'хюндай', 'хендай'],
-        'kia': ['kia', 'киа'],
-        'ssangyong': ['ssangyong', 'ссангйонг', 'сангёнг'],
-        'genesis': ['genesis', 'генезис'],
-        'daewoo': ['daewoo', 'дэу', 'деу'],
-        # Американские
-        'ford': ['ford', 'форд'],
-        'chevrolet': ['chevrolet', 'шевроле'],
-        'cadillac': ['cadillac', 'кадиллак'],
-        'chrysler': ['chrysler', 'крайслер'],
-        'dodge': ['dodge', 'додж'],
-        'jeep': ['jeep', 'джип'],
-        'lincoln': ['lincoln', 'линкольн'],
-        'buick': ['buick', 'бьюик'],
-        'gmc': ['gmc', 'джиэмси'],
-        'hummer': ['hummer', 'хаммер'],
-        'tesla': ['tesla', 'тесла'],
-        'ram': ['ram', 'рам'],
-        # Российские
-        'lada': ['lada', 'ваз', 'лада'],
-        'uaz': ['uaz', 'уаз'],
-        'gaz': ['gaz', 'газ'],
-        'volga': ['volga', 'волга'],
-        'moskvich': ['moskvich', 'москвич'],
-        'zaz': ['zaz', 'заз'],
-        'luaz': ['luaz', 'луаз'],
-        # Прочие
-        'mercedes': ['mercedes'],  # Одиночный mercedes в конце списка
-        # Экзотика, редкие, нишевые, новые электромобили и др.
-        'aixam': ['aixam', 'айксам'],
-        'ariel': ['ariel', 'ариэль'],
-        'baic': ['baic', 'байк'],
-        'baw': ['baw', 'бав'],
-        'belgee': ['belgee', 'белджи', 'белджи'],
-        'borgward': ['borgward', 'боргвард'],
-        'brabus': ['brabus', 'брабус'],
-        'bufori': ['bufori', 'буфори'],
-        'byton': ['byton', 'байтон'],
-        'changhe': ['changhe', 'чанхе'],
-        'datsun': ['datsun', 'датсун'],
-        'derways': ['derways', 'дервейс'],
-        'dfm': ['dfm', 'дфм'],
-        'dr': ['dr', 'др'],
-        'ds': ['ds', 'дс'],
-        'exeed': ['exeed', 'эксид'],
-        'fisker': ['fisker', 'фискер'],
-        'haima': ['haima', 'хайма'],
-        'hino': ['hino', 'хино'],
-        'iran khodro': ['iran khodro', 'иран ходро'],
-        'jetour': ['jetour', 'жетур'],
-        'jmc': ['jmc', 'джмс'],
-        'kamaz': ['kamaz', 'камаз'],
-        'king long': ['king long', 'кинг лонг'],
-        'landwind': ['landwind', 'лэндвинд'],
-        'leapmotor': ['leapmotor', 'липмотор'],
-        'mahindra': ['mahindra', 'махиндра'],
-        'maruti': ['maruti', 'марути'],
-        'maybach': ['maybach', 'майбах'],
-        'microcar': ['microcar', 'микрокар'],
-        'moskvich': ['moskvich', 'москвич'],
-        'nio': ['nio', 'нио'],
-        'perodua': ['perodua', 'перодуа'],
-        'proton': ['proton', 'протон'],
-        'ravon': ['ravon', 'равон'],
-        'saipa': ['saipa', 'сайпа'],
-        'scion': ['scion', 'сайон'],
-        'shineray': ['shineray', 'шайнерей'],
-        'ssangyong': ['ssangyong', 'ссангйонг', 'сангёнг'],
-        'tata': ['tata', 'тата'],
-        'vortex': ['vortex', 'вортекс'],
-        'weling': ['weling', 'велинг'],
-        'zotye': ['zotye', 'зотье'],
-        'zx': ['zx', 'зх'],
-        # Электромобили и новые бренды
-        'neta': ['neta', 'нета'],
-        'seres': ['seres', 'серес'],
-        'voyah': ['voyah', 'воя'],
-        'skywell': ['skywell', 'скайвелл'],
-        'weltmeister': ['weltmeister', 'вельтмайстер'],
-        'wm motor': ['wm motor', 'вм мотор'],
-        'zeekr': ['zeekr', 'зикр'],
-        # Индийские и малайзийские
-        'perodua': ['perodua', 'перодуа'],
-        # Редкие европейские
-        'dr': ['dr', 'др'],
-        'ds': ['ds', 'дс'],
-        'belgee': ['belgee', 'белджи', 'белджи'],
-        # Кастом/тюнинг
-        'mansory': ['mansory', 'мансори'],
-        'hamann': ['hamann', 'хаман'],
-        'g-power': ['g-power', 'джи-пауэр', 'g power'],
-    }
-    
     # ЭТАП 1: Поиск марки в первой строке (сначала составные марки)
-    found_brand = None
-    brand_variants = None
     first_line_lower = first_line.lower()
-    # Составляем список составных марок (2-3 слова)
-    sorted_brands = sorted(brands_mapping.items(), key=lambda x: -max(len(v.split()) for v in x[1]))
-    for brand_key, variants in sorted_brands:
-        for variant in variants:
-            variant_clean = variant.replace('-', ' ').lower()
-            # Ищем как есть и без дефиса
-            if variant in first_line_lower or variant_clean in first_line_lower.replace('-', ' '):
-                found_brand = brand_key
-                brand_variants = variants
-                print(f"✅ ЭТАП 1: Найдена марка '{brand_key}' (вариант '{variant}') в первой строке")
-                break
-        if found_brand:
-            break
+    found_brand = _find_brand_in_first_line(first_line_lower)
     # Если найдена марка в первой строке, извлекаем модель
     if found_brand:
         # Ищем позицию марки
         brand_pos = -1
         used_variant = None
-        for variant in brand_variants:
+        for variant in BRANDS_MAPPING[found_brand]:
             pos = first_line_lower.find(variant)
             if pos == -1:
                 # Пробуем без дефиса
@@ -253,128 +402,86 @@ def extract_car_info_from_text(text: str) -> CarInfo:
             # Извлекаем часть после марки
             after_brand = first_line[brand_pos + len(used_variant):].strip()
             # Убираем год если есть
-            model_clean = re.sub(r'\s*(19|20)\d{2}.*', '', after_brand).strip()
+            model_clean = MODEL_TAIL_YEAR_PATTERN.sub('', after_brand).strip()
             # Убираем лишние символы
-            model_clean = re.sub(r'[^\w\s-]', '', model_clean).strip()
+            model_clean = MODEL_JUNK_PATTERN.sub('', model_clean).strip()
             # Убираем служебные слова из модели
-            service_words_model = {'год', 'тип', 'комплектация', 'бизнес', 'класс', 'тип', 'new', 'новый', 'без', 'учета', 'таможенных', 'таможни', 'авто', 'машина', 'car', 'auto'}
-            model_words = [w for w in model_clean.split() if w.lower() not in service_words_model]
+            model_words = [w for w in model_clean.split() if w.lower() not in SERVICE_WORDS_MODEL]
             car_info.brand = found_brand.title()
             car_info.model = ' '.join(model_words) if model_words else "Неизвестная модель"
-            print(f"✅ ЭТАП 1: Марка={car_info.brand}, Модель={car_info.model}")
+            if debug:
+                logger.debug("ЭТАП 1: Марка=%s, Модель=%s", car_info.brand, car_info.model)
     
     # ЭТАП 2: Если не найдено - поиск по паттернам
     if not car_info.brand:
-        print("🔍 ЭТАП 2: Поиск через регулярные выражения")
-        
-        patterns = [
-            r'^([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+?)\s*(\d{4})',  # Марка Модель Год
-            r'^([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+)',  # Марка Модель
-            r'([A-Za-zА-Яа-я-]+)\s+([A-Za-zА-Яа-я0-9\s-]+?)\s*(\d{4})',  # Марка Модель Год (в любом месте)
-        ]
-        
-        for i, pattern in enumerate(patterns):
-            match = re.search(pattern, first_line)
+        for i, pattern in enumerate(BRAND_MODEL_PATTERNS):
+            match = pattern.search(first_line)
             if match:
                 potential_brand = match.group(1).strip()
                 potential_model = match.group(2).strip()
                 
                 # Проверяем, что это не служебные слова
-                service_words = ['продам', 'продается', 'авто', 'автомобиль', 'машина', 'цена', 'год', 'состояние']
-                if potential_brand.lower() not in service_words and len(potential_brand) > 2:
+                if potential_brand.lower() not in SERVICE_WORDS_BRAND and len(potential_brand) > 2:
                     car_info.brand = potential_brand.title()
                     car_info.model = potential_model
-                    print(f"✅ ЭТАП 2.{i+1}: Найдено через паттерн - Марка={car_info.brand}, Модель={car_info.model}")
+                    if debug:
+                        logger.debug(
+                            "ЭТАП 2.%d: Найдено через паттерн - Марка=%s, Модель=%s",
+                            i + 1, car_info.brand, car_info.model
+                        )
                     break
     
     # ЭТАП 3: Поиск марки по всему тексту
     if not car_info.brand:
-        print("🔍 ЭТАП 3: Поиск марки по всему тексту")
-        text_lower = text.lower()
-        service_words_model = {'год', 'тип', 'комплектация', 'бизнес', 'класс', 'тип', 'new', 'новый', 'без', 'учета', 'таможенных', 'таможни', 'авто', 'машина', 'car', 'auto'}
-        for brand_key, variants in brands_mapping.items():
-            for variant in variants:
-                pattern = rf'\b{re.escape(variant)}\b'
-                match = re.search(pattern, text_lower)
-                if match:
-                    car_info.brand = brand_key.title()
-                    # Пытаемся найти модель рядом
-                    after = text[match.end():].strip().split()
-                    model_words = []
-                    for w in after:
-                        if re.match(r'^(19|20)\d{2}$', w): break
-                        if w.lower() in service_words_model: break
-                        model_words.append(w)
-                        if len(model_words) >= 2: break
-                    car_info.model = ' '.join(model_words) if model_words else 'Неизвестная модель'
-                    print(f"✅ ЭТАП 3: Найдено в тексте - Марка={car_info.brand}, Модель={car_info.model}")
-                    break
-            if car_info.brand:
-                break
+        found = _find_brand_in_text(text_lower)
+        if found:
+            brand_key, match = found
+            car_info.brand = brand_key.title()
+            # Пытаемся найти модель рядом
+            after = text[match.end(1):].strip().split()
+            model_words = []
+            for w in after:
+                if YEAR_WORD_PATTERN.match(w): break
+                if w.lower() in SERVICE_WORDS_MODEL: break
+                model_words.append(w)
+                if len(model_words) >= 2: break
+            car_info.model = ' '.join(model_words) if model_words else 'Неизвестная модель'
+            if debug:
+                logger.debug("ЭТАП 3: Найдено в тексте - Марка=%s, Модель=%s", car_info.brand, car_info.model)
     
     # ЭТАП 4: Экстренный fallback - берем первые подходящие слова
     if not car_info.brand:
-        print("🔍 ЭТАП 4: Экстренный fallback")
         # Очищаем первую строку от мусора
-        clean_line = re.sub(r'[^-а-яА-ЯёЁ\s-]', ' ', first_line)
+        clean_line = FALLBACK_CLEAN_PATTERN.sub(' ', first_line)
         words = [w for w in clean_line.split() if w.isalpha() and len(w) > 2]
-        # Расширенный список стоп-слов
-        service_words = {
-            'продам', 'продается', 'авто', 'автомобиль', 'машина', 'цена', 'год', 'состояние', 'пробег',
-            'минск', 'минске', 'без', 'в', 'на', 'купить', 'продажа', 'новый', 'б/у', 'комплектация',
-            'цвет', 'документы', 'объявление', 'или', 'и', 'с', 'по', 'за', 'от', 'до', 'новая', 'новое',
-            'новые', 'новых', 'нового', 'новой', 'новым', 'новыми', 'новых', 'новое', 'новая', 'новый',
-            'новое', 'новая', 'новый', 'новое', 'новая', 'новый', 'новое', 'новая', 'новый', 'новое',
-        }
-        filtered_words = [w for w in words if w.lower() not in service_words]
+        filtered_words = [w for w in words if w.lower() not in SERVICE_WORDS_FALLBACK]
         if len(filtered_words) >= 2:
             car_info.brand = filtered_words[0].title()
             car_info.model = filtered_words[1].title()
-            print(f"✅ ЭТАП 4: Fallback - Марка={car_info.brand}, Модель={car_info.model}")
         elif len(filtered_words) == 1:
             car_info.brand = filtered_words[0].title()
             car_info.model = "Неизвестная модель"
-            print(f"✅ ЭТАП 4: Fallback - только марка={car_info.brand}")
         else:
             car_info.brand = "Автомобиль"
             car_info.model = "Неизвестная модель"
-            print(f"✅ ЭТАП 4: Fallback - нет валидных слов, возвращаю дефолт")
-    
-    # ЭТАП 5: Последний fallback
-    if not car_info.brand:
-        print("🔍 ЭТАП 5: Последний fallback - используем дефолтные значения")
-        car_info.brand = "Автомобиль"
-        car_info.model = "Неизвестная модель"
-    
-    print(f"🎯 ИТОГ: Марка='{car_info.brand}', Модель='{car_info.model}'")
+        if debug:
+            logger.debug("ЭТАП 4: Fallback - Марка=%s, Модель=%s", car_info.brand, car_info.model)
     
     # Извлечение года (4 цифры от 1980 до текущего года + 2)
     current_year = datetime.now().year
-    year_pattern = r'\b(19[8-9]\d|20[0-2]\d)\b'
-    year_match = re.search(year_pattern, text)
+    year_match = YEAR_PATTERN.search(text)
     if year_match:
         year = int(year_match.group(1))
         if 1980 <= year <= current_year + 2:
             car_info.year = year
-            print(f"✅ Найден год: {car_info.year}")
     
     # Извлечение цены в долларах США
-    print("🔍 Поиск цены в долларах...")
-    price_patterns = [
-        r'(\d{1,3}(?:\s\d{3})*)\s*\$',  # 40 400$ (с пробелами)
-        r'\$(\d{1,3}(?:,\d{3})*)',  # $25,000
-        r'(\d{1,3}(?:,\d{3})*)\s*\$',  # 25,000$
-        r'(\d{1,3}(?:,\d{3})*)\s*долл',  # 25000 долл
-        r'(\d+)\s*тыс.*долл',  # 25 тыс долл
-        r'price.*\$(\d{1,3}(?:,\d{3})*)',  # price: $25,000
-        r'цена.*(\d{1,3}(?:,\d{3})*)\s*\$',  # цена 25,000$
-    ]
-    
-    for i, pattern in enumerate(price_patterns):
-        match = re.search(pattern, text, re.IGNORECASE)
+    for i, (pattern, literal) in enumerate(PRICE_PATTERNS):
+        if literal and literal not in text:
+            continue
+        match = pattern.search(text)
         if match:
             price_str = match.group(1).replace(',', '').replace(' ', '')  # Убираем запятые и пробелы
-            print(f"🔍 Найден паттерн {i+1}: '{match.group(0)}' -> '{price_str}'")
             try:
                 price = int(price_str)
                 # Обработка "тыс долл"
@@ -383,25 +490,17 @@ def extract_car_info_from_text(text: str) -> CarInfo:
                     
                 if 5000 <= price <= 500000:  # Разумные пределы для цены авто
                     car_info.price = price
-                    print(f"✅ Найдена цена: ${car_info.price}")
                     break
-                else:
-                    print(f"❌ Цена {price} вне разумных пределов")
+                elif debug:
+                    logger.debug("Цена %s вне разумных пределов (паттерн %d)", price, i + 1)
             except ValueError:
-                print(f"❌ Ошибка парсинга цены: {price_str}")
                 continue
     
     # Извлечение пробега
-    print("🔍 Поиск пробега...")
-    mileage_patterns = [
-        r'(\d{1,3}(?:,\d{3})*)\s*км',  # 150,000 км
-        r'пробег.*?(\d{1,3}(?:,\d{3})*)',  # пробег: 150000
-        r'(\d+)\s*тыс.*км',  # 150 тыс км
-        r'mileage.*?(\d{1,3}(?:,\d{3})*)',  # mileage: 150000
-    ]
-    
-    for pattern in mileage_patterns:
-        match = re.search(pattern, text_lower)
+    for pattern, literal in MILEAGE_PATTERNS:
+        if literal not in text_lower:
+            continue
+        match = pattern.search(text_lower)
         if match:
             mileage_str = match.group(1).replace(',', '')
             try:
@@ -412,70 +511,61 @@ def extract_car_info_from_text(text: str) -> CarInfo:
                     
                 if 0 <= mileage <= 1000000:  # Разумные пределы для пробега
                     car_info.mileage = mileage
-                    print(f"✅ Найден пробег: {car_info.mileage} км")
                     break
             except ValueError:
                 continue
     
     # Извлечение информации о двигателе
-    engine_patterns = [
-        r'(\d\.?\d?)\s*[лl]',  # 2.0л или 2л
-        r'двигат.*?(\d\.?\d?)\s*[лl]',  # двигатель 2.0л
-        r'engine.*?(\d\.?\d?)\s*[lL]',  # engine 2.0L
-    ]
-    
-    for pattern in engine_patterns:
-        match = re.search(pattern, text_lower)
+    for pattern in ENGINE_PATTERNS:
+        match = pattern.search(text_lower)
         if match:
             car_info.engine_volume = f"{match.group(1)}л"
-            print(f"✅ Найден объем двигателя: {car_info.engine_volume}")
             break
     
     # Извлечение коробки передач
-    transmission_keywords = {
-        'автомат': ['автомат', 'automatic', 'акпп', 'auto'],
-        'механика': ['механика', 'manual', 'мкпп', 'мех'],
-        'вариатор': ['вариатор', 'cvt'],
-        'робот': ['робот', 'dsg', 'amt']
-    }
-    
-    for trans_type, keywords in transmission_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                car_info.transmission = trans_type
-                print(f"✅ Найдена КПП: {car_info.transmission}")
-                break
-        if car_info.transmission:
+    for trans_type, keywords in TRANSMISSION_KEYWORDS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            car_info.transmission = trans_type
             break
     
     # Извлечение типа привода
-    drive_keywords = {
-        'полный': ['полный', 'awd', '4wd', 'quattro'],
-        'передний': ['передний', 'fwd', 'front'],
-        'задний': ['задний', 'rwd', 'rear']
-    }
-    
-    for drive_type, keywords in drive_keywords.items():
-        for keyword in keywords:
-            if keyword in text_lower:
-                car_info.drive_type = drive_type
-                print(f"✅ Найден привод: {car_info.drive_type}")
-                break
-        if car_info.drive_type:
+    for drive_type, keywords in DRIVE_KEYWORDS.items():
+        if any(keyword in text_lower for keyword in keywords):
+            car_info.drive_type = drive_type
             break
     
-    print(f"🏁 ФИНАЛЬНЫЕ ДАННЫЕ:")
-    print(f"   Марка: {car_info.brand}")
-    print(f"   Модель: {car_info.model}")
-    print(f"   Год: {car_info.year}")
-    print(f"   Цена: ${car_info.price}")
-    print(f"   Пробег: {car_info.mileage} км")
-    print(f"   Двигатель: {car_info.engine_volume}")
-    print(f"   КПП: {car_info.transmission}")
-    print(f"   Привод: {car_info.drive_type}")
+    if debug:
+        logger.debug(
+            "ФИНАЛЬНЫЕ ДАННЫЕ: Марка=%s, Модель=%s, Год=%s, Цена=$%s, Пробег=%s км, "
+            "Двигатель=%s, КПП=%s, Привод=%s",
+            car_info.brand, car_info.model, car_info.year, car_info.price,
+            car_info.mileage, car_info.engine_volume, car_info.transmission, car_info.drive_type
+        )
     
     return car_info
 
+
+def extract_car_info_batch(texts: Iterable[str]) -> List[CarInfo]:
+    """
+    Пакетное извлечение информации об автомобилях (для бэкфиллов)
+    
+    Одинаковые тексты разбираются один раз.
+    
+    Args:
+        texts: Тексты объявлений
+        
+    Returns:
+        Список CarInfo в том же порядке
+    """
+    parsed: Dict[str, CarInfo] = {}
+    results = []
+    for text in texts:
+        if text not in parsed:
+            parsed[text] = extract_car_info_from_text(text)
+        # Отдельный экземпляр на каждый текст, чтобы результаты можно было менять независимо
+        results.append(replace(parsed[text]))
+    return results
+
 def create_car_description_prompt(car_info: CarInfo, custom_context: str = "") -> str:
     """
     Создает промпт для Perplexity API для генерации объявления о продаже китайского автомобиля
@@ -109,7 +109,8 @@ def format_car_data_for_storage(
     source_channel_name: str,
     description: str,
     cloudinary_urls: list,
-    target_msg_id: Optional[int] = None
+    target_msg_id: Optional[int] = None,
+    photo_file_ids: Optional[list] = None
 ) -> Dict[str, Any]:
     """
     Форматирует данные автомобиля для сохранения в базе данных.
@@ -121,6 +122,7 @@ def format_car_data_for_storage(
         description: Описание автомобиля
         cloudinary_urls: Список URL фотографий
         target_msg_id: ID сообщения в целевом канале
+        photo_file_ids: file_id фото, выданные Bot API (заполняются ботом при первой отправке в /getauto)
         
     Returns:
         Сформированный словарь для отправки в API
@@ -140,6 +142,7 @@ def format_car_data_for_storage(
         "price": car_details.get('price'),
         "description": description,
         "photos": cloudinary_urls,
+        "photo_file_ids": photo_file_ids or [],
         "status": 'available' if target_msg_id else 'error',
         "created_at": datetime.utcnow().isoformat()
     }
@@ -5,6 +5,8 @@ from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 import logging
 
+from app.monitoring.metrics import record_api_error
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -23,6 +25,24 @@ class CarData:
     photos: Optional[List[str]] = None
     status: str = 'available'
     target_channel_message_id: Optional[int] = None
+    photo_file_ids: Optional[List[str]] = None
+
+    def to_payload(self) -> Dict[str, Any]:
+        """Тело запроса POST /api/cars (оно же - запись очереди spool)"""
+        return {
+            'custom_id': self.custom_id,
+            'source_message_id': self.source_message_id,
+            'source_channel_name': self.source_channel_name,
+            'brand': self.brand,
+            'model': self.model,
+            'year': self.year,
+            'price': self.price,
+            'description': self.description,
+            'photos': self.photos or [],
+            'photo_file_ids': self.photo_file_ids or [],
+            'status': self.status,
+            'target_channel_message_id': self.target_channel_message_id
+        }
 
 class DatabaseClient:
     """
@@ -54,19 +74,7 @@ class DatabaseClient:
         """
         try:
             # Подготавливаем данные для отправки
-            payload = {
-                'custom_id': car_data.custom_id,
-                'source_message_id': car_data.source_message_id,
-                'source_channel_name': car_data.source_channel_name,
-                'brand': car_data.brand,
-                'model': car_data.model,
-                'year': car_data.year,
-                'price': car_data.price,
-                'description': car_data.description,
-                'photos': car_data.photos or [],
-                'status': car_data.status,
-                'target_channel_message_id': car_data.target_channel_message_id
-            }
+            payload = car_data.to_payload()
             
             logger.info(f"💾 Сохранение автомобиля: {car_data.custom_id}")
             
@@ -81,13 +89,79 @@ class DatabaseClient:
                 logger.info(f"✅ Автомобиль сохранен: {car_data.custom_id}")
                 return result
             else:
+                record_api_error('storage_api', response.status_code)
                 logger.error(f"❌ Ошибка сохранения {car_data.custom_id}: {response.status_code} - {response.text}")
                 return None
                 
         except Exception as e:
+            record_api_error('storage_api', type(e).__name__)
             logger.error(f"❌ Исключение при сохранении {car_data.custom_id}: {e}")
             return None
     
+    @staticmethod
+    def _same_source(existing: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+        """Запись в базе создана из того же поста источника (повтор отправки)"""
+        return (str(existing.get('source_message_id')) == str(payload.get('source_message_id'))
+                and (existing.get('source_channel_name') or '') == (payload.get('source_channel_name') or ''))
+
+    def save_cars_bulk(self, payloads: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Пакетное сохранение автомобилей (POST /api/cars/bulk)
+        
+        Существующий custom_id из того же поста источника считается сохраненным,
+        поэтому пакет можно отправлять повторно; другой автомобиль с занятым
+        custom_id возвращается в failed. Отказы, которые повтор не исправит
+        (конфликт custom_id, 4xx), помечаются permanent. Старый сервер без этого
+        маршрута обходится поштучными POST /api/cars.
+        
+        Args:
+            payloads: Тела запросов (CarData.to_payload())
+            
+        Returns:
+            {'saved': [custom_id, ...],
+             'failed': [{'custom_id', 'error', 'permanent', 'reason': conflict / rejected}, ...]}
+            или None, если API недоступен и пакет надо повторить целиком
+        """
+        try:
+            response = self.session.post(f"{self.base_url}/api/cars/bulk", json={'cars': payloads}, timeout=30)
+            if response.status_code == 200:
+                data = response.json()
+                return {'saved': data.get('saved', []), 'failed': data.get('failed', [])}
+            if response.status_code != 404:
+                record_api_error('storage_api', response.status_code)
+                logger.error(f"❌ Ошибка пакетного сохранения: {response.status_code} - {response.text}")
+                return None
+            
+            saved, failed = [], []
+            for payload in payloads:
+                response = self.session.post(f"{self.base_url}/api/cars", json=payload, timeout=10)
+                if response.status_code in (200, 201):
+                    saved.append(payload['custom_id'])
+                elif response.status_code == 409:
+                    # Сохранен прошлой попыткой или custom_id занят другим автомобилем
+                    existing = self.get_car(payload['custom_id'])
+                    if existing is not None and self._same_source(existing, payload):
+                        saved.append(payload['custom_id'])
+                    else:
+                        failed.append({'custom_id': payload['custom_id'],
+                                       'error': f"custom_id {payload['custom_id']} занят другим автомобилем",
+                                       'permanent': True, 'reason': 'conflict'})
+                elif response.status_code >= 500:
+                    record_api_error('storage_api', response.status_code)
+                    if not saved and not failed:
+                        return None
+                    failed.append({'custom_id': payload['custom_id'], 'error': f"HTTP {response.status_code}"})
+                else:
+                    record_api_error('storage_api', response.status_code)
+                    failed.append({'custom_id': payload['custom_id'], 'error': response.text[:200],
+                                   'permanent': True, 'reason': 'rejected'})
+            return {'saved': saved, 'failed': failed}
+            
+        except Exception as e:
+            record_api_error('storage_api', type(e).__name__)
+            logger.error(f"❌ Исключение при пакетном сохранении: {e}")
+            return None
+    
     def check_duplicate(self, source_message_id: int, source_channel_name: str) -> Optional[Dict[str, Any]]:
         """
         Проверка дубликата по ID сообщения и каналу
@@ -144,6 +218,43 @@ class DatabaseClient:
             logger.error(f"Ошибка получения списка автомобилей: {e}")
             return None
 
+    def get_custom_ids(self, page_size: int = 500) -> Optional[List[str]]:
+        """
+        Все custom_id в базе одним запросом (/api/custom-ids)
+        
+        Старый сервер без этого маршрута обходится постранично через /api/cars.
+        Возвращает None при ошибке.
+        """
+        try:
+            response = self.session.get(f"{self.base_url}/api/custom-ids", timeout=30)
+            if response.status_code == 200:
+                return response.json().get('custom_ids', [])
+            if response.status_code != 404:
+                record_api_error('storage_api', response.status_code)
+                return None
+            
+            custom_ids = []
+            page = 1
+            while True:
+                response = self.session.get(
+                    f"{self.base_url}/api/cars", params={'page': page, 'limit': page_size}, timeout=30
+                )
+                if response.status_code != 200:
+                    record_api_error('storage_api', response.status_code)
+                    return None
+                data = response.json()
+                cars = data.get('cars', [])
+                custom_ids.extend(car['custom_id'] for car in cars if car.get('custom_id'))
+                pages = (data.get('pagination') or {}).get('pages', page)
+                if not cars or page >= pages:
+                    return custom_ids
+                page += 1
+                
+        except Exception as e:
+            record_api_error('storage_api', type(e).__name__)
+            logger.error(f"Ошибка получения списка custom_id: {e}")
+            return None
+
 # Глобальный экземпляр клиента
 _client = None
 
@@ -151,7 +262,7 @@ def get_client() -> DatabaseClient:
     """Получение глобального экземпляра клиента базы данных"""
     global _client
     if _client is None:
-        _client = DatabaseClient()
+        _client = DatabaseClient(os.getenv('STORAGE_API_URL', 'http://localhost:3001'))
     return _client
 
 # Удалена дублирующая функция save_car_to_db - теперь используется прямой вызов в legacy_wrapper
@@ -5,6 +5,7 @@
 
 from .database_client import check_car_duplicate, get_client
 from .data_formatter import format_car_data_for_storage
+from .spool import enqueue_car
 import logging
 from typing import Dict, Any, Optional
 
@@ -14,10 +15,11 @@ def send_car_to_node(car_data_dict):
     """
     Обертка для замены старой функции send_to_node
     Совместима с существующим кодом
+    
+    Автомобиль не отправляется сразу, а ставится в локальную очередь
+    (spool.py): фоновый поток сохранит его пачкой и повторит при сбое API.
     """
     try:
-        client = get_client()
-        
         # Создаем объект CarData из словаря
         from .database_client import CarData
         car_data = CarData(
@@ -30,17 +32,13 @@ def send_car_to_node(car_data_dict):
             price=car_data_dict.get('price'),
             description=car_data_dict.get('description'),
             photos=car_data_dict.get('photos', []),
+            photo_file_ids=car_data_dict.get('photo_file_ids') or [],
             status=car_data_dict.get('status', 'available'),
             target_channel_message_id=car_data_dict.get('target_channel_message_id')
         )
         
-        # Используем прямой вызов клиента вместо промежуточной функции
-        result = client.save_car(car_data)
-        
-        if result is not None:
-            return {'message': 'Car saved successfully'}
-        else:
-            return {'error': 'Failed to save car'}
+        enqueue_car(car_data.to_payload())
+        return {'message': 'Car queued for saving', 'queued': True}
             
     except Exception as e:
         logger.error(f"Ошибка в send_car_to_node: {e}")
@@ -65,7 +63,8 @@ def save_car_with_formatting(
     source_channel_name: str,
     description: str,
     cloudinary_urls: list,
-    target_msg_id: Optional[int] = None
+    target_msg_id: Optional[int] = None,
+    photo_file_ids: Optional[list] = None
 ) -> Dict[str, Any]:
     """
     Новая функция для сохранения автомобиля с автоматическим форматированием.
@@ -79,7 +78,8 @@ def save_car_with_formatting(
             source_channel_name=source_channel_name,
             description=description,
             cloudinary_urls=cloudinary_urls,
-            target_msg_id=target_msg_id
+            target_msg_id=target_msg_id,
+            photo_file_ids=photo_file_ids
         )
         
         # Сохраняем через Storage API
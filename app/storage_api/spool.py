@@ -0,0 +1,352 @@
+"""
+Spool - локальная очередь сохранений в Storage API (write-behind)
+
+Каждое сохранение автомобиля сначала пишется в SQLite (STORAGE_SPOOL_PATH) и
+сразу возвращается: публикация в канал не ждет базу. Фоновый поток отправляет
+накопленные записи пачками (POST /api/cars/bulk) и удаляет из очереди только
+подтвержденные. Временные ошибки (API недоступен, 5xx) повторяются с
+экспоненциальной задержкой, запись остается в файле до успеха - при падении
+API или перезапуске бота автомобиль не теряется. Ключ очереди - custom_id:
+повторная постановка заменяет запись, а уже существующий в базе custom_id
+того же поста источника считается сохраненным.
+
+Записи, которые база отклоняет окончательно (custom_id занят другим
+автомобилем, ошибка валидации), после max_attempts попыток переносятся в
+таблицу spool_dead: они больше не отправляются и не держат очередь, а админ
+получает алерт. custom_id такой записи не меняется - он уже опубликован в
+посте канала.
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Tuple, Callable
+
+from app.monitoring.metrics import QUEUE_DEPTH, STORAGE_SPOOL_DEAD
+
+logger = logging.getLogger(__name__)
+
+STORAGE_SPOOL_PATH = 'data/storage_spool.sqlite3'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    custom_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+)
+"""
+
+_DEAD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool_dead (
+    custom_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    last_error TEXT,
+    dead_at REAL NOT NULL
+)
+"""
+
+
+class CarSpool:
+    """Очередь неотправленных автомобилей в SQLite"""
+
+    def __init__(self, path: str, base_delay: float = 2.0, max_delay: float = 300.0, max_attempts: int = 3):
+        """
+        Args:
+            path: Файл SQLite (':memory:' - только для тестов)
+            base_delay: Задержка перед первым повтором, секунд
+            max_delay: Максимальная задержка между повторами, секунд
+            max_attempts: Попыток до переноса окончательно отклоненной записи в dead-letter
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.execute(_SCHEMA)
+        self._db.execute(_DEAD_SCHEMA)
+        self._report()
+
+    def _report(self):
+        QUEUE_DEPTH.labels(queue='storage_spool').set(self.pending())
+
+    def put(self, payload: Dict[str, Any]):
+        """Ставит автомобиль в очередь (запись с тем же custom_id заменяется)"""
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO spool (custom_id, payload, created_at) VALUES (?, ?, ?)',
+                (payload['custom_id'], json.dumps(payload, ensure_ascii=False, default=str), time.time())
+            )
+        self._report()
+
+    def due(self, limit: int) -> List[Dict[str, Any]]:
+        """Записи, которые пора отправить (старые первыми)"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT payload FROM spool WHERE next_attempt <= ? ORDER BY created_at LIMIT ?',
+                (time.time(), limit)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def ack(self, custom_ids: List[str]):
+        """Удаляет подтвержденные базой записи"""
+        if not custom_ids:
+            return
+        with self._lock:
+            self._db.executemany('DELETE FROM spool WHERE custom_id = ?', [(i,) for i in custom_ids])
+        self._report()
+
+    def retry(self, failures: List[Tuple[str, str]]):
+        """Откладывает записи с ошибкой: задержка растет вдвое с каждой попыткой"""
+        if not failures:
+            return
+        with self._lock:
+            for custom_id, error in failures:
+                self._postpone(custom_id, error)
+
+    def _postpone(self, custom_id: str, error: str) -> Optional[int]:
+        """Следующая попытка с экспоненциальной задержкой (вызывается под блокировкой)"""
+        row = self._db.execute('SELECT attempts FROM spool WHERE custom_id = ?', (custom_id,)).fetchone()
+        if row is None:
+            return None
+        attempts = row[0] + 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        self._db.execute(
+            'UPDATE spool SET attempts = ?, next_attempt = ?, last_error = ? WHERE custom_id = ?',
+            (attempts, time.time() + delay * random.uniform(0.8, 1.2), error[:500], custom_id)
+        )
+        return attempts
+
+    def reject(self, failures: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        """
+        Учитывает окончательный отказ базы: после max_attempts попыток запись
+        переносится в dead-letter, до этого - откладывается как при retry
+
+        Args:
+            failures: (custom_id, причина: conflict / rejected, текст ошибки)
+
+        Returns:
+            Перенесенные в dead-letter записи: custom_id, reason, error, attempts
+        """
+        dead = []
+        if not failures:
+            return dead
+        with self._lock:
+            for custom_id, reason, error in failures:
+                attempts = self._postpone(custom_id, error)
+                if attempts is None or attempts < self.max_attempts:
+                    continue
+                self._db.execute('BEGIN')
+                self._db.execute(
+                    'INSERT OR REPLACE INTO spool_dead '
+                    '(custom_id, payload, created_at, attempts, reason, last_error, dead_at) '
+                    'SELECT custom_id, payload, created_at, attempts, ?, last_error, ? FROM spool WHERE custom_id = ?',
+                    (reason, time.time(), custom_id)
+                )
+                self._db.execute('DELETE FROM spool WHERE custom_id = ?', (custom_id,))
+                self._db.execute('COMMIT')
+                dead.append({'custom_id': custom_id, 'reason': reason, 'error': error, 'attempts': attempts})
+        if dead:
+            self._report()
+        return dead
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """Записи в dead-letter (для разбора вручную)"""
+        with self._lock:
+            rows = self._db.execute(
+                'SELECT custom_id, reason, last_error, attempts, payload FROM spool_dead ORDER BY dead_at'
+            ).fetchall()
+        return [
+            {'custom_id': custom_id, 'reason': reason, 'error': error, 'attempts': attempts,
+             'payload': json.loads(payload)}
+            for custom_id, reason, error, attempts, payload in rows
+        ]
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class SpoolFlusher:
+    """Фоновый поток: отправляет очередь пачками, пока она не опустеет"""
+
+    def __init__(self, spool: CarSpool, client=None, batch_size: int = 50, interval: float = 2.0,
+                 alert_sender: Optional[Callable[[str], Any]] = None):
+        """
+        Args:
+            spool: Очередь
+            client: DatabaseClient (по умолчанию глобальный)
+            batch_size: Автомобилей в одном запросе
+            interval: Пауза между проверками пустой очереди, секунд
+            alert_sender: Функция отправки алерта админам (вызывается из потока отправки)
+        """
+        self.spool = spool
+        self.alert_sender = alert_sender
+        self.client = client
+        self.batch_size = batch_size
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='storage-spool', daemon=True)
+            self._thread.start()
+
+    def notify(self):
+        """Будит поток сразу после постановки в очередь"""
+        self._wakeup.set()
+
+    def stop(self, timeout: float = 10.0):
+        """Останавливает поток после последней попытки отправки"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def flush_once(self) -> int:
+        """
+        Отправляет одну пачку
+
+        Returns:
+            Сколько записей было в пачке
+        """
+        batch = self.spool.due(self.batch_size)
+        if not batch:
+            return 0
+        if self.client is None:
+            from .database_client import get_client
+            self.client = get_client()
+        result = self.client.save_cars_bulk(batch)
+        if result is None:
+            self.spool.retry([(car['custom_id'], 'Storage API недоступен') for car in batch])
+            logger.warning(f"Storage API недоступен, в очереди {self.spool.pending()} автомобилей")
+            return len(batch)
+        self.spool.ack(result['saved'])
+        self.spool.retry([(item['custom_id'], item.get('error', ''))
+                          for item in result['failed'] if not item.get('permanent')])
+        dead = self.spool.reject([(item['custom_id'], item.get('reason') or 'rejected', item.get('error', ''))
+                                  for item in result['failed'] if item.get('permanent')])
+        if result['saved']:
+            logger.info(f"✅ Из очереди сохранено {len(result['saved'])} автомобилей")
+        for item in result['failed']:
+            logger.error(f"❌ Не удалось сохранить {item['custom_id']}: {item.get('error')}")
+        if dead:
+            self._dead_letter_alert(dead)
+        return len(batch)
+
+    def _dead_letter_alert(self, dead: List[Dict[str, Any]]):
+        for item in dead:
+            STORAGE_SPOOL_DEAD.labels(reason=item['reason']).inc()
+        lines = [f"{item['custom_id']}: {item['error']}" for item in dead[:10]]
+        if len(dead) > 10:
+            lines.append(f"... и еще {len(dead) - 10}")
+        text = ("⚠️ Storage API отклоняет автомобили, они убраны из очереди сохранения "
+                f"(dead-letter, {self.spool.path}):\n" + "\n".join(lines))
+        logger.error(text)
+        if self.alert_sender:
+            try:
+                self.alert_sender(text)
+            except Exception as e:
+                logger.error(f"Не удалось отправить алерт о dead-letter: {e}")
+
+    def drain(self, timeout: float = 30.0) -> int:
+        """
+        Отправляет все записи, которые пора отправить (при остановке и в нагрузочном стенде)
+
+        Returns:
+            Сколько записей осталось в очереди
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and self.flush_once():
+            pass
+        return self.spool.pending()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                sent = self.flush_once()
+            except Exception as e:
+                logger.error(f"Ошибка отправки очереди Storage API: {e}")
+                sent = 0
+            if sent < self.batch_size:
+                self._wakeup.wait(self.interval)
+                self._wakeup.clear()
+
+
+_spool: Optional[CarSpool] = None
+_flusher: Optional[SpoolFlusher] = None
+_init_lock = threading.Lock()
+
+
+def get_spool() -> CarSpool:
+    """Глобальная очередь; при первом вызове запускает фоновую отправку"""
+    global _spool, _flusher
+    with _init_lock:
+        if _spool is None:
+            _spool = CarSpool(
+                os.getenv('STORAGE_SPOOL_PATH', STORAGE_SPOOL_PATH),
+                max_delay=float(os.getenv('STORAGE_SPOOL_MAX_DELAY', '300')),
+                max_attempts=int(os.getenv('STORAGE_SPOOL_MAX_ATTEMPTS', '3')),
+            )
+            _flusher = SpoolFlusher(
+                _spool,
+                batch_size=int(os.getenv('STORAGE_SPOOL_BATCH', '50')),
+                interval=float(os.getenv('STORAGE_SPOOL_INTERVAL', '2')),
+            )
+            _flusher.start()
+            pending = _spool.pending()
+            if pending:
+                logger.info(f"В очереди Storage API с прошлого запуска: {pending} автомобилей")
+        return _spool
+
+
+def get_flusher() -> Optional[SpoolFlusher]:
+    return _flusher
+
+
+def enqueue_car(payload: Dict[str, Any]):
+    """Ставит автомобиль в очередь сохранения и будит фоновую отправку"""
+    get_spool().put(payload)
+    _flusher.notify()
+
+
+def shutdown_spool(timeout: float = 10.0) -> int:
+    """
+    Останавливает фоновую отправку, попробовав отправить очередь
+
+    Returns:
+        Сколько записей осталось в файле до следующего запуска
+    """
+    global _spool, _flusher
+    with _init_lock:
+        if _spool is None:
+            return 0
+        _flusher.stop()
+        pending = _flusher.drain(timeout)
+        _spool.close()
+        _spool = _flusher = None
+    if pending:
+        logger.warning(f"В очереди Storage API осталось {pending} автомобилей, отправка после перезапуска")
+    return pending
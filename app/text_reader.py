@@ -1,24 +1,8 @@
 import os
 import asyncio
-from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.sessions import StringSession
 from telethon.tl.types import MessageService
 from app.ocr_api.legacy_wrapper import extract_text_from_image
-
-load_dotenv()
-
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
-
-if not session_string:
-    raise ValueError(
-        "TELEGRAM_SESSION_STRING not found in environment variables. "
-        "Please run 'python generate_session.py' to generate it."
-    )
-
-client = TelegramClient(StringSession(session_string), api_id, api_hash)
+from app.core.telethon_client import get_client
 
 async def fetch_text_messages_from_channel(source_channel, limit=500):
     """
@@ -26,6 +10,7 @@ async def fetch_text_messages_from_channel(source_channel, limit=500):
     [{"id": ..., "text": ...}, ...]
     """
     messages = []
+    client = get_client()
     await client.start()
     async for message in client.iter_messages(source_channel, limit=limit, reverse=True):
         if (
@@ -43,6 +28,7 @@ async def fetch_text_messages_from_channel(source_channel, limit=500):
 
 async def get_message_media(channel_username, message_id):
     """Получить медиа из сообщения"""
+    client = get_client()
     await client.start()
     try:
         entity = await client.get_entity(channel_username)
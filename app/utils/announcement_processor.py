@@ -5,110 +5,89 @@ from app.utils.channel_parser import fetch_announcements_from_channel
 from app.ocr_api.legacy_wrapper import OCRProcessor
 from app.perplexity_api.legacy_wrapper import PerplexityProcessor
 from app.cloudinary_api.legacy_wrapper import upload_image_to_cloudinary, get_image_url_from_cloudinary
-from app.utils.message_formatter import MessageFormatter
+from app.utils.message_formatter import MessageFormatter, format_perplexity_response_with_quotes
 from app.core.telegram import send_message_to_channel, send_message_with_photos_to_channel
 from app.utils.config import get_telegram_config, get_pricing_config
 from app.utils.id_generator import generate_custom_id, format_id_for_display
+from app.utils.channel_scheduler import ChannelScheduler, parse_channels
 import sys
 import shutil
 import random
 from app.storage_api.legacy_wrapper import save_car_with_formatting
 import re
 from app.utils.cbr_exchange_rate import get_cbr_usd_rate_with_markup
+from app.monitoring.metrics import track_stage, IN_FLIGHT, MESSAGES_PROCESSED
+from app.monitoring.tracing import span
+from app.monitoring.profiling import get_profiler
+from app.monitoring.freshness import get_freshness_tracker
+from app.monitoring.cassette import record_announcement, tape_call, tape_await, fingerprint
+from app.monitoring.shadow import record_run, is_shadow_run, note_output, get_shadow_config
 
 
-def format_perplexity_response_with_quotes(response_text: str) -> str:
-    """
-    Очищает ответ от Perplexity от остатков Markdown и применяет HTML форматирование
-    
-    Args:
-        response_text: Текст ответа от Perplexity
-        
-    Returns:
-        Очищенный текст в HTML формате с blockquote для технических секций
-    """
-    if not response_text:
-        return response_text
-    
-    # Удаляем остатки Markdown если они есть
-    cleaned_text = response_text
-    
-    # Убираем ** для жирного текста (если остались)
-    cleaned_text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', cleaned_text)
-    
-    # Убираем * для курсива (если остались)
-    cleaned_text = re.sub(r'\*(.*?)\*', r'<i>\1</i>', cleaned_text)
-    
-    # Убираем - в начале строк (markdown списки)
-    cleaned_text = re.sub(r'^- ', '', cleaned_text, flags=re.MULTILINE)
-    
-    # Список разделов для форматирования в blockquote
-    sections_to_quote = [
-        # Технические характеристики
-        r'(🛠[️]?\s*(?:\*\*)?(?:<b>)?(?:Технические характеристики|Technical specifications)(?:</b>)?(?:\*\*)?[:\s]*)\n((?:(?!🛡|📱|📊|⚙️|Custom ID|#).+\n?)*)',
-        # Дополнительные детали с эмодзи ⚙️ (упрощенный паттерн)
-        r'(⚙️.*?Дополнительные детали.*?)\n(.*?)(?=\n*#)',
-        # Дополнительные детали с эмодзи 📊
-        r'(📊\s*(?:\*\*)?(?:<b>)?(?:Дополнительные детали|Additional details)(?:</b>)?(?:\*\*)?[:\s]*)\n((?:(?!🛠|🛡|📱|⚙️|Custom ID|#).+\n?)*)',
-        # Системы безопасности
-        r'(🛡[️]?\s*(?:\*\*)?(?:<b>)?(?:Системы безопасности|Safety systems|Состояние и документы)(?:</b>)?(?:\*\*)?[:\s]*)\n((?:(?!🛠|📱|📊|⚙️|Custom ID|#).+\n?)*)',
-        # Мультимедиа
-        r'(📱\s*(?:\*\*)?(?:<b>)?(?:Мультимедиа|Multimedia)(?:</b>)?(?:\*\*)?[:\s]*)\n((?:(?!🛠|🛡|📊|⚙️|Custom ID|#).+\n?)*)',
-        # Условия продажи
-        r'(📦\s*(?:\*\*)?(?:<b>)?(?:Условия продажи|Sales terms)(?:</b>)?(?:\*\*)?[:\s]*)\n((?:(?!🛠|🛡|📱|📊|⚙️|Custom ID|#).+\n?)*)'
-    ]
-    
-    # Применяем blockquote форматирование к каждой секции
-    for pattern in sections_to_quote:
-        def replace_with_blockquote(match):
-            header = match.group(1).strip()
-            content = match.group(2).strip()
-            
-            # Очищаем заголовок от Markdown остатков
-            header = re.sub(r'\*\*', '', header)
-            header = re.sub(r'🛠️', '🛠', header)  # Нормализуем эмодзи
-            header = re.sub(r'🛡️', '🛡', header)
-            
-            # Если заголовок еще не обернут в <b>, оборачиваем
-            if '<b>' not in header or '</b>' not in header:
-                # Оборачиваем текст после эмодзи в <b>
-                header = re.sub(r'(🛠|📊|🛡|📱|📦|⚙️)\s*(.+)', r'\1 <b>\2</b>', header)
-            
-            if content:
-                return f"{header}\n<blockquote>{content}</blockquote>"
-            else:
-                return header
-        
-        cleaned_text = re.sub(pattern, replace_with_blockquote, cleaned_text, flags=re.MULTILINE | re.DOTALL)
-    
-    # Разделяем хештеги пробелами, если они слиплись
-    cleaned_text = re.sub(r'(#[^\s#]+)(?=#)', r'\1 ', cleaned_text)
-    
-    return cleaned_text
+def _file_size(path):
+    """Размер файла в байтах (0, если файл недоступен)"""
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
 
 
 async def process_single_announcement(ann, perplexity_processor, source_channel, markup_percentage):
     """
     Обрабатывает одно объявление: OCR, Perplexity, отправка в Node.js API и публикация.
+    Учитывает объявление в метриках (в обработке, успешно / с ошибкой) и
+    открывает корневой спан трейса, к которому привязываются все этапы.
+    Если включен режим профилирования calls, вызов выполняется под cProfile,
+    при заданном CASSETTE_DIR объявление записывается в кассету, а при
+    заданном SHADOW_LOG - результаты и длительности для сравнения с shadow.
+    """
+    IN_FLIGHT.inc()
+    photos = ann.get("photos") or []
+    try:
+        with span('announcement', message_id=ann.get("id"), source_channel=source_channel,
+                  photos=len(photos), bytes=sum(_file_size(p) for p in photos)), get_profiler().announcement(), \
+                record_announcement(ann, source_channel), record_run(ann, source_channel):
+            await _process_single_announcement(ann, perplexity_processor, source_channel, markup_percentage)
+    except Exception:
+        MESSAGES_PROCESSED.labels(status='error').inc()
+        raise
+    else:
+        MESSAGES_PROCESSED.labels(status='success').inc()
+    finally:
+        IN_FLIGHT.dec()
+
+
+async def _process_single_announcement(ann, perplexity_processor, source_channel, markup_percentage):
+    """
+    Этапы обработки одного объявления (каждый этап измеряется track_stage).
+    Внешние вызовы идут через tape_call/tape_await, чтобы их можно было
+    записать в кассету и воспроизвести без сети. В shadow-режиме пост уходит
+    в канал-приемник (или никуда), а сохранение в базу пропускается.
     """
     message_id = ann["id"]
+    shadow = is_shadow_run()
     print("--- Обработка объявления ID: " + str(message_id))
 
     # Генерация уникального custom_id в новом формате XXX-XXX
-    custom_id = generate_custom_id()
+    # Выдача номера блокирует файл карты (flock) - вне event loop
+    custom_id = await tape_await('custom_id', None, asyncio.to_thread, generate_custom_id)
     print(">> Сгенерирован уникальный ID для поста:", custom_id)
     
     ocr_texts = []
     if ann.get("photos"):
         print(f">> Запуск OCR для {len(ann['photos'])} фото...")
         ocr = OCRProcessor(lang='ru', use_yandex=True)
-        for photo_path in ann["photos"]:
-            ocr_text = await ocr.extract_text(photo_path)
-            if ocr_text and not ocr_text.startswith('Ошибка разбора ответа'):
-                ocr_texts.append(ocr_text)
+        with track_stage('ocr'):
+            for photo_index, photo_path in enumerate(ann["photos"]):
+                with span('ocr.image', bytes=_file_size(photo_path)) as image_span:
+                    ocr_text = await tape_await('ocr', photo_index, ocr.extract_text, photo_path)
+                    image_span.set('chars', len(ocr_text or ''))
+                if ocr_text and not ocr_text.startswith('Ошибка разбора ответа'):
+                    ocr_texts.append(ocr_text)
         print(">> OCR завершен.")
 
     ocr_data = '\n'.join(ocr_texts)
+    note_output('ocr', {'chars': len(ocr_data), 'hash': fingerprint(ocr_data)})
     
     # Извлекаем данные автомобиля из OCR и текста объявления
     from app.perplexity_api.text_formatter import extract_car_info_from_text
@@ -117,7 +96,10 @@ async def process_single_announcement(ann, perplexity_processor, source_channel,
     all_text = f"{ann.get('text', '')}\n{ocr_data}".strip()
     
     # Извлекаем структурированную информацию
-    car_info = extract_car_info_from_text(all_text)
+    with track_stage('parse'):
+        car_info = extract_car_info_from_text(all_text)
+    note_output('car', {'brand': car_info.brand, 'model': car_info.model, 'year': car_info.year,
+                        'price': car_info.price, 'mileage': car_info.mileage})
     
     # Подготавливаем данные автомобиля для нового формата
     # Применяем наценку к цене с сохранением оригинальной валюты
@@ -127,7 +109,8 @@ async def process_single_announcement(ann, perplexity_processor, source_channel,
     price_with_markup = format_price_with_markup(car_info, markup_percentage)
     
     # Получаем курс ЦБ РФ с наценкой
-    usd_to_rub = get_cbr_usd_rate_with_markup()
+    with track_stage('exchange_rate'):
+        usd_to_rub = get_cbr_usd_rate_with_markup()
     price_rub = None
     if usd_to_rub and car_info.price:
         price_rub = int(round(car_info.price * usd_to_rub))
@@ -183,7 +166,9 @@ async def process_single_announcement(ann, perplexity_processor, source_channel,
         )
         
         print(">> Отправка запроса в Perplexity API с новым промптом...")
-        msg = await perplexity_processor.process_text(prompt)
+        with track_stage('perplexity') as llm_span:
+            llm_span.set('bytes', len(prompt.encode('utf-8')))
+            msg = await tape_await('perplexity', fingerprint(prompt), perplexity_processor.process_text, prompt)
         print(">> Ответ от Perplexity получен.")
         
         # Форматируем ответ с HTML цитатами
@@ -197,39 +182,75 @@ async def process_single_announcement(ann, perplexity_processor, source_channel,
     cloudinary_urls = []
     if ann.get("photos"):
         print(f">> Загрузка {len(ann['photos'])} фото в Cloudinary...")
-        for i, photo_path in enumerate(ann["photos"]):
-            if os.path.exists(photo_path):
-                # Создаем уникальный public_id для Cloudinary
-                public_id = f"car_{custom_id}_{i+1}"
+        with track_stage('cloudinary'):
+            for i, photo_path in enumerate(ann["photos"]):
+                if os.path.exists(photo_path):
+                    # Создаем уникальный public_id для Cloudinary
+                    public_id = f"car_{custom_id}_{i+1}"
+                    if shadow:
+                        public_id = get_shadow_config().public_id_prefix + public_id
                 
-                # Загружаем в Cloudinary
-                upload_result = upload_image_to_cloudinary(photo_path, public_id=public_id)
-                if upload_result and upload_result.get('secure_url'):
-                    cloudinary_url = upload_result['secure_url']
-                    cloudinary_urls.append(cloudinary_url)
-                    print(f">> Фото {i+1} загружено в Cloudinary: {cloudinary_url}")
-                else:
-                    print(f">> Ошибка загрузки фото {i+1} в Cloudinary")
+                    # Загружаем в Cloudinary
+                    with span('cloudinary.upload', bytes=_file_size(photo_path)):
+                        upload_result = tape_call('cloudinary', public_id, upload_image_to_cloudinary,
+                                                  photo_path, public_id=public_id,
+                                                  custom_id=None if shadow else custom_id)
+                    if upload_result and upload_result.get('secure_url'):
+                        cloudinary_url = upload_result['secure_url']
+                        cloudinary_urls.append(cloudinary_url)
+                        print(f">> Фото {i+1} загружено в Cloudinary: {cloudinary_url}")
+                    else:
+                        print(f">> Ошибка загрузки фото {i+1} в Cloudinary")
         print(f">> Загружено в Cloudinary: {len(cloudinary_urls)} из {len(ann['photos'])} фото")
+    note_output('message', msg)
+    note_output('uploaded', len(cloudinary_urls))
 
     # Отправка сообщения в Telegram канал (используем локальные файлы для Telegram)
-    target_msg_id, _ = await send_message_with_photos_to_channel(msg, ann["photos"])
+    with track_stage('publish') as publish_span:
+        publish_span.set('bytes', len(msg.encode('utf-8')) + sum(_file_size(p) for p in ann["photos"]))
+        if shadow and not get_shadow_config().sink_channel:
+            print(">> Shadow-режим: публикация пропущена")
+            target_msg_id = None
+        else:
+            target_channel = get_shadow_config().sink_channel if shadow else None
+            target_msg_id, _ = await tape_await('publish', fingerprint(msg), send_message_with_photos_to_channel,
+                                                msg, ann["photos"], target_channel=target_channel)
+    note_output('published', bool(target_msg_id))
+
+    # Свежесть: время от поста в источнике до публикации (shadow не влияет на SLO)
+    if target_msg_id and not shadow:
+        source_lag = await get_freshness_tracker().record(source_channel, ann.get("date"))
+        if source_lag is not None:
+            publish_span.set('source_lag_seconds', round(source_lag, 1))
 
     # Сохраняем автомобиль через Storage API с автоматическим форматированием
-    print(">> Сохранение автомобиля в базу данных...")
-    save_result = save_car_with_formatting(
-        custom_id=custom_id,
-        source_message_id=message_id,
-        source_channel_name=source_channel,
-        description=msg,
-        cloudinary_urls=cloudinary_urls,
-        target_msg_id=target_msg_id
-    )
-    
-    if save_result.get('message'):
-        print(f">> ✅ Автомобиль {custom_id} сохранен в базу данных")
+    if shadow:
+        print(f">> Shadow-режим: сохранение {custom_id} в базу пропущено")
     else:
-        print(f">> ⚠️ Ошибка сохранения автомобиля {custom_id}: {save_result}")
+        print(">> Сохранение автомобиля в базу данных...")
+        with track_stage('save'):
+            save_result = tape_call(
+                'save', custom_id, save_car_with_formatting,
+                custom_id=custom_id,
+                source_message_id=message_id,
+                source_channel_name=source_channel,
+                description=msg,
+                cloudinary_urls=cloudinary_urls,
+                target_msg_id=target_msg_id
+            )
+
+        # Ошибка приходит и со словом message ({'message': 'Error: ...', 'success': False}),
+        # поэтому сначала проверяются явные признаки неудачи
+        failed = (save_result.get('error') or save_result.get('success') is False
+                  or save_result.get('queued') is False)
+        if failed:
+            print(f">> ⚠️ Ошибка сохранения автомобиля {custom_id}: {save_result}")
+        elif save_result.get('queued'):
+            print(f">> ✅ Автомобиль {custom_id} поставлен в очередь сохранения в базу")
+        elif save_result.get('message'):
+            print(f">> ✅ Автомобиль {custom_id} сохранен в базу данных")
+        else:
+            print(f">> ⚠️ Ошибка сохранения автомобиля {custom_id}: {save_result}")
     
 
     # Удаление временных локальных файлов фотографий после обработки
@@ -239,10 +260,11 @@ async def process_single_announcement(ann, perplexity_processor, source_channel,
     elif ann.get("photos"):
         try:
             photo_dir = os.path.dirname(ann["photos"][0])
-            if os.path.exists(photo_dir) and photo_dir != "downloads" and photo_dir != os.path.abspath("downloads"):
-                if "temp" in photo_dir or str(message_id) in photo_dir:
-                    shutil.rmtree(photo_dir)
-                    print(f">> Временная папка с фото {photo_dir} удалена (определена по пути к фото).")
+            # Удаляется только папка этого сообщения (downloads/<канал>/<id>), а не общая
+            # папка канала: в ней могут лежать фото объявлений, которые еще обрабатываются
+            if os.path.exists(photo_dir) and os.path.basename(os.path.normpath(photo_dir)) == str(message_id):
+                shutil.rmtree(photo_dir)
+                print(f">> Временная папка с фото {photo_dir} удалена (определена по пути к фото).")
         except Exception as e:
             print(f"Ошибка при попытке удаления временной папки с фото: {e}")
 
@@ -250,17 +272,16 @@ async def process_all_cars_from_channel():
     print(">>> Запуск конвейера обработки автомобилей...")
     load_dotenv()
     
+    scheduler = None
     try:
-        source_channel = os.getenv("TELEGRAM_CHANNEL")
-        if not source_channel:
+        # TELEGRAM_CHANNEL - один канал или несколько через запятую
+        source_channels = parse_channels(os.getenv("TELEGRAM_CHANNEL"))
+        if not source_channels:
             print("TELEGRAM_CHANNEL не задан в .env")
             return
 
         limit, start_from_id = get_telegram_config()
         markup_percentage = get_pricing_config()
-        print(f">>> Получение объявлений из канала {source_channel}...")
-        announcements = await fetch_announcements_from_channel(source_channel, limit=limit, start_from_id=start_from_id)
-        print(f">>> Получено {len(announcements)} объявлений.")
 
         api_key = os.getenv("PERPLEXITY_API_KEY")
         if not api_key:
@@ -268,12 +289,27 @@ async def process_all_cars_from_channel():
             return
         perplexity = PerplexityProcessor(api_key)
 
-        for ann in announcements:
+        async def handle(source_channel, ann):
             await process_single_announcement(ann, perplexity, source_channel, markup_percentage)
-            
+
+        # Очередь на каждый канал: обработка начинается с первого загруженного канала,
+        # а объявления каналов чередуются по весам из [channels] в config.ini
+        scheduler = ChannelScheduler.from_config(handle, name='channel_import')
+        scheduler.start()
+        for source_channel in source_channels:
+            print(f">>> Получение объявлений из канала {source_channel}...")
+            announcements = await fetch_announcements_from_channel(source_channel, limit=limit, start_from_id=start_from_id)
+            print(f">>> Получено {len(announcements)} объявлений.")
+            for ann in announcements:
+                scheduler.submit(source_channel, ann)
+        await scheduler.join()
+        print(f">>> Обработано по каналам: {scheduler.processed}")
+
     except Exception as e:
         print(f"Ошибка в конвейере обработки: {e}")
     finally:
+        if scheduler is not None:
+            await scheduler.stop()
         print(">>> Конвейер завершил работу.")
 
 if __name__ == "__main__":
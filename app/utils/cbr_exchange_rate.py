@@ -1,17 +1,46 @@
+import os
+import time
 import requests
 import xml.etree.ElementTree as ET
 from typing import Optional
 
+from app.monitoring.metrics import record_api_error, record_cache
+from app.monitoring.cassette import tape_call
+
+# ЦБ обновляет курс раз в день, поэтому не запрашиваем его на каждое объявление
+CBR_RATE_CACHE_TTL = float(os.getenv("CBR_RATE_CACHE_TTL", "3600"))
+CBR_DAILY_URL = os.getenv("CBR_DAILY_URL", "https://www.cbr.ru/scripts/XML_daily.asp")
+_rate_cache = {'value': None, 'expires_at': 0.0}
+
 def get_cbr_usd_rate() -> Optional[float]:
     """
     Получает актуальный курс доллара США с сайта ЦБ РФ (https://www.cbr.ru/scripts/XML_daily.asp)
+    Успешный ответ кэшируется на CBR_RATE_CACHE_TTL секунд. Каждое обращение
+    пишется в кассету (если она активна), чтобы воспроизведение не зависело
+    от состояния кэша.
     
     Returns:
         Курс доллара (float) или None при ошибке
     """
+    return tape_call('exchange_rate', None, _cached_cbr_usd_rate)
+
+def _cached_cbr_usd_rate() -> Optional[float]:
+    """Курс из кэша или от ЦБ РФ"""
+    if _rate_cache['value'] is not None and time.monotonic() < _rate_cache['expires_at']:
+        record_cache('cbr_rate', hit=True)
+        return _rate_cache['value']
+    record_cache('cbr_rate', hit=False)
+    
+    rate = _fetch_cbr_usd_rate()
+    if rate is not None:
+        _rate_cache['value'] = rate
+        _rate_cache['expires_at'] = time.monotonic() + CBR_RATE_CACHE_TTL
+    return rate
+
+def _fetch_cbr_usd_rate() -> Optional[float]:
+    """Запрос курса доллара к ЦБ РФ без кэша"""
     try:
-        url = "https://www.cbr.ru/scripts/XML_daily.asp"
-        response = requests.get(url, timeout=10)
+        response = requests.get(CBR_DAILY_URL, timeout=10)
         response.raise_for_status()
         tree = ET.fromstring(response.content)
         for valute in tree.findall('Valute'):
@@ -21,6 +50,7 @@ def get_cbr_usd_rate() -> Optional[float]:
                 return float(value)
         return None
     except Exception as e:
+        record_api_error('cbr', type(e).__name__)
         print(f"Ошибка получения курса USD с ЦБ РФ: {e}")
         return None
 
@@ -1,31 +1,18 @@
 import os
 import asyncio
 from datetime import datetime
-from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.sessions import StringSession
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument, MessageService
 import logging
 import shutil
 
+from app.monitoring.metrics import track_stage
+from app.core.telethon_client import get_client
+from app.utils.channel_scheduler import channel_key
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
-
-if not session_string:
-    raise ValueError(
-        "TELEGRAM_SESSION_STRING not found in environment variables. "
-        "Please run 'python generate_session.py' to generate it."
-    )
-
-# Создаем клиент с StringSession
-client = TelegramClient(StringSession(session_string), api_id, api_hash)
 
 async def get_channel_messages(channel_username, limit=10, start_from_id=None):
     """
@@ -49,6 +36,7 @@ async def get_channel_messages(channel_username, limit=10, start_from_id=None):
             ...
         ]
     """
+    client = get_client()
     try:
         await client.start()
         logger.info(f"Подключение к каналу: {channel_username}")
@@ -166,16 +154,20 @@ def is_photo_message(msg):
 
 async def fetch_announcements_from_channel(source_channel, limit=10, download_dir="downloads", temp_dir="temp", start_from_id=None):
     """
-    Возвращает список объявлений: {'text': ..., 'photos': [photo_path, ...], 'temp_dir': ...}
+    Возвращает список объявлений: {'id': ..., 'date': ..., 'text': ..., 'photos': [photo_path, ...], 'temp_dir': ...}
     Сначала загружает буфер сообщений, затем обрабатывает их от старых к новым, чтобы правильно сгруппировать фото и текст.
     Возвращает `limit` самых последних объявлений.
+    Файлы раскладываются по подпапкам канала (downloads/<канал>/, temp/<канал>/<id>):
+    ID сообщений уникальны только внутри канала, а объявления разных каналов
+    обрабатываются одновременно.
     """
-    # Используем уже созданный клиент с StringSession из модуля
+    # Общий клиент с StringSession (создается при первом вызове)
+    client = get_client()
     await client.start()
-    if not os.path.exists(download_dir):
-        os.makedirs(download_dir)
-    if not os.path.exists(temp_dir):
-        os.makedirs(temp_dir)
+    download_dir = os.path.join(download_dir, channel_key(str(source_channel)))
+    temp_dir = os.path.join(temp_dir, channel_key(str(source_channel)))
+    os.makedirs(download_dir, exist_ok=True)
+    os.makedirs(temp_dir, exist_ok=True)
     
     # 1. Загружаем буфер сообщений (с запасом, т.к. в одном объявлении может быть много фото)
     messages_to_fetch = limit * 15 
@@ -199,7 +191,8 @@ async def fetch_announcements_from_channel(source_channel, limit=10, download_di
         
         if is_photo_message(msg):
             photo_path = os.path.join(download_dir, f"photo_{msg.id}.jpg")
-            await client.download_media(msg, photo_path)
+            with track_stage('download'):
+                await client.download_media(msg, photo_path)
             current_photos.append(photo_path)
         elif hasattr(msg, 'text') and msg.text and not is_photo_message(msg):
             # Если есть фото, значит мы нашли текст для них - это объявление
@@ -221,6 +214,7 @@ async def fetch_announcements_from_channel(source_channel, limit=10, download_di
                 
                 announcements.append({
                     "id": msg.id,
+                    "date": msg.date,
                     "text": msg.text,
                     "photos": photo_paths,
                     "temp_dir": car_temp_dir
@@ -234,13 +228,14 @@ async def fetch_announcements_from_channel(source_channel, limit=10, download_di
     print(f"Найдено и отобрано {len(final_announcements)} объявлений.")
     return final_announcements 
 
-async def convert_telethon_message_to_announcement(message):
+async def convert_telethon_message_to_announcement(message, source_channel=None):
     """
     Преобразует объект сообщения Telethon в формат словаря 'announcement'.
-    Скачивает фото во временную папку.
+    Скачивает фото во временную папку downloads/<канал>/<id сообщения>.
     """
-    # Создаем уникальную временную папку для этого сообщения
-    temp_dir = os.path.join('downloads', str(message.id))
+    # Создаем уникальную временную папку для этого сообщения (ID уникален только в канале)
+    channel = channel_key(str(source_channel or message.chat_id))
+    temp_dir = os.path.join('downloads', channel, str(message.id))
     os.makedirs(temp_dir, exist_ok=True)
     
     photo_paths = []
@@ -249,7 +244,8 @@ async def convert_telethon_message_to_announcement(message):
     # Эта логика пока упрощена и может быть улучшена для более надежной работы с альбомами.
     try:
         if message.photo:
-            photo_path = await message.download_media(file=os.path.join(temp_dir, f"{message.id}.jpg"))
+            with track_stage('download'):
+                photo_path = await message.download_media(file=os.path.join(temp_dir, f"{message.id}.jpg"))
             photo_paths.append(photo_path)
     except Exception as e:
         print(f"Не удалось скачать медиа для сообщения {message.id}: {e}")
@@ -263,6 +259,7 @@ async def convert_telethon_message_to_announcement(message):
 
     return {
         "id": message.id,
+        "date": message.date,
         "text": text,
         "photos": photo_paths
     } 
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+Channel Scheduler - справедливая очередь объявлений из нескольких каналов-источников
+
+TELEGRAM_CHANNEL может перечислять много каналов-доноров. Без планировщика
+канал, публикующий десятки постов подряд, занимает весь конвейер, и посты
+остальных каналов ждут, пока он не выговорится. Здесь у каждого канала своя
+очередь, а обработчики выбирают следующее объявление взвешенной справедливой
+очередью (start-time fair queuing):
+
+- объявлению присваивается виртуальное время окончания: время начала (не меньше
+  текущего виртуального времени и окончания предыдущего объявления канала)
+  плюс 1 / вес канала;
+- свободный обработчик берет объявление с наименьшим временем окончания среди
+  каналов, у которых не исчерпаны квоты. Канал с весом 2 получает вдвое больше
+  обработчиков, чем канал с весом 1, пока очереди есть у обоих; простаивавший
+  канал не копит "кредит" и не вытесняет остальных после возвращения.
+
+Квоты (config.ini, секции [channels] и [channel:<имя>]):
+- concurrency - одновременно обрабатываемых объявлений канала (1 сохраняет
+  порядок постов);
+- rate_per_minute - не чаще N объявлений канала в минуту (0 - без ограничения).
+
+Очереди каналов экспортируются метриками telegram_channel_backlog,
+telegram_channel_in_flight и telegram_channel_wait_seconds; суммарная очередь -
+telegram_queue_depth{queue=<имя планировщика>} (ее проверяет /readyz).
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.monitoring.freshness import channel_label
+from app.monitoring.metrics import QUEUE_DEPTH, CHANNEL_BACKLOG, CHANNEL_IN_FLIGHT, CHANNEL_WAIT
+from app.utils.config import get_channel_scheduler_config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_channels(value: str) -> List[str]:
+    """Список каналов из TELEGRAM_CHANNEL (через запятую)"""
+    return [channel.strip() for channel in (value or '').split(',') if channel.strip()]
+
+
+def channel_key(channel: str) -> str:
+    """Ключ очереди и квот: https://t.me/Name, @Name и Name -> name"""
+    return channel_label(channel).lower()
+
+
+@dataclass
+class ChannelQuota:
+    """Квоты канала-источника"""
+    weight: float = 1.0
+    concurrency: int = 1
+    rate_per_minute: float = 0
+
+
+# (время начала, время окончания, время постановки, канал как передан в submit, объявление)
+_Entry = Tuple[float, float, float, str, Any]
+
+
+class ChannelScheduler:
+    """Очереди по каналам-источникам с взвешенной справедливой выдачей обработчикам"""
+
+    def __init__(self, handler: Callable[[str, Any], Awaitable[Any]], workers: int = 4,
+                 default_quota: Optional[ChannelQuota] = None,
+                 quotas: Optional[Dict[str, ChannelQuota]] = None, name: str = 'channels'):
+        """
+        Args:
+            handler: Корутина handler(channel, item), обрабатывающая одно объявление
+            workers: Одновременно обрабатываемых объявлений по всем каналам
+            default_quota: Квоты каналов без отдельных настроек
+            quotas: Квоты отдельных каналов {имя канала: ChannelQuota}
+            name: Метка queue суммарной очереди в telegram_queue_depth
+        """
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.default_quota = default_quota or ChannelQuota()
+        self.quotas = {channel_key(channel): quota for channel, quota in (quotas or {}).items()}
+        self.name = name
+        self.processed: Dict[str, int] = {}
+        self._queues: Dict[str, Deque[_Entry]] = {}
+        self._last_finish: Dict[str, float] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._next_slot: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._pending = 0
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_config(cls, handler: Callable[[str, Any], Awaitable[Any]], name: str = 'channels') -> 'ChannelScheduler':
+        """Создает планировщик с квотами из config.ini"""
+        config = get_channel_scheduler_config()
+        return cls(
+            handler,
+            workers=config['workers'],
+            default_quota=ChannelQuota(**config['default']),
+            quotas={channel: ChannelQuota(**quota) for channel, quota in config['channels'].items()},
+            name=name,
+        )
+
+    def quota(self, channel: str) -> ChannelQuota:
+        """Квоты канала (отдельные или по умолчанию)"""
+        return self.quotas.get(channel_key(channel), self.default_quota)
+
+    def submit(self, channel: str, item: Any):
+        """
+        Ставит объявление в очередь канала (не блокирует)
+
+        Args:
+            channel: Канал-источник (@name, name или https://t.me/name); в handler
+                передается как есть
+            item: Объявление или сообщение для handler
+        """
+        key = channel_key(channel)
+        weight = self.quota(channel).weight
+        start = max(self._virtual_time, self._last_finish.get(key, 0.0))
+        finish = start + 1.0 / (weight if weight > 0 else 1.0)
+        self._last_finish[key] = finish
+        self._queues.setdefault(key, deque()).append((start, finish, time.monotonic(), channel, item))
+        self._pending += 1
+        self._idle.clear()
+        self._update_backlog(key)
+        self._wakeup.set()
+
+    def backlog(self) -> Dict[str, int]:
+        """Длина очереди по каналам"""
+        return {key: len(queue) for key, queue in self._queues.items() if queue}
+
+    def in_flight(self) -> Dict[str, int]:
+        """Объявления в обработке по каналам"""
+        return {key: count for key, count in self._in_flight.items() if count}
+
+    def _update_backlog(self, key: str):
+        CHANNEL_BACKLOG.labels(source_channel=key).set(len(self._queues.get(key, ())))
+        QUEUE_DEPTH.labels(queue=self.name).set(self._pending)
+
+    def _pick(self, now: float) -> Tuple[Optional[str], Optional[float]]:
+        """
+        Канал с наименьшим временем окончания первого объявления среди доступных
+
+        Returns:
+            (канал или None, через сколько секунд освободится канал, ограниченный
+            rate_per_minute, если сейчас доступных нет)
+        """
+        best_key = None
+        best_finish = None
+        retry_in = None
+        for key, queue in self._queues.items():
+            if not queue:
+                continue
+            quota = self.quotas.get(key, self.default_quota)
+            if self._in_flight.get(key, 0) >= max(1, quota.concurrency):
+                continue
+            slot = self._next_slot.get(key, 0.0)
+            if slot > now:
+                retry_in = slot - now if retry_in is None else min(retry_in, slot - now)
+                continue
+            finish = queue[0][1]
+            if best_finish is None or finish < best_finish:
+                best_key, best_finish = key, finish
+        return best_key, retry_in
+
+    async def _next(self) -> Tuple[str, _Entry]:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            key, retry_in = self._pick(now)
+            if key is not None:
+                entry = self._queues[key].popleft()
+                self._pending -= 1
+                self._virtual_time = max(self._virtual_time, entry[0])
+                self._in_flight[key] = self._in_flight.get(key, 0) + 1
+                rate = self.quotas.get(key, self.default_quota).rate_per_minute
+                if rate > 0:
+                    self._next_slot[key] = max(now, self._next_slot.get(key, 0.0)) + 60.0 / rate
+                self._update_backlog(key)
+                CHANNEL_IN_FLIGHT.labels(source_channel=key).set(self._in_flight[key])
+                CHANNEL_WAIT.labels(source_channel=key).observe(now - entry[2])
+                return key, entry
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), retry_in)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            key, (_, _, _, channel, item) = await self._next()
+            try:
+                await self.handler(channel, item)
+            except Exception as e:
+                logger.error(f"Ошибка обработки объявления из {channel}: {e}")
+            finally:
+                self._in_flight[key] -= 1
+                self.processed[key] = self.processed.get(key, 0) + 1
+                CHANNEL_IN_FLIGHT.labels(source_channel=key).set(self._in_flight[key])
+                if not self._pending and not any(self._in_flight.values()):
+                    self._idle.set()
+                self._wakeup.set()
+
+    def start(self):
+        """Запускает обработчики в текущем event loop"""
+        if not self._tasks:
+            loop = asyncio.get_running_loop()
+            self._tasks = [loop.create_task(self._worker()) for _ in range(self.workers)]
+            logger.info(f"Планировщик каналов '{self.name}' запущен ({self.workers} обработчиков)")
+
+    async def join(self):
+        """Ждет, пока все поставленные объявления не будут обработаны"""
+        await self._idle.wait()
+
+    async def stop(self):
+        """Останавливает обработчики; необработанные объявления отбрасываются"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pending:
+            logger.warning(f"Планировщик '{self.name}' остановлен, в очередях осталось {self._pending} объявлений: "
+                           f"{self.backlog()}")
@@ -53,4 +53,51 @@ def get_application_config():
     if not button_url or not button_url.strip():
         return None, None
         
-    return button_text, button_url 
\ No newline at end of file
+    return button_text, button_url
+
+def get_freshness_config():
+    """
+    Возвращает параметры SLO свежести из секции [freshness].
+    Если config.ini отсутствует, используются значения по умолчанию.
+    """
+    try:
+        config = get_config()
+    except FileNotFoundError:
+        config = configparser.ConfigParser()
+    return {
+        'slo_p95_seconds': config.getfloat('freshness', 'slo_p95_seconds', fallback=900),
+        'window_minutes': config.getfloat('freshness', 'window_minutes', fallback=60),
+        'min_samples': config.getint('freshness', 'min_samples', fallback=10),
+        'alert_cooldown_minutes': config.getfloat('freshness', 'alert_cooldown_minutes', fallback=60),
+        'ignore_older_than_hours': config.getfloat('freshness', 'ignore_older_than_hours', fallback=24),
+    }
+
+def get_channel_scheduler_config():
+    """
+    Возвращает квоты планировщика каналов-источников.
+    Секция [channels] - общее число обработчиков и квоты по умолчанию,
+    секции [channel:<имя>] - квоты отдельных каналов (имя без @ и https://t.me/).
+    Если config.ini отсутствует, используются значения по умолчанию.
+    """
+    try:
+        config = get_config()
+    except FileNotFoundError:
+        config = configparser.ConfigParser()
+
+    def quota(section, fallback):
+        return {
+            'weight': config.getfloat(section, 'weight', fallback=fallback['weight']),
+            'concurrency': config.getint(section, 'concurrency', fallback=fallback['concurrency']),
+            'rate_per_minute': config.getfloat(section, 'rate_per_minute', fallback=fallback['rate_per_minute']),
+        }
+
+    default = quota('channels', {'weight': 1.0, 'concurrency': 1, 'rate_per_minute': 0})
+    channels = {
+        section.split(':', 1)[1].strip().lower(): quota(section, default)
+        for section in config.sections() if section.startswith('channel:')
+    }
+    return {
+        'workers': config.getint('channels', 'workers', fallback=4),
+        'default': default,
+        'channels': channels,
+    }
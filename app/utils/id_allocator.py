@@ -0,0 +1,238 @@
+"""
+Аллокатор custom ID на битовой карте
+
+Пространство XXX-XXX (1 000 000 номеров) хранится битовой картой в 125 КБ:
+бит номера N выставлен, если ID занят. Карта лежит в CUSTOM_ID_BITMAP и при
+старте дополняется ID, уже сохраненными в Storage API, поэтому новые ID не
+совпадают с записями в базе и после перезапуска.
+
+Свободный номер ищется по 64-битным словам со случайного места: заполненные
+байты пропускаются поиском на C, свободный бит внутри слова находится битовыми
+операциями. Несколько процессов делят один файл: номера выдаются арендой по
+CUSTOM_ID_LEASE_SIZE штук под блокировкой файла (flock), которая перечитывает
+карту, занимает номера и сразу пишет ее обратно. Не выданные до остановки
+номера аренды остаются занятыми.
+"""
+
+import os
+import re
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Iterable, Deque
+
+from app.monitoring.metrics import CUSTOM_IDS_REMAINING
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+TOTAL_IDS = 1_000_000
+BITMAP_BYTES = TOTAL_IDS // 8
+CUSTOM_ID_BITMAP = 'data/custom_ids.bitmap'
+
+_WORD_BITS = 64
+_WORD_BYTES = _WORD_BITS // 8
+_FULL_WORD = (1 << _WORD_BITS) - 1
+# Байт, в котором есть свободный бит: поиск идет на C, а не циклом Python
+_FREE_BYTE = re.compile(rb'[^\xff]')
+
+
+class IDSpaceExhausted(Exception):
+    """Все номера XXX-XXX заняты"""
+
+
+class IDBitmap:
+    """Битовая карта занятых номеров 0..999 999"""
+
+    def __init__(self, data: Optional[bytes] = None):
+        self._bytes = bytearray(BITMAP_BYTES)
+        if data:
+            self._bytes[:min(len(data), BITMAP_BYTES)] = data[:BITMAP_BYTES]
+        self.used = self._count()
+
+    def _count(self) -> int:
+        return int.from_bytes(self._bytes, 'little').bit_count()
+
+    def __contains__(self, number: int) -> bool:
+        return bool(self._bytes[number >> 3] & (1 << (number & 7)))
+
+    def add(self, number: int) -> bool:
+        """Занимает номер; False, если он уже был занят"""
+        mask = 1 << (number & 7)
+        if self._bytes[number >> 3] & mask:
+            return False
+        self._bytes[number >> 3] |= mask
+        self.used += 1
+        return True
+
+    def take(self, rng: random.Random) -> int:
+        """
+        Занимает случайный свободный номер
+
+        Returns:
+            Номер 0..999 999
+
+        Raises:
+            IDSpaceExhausted: свободных номеров нет
+        """
+        if self.used >= TOTAL_IDS:
+            raise IDSpaceExhausted("Все custom ID XXX-XXX заняты")
+        start = rng.randrange(BITMAP_BYTES)
+        found = _FREE_BYTE.search(self._bytes, start) or _FREE_BYTE.search(self._bytes, 0, start)
+        word = found.start() // _WORD_BYTES
+        offset = word * _WORD_BYTES
+        free = ~int.from_bytes(self._bytes[offset:offset + _WORD_BYTES], 'little') & _FULL_WORD
+        # Первый свободный бит слова не раньше случайной позиции (по кругу)
+        shift = rng.randrange(_WORD_BITS)
+        rotated = ((free >> shift) | (free << (_WORD_BITS - shift))) & _FULL_WORD
+        bit = (shift + (rotated & -rotated).bit_length() - 1) % _WORD_BITS
+        number = word * _WORD_BITS + bit
+        self.add(number)
+        return number
+
+    def load(self, data: bytes):
+        """Заменяет содержимое карты (например, прочитанным из файла)"""
+        self._bytes[:] = bytes(BITMAP_BYTES)
+        self._bytes[:min(len(data), BITMAP_BYTES)] = data[:BITMAP_BYTES]
+        self.used = self._count()
+
+    def clear(self):
+        self.load(b'')
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._bytes)
+
+
+class IDAllocator:
+    """Выдает свободные номера custom ID; потокобезопасен, делит файл карты между процессами"""
+
+    def __init__(self, path: Optional[str] = None, lease_size: int = 16, seed: Optional[int] = None):
+        """
+        Args:
+            path: Файл битовой карты (None - карта только в памяти)
+            lease_size: Сколько номеров занимать за одно обращение к файлу
+            seed: Seed генератора случайных позиций (для тестов)
+        """
+        self.path = path
+        self.lease_size = max(1, lease_size)
+        self.bitmap = IDBitmap()
+        self._leased: Deque[int] = deque()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._file() as fd:
+                self._reload(fd)
+        self._report()
+
+    @classmethod
+    def from_env(cls) -> 'IDAllocator':
+        """Читает CUSTOM_ID_BITMAP (пустое значение - только в памяти) и CUSTOM_ID_LEASE_SIZE"""
+        return cls(
+            path=os.getenv('CUSTOM_ID_BITMAP', CUSTOM_ID_BITMAP) or None,
+            lease_size=int(os.getenv('CUSTOM_ID_LEASE_SIZE', '16')),
+        )
+
+    @property
+    def used_count(self) -> int:
+        """Занятые номера, включая арендованные, но еще не выданные"""
+        return self.bitmap.used
+
+    @property
+    def remaining(self) -> int:
+        return TOTAL_IDS - self.bitmap.used
+
+    @contextmanager
+    def _file(self):
+        """Открытый под эксклюзивной блокировкой файл карты"""
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield fd
+        finally:
+            os.close(fd)
+
+    def _reload(self, fd: int):
+        self.bitmap.load(os.pread(fd, BITMAP_BYTES, 0))
+
+    def _write(self, fd: int):
+        os.pwrite(fd, self.bitmap.to_bytes(), 0)
+
+    def _report(self):
+        CUSTOM_IDS_REMAINING.set(self.remaining)
+
+    def _lease(self):
+        """Занимает lease_size номеров (с перечитыванием и записью файла карты)"""
+        if not self.path:
+            self._leased.append(self.bitmap.take(self._rng))
+            return
+        with self._file() as fd:
+            self._reload(fd)
+            for _ in range(self.lease_size):
+                try:
+                    self._leased.append(self.bitmap.take(self._rng))
+                except IDSpaceExhausted:
+                    if not self._leased:
+                        raise
+                    break
+            self._write(fd)
+
+    def allocate(self) -> int:
+        """
+        Выдает свободный номер
+
+        Returns:
+            Номер 0..999 999
+
+        Raises:
+            IDSpaceExhausted: свободных номеров нет
+        """
+        with self._lock:
+            if not self._leased:
+                self._lease()
+                self._report()
+            return self._leased.popleft()
+
+    def mark_used(self, numbers: Iterable[int]) -> int:
+        """
+        Отмечает номера занятыми (например, ID из базы)
+
+        Returns:
+            Сколько номеров было свободно до вызова
+        """
+        numbers = list(numbers)
+        with self._lock:
+            if not self.path:
+                added = sum(1 for number in numbers if self.bitmap.add(number))
+            else:
+                with self._file() as fd:
+                    self._reload(fd)
+                    added = sum(1 for number in numbers if self.bitmap.add(number))
+                    if added:
+                        self._write(fd)
+            # Номер из аренды уже выдан кем-то другим - не выдаем его повторно
+            if self._leased:
+                taken = set(numbers)
+                self._leased = deque(number for number in self._leased if number not in taken)
+            self._report()
+        return added
+
+    def reset(self):
+        """Очищает карту (и файл, если он задан)"""
+        with self._lock:
+            self._leased.clear()
+            self.bitmap.clear()
+            if self.path:
+                with self._file() as fd:
+                    self._write(fd)
+            self._report()
@@ -1,18 +1,36 @@
 """
 Генератор уникальных ID для автомобилей
 Формат: XXX-XXX (например, 023-455)
+
+Занятые ID хранятся битовой картой в файле CUSTOM_ID_BITMAP (см. id_allocator.py)
 """
 
-import random
-import string
-from typing import Set
 import re
+import logging
+from typing import Optional, Iterable
+
+from app.utils.id_allocator import IDAllocator, TOTAL_IDS
+
+logger = logging.getLogger(__name__)
+
+
+def _to_number(custom_id: str) -> int:
+    return int(custom_id[:3]) * 1000 + int(custom_id[4:])
+
+
+def _to_custom_id(number: int) -> str:
+    return f"{number // 1000:03d}-{number % 1000:03d}"
+
 
 class CustomIDGenerator:
     """Генератор custom ID в формате XXX-XXX"""
     
-    def __init__(self):
-        self._used_ids: Set[str] = set()
+    def __init__(self, allocator: Optional[IDAllocator] = None):
+        """
+        Args:
+            allocator: Битовая карта занятых ID (по умолчанию - только в памяти)
+        """
+        self._allocator = allocator or IDAllocator()
     
     def generate_id(self) -> str:
         """
@@ -21,19 +39,10 @@ class CustomIDGenerator:
         Returns:
             Строка в формате XXX-XXX, например "023-455"
         """
-        while True:
-            # Генерируем 6 цифр
-            digits = [str(random.randint(0, 9)) for _ in range(6)]
-            
-            # Форматируем как XXX-XXX
-            custom_id = f"{digits[0]}{digits[1]}{digits[2]}-{digits[3]}{digits[4]}{digits[5]}"
-            
-            # Проверяем уникальность
-            if custom_id not in self._used_ids:
-                self._used_ids.add(custom_id)
-                return custom_id
+        return _to_custom_id(self._allocator.allocate())
     
-    def is_valid_format(self, custom_id: str) -> bool:
+    @staticmethod
+    def is_valid_format(custom_id: str) -> bool:
         """
         Проверяет, соответствует ли ID формату XXX-XXX
         
@@ -57,19 +66,39 @@ class CustomIDGenerator:
         Args:
             custom_id: ID для отметки
         """
-        if self.is_valid_format(custom_id):
-            self._used_ids.add(custom_id)
+        self.mark_many_as_used([custom_id])
+    
+    def mark_many_as_used(self, custom_ids: Iterable[str]) -> int:
+        """
+        Отмечает ID использованными одной записью карты
+        
+        Args:
+            custom_ids: ID для отметки (неверный формат пропускается)
+            
+        Returns:
+            Сколько ID были свободны до вызова
+        """
+        return self._allocator.mark_used(
+            _to_number(custom_id) for custom_id in custom_ids if self.is_valid_format(custom_id)
+        )
     
     def reset_used_ids(self) -> None:
         """Очищает список использованных ID"""
-        self._used_ids.clear()
+        self._allocator.reset()
     
     def get_used_ids_count(self) -> int:
         """Возвращает количество использованных ID"""
-        return len(self._used_ids)
+        return self._allocator.used_count
+
+# Глобальный экземпляр генератора (создается при первом обращении)
+_global_generator: Optional[CustomIDGenerator] = None
 
-# Глобальный экземпляр генератора
-_global_generator = CustomIDGenerator()
+def get_generator() -> CustomIDGenerator:
+    """Глобальный генератор на битовой карте CUSTOM_ID_BITMAP"""
+    global _global_generator
+    if _global_generator is None:
+        _global_generator = CustomIDGenerator(IDAllocator.from_env())
+    return _global_generator
 
 def generate_custom_id() -> str:
     """
@@ -78,7 +107,28 @@ def generate_custom_id() -> str:
     Returns:
         Уникальный ID в формате XXX-XXX
     """
-    return _global_generator.generate_id()
+    return get_generator().generate_id()
+
+def seed_used_ids_from_storage() -> Optional[int]:
+    """
+    Отмечает занятыми все custom ID из Storage API (вызывается при старте)
+    
+    Returns:
+        Сколько ID из базы не было в карте, или None, если API недоступен
+    """
+    from app.storage_api.database_client import get_client
+    
+    custom_ids = get_client().get_custom_ids()
+    if custom_ids is None:
+        logger.warning("Не удалось получить custom ID из Storage API, карта ID не дополнена")
+        return None
+    generator = get_generator()
+    added = generator.mark_many_as_used(custom_ids)
+    logger.info(
+        f"Карта custom ID: из базы {len(custom_ids)}, новых {added}, "
+        f"занято {generator.get_used_ids_count()} из {TOTAL_IDS}"
+    )
+    return added
 
 def is_valid_custom_id(custom_id: str) -> bool:
     """
@@ -90,7 +140,7 @@ def is_valid_custom_id(custom_id: str) -> bool:
     Returns:
         True если формат правильный
     """
-    return _global_generator.is_valid_format(custom_id)
+    return CustomIDGenerator.is_valid_format(custom_id)
 
 def mark_id_as_used(custom_id: str) -> None:
     """
@@ -99,7 +149,7 @@ def mark_id_as_used(custom_id: str) -> None:
     Args:
         custom_id: ID для отметки
     """
-    _global_generator.mark_as_used(custom_id)
+    get_generator().mark_as_used(custom_id)
 
 def convert_old_id_to_new_format(old_id: str) -> str:
     """
@@ -185,8 +235,8 @@ def get_id_statistics() -> dict:
     Returns:
         Словарь со статистикой
     """
-    total_possible = 1000000  # 000-000 до 999-999
-    used_count = _global_generator.get_used_ids_count()
+    total_possible = TOTAL_IDS  # 000-000 до 999-999
+    used_count = get_generator().get_used_ids_count()
     
     return {
         "total_possible": total_possible,
@@ -238,4 +288,6 @@ def test_id_generation():
         print(f"'{text}' → {'✅ ' + extracted_id if extracted_id else '❌ не найден'}")
 
 if __name__ == "__main__":
+    # Карта только в памяти: демонстрация не занимает ID в рабочей карте CUSTOM_ID_BITMAP
+    _global_generator = CustomIDGenerator()
     test_id_generation() 
\ No newline at end of file
@@ -120,6 +120,178 @@ Custom ID: {custom_id}
         """Извлекает хештеги из сообщения"""
         return re.findall(r'#\w+', message)
 
+# Остатки Markdown в ответе LLM: каждое правило работает в пределах строки
+_MARKDOWN_BOLD = re.compile(r'\*\*(.*?)\*\*')
+_MARKDOWN_ITALIC = re.compile(r'\*(.*?)\*')
+_MARKDOWN_LIST = re.compile(r'^- ', re.MULTILINE)
+_HEADER_TITLE = re.compile(r'(🛠|📊|🛡|📱|📦|⚙️)\s*(.+)')
+_GLUED_HASHTAG = re.compile(r'(#[^\s#]+)(?=#)')
+
+_DETAILS_EMOJI = '⚙️'
+_DETAILS_TITLE = 'Дополнительные детали'
+
+
+@dataclass(frozen=True)
+class _SectionRule:
+    """Заголовок секции с эмодзи: названия и начала строк, после которых цитата пуста"""
+    emoji: str
+    titles: tuple
+    stops: tuple
+    variation: bool = False
+
+
+# Порядок важен: каждое правило видит результат предыдущих, секция ⚙️ (см.
+# _quote_details) обрабатывается сразу после технических характеристик
+_SECTION_RULES = (
+    _SectionRule('🛠', ('Технические характеристики', 'Technical specifications'),
+                 ('🛡', '📱', '📊', '⚙️', 'Custom ID', '#'), variation=True),
+    _SectionRule('📊', ('Дополнительные детали', 'Additional details'),
+                 ('🛠', '🛡', '📱', '⚙️', 'Custom ID', '#')),
+    _SectionRule('🛡', ('Системы безопасности', 'Safety systems', 'Состояние и документы'),
+                 ('🛠', '📱', '📊', '⚙️', 'Custom ID', '#'), variation=True),
+    _SectionRule('📱', ('Мультимедиа', 'Multimedia'),
+                 ('🛠', '🛡', '📊', '⚙️', 'Custom ID', '#')),
+    _SectionRule('📦', ('Условия продажи', 'Sales terms'),
+                 ('🛠', '🛡', '📱', '📊', '⚙️', 'Custom ID', '#')),
+)
+
+
+def _format_section(header: str, content: str) -> str:
+    """Заголовок секции в <b> и ее содержимое в <blockquote>"""
+    header = header.strip().replace('**', '').replace('🛠️', '🛠').replace('🛡️', '🛡')
+    if '<b>' not in header or '</b>' not in header:
+        header = _HEADER_TITLE.sub(r'\1 <b>\2</b>', header)
+    content = content.strip()
+    if content:
+        return f"{header}\n<blockquote>{content}</blockquote>"
+    return header
+
+
+def _section_header_end(text: str, start: int, rule: _SectionRule) -> int:
+    """
+    Разбирает заголовок секции, начинающийся с эмодзи в позиции start
+
+    Returns:
+        Позиция последнего перевода строки после заголовка или -1, если это не заголовок
+    """
+    length = len(text)
+    pos = start + len(rule.emoji)
+    if rule.variation and text.startswith('\ufe0f', pos):
+        pos += 1
+    while pos < length and text[pos].isspace():
+        pos += 1
+    for marker in ('**', '<b>'):
+        if text.startswith(marker, pos):
+            pos += len(marker)
+    for title in rule.titles:
+        if text.startswith(title, pos):
+            pos += len(title)
+            break
+    else:
+        return -1
+    for marker in ('</b>', '**'):
+        if text.startswith(marker, pos):
+            pos += len(marker)
+    newline = -1
+    while pos < length and (text[pos] == ':' or text[pos].isspace()):
+        if text[pos] == '\n':
+            newline = pos
+        pos += 1
+    return newline
+
+
+def _quote_section(text: str, rule: _SectionRule) -> str:
+    """
+    Оборачивает секцию rule в цитату
+
+    Цитата продолжается до конца текста, если строка после заголовка не
+    начинается с другого заголовка, Custom ID или хештега - тогда секция пуста и
+    от нее остается только заголовок. Найденные внутри цитаты заголовки того же
+    вида не обрабатываются.
+    """
+    parts = []
+    copied = search = 0
+    while True:
+        start = text.find(rule.emoji, search)
+        if start < 0:
+            break
+        newline = _section_header_end(text, start, rule)
+        if newline < 0:
+            search = start + 1
+            continue
+        body = newline + 1
+        end = len(text) if body < len(text) and not text.startswith(rule.stops, body) else body
+        parts.append(text[copied:start])
+        parts.append(_format_section(text[start:newline], text[body:end]))
+        copied = search = end
+    parts.append(text[copied:])
+    return ''.join(parts)
+
+
+def _quote_details(text: str) -> str:
+    """
+    Оборачивает в цитату секции от ⚙️ до строки с «Дополнительные детали»
+
+    Цитата заканчивается перед ближайшим хештегом (и пустыми строками перед
+    ним); без хештега после заголовка секция не оформляется.
+    """
+    parts = []
+    copied = 0
+    while True:
+        start = text.find(_DETAILS_EMOJI, copied)
+        if start < 0:
+            break
+        title = text.find(_DETAILS_TITLE, start + len(_DETAILS_EMOJI))
+        newline = text.find('\n', title + len(_DETAILS_TITLE)) if title >= 0 else -1
+        hashtag = text.find('#', newline + 1) if newline >= 0 else -1
+        if hashtag < 0:
+            break
+        end = hashtag
+        while end > newline + 1 and text[end - 1] == '\n':
+            end -= 1
+        parts.append(text[copied:start])
+        parts.append(_format_section(text[start:newline], text[newline + 1:end]))
+        copied = end
+    parts.append(text[copied:])
+    return ''.join(parts)
+
+
+def format_perplexity_response_with_quotes(response_text: str) -> str:
+    """
+    Очищает ответ от Perplexity от остатков Markdown и применяет HTML форматирование
+
+    Заголовки секций разбираются линейным сканированием по позициям эмодзи, без
+    перебора с возвратом: время растет линейно с длиной ответа, в том числе для
+    длинных секций без хештегов в конце.
+    
+    Args:
+        response_text: Текст ответа от Perplexity
+        
+    Returns:
+        Очищенный текст в HTML формате с blockquote для технических секций
+    """
+    if not response_text:
+        return response_text
+    
+    # Убираем **, * и - в начале строк (остатки Markdown)
+    cleaned_text = _MARKDOWN_BOLD.sub(r'<b>\1</b>', response_text)
+    cleaned_text = _MARKDOWN_ITALIC.sub(r'<i>\1</i>', cleaned_text)
+    cleaned_text = _MARKDOWN_LIST.sub('', cleaned_text)
+    
+    # Оборачиваем технические секции в blockquote
+    cleaned_text = _quote_section(cleaned_text, _SECTION_RULES[0])
+    cleaned_text = _quote_details(cleaned_text)
+    for rule in _SECTION_RULES[1:]:
+        cleaned_text = _quote_section(cleaned_text, rule)
+    
+    # Разделяем хештеги пробелами, если они слиплись
+    return _GLUED_HASHTAG.sub(r'\1 ', cleaned_text)
+
+
+# Заголовки блоков описания, которые MessageFormatter оформляет цитатой
+QUOTED_SECTION_TITLES = ('Основные характеристики', 'Комплектация и опции', 'Преимущества')
+
+
 class MessageFormatter:
     def __init__(self, template_path: Optional[str] = None):
         self.default_template = '''📌 Заголовок: {title}
@@ -259,37 +431,40 @@ class MessageFormatter:
     def _quote_sections(self, text: str) -> str:
         """
         Оборачивает блоки после заголовков в цитату (> ...), если встречаются ключевые заголовки.
+
+        Заголовок - отдельная строка «Заголовок» или «Заголовок:», за которой
+        есть еще строки; строка сразу после другого заголовка заголовком не
+        считается. Текст разбирается за один проход по строкам.
         """
         if not text:
             return text
-        import re
-        # Список заголовков
-        headers = [
-            'Основные характеристики',
-            'Комплектация и опции',
-            'Преимущества'
-        ]
-        # Разбиваем текст на блоки по заголовкам
-        pattern = r'(^|\n)(%s):?\n' % '|'.join(headers)
-        parts = re.split(pattern, text)
-        if len(parts) <= 1:
+        intro: List[str] = []
+        sections = []
+        current = intro
+        lines = text.split('\n')
+        after_header = False
+        for index, line in enumerate(lines):
+            title = line[:-1] if line.endswith(':') else line
+            if title in QUOTED_SECTION_TITLES and not after_header and index + 1 < len(lines):
+                current = []
+                sections.append((title, current))
+                after_header = True
+                continue
+            current.append(line)
+            after_header = False
+        if not sections:
             return text  # нет заголовков
         result = []
-        i = 0
-        while i < len(parts):
-            if parts[i] in headers:
-                header = parts[i]
-                # Следующий элемент — текст блока
-                block = parts[i+1] if i+1 < len(parts) else ''
-                # Оборачиваем каждую строку блока в цитату
-                quoted = '\n'.join('> ' + line if line.strip() else '' for line in block.strip().split('\n'))
-                result.append(f'{header}:\n{quoted}')
-                i += 2
-            else:
-                # Просто текст вне секций
-                if parts[i].strip():
-                    result.append(parts[i].strip())
-                i += 1
+        intro_text = '\n'.join(intro).strip()
+        if intro_text:
+            result.append(intro_text)
+        for title, block in sections:
+            # Оборачиваем каждую строку блока в цитату
+            quoted = '\n'.join(
+                '> ' + line if line.strip() else ''
+                for line in '\n'.join(block).strip().split('\n')
+            )
+            result.append(f'{title}:\n{quoted}')
         return '\n\n'.join(result) 
 
     def format_car_message(self, car_data: Dict, pricing_config: Dict, application_config: Dict) -> str:
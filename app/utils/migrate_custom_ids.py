@@ -1,328 +1,440 @@
 """
 Утилита для миграции custom_id в базе данных на новый формат XXX-XXX
+
+Автомобили читаются из Storage API постранично по курсору (custom_id по
+возрастанию), поэтому записи, добавленные ботом во время обхода, не сдвигают
+страницы. В памяти остаются только ID, без самих записей. Конфликты ищутся по хеш-индексам (уже занятые ID и ID,
+обещанные другим записям плана). Обновления идут параллельно (не больше
+concurrency запросов) через одну HTTP-сессию, каждое завершенное обновление
+дописывается в checkpoint - прерванная миграция продолжается с того же места.
+Checkpoint относится к одному незавершенному запуску: после запуска без ошибок
+он удаляется, а пропускаются только записи, совпадающие с текущим планом.
 """
 
+import os
+import json
+import time
 import asyncio
 import aiohttp
-import json
-from typing import List, Dict, Tuple
+from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Set, Iterable, AsyncIterator, Optional
 from app.utils.id_generator import (
-    convert_old_id_to_new_format, 
+    convert_old_id_to_new_format,
     is_valid_custom_id,
-    mark_id_as_used,
+    get_generator,
     get_id_statistics
 )
 
+MIGRATION_CHECKPOINT = 'migration_checkpoint.jsonl'
+
+
+@dataclass
+class MigrationScan:
+    """Результат обхода базы: только ID, без записей автомобилей"""
+    total_cars: int = 0
+    valid_ids: Set[str] = field(default_factory=set)
+    # Старые ID в порядке обхода (dict - без повторов)
+    legacy_ids: Dict[str, None] = field(default_factory=dict)
+
+    def add(self, car: Dict):
+        self.total_cars += 1
+        custom_id = car.get('custom_id', '')
+        if is_valid_custom_id(custom_id):
+            self.valid_ids.add(custom_id)
+        else:
+            self.legacy_ids[custom_id] = None
+
+    def plan(self) -> Tuple[List[Tuple[str, str]], List[Dict]]:
+        """
+        Делит старые ID на план миграции и конфликты
+
+        Занятые ID должны быть отмечены в генераторе до вызова: короткие старые
+        ID получают новые случайные ID.
+
+        Returns:
+            Tuple[[(старый ID, новый ID)], conflicts]
+        """
+        claimed: Dict[str, str] = {}
+        plan = []
+        conflicts = []
+        for old_id in self.legacy_ids:
+            new_id = convert_old_id_to_new_format(old_id)
+            if new_id in self.valid_ids:
+                reason = 'Конвертированный ID уже существует'
+            elif new_id in claimed:
+                reason = f'Конвертированный ID уже получает {claimed[new_id]}'
+            else:
+                claimed[new_id] = old_id
+                plan.append((old_id, new_id))
+                continue
+            conflicts.append({
+                'old_id': old_id,
+                'proposed_new_id': new_id,
+                'conflict_reason': reason
+            })
+        return plan, conflicts
+
+
 class CustomIDMigrator:
     """Класс для миграции custom_id в базе данных"""
-    
-    def __init__(self, node_api_url: str = "http://localhost:3001"):
+
+    def __init__(self, node_api_url: str = "http://localhost:3001", page_size: int = 500,
+                 concurrency: int = 16, checkpoint_path: Optional[str] = MIGRATION_CHECKPOINT):
+        """
+        Args:
+            node_api_url: Адрес Storage API
+            page_size: Автомобилей на страницу при обходе базы
+            concurrency: Одновременных запросов на обновление
+            checkpoint_path: Файл завершенных обновлений (None - без checkpoint)
+        """
         self.node_api_url = node_api_url
+        self.page_size = page_size
+        self.concurrency = concurrency
+        self.checkpoint_path = checkpoint_path
         self.migration_log = []
         self.conflicts = []
-        
+
+    async def _get_cars_page(self, session: aiohttp.ClientSession, params: Dict) -> Dict:
+        """Одна страница /api/cars"""
+        async with session.get(f"{self.node_api_url}/api/cars", params=params) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Ошибка получения автомобилей ({params}): {response.status}")
+            return await response.json()
+
+    async def iter_car_pages(self, session: aiohttp.ClientSession) -> AsyncIterator[List[Dict]]:
+        """
+        Автомобили из базы страницами по page_size
+
+        Страницы запрашиваются по курсору after (custom_id по возрастанию):
+        вставка новой записи во время обхода не сдвигает страницы и не
+        приводит к пропуску автомобиля. Старый сервер без курсора обходится
+        по page (ORDER BY created_at DESC) - на время миграции бота нужно
+        остановить.
+        """
+        after = ''
+        while True:
+            data = await self._get_cars_page(session, {'after': after, 'limit': self.page_size})
+            pagination = data.get('pagination') or {}
+            if 'next_after' not in pagination:
+                print("⚠️ Storage API не поддерживает курсор after: обход по page, "
+                      "остановите бота на время миграции")
+                async for cars in self._iter_offset_pages(session, data):
+                    yield cars
+                return
+            cars = data.get('cars', [])
+            if cars:
+                yield cars
+            after = pagination['next_after']
+            if not cars or not after:
+                return
+
+    async def _iter_offset_pages(self, session: aiohttp.ClientSession, data: Dict) -> AsyncIterator[List[Dict]]:
+        """Обход по номерам страниц; data - уже полученная первая страница"""
+        page = 1
+        while True:
+            cars = data.get('cars', [])
+            if cars:
+                yield cars
+            pages = (data.get('pagination') or {}).get('pages', page)
+            if not cars or page >= pages:
+                return
+            page += 1
+            data = await self._get_cars_page(session, {'page': page, 'limit': self.page_size})
+
     async def get_all_cars(self) -> List[Dict]:
         """Получает все автомобили из базы данных"""
         try:
             async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.node_api_url}/api/cars") as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return data.get('cars', [])
-                    else:
-                        print(f"❌ Ошибка получения автомобилей: {response.status}")
-                        return []
+                return [car async for cars in self.iter_car_pages(session) for car in cars]
         except Exception as e:
             print(f"❌ Исключение при получении автомобилей: {e}")
             return []
-    
-    async def update_car_id(self, old_id: str, new_id: str, car_data: Dict) -> bool:
-        """Обновляет custom_id автомобиля в базе данных"""
+
+    async def scan(self, session: aiohttp.ClientSession) -> MigrationScan:
+        """Обходит базу постранично и собирает ID"""
+        scan = MigrationScan()
+        async for cars in self.iter_car_pages(session):
+            for car in cars:
+                scan.add(car)
+        return scan
+
+    async def update_car_id(self, old_id: str, new_id: str, car_data: Optional[Dict] = None,
+                            session: Optional[aiohttp.ClientSession] = None) -> bool:
+        """Обновляет custom_id автомобиля в базе данных (остальные поля не меняются)"""
+        if session is None:
+            async with aiohttp.ClientSession() as own_session:
+                return await self.update_car_id(old_id, new_id, car_data, own_session)
         try:
-            # Обновляем car_data с новым ID
-            updated_data = car_data.copy()
-            updated_data['custom_id'] = new_id
-            
-            async with aiohttp.ClientSession() as session:
-                # Обновляем запись
-                async with session.put(
-                    f"{self.node_api_url}/api/cars/{old_id}",
-                    json=updated_data,
-                    headers={'Content-Type': 'application/json'}
-                ) as response:
-                    if response.status == 200:
-                        return True
-                    else:
-                        print(f"❌ Ошибка обновления {old_id} → {new_id}: {response.status}")
-                        error_text = await response.text()
-                        print(f"   Детали: {error_text}")
-                        return False
+            async with session.put(
+                f"{self.node_api_url}/api/cars/{old_id}",
+                json={'custom_id': new_id},
+                headers={'Content-Type': 'application/json'}
+            ) as response:
+                if response.status == 200:
+                    return True
+                error_text = await response.text()
+                print(f"❌ Ошибка обновления {old_id} → {new_id}: {response.status} {error_text[:200]}")
+                return False
         except Exception as e:
             print(f"❌ Исключение при обновлении {old_id} → {new_id}: {e}")
             return False
-    
-    def analyze_existing_ids(self, cars: List[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
+
+    def analyze_existing_ids(self, cars: Iterable[Dict]) -> Tuple[List[Dict], List[Dict], List[Dict]]:
         """
         Анализирует существующие ID и классифицирует их
-        
+
         Returns:
             Tuple[valid_cars, needs_migration, conflicts]
         """
         valid_cars = []
         needs_migration = []
-        conflicts = []
-        
-        existing_new_ids = set()
-        
+        scan = MigrationScan()
         for car in cars:
-            custom_id = car.get('custom_id', '')
-            
-            if is_valid_custom_id(custom_id):
+            scan.add(car)
+            if is_valid_custom_id(car.get('custom_id', '')):
                 valid_cars.append(car)
-                existing_new_ids.add(custom_id)
             else:
                 needs_migration.append(car)
-        
-        # Проверяем конфликты - когда конвертация приводит к уже существующему ID
-        for car in needs_migration:
-            old_id = car.get('custom_id', '')
-            new_id = convert_old_id_to_new_format(old_id)
-            
-            if new_id in existing_new_ids:
-                conflicts.append({
-                    'car': car,
-                    'old_id': old_id,
-                    'proposed_new_id': new_id,
-                    'conflict_reason': 'Конвертированный ID уже существует'
-                })
-        
+        _, conflicts = scan.plan()
         return valid_cars, needs_migration, conflicts
-    
+
+    def _load_checkpoint(self) -> Set[Tuple[str, str]]:
+        """Пары (старый ID, новый ID), уже успешно обновленные прерванным запуском"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return set()
+        done = set()
+        with open(self.checkpoint_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get('ok'):
+                    done.add((entry['old_id'], entry['new_id']))
+        return done
+
+    def _clear_checkpoint(self):
+        """Удаляет checkpoint завершенного запуска, чтобы он не влиял на следующие"""
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    async def apply_updates(self, session: aiohttp.ClientSession,
+                            plan: List[Tuple[str, str]], label: str = 'SUCCESS') -> Tuple[int, int]:
+        """
+        Выполняет обновления параллельно, дописывая результаты в checkpoint
+
+        Returns:
+            Tuple[успешных, неудачных]
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        checkpoint = open(self.checkpoint_path, 'a', encoding='utf-8') if self.checkpoint_path else None
+        counts = {'ok': 0, 'failed': 0}
+        started = time.monotonic()
+
+        async def update(old_id: str, new_id: str):
+            async with semaphore:
+                ok = await self.update_car_id(old_id, new_id, session=session)
+            counts['ok' if ok else 'failed'] += 1
+            self.migration_log.append(f"{label if ok else 'FAILED'}: {old_id} → {new_id}")
+            if checkpoint:
+                checkpoint.write(json.dumps({'old_id': old_id, 'new_id': new_id, 'ok': ok}, ensure_ascii=False) + '\n')
+            finished = counts['ok'] + counts['failed']
+            if finished % 500 == 0 or finished == len(plan):
+                if checkpoint:
+                    checkpoint.flush()
+                print(f"  [{finished}/{len(plan)}] ✅ {counts['ok']} ❌ {counts['failed']} "
+                      f"({time.monotonic() - started:.0f}s)")
+
+        try:
+            await asyncio.gather(*(update(old_id, new_id) for old_id, new_id in plan))
+        finally:
+            if checkpoint:
+                checkpoint.close()
+        return counts['ok'], counts['failed']
+
     async def migrate_ids(self, dry_run: bool = True) -> Dict:
         """
         Выполняет миграцию ID в базе данных
-        
+
         Args:
             dry_run: Если True, только показывает что будет сделано без изменений
-            
+
         Returns:
             Словарь с результатами миграции
         """
         print("🔄 Начинаем анализ custom_id в базе данных...")
-        
-        # Получаем все автомобили
-        cars = await self.get_all_cars()
-        if not cars:
-            return {'error': 'Не удалось получить данные из базы'}
-        
-        print(f"📊 Найдено автомобилей в базе: {len(cars)}")
-        
-        # Анализируем ID
-        valid_cars, needs_migration, conflicts = self.analyze_existing_ids(cars)
-        
-        print(f"✅ Уже в правильном формате: {len(valid_cars)}")
-        print(f"🔄 Требуют миграции: {len(needs_migration)}")
-        print(f"⚠️  Конфликтов: {len(conflicts)}")
-        
-        # Отмечаем все валидные ID как использованные
-        for car in valid_cars:
-            mark_id_as_used(car['custom_id'])
-        
-        migration_plan = []
-        successful_migrations = 0
-        failed_migrations = 0
-        
-        # Планируем миграцию для автомобилей без конфликтов
-        for car in needs_migration:
-            old_id = car.get('custom_id', '')
-            new_id = convert_old_id_to_new_format(old_id)
-            
-            # Проверяем, нет ли этого ID в конфликтах
-            is_conflict = any(c['old_id'] == old_id for c in conflicts)
-            
-            if not is_conflict:
-                migration_plan.append({
-                    'car': car,
-                    'old_id': old_id,
-                    'new_id': new_id
-                })
-        
-        print(f"\n📋 План миграции: {len(migration_plan)} автомобилей")
-        
-        # Показываем несколько примеров
-        if migration_plan:
-            print("🔍 Примеры миграции:")
-            for i, item in enumerate(migration_plan[:5]):
-                print(f"  {i+1}. {item['old_id']} → {item['new_id']}")
-            if len(migration_plan) > 5:
-                print(f"  ... и еще {len(migration_plan) - 5}")
-        
-        # Показываем конфликты
-        if conflicts:
-            print(f"\n⚠️  Найдены конфликты ({len(conflicts)}):")
-            for conflict in conflicts[:3]:
-                print(f"  {conflict['old_id']} → {conflict['proposed_new_id']} (уже существует)")
-            if len(conflicts) > 3:
-                print(f"  ... и еще {len(conflicts) - 3}")
-        
-        if dry_run:
-            print(f"\n🔍 Это пробный запуск - изменения НЕ вносились")
-            return {
-                'dry_run': True,
-                'total_cars': len(cars),
-                'valid_cars': len(valid_cars),
-                'needs_migration': len(needs_migration),
-                'conflicts': len(conflicts),
-                'migration_plan': len(migration_plan)
-            }
-        
-        # Выполняем реальную миграцию
-        print(f"\n🚀 Выполняем миграцию...")
-        
-        for i, item in enumerate(migration_plan):
-            car = item['car']
-            old_id = item['old_id']
-            new_id = item['new_id']
-            
-            print(f"  [{i+1}/{len(migration_plan)}] {old_id} → {new_id}...", end="")
-            
-            success = await self.update_car_id(old_id, new_id, car)
-            if success:
-                successful_migrations += 1
-                mark_id_as_used(new_id)
-                print(" ✅")
-                self.migration_log.append(f"SUCCESS: {old_id} → {new_id}")
-            else:
-                failed_migrations += 1
-                print(" ❌")
-                self.migration_log.append(f"FAILED: {old_id} → {new_id}")
-            
-            # Небольшая пауза между обновлениями
-            await asyncio.sleep(0.1)
-        
+
+        async with aiohttp.ClientSession() as session:
+            try:
+                scan = await self.scan(session)
+            except Exception as e:
+                print(f"❌ {e}")
+                scan = MigrationScan()
+            if not scan.total_cars:
+                return {'error': 'Не удалось получить данные из базы'}
+
+            print(f"📊 Найдено автомобилей в базе: {scan.total_cars}")
+
+            # Отмечаем все валидные ID как использованные (до генерации новых)
+            get_generator().mark_many_as_used(scan.valid_ids)
+            migration_plan, conflicts = scan.plan()
+            self.conflicts = conflicts
+
+            print(f"✅ Уже в правильном формате: {len(scan.valid_ids)}")
+            print(f"🔄 Требуют миграции: {len(scan.legacy_ids)}")
+            print(f"⚠️  Конфликтов: {len(conflicts)}")
+
+            done = self._load_checkpoint()
+            if done:
+                remaining = [item for item in migration_plan if item not in done]
+                print(f"⏭️  Уже обновлены в прерванном запуске: {len(migration_plan) - len(remaining)}")
+                migration_plan = remaining
+
+            print(f"\n📋 План миграции: {len(migration_plan)} автомобилей")
+
+            # Показываем несколько примеров
+            if migration_plan:
+                print("🔍 Примеры миграции:")
+                for i, (old_id, new_id) in enumerate(migration_plan[:5]):
+                    print(f"  {i+1}. {old_id} → {new_id}")
+                if len(migration_plan) > 5:
+                    print(f"  ... и еще {len(migration_plan) - 5}")
+
+            # Показываем конфликты
+            if conflicts:
+                print(f"\n⚠️  Найдены конфликты ({len(conflicts)}):")
+                for conflict in conflicts[:3]:
+                    print(f"  {conflict['old_id']} → {conflict['proposed_new_id']} ({conflict['conflict_reason']})")
+                if len(conflicts) > 3:
+                    print(f"  ... и еще {len(conflicts) - 3}")
+
+            if dry_run:
+                print(f"\n🔍 Это пробный запуск - изменения НЕ вносились")
+                return {
+                    'dry_run': True,
+                    'total_cars': scan.total_cars,
+                    'valid_cars': len(scan.valid_ids),
+                    'needs_migration': len(scan.legacy_ids),
+                    'conflicts': len(conflicts),
+                    'migration_plan': len(migration_plan)
+                }
+
+            # Выполняем реальную миграцию
+            print(f"\n🚀 Выполняем миграцию ({self.concurrency} запросов параллельно)...")
+            successful_migrations, failed_migrations = await self.apply_updates(session, migration_plan)
+            if not failed_migrations:
+                self._clear_checkpoint()
+
         # Статистика
         stats = get_id_statistics()
-        
+
         print(f"\n📊 Результаты миграции:")
         print(f"   ✅ Успешно: {successful_migrations}")
         print(f"   ❌ Ошибок: {failed_migrations}")
         print(f"   ⚠️  Конфликтов: {len(conflicts)}")
         print(f"   📈 Всего ID в системе: {stats['used_count']}")
-        
+
         return {
             'dry_run': False,
-            'total_cars': len(cars),
-            'valid_cars': len(valid_cars),
+            'total_cars': scan.total_cars,
+            'valid_cars': len(scan.valid_ids),
             'successful_migrations': successful_migrations,
             'failed_migrations': failed_migrations,
             'conflicts': len(conflicts),
             'migration_log': self.migration_log,
             'id_statistics': stats
         }
-    
+
     async def handle_conflicts(self) -> Dict:
         """Обрабатывает конфликтные ID путем генерации новых уникальных ID"""
-        cars = await self.get_all_cars()
-        if not cars:
-            return {'error': 'Не удалось получить данные из базы'}
-        
-        valid_cars, needs_migration, conflicts = self.analyze_existing_ids(cars)
-        
-        if not conflicts:
-            print("✅ Конфликтов не найдено")
-            return {'conflicts_resolved': 0}
-        
-        print(f"🔧 Разрешение {len(conflicts)} конфликтов...")
-        
-        # Отмечаем все валидные ID как использованные
-        for car in valid_cars:
-            mark_id_as_used(car['custom_id'])
-        
-        resolved_conflicts = 0
-        failed_conflicts = 0
-        
-        for i, conflict in enumerate(conflicts):
-            car = conflict['car']
-            old_id = conflict['old_id']
-            
-            print(f"  [{i+1}/{len(conflicts)}] Разрешаем конфликт для {old_id}...", end="")
-            
-            # Генерируем новый уникальный ID вместо конфликтного
-            from app.utils.id_generator import generate_custom_id
-            new_id = generate_custom_id()
-            
-            success = await self.update_car_id(old_id, new_id, car)
-            if success:
-                resolved_conflicts += 1
-                print(f" ✅ → {new_id}")
-                self.migration_log.append(f"CONFLICT_RESOLVED: {old_id} → {new_id}")
-            else:
-                failed_conflicts += 1
-                print(" ❌")
-                self.migration_log.append(f"CONFLICT_FAILED: {old_id}")
-            
-            await asyncio.sleep(0.1)
-        
+        async with aiohttp.ClientSession() as session:
+            try:
+                scan = await self.scan(session)
+            except Exception as e:
+                print(f"❌ {e}")
+                return {'error': 'Не удалось получить данные из базы'}
+
+            generator = get_generator()
+            generator.mark_many_as_used(scan.valid_ids)
+            migration_plan, conflicts = scan.plan()
+            # Новые ID плана еще не записаны в базу (миграция не выполнялась или
+            # завершилась с ошибками) - они не должны достаться конфликтным записям
+            generator.mark_many_as_used(new_id for _, new_id in migration_plan)
+
+            if not conflicts:
+                print("✅ Конфликтов не найдено")
+                return {'conflicts_resolved': 0}
+
+            print(f"🔧 Разрешение {len(conflicts)} конфликтов...")
+
+            # Генерируем новые уникальные ID вместо конфликтных
+            plan = [(conflict['old_id'], generator.generate_id()) for conflict in conflicts]
+            resolved_conflicts, failed_conflicts = await self.apply_updates(session, plan, 'CONFLICT_RESOLVED')
+            if not failed_conflicts:
+                self._clear_checkpoint()
+
         print(f"\n📊 Результаты разрешения конфликтов:")
         print(f"   ✅ Разрешено: {resolved_conflicts}")
         print(f"   ❌ Ошибок: {failed_conflicts}")
-        
+
         return {
             'conflicts_resolved': resolved_conflicts,
             'conflicts_failed': failed_conflicts,
             'migration_log': self.migration_log
         }
-    
+
     def save_migration_log(self, filename: str = "migration_log.json"):
         """Сохраняет лог миграции в файл"""
         log_data = {
             'migration_log': self.migration_log,
             'conflicts': self.conflicts,
-            'timestamp': asyncio.get_event_loop().time()
+            'timestamp': time.time()
         }
-        
+
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(log_data, f, ensure_ascii=False, indent=2)
-        
+
         print(f"📄 Лог миграции сохранен в {filename}")
 
 async def main():
     """Основная функция для запуска миграции"""
     print("🔄 Утилита миграции Custom ID")
     print("=" * 50)
-    
-    migrator = CustomIDMigrator()
-    
+
+    migrator = CustomIDMigrator(
+        node_api_url=os.getenv('STORAGE_API_URL', 'http://localhost:3001'),
+        concurrency=int(os.getenv('MIGRATION_CONCURRENCY', '16')),
+    )
+
     # Сначала пробный запуск
     print("🔍 Шаг 1: Анализ текущего состояния")
     dry_run_result = await migrator.migrate_ids(dry_run=True)
-    
+
     if 'error' in dry_run_result:
         print(f"❌ {dry_run_result['error']}")
         return
-    
+
     if dry_run_result['needs_migration'] == 0:
         print("✅ Все ID уже в правильном формате, миграция не требуется")
         return
-    
+
     # Запрашиваем подтверждение
     print(f"\n❓ Выполнить миграцию {dry_run_result['migration_plan']} автомобилей? (y/N): ", end="")
-    
+
     try:
-        import sys
         response = input().strip().lower()
         if response == 'y':
             print("\n🚀 Шаг 2: Выполнение миграции")
             result = await migrator.migrate_ids(dry_run=False)
-            
+
             # Обрабатываем конфликты если есть
             if result.get('conflicts', 0) > 0:
                 print(f"\n🔧 Шаг 3: Разрешение конфликтов")
-                conflict_result = await migrator.handle_conflicts()
-            
+                await migrator.handle_conflicts()
+
             # Сохраняем лог
             migrator.save_migration_log()
-            
+
             print("\n✅ Миграция завершена!")
         else:
             print("❌ Миграция отменена пользователем")
@@ -330,4 +442,4 @@ async def main():
         print("\n❌ Миграция прервана пользователем")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
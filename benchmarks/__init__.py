@@ -0,0 +1,3 @@
+"""
+Бенчмарки горячих путей обработки объявлений (pytest-benchmark)
+"""
@@ -0,0 +1,32 @@
+"""
+Бенчмарк извлечения марки, модели, года и цены для Storage API
+
+Запуск:
+    pytest benchmarks/bench_data_formatter.py --benchmark-only
+"""
+
+from app.storage_api.data_formatter import extract_car_details
+from app.utils.message_formatter import format_perplexity_response_with_quotes
+from benchmarks.corpus import build_corpus, build_perplexity_corpus
+
+LISTINGS = build_corpus()
+DESCRIPTIONS = [format_perplexity_response_with_quotes(text) for text in build_perplexity_corpus()]
+
+
+def test_extract_details_descriptions(benchmark):
+    """Готовые описания постов (то, что сохраняется в базу)"""
+    results = benchmark(lambda: [extract_car_details(text) for text in DESCRIPTIONS])
+    assert len(results) == len(DESCRIPTIONS)
+
+
+def test_extract_details_listings(benchmark):
+    """Сырые тексты объявлений"""
+    results = benchmark(lambda: [extract_car_details(text) for text in LISTINGS])
+    assert any(result['year'] for result in results)
+
+
+def test_extract_details_no_price(benchmark):
+    """Длинный текст без цены - все паттерны цены отрабатывают впустую"""
+    text = "Mercedes-Benz GLE 2023\n" + "Комплектация: панорама, HUD, камеры 360. " * 200
+    result = benchmark(extract_car_details, text)
+    assert result['price'] is None
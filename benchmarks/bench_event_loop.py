@@ -0,0 +1,79 @@
+"""
+Бенчмарк event loop: стандартный asyncio против uvloop (USE_UVLOOP=1)
+
+Нагрузка похожа на работу бота: много коротких корутин, очереди между
+производителем и потребителями и таймеры. Запуск:
+    pytest benchmarks/bench_event_loop.py --benchmark-only --benchmark-group-by=func
+"""
+
+import asyncio
+import pytest
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+LOOPS = [
+    pytest.param(asyncio.new_event_loop, id='asyncio'),
+    pytest.param(
+        lambda: uvloop.new_event_loop(), id='uvloop',
+        marks=pytest.mark.skipif(not UVLOOP_AVAILABLE, reason="uvloop не установлен")
+    ),
+]
+
+
+async def _many_tasks(count=2000, yields=5):
+    async def worker():
+        for _ in range(yields):
+            await asyncio.sleep(0)
+    await asyncio.gather(*(worker() for _ in range(count)))
+
+
+async def _queue_pipeline(items=5000, consumers=4):
+    queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+
+    async def consume():
+        while True:
+            item = await queue.get()
+            queue.task_done()
+            if item is None:
+                return
+
+    tasks = [asyncio.create_task(consume()) for _ in range(consumers)]
+    for i in range(items):
+        await queue.put(i)
+    for _ in tasks:
+        await queue.put(None)
+    await asyncio.gather(*tasks)
+
+
+async def _timers(count=2000):
+    await asyncio.gather(*(asyncio.sleep(0.001) for _ in range(count)))
+
+
+def _run(loop_factory, coro_factory):
+    loop = loop_factory()
+    try:
+        loop.run_until_complete(coro_factory())
+    finally:
+        loop.close()
+
+
+@pytest.mark.parametrize('loop_factory', LOOPS)
+def test_many_tasks(benchmark, loop_factory):
+    """Короткие корутины с переключениями"""
+    benchmark(_run, loop_factory, _many_tasks)
+
+
+@pytest.mark.parametrize('loop_factory', LOOPS)
+def test_queue_pipeline(benchmark, loop_factory):
+    """Очередь производитель - потребители"""
+    benchmark(_run, loop_factory, _queue_pipeline)
+
+
+@pytest.mark.parametrize('loop_factory', LOOPS)
+def test_timers(benchmark, loop_factory):
+    """Массовые таймеры"""
+    benchmark(_run, loop_factory, _timers)
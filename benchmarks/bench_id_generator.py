@@ -0,0 +1,43 @@
+"""
+Бенчмарк генерации custom ID при разной заполненности пространства XXX-XXX
+
+Запуск:
+    pytest benchmarks/bench_id_generator.py --benchmark-only
+"""
+
+import random
+import pytest
+
+from app.utils.id_allocator import IDAllocator, TOTAL_IDS
+from app.utils.id_generator import CustomIDGenerator
+
+
+def _filled_generator(fill: float) -> CustomIDGenerator:
+    allocator = IDAllocator(seed=42)
+    rng = random.Random(42)
+    allocator.mark_used(rng.sample(range(TOTAL_IDS), int(TOTAL_IDS * fill)))
+    return CustomIDGenerator(allocator)
+
+
+@pytest.mark.parametrize('fill', [0.0, 0.5, 0.9, 0.99])
+def test_generate_id(benchmark, fill):
+    """Один новый ID; заполненность поддерживается постоянной"""
+    generator = _filled_generator(fill)
+    bitmap = generator._allocator.bitmap
+
+    def generate():
+        custom_id = generator.generate_id()
+        number = int(custom_id[:3]) * 1000 + int(custom_id[4:])
+        bitmap._bytes[number >> 3] &= ~(1 << (number & 7))
+        bitmap.used -= 1
+        return custom_id
+
+    result = benchmark(generate)
+    assert generator.is_valid_format(result)
+
+
+def test_generate_id_shared_file(benchmark, tmp_path):
+    """Один новый ID из карты на диске (аренда по 16 ID под flock)"""
+    generator = CustomIDGenerator(IDAllocator(str(tmp_path / 'ids.bitmap'), lease_size=16))
+    result = benchmark(generator.generate_id)
+    assert generator.is_valid_format(result)
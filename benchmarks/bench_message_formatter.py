@@ -0,0 +1,65 @@
+"""
+Бенчмарк форматирования сообщений: ответ Perplexity -> HTML и шаблоны MessageFormatter
+
+Запуск:
+    pytest benchmarks/bench_message_formatter.py --benchmark-only
+"""
+
+from app.utils.message_formatter import MessageFormatter, format_perplexity_response_with_quotes
+from benchmarks.corpus import build_perplexity_corpus, build_car_data
+
+RESPONSES = build_perplexity_corpus()
+CAR_DATA = build_car_data()
+FORMATTER = MessageFormatter()
+
+
+def test_quotes_single(benchmark):
+    """Самый длинный ответ Perplexity"""
+    text = max(RESPONSES, key=len)
+    result = benchmark(format_perplexity_response_with_quotes, text)
+    assert '<blockquote>' in result
+
+
+def test_quotes_corpus(benchmark):
+    """Все ответы корпуса подряд"""
+    results = benchmark(lambda: [format_perplexity_response_with_quotes(text) for text in RESPONSES])
+    assert len(results) == len(RESPONSES)
+
+
+def test_quotes_long_tail(benchmark):
+    """Ответ с длинной секцией без хештегов в конце (худший случай для lookahead)"""
+    text = RESPONSES[0] + "\n" + "\n".join(f"- Опция {i}" for i in range(300))
+    benchmark(format_perplexity_response_with_quotes, text)
+
+
+def test_format_for_telegram(benchmark):
+    """Шаблон поста без Perplexity"""
+    results = benchmark(lambda: [FORMATTER.format_for_telegram(car) for car in CAR_DATA])
+    assert all('#' in result for result in results)
+
+
+def test_format_message_quote_sections(benchmark):
+    """format_message с цитированием секций (_quote_sections)"""
+    data = {
+        'title': 'Zeekr 001 2024',
+        'description': 'Основные характеристики:\n' + '\n'.join(f'Параметр {i}: значение' for i in range(20)),
+        'main_text': (
+            'Комплектация и опции:\n' + '\n'.join(f'Опция {i}' for i in range(40)) +
+            '\nПреимущества:\n' + '\n'.join(f'Плюс {i}' for i in range(20))
+        ),
+        'source': 'https://t.me/source',
+        'date': '2026-10-19 12:00',
+    }
+    result = benchmark(FORMATTER.format_message, data)
+    assert '> Опция 1' in result
+
+
+def test_format_auto_data(benchmark):
+    """Пост по структуре format_auto_data"""
+    data = {
+        'brand': 'BMW', 'model': 'X5', 'gearbox': 'автомат', 'year': '2023', 'engine': '3.0',
+        'power': '381 л.с.', 'mileage': '15000', 'body': 'SUV', 'drive': 'полный',
+        'options': [f'Опция {i}' for i in range(30)], 'advantages': [f'Плюс {i}' for i in range(10)],
+    }
+    result = benchmark(FORMATTER.format_auto_data, data)
+    assert result.startswith('Продаётся')
@@ -0,0 +1,42 @@
+"""
+Бенчмарк извлечения данных об автомобиле из текста объявления
+
+Запуск:
+    pytest benchmarks/bench_text_formatter.py --benchmark-only
+"""
+
+import pytest
+
+from app.perplexity_api.text_formatter import (
+    extract_car_info_from_text,
+    extract_car_info_batch
+)
+from benchmarks.corpus import build_corpus
+
+CORPUS = build_corpus()
+
+
+def test_extract_single(benchmark):
+    """Одно объявление с длинным хвостом OCR"""
+    text = max(CORPUS, key=len)
+    result = benchmark(extract_car_info_from_text, text)
+    assert result.brand
+
+
+def test_extract_corpus(benchmark):
+    """Последовательный разбор всего корпуса"""
+    results = benchmark(lambda: [extract_car_info_from_text(text) for text in CORPUS])
+    assert len(results) == len(CORPUS)
+
+
+def test_extract_batch(benchmark):
+    """Пакетный API для бэкфиллов"""
+    results = benchmark(extract_car_info_batch, CORPUS)
+    assert len(results) == len(CORPUS)
+
+
+def test_extract_brand_from_body(benchmark):
+    """Марка не в первой строке - поиск по всему тексту (этап 3)"""
+    text = "Авто из Китая под заказ\n" + "Отличное состояние, один владелец. " * 50 + "Zeekr 001 2023"
+    result = benchmark(extract_car_info_from_text, text)
+    assert result.brand == 'Zeekr'
@@ -0,0 +1,200 @@
+"""
+Корпус объявлений для бенчмарков
+
+Тексты собираются детерминированно из шаблонов, похожих на реальные посты
+каналов-источников: заголовок с маркой и моделью, характеристики, цена,
+иногда - длинный хвост OCR с листа характеристик. Здесь же - ответы Perplexity
+в формате промпта create_car_description_prompt и словари car_data, которые
+конвейер передает в MessageFormatter.
+"""
+
+import random
+from typing import List, Dict, Any
+
+TITLES = [
+    "{brand} {model} {year}",
+    "🚗 {brand} {model}, {year} год",
+    "Продается {brand} {model} {year} года",
+    "{brand_ru} {model} {year}",
+    "НОВЫЙ {brand} {model} в наличии",
+    "Авто из Китая под заказ",
+]
+
+CARS = [
+    ("Geely", "джили", "Monjaro"),
+    ("Chery", "чери", "Tiggo 8 Pro"),
+    ("BYD", "бид", "Song Plus"),
+    ("Haval", "хавал", "Jolion"),
+    ("Changan", "чанган", "UNI-K"),
+    ("Lixiang", "лисян", "L9"),
+    ("Zeekr", "зикр", "001"),
+    ("Mercedes-Benz", "мерседес-бенц", "GLE 450"),
+    ("Land Rover", "ленд ровер", "Defender"),
+    ("BMW", "бмв", "X5 xDrive40i"),
+    ("Toyota", "тойота", "Camry"),
+    ("Kia", "киа", "Sportage"),
+    ("Hyundai", "хендай", "Palisade"),
+    ("Tank", "танк", "300"),
+    ("Voyah", "воя", "Free"),
+]
+
+SPECS = [
+    "Пробег: {mileage} км",
+    "Двигатель {engine}л, {power} л.с.",
+    "Коробка: {transmission}",
+    "Привод: {drive}",
+    "Цвет: белый перламутр",
+    "Цена: {price}$ без учета таможенных платежей",
+    "Стоимость под ключ во Владивостоке уточняйте в ЛС",
+]
+
+OCR_TAIL = (
+    "Комплектация Flagship. Панорамная крыша, адаптивный круиз-контроль, "
+    "камеры 360, подогрев и вентиляция сидений, память положения, "
+    "проекционный дисплей, аудиосистема 18 динамиков. "
+)
+
+
+def build_corpus(size: int = 500, seed: int = 42) -> List[str]:
+    """
+    Собирает корпус текстов объявлений
+
+    Args:
+        size: Количество текстов
+        seed: Зерно генератора для воспроизводимости
+
+    Returns:
+        Список текстов
+    """
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        brand, brand_ru, model = rng.choice(CARS)
+        values = {
+            'brand': brand,
+            'brand_ru': brand_ru.title(),
+            'model': model,
+            'year': rng.randint(2015, 2025),
+            'mileage': rng.choice(["12 000", "45000", "150,000", "5 тыс"]),
+            'engine': rng.choice(["1.5", "2.0", "3.0"]),
+            'power': rng.randint(120, 450),
+            'transmission': rng.choice(["автомат", "робот DSG", "вариатор", "механика"]),
+            'drive': rng.choice(["полный", "передний", "задний", "AWD"]),
+            'price': rng.choice(["25 400", "32,900", "41000", "18 750"]),
+        }
+        lines = [rng.choice(TITLES).format(**values)]
+        lines += [spec.format(**values) for spec in rng.sample(SPECS, rng.randint(2, len(SPECS)))]
+        if rng.random() < 0.4:
+            lines.append(OCR_TAIL * rng.randint(1, 8))
+        texts.append('\n'.join(lines))
+    return texts
+
+
+PERPLEXITY_SECTIONS = [
+    ("🛠️ **Технические характеристики**", [
+        "Двигатель: {engine} л, бензин, турбо, {power} л.с.",
+        "Коробка передач: {transmission}",
+        "Привод: {drive}",
+        "Пробег: {mileage} км",
+        "Расход топлива: 6.5–7.5 л/100 км[1]",
+        "Клиренс: 180–200 мм",
+    ]),
+    ("{details_emoji} <b>Дополнительные детали:</b>", [
+        "Электронная система стабилизации ESP",
+        "Адаптивный круиз-контроль",
+        "Панорамная крыша",
+        "Камеры кругового обзора 360",
+    ]),
+    ("🛡️ **Системы безопасности и помощи**", [
+        "ABS, ESP",
+        "Мульти-эйрбэг",
+        "Ассистент удержания полосы",
+        "Датчики света и дождя",
+    ]),
+    ("📱 **Мультимедиа и опции**", [
+        "Дисплей 15.6\"",
+        "Поддержка Apple CarPlay / Android Auto[1]",
+        "Климат-контроль",
+        "Подогрев и *вентиляция* сидений",
+    ]),
+    ("📦 **Условия продажи**", [
+        "Только онлайн",
+        "Доставка по РФ",
+        "Цена: {price} USD",
+    ]),
+]
+
+
+def build_perplexity_corpus(size: int = 100, seed: int = 42) -> List[str]:
+    """
+    Собирает ответы Perplexity: Markdown-остатки, секции с эмодзи, Custom ID и хештеги
+
+    Args:
+        size: Количество ответов
+        seed: Зерно генератора для воспроизводимости
+
+    Returns:
+        Список текстов
+    """
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        brand, _, model = rng.choice(CARS)
+        year = rng.randint(2018, 2025)
+        values = {
+            'engine': rng.choice(["1.5", "2.0", "3.0"]),
+            'power': rng.randint(120, 450),
+            'transmission': rng.choice(["автомат", "робот", "вариатор"]),
+            'drive': rng.choice(["полный (4WD)", "передний", "задний"]),
+            'mileage': rng.choice(["12 000", "45 000", "150 000"]),
+            'price': rng.choice(["25 400", "32 900", "46 816"]),
+            'details_emoji': rng.choice(["📊", "⚙️"]),
+        }
+        parts = [f"🚗 **{brand} {model} {year}** — *отличный выбор* для города и трассы  ",
+                 f"Custom ID: {rng.randint(0, 999):03d}-{rng.randint(0, 999):03d}", ""]
+        for header, lines in rng.sample(PERPLEXITY_SECTIONS, rng.randint(3, len(PERPLEXITY_SECTIONS))):
+            parts.append(header.format(**values) + "  ")
+            parts += [f"- {line.format(**values)}  " for line in lines]
+            parts.append("")
+        hashtags = [f"#{brand.replace(' ', '').replace('-', '')}", f"#{model.split()[0]}", f"#авто{year}", "#китайскиеавто"]
+        parts.append(''.join(hashtags) if rng.random() < 0.3 else ' '.join(hashtags))
+        texts.append('\n'.join(parts))
+    return texts
+
+
+def build_car_data(size: int = 100, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Собирает словари car_data в том виде, в каком их строит announcement_processor
+
+    Args:
+        size: Количество словарей
+        seed: Зерно генератора для воспроизводимости
+
+    Returns:
+        Список словарей
+    """
+    rng = random.Random(seed)
+    items = []
+    for i in range(size):
+        brand, _, model = rng.choice(CARS)
+        price = rng.randint(15000, 90000)
+        items.append({
+            'brand': brand,
+            'model': model,
+            'year': str(rng.randint(2018, 2025)),
+            'mileage': str(rng.randint(0, 150000)),
+            'price': f"{price:,}".replace(',', ' '),
+            'price_rub': price * 92,
+            'currency': 'USD',
+            'engine': rng.choice(["1.5", "2.0", "3.0"]) + 'л, бензин',
+            'transmission': rng.choice(["автомат", "робот", "вариатор"]),
+            'drive_type': rng.choice(["полный", "передний", "задний"]),
+            'trim': rng.choice(["комфорт", "Flagship", "Max"]),
+            'color': rng.choice(["белый", "черный", "серый"]),
+            'condition': 'хорошее',
+            'custom_id': f"{i // 1000:03d}-{i % 1000:03d}",
+            'city': 'Москва',
+            'usd_to_rub': 92.0,
+            'features': rng.sample(["Панорамная крыша", "Камеры 360", "Подогрев руля", "HUD", "Адаптивный круиз"], 3),
+        })
+    return items
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Бюджет времени импорта точек входа (python -X importtime)
+
+Каждый модуль импортируется в отдельном интерпретаторе с пустым окружением
+(без .env и TELEGRAM_*): импорт не должен читать конфигурацию, создавать
+клиенты и ходить в сеть. Проверяется:
+
+- суммарное время импорта модуля (минимум из нескольких запусков) не больше
+  бюджета;
+- тяжелые опциональные бэкенды OCR (cv2, paddleocr, transformers, torch)
+  не загружаются при импорте - только при первом использовании.
+
+Использование:
+    python benchmarks/import_budget.py [--runs 3] [--scale 1.0] [--json logs/import_budget.json] [module ...]
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Бюджет на модуль, мс. Запуск бота и CLI-утилиты должны стартовать быстрее секунды
+# вместе со стартом интерпретатора; основная часть бюджета бота - telethon и PTB
+BUDGETS_MS: Dict[str, int] = {
+    'main': 1000,
+    'get_auto': 700,
+    'post_via_bot': 400,
+    'app.ocr_api': 400,
+    'app.cloudinary_api': 300,
+    'app.utils.announcement_processor': 900,
+    'app.utils.migrate_custom_ids': 400,
+    'app.cloudinary_api.cleanup': 300,
+    'app.monitoring.trace_report': 300,
+    'app.monitoring.shadow_report': 300,
+    'loadtest.harness': 500,
+    'loadtest.replay': 500,
+}
+
+# Модули, которые не должны загружаться ни одной точкой входа при импорте
+FORBIDDEN_MODULES = ('cv2', 'paddleocr', 'transformers', 'torch', 'pytesseract')
+
+_LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)$')
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """
+    Импортирует модуль в чистом интерпретаторе
+
+    Args:
+        module: Имя модуля
+
+    Returns:
+        (время импорта модуля в мс, список всех загруженных при этом модулей)
+
+    Raises:
+        RuntimeError: Импорт завершился ошибкой
+    """
+    env = {'PATH': os.environ.get('PATH', ''), 'PYTHONPATH': str(ROOT)}
+    if 'HOME' in os.environ:
+        env['HOME'] = os.environ['HOME']
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()[-2000:]}")
+
+    total_us = 0
+    loaded = []
+    for line in result.stderr.splitlines():
+        match = _LINE_PATTERN.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        loaded.append(name)
+        if name == module:
+            total_us = int(match.group(2))
+    return total_us / 1000, loaded
+
+
+def check_module(module: str, budget_ms: float, runs: int = 3) -> Dict:
+    """
+    Проверяет бюджет одного модуля
+
+    Args:
+        module: Имя модуля
+        budget_ms: Бюджет, мс
+        runs: Число запусков (берется минимум, чтобы не зависеть от шума)
+
+    Returns:
+        Словарь с результатом: module, ms, budget_ms, forbidden, ok
+    """
+    timings = []
+    forbidden: List[str] = []
+    for _ in range(max(runs, 1)):
+        ms, loaded = measure_import(module)
+        timings.append(ms)
+        forbidden = sorted({name for name in loaded if name.split('.')[0] in FORBIDDEN_MODULES})
+    ms = min(timings)
+    return {
+        'module': module,
+        'ms': round(ms, 1),
+        'budget_ms': budget_ms,
+        'forbidden': forbidden,
+        'ok': ms <= budget_ms and not forbidden,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Проверка бюджета времени импорта")
+    parser.add_argument('modules', nargs='*', help="Модули (по умолчанию все из BUDGETS_MS)")
+    parser.add_argument('--runs', type=int, default=3, help="Запусков на модуль")
+    parser.add_argument('--scale', type=float, default=float(os.getenv('IMPORT_BUDGET_SCALE', '1.0')),
+                        help="Множитель бюджетов для медленных машин (IMPORT_BUDGET_SCALE)")
+    parser.add_argument('--json', help="Сохранить результаты в JSON")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or list(BUDGETS_MS)
+    results = []
+    for module in modules:
+        budget = BUDGETS_MS.get(module, 1000) * args.scale
+        try:
+            result = check_module(module, budget, args.runs)
+        except RuntimeError as e:
+            result = {'module': module, 'ms': None, 'budget_ms': budget, 'forbidden': [], 'ok': False,
+                      'error': str(e)}
+        results.append(result)
+        status = '✅' if result['ok'] else '❌'
+        timing = f"{result['ms']:.0f}" if result['ms'] is not None else '-'
+        print(f"{status} {module:40} {timing:>6} / {budget:.0f} мс")
+        if result['forbidden']:
+            print(f"   загружены при импорте: {', '.join(result['forbidden'])}")
+        if result.get('error'):
+            print(f"   {result['error']}")
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
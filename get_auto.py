@@ -4,60 +4,23 @@
 Использование: python get_auto.py <custom_id> <user_id>
 """
 import sys
-import os
 import asyncio
-import aiohttp
-from dotenv import load_dotenv
-from telethon import TelegramClient
-from telethon.sessions import StringSession
+from telethon.errors import WebpageCurlFailedError, WebpageMediaEmptyError, MediaEmptyError
 from io import BytesIO
 
-load_dotenv()
+from app.commands.car_lookup import CarLookup
+from app.core.telethon_client import create_client, get_credentials
 
-# Настройки Telegram
-api_id = int(os.getenv("TELEGRAM_API_ID"))
-api_hash = os.getenv("TELEGRAM_API_HASH")
-session_string = os.getenv("TELEGRAM_SESSION_STRING", "")
-
-if not session_string:
-    print("❌ TELEGRAM_SESSION_STRING не найден в .env файле")
-    print("Запустите: python generate_session.py")
-    sys.exit(1)
-
-# Настройки Node.js API
-NODE_API_URL = f"http://localhost:{os.getenv('NODE_PORT', 3001)}/api"
+# Node.js API: общий клиент с ботом (одна сессия, параллельные фото)
+lookup = CarLookup()
 
 async def get_car_from_api(custom_id: str):
     """Получает данные автомобиля из Node.js API"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{NODE_API_URL}/cars/{custom_id}") as response:
-                if response.status == 200:
-                    return await response.json()
-                elif response.status == 404:
-                    return None
-                else:
-                    error_text = await response.text()
-                    print(f"❌ Ошибка API: {response.status} - {error_text}")
-                    return None
-    except Exception as e:
-        print(f"❌ Ошибка подключения к API: {e}")
-        return None
+    return await lookup.get_car(custom_id)
 
 async def download_image(url: str) -> BytesIO:
     """Скачивает изображение по URL и возвращает BytesIO объект"""
-    try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    image_data = await response.read()
-                    return BytesIO(image_data)
-                else:
-                    print(f"⚠️  Не удалось скачать изображение: {url}")
-                    return None
-    except Exception as e:
-        print(f"⚠️  Ошибка скачивания изображения {url}: {e}")
-        return None
+    return await lookup.download_image(url)
 
 def format_car_message(car_data: dict) -> str:
     """Форматирует информацию об автомобиле для отправки"""
@@ -124,7 +87,7 @@ async def send_car_to_user(custom_id: str, user_id: int):
     print(f"✅ Автомобиль найден: {car_data.get('brand', 'N/A')} {car_data.get('model', 'N/A')}")
     
     # Подключаемся к Telegram
-    client = TelegramClient(StringSession(session_string), api_id, api_hash)
+    client = create_client()
     
     try:
         await client.start()
@@ -137,52 +100,42 @@ async def send_car_to_user(custom_id: str, user_id: int):
         photos = car_data.get('photos', [])
         
         if photos and len(photos) > 0:
-            print(f"📸 Скачивание {len(photos)} фотографий...")
+            photos = photos[:10]  # Максимум 10 фото
+            print(f"📤 Отправка сообщения с {len(photos)} фотографиями...")
             
-            # Скачиваем фотографии
-            photo_files = []
-            for i, photo_url in enumerate(photos[:10], 1):  # Максимум 10 фото
-                print(f"  📥 Скачивание фото {i}/{len(photos)}...")
-                photo_data = await download_image(photo_url)
-                if photo_data:
-                    photo_files.append(photo_data)
-                # Небольшая задержка между скачиваниями
-                if i < len(photos) and len(photos) > 1:
-                    await asyncio.sleep(0.5)
-            
-            if photo_files:
-                print(f"📤 Отправка сообщения с {len(photo_files)} фотографиями...")
-                
-                # Отправляем фотографии с подписью
+            # Отправляем фотографии с подписью
+            try:
                 try:
-                    await client.send_file(
-                        user_id, 
-                        photo_files, 
-                        caption=message
-                    )
-                except Exception as e:
-                    if "wait" in str(e).lower() and "seconds" in str(e).lower():
-                        print(f"⚠️  Telegram флуд-лимит: {e}")
-                        print("📤 Пробуем отправить только первое фото...")
-                        try:
-                            # Пробуем отправить только первое фото
-                            await client.send_file(
-                                user_id, 
-                                photo_files[0], 
-                                caption=f"{message}\n\n⚠️ Остальные фото временно недоступны из-за ограничений Telegram"
-                            )
-                        except:
-                            print("📤 Отправляем только текст без фотографий...")
-                            await client.send_message(
-                                user_id,
-                                f"⚠️ Фотографии временно недоступны из-за ограничений Telegram\n\n{message}"
-                            )
+                    # URL Cloudinary: Telegram скачивает фото сам, без загрузки через утилиту
+                    await client.send_file(user_id, photos, caption=message)
+                except (WebpageCurlFailedError, WebpageMediaEmptyError, MediaEmptyError) as e:
+                    print(f"⚠️  Telegram не принял URL фотографий ({e}), скачиваем...")
+                    photo_files = await lookup.download_images(photos)
+                    if photo_files:
+                        await client.send_file(user_id, photo_files, caption=message)
                     else:
-                        raise e
-            else:
-                # Если фото не удалось скачать, отправляем только текст
-                print("⚠️  Не удалось скачать фотографии, отправляем только текст")
-                await client.send_message(user_id, message)
+                        # Если фото не удалось скачать, отправляем только текст
+                        print("⚠️  Не удалось скачать фотографии, отправляем только текст")
+                        await client.send_message(user_id, message)
+            except Exception as e:
+                if "wait" in str(e).lower() and "seconds" in str(e).lower():
+                    print(f"⚠️  Telegram флуд-лимит: {e}")
+                    print("📤 Пробуем отправить только первое фото...")
+                    try:
+                        # Пробуем отправить только первое фото
+                        await client.send_file(
+                            user_id, 
+                            photos[0], 
+                            caption=f"{message}\n\n⚠️ Остальные фото временно недоступны из-за ограничений Telegram"
+                        )
+                    except:
+                        print("📤 Отправляем только текст без фотографий...")
+                        await client.send_message(
+                            user_id,
+                            f"⚠️ Фотографии временно недоступны из-за ограничений Telegram\n\n{message}"
+                        )
+                else:
+                    raise e
         else:
             # Нет фотографий, отправляем только текст
             print("📤 Отправка текстового сообщения...")
@@ -226,6 +179,7 @@ async def send_car_to_user(custom_id: str, user_id: int):
         return False
     finally:
         await client.disconnect()
+        await lookup.close()
 
 async def main():
     """Главная функция"""
@@ -242,6 +196,13 @@ async def main():
         print("❌ user_id должен быть числом!")
         sys.exit(1)
     
+    # Настройки Telegram проверяются до запросов к API, а не при импорте
+    try:
+        get_credentials()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    
     print(f"🚀 Запуск утилиты get_auto")
     print(f"🆔 Custom ID: {custom_id}")
     print(f"👤 User ID: {user_id}")
@@ -250,15 +211,15 @@ async def main():
     # Проверяем доступность API
     print("🔍 Проверка доступности Node.js API...")
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{NODE_API_URL}/health") as response:
-                if response.status == 200:
-                    print("✅ Node.js API доступен")
-                else:
-                    print(f"⚠️  Node.js API вернул статус {response.status}")
+        async with lookup.session.get(f"{lookup.api_url}/health") as response:
+            if response.status == 200:
+                print("✅ Node.js API доступен")
+            else:
+                print(f"⚠️  Node.js API вернул статус {response.status}")
     except Exception as e:
         print(f"❌ Node.js API недоступен: {e}")
         print("Убедитесь что сервер запущен: node app/db/server.js")
+        await lookup.close()
         sys.exit(1)
     
     # Отправляем данные пользователю
@@ -0,0 +1,3 @@
+"""
+Нагрузочный стенд: реальный конвейер против локальных заглушек внешних сервисов
+"""
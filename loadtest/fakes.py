@@ -0,0 +1,361 @@
+"""
+Локальные заглушки внешних сервисов для нагрузочного стенда
+
+Все заглушки обслуживает один aiohttp-сервер в отдельном потоке со своим
+event loop: часть клиентов конвейера синхронная (requests, Cloudinary SDK), и
+заглушка в том же loop заблокировала бы сама себя.
+
+| Сервис | Путь |
+|---|---|
+| Perplexity | /perplexity/chat/completions |
+| Yandex Vision | /yandex/vision/v1/batchAnalyze |
+| Cloudinary | /cloudinary/v1_1/{cloud}/image/upload, /cloudinary/v1_1/{cloud}/folders |
+| Node Storage API | /storage/api/cars (сохранение, пакет /bulk, страницы, PUT), /storage/api/custom-ids, /storage/api/health |
+| ЦБ РФ | /cbr/scripts/XML_daily.asp |
+
+Telegram (источник и канал публикации) эмулируется в процессе: FakeTelegramSink.
+"""
+
+import random
+import asyncio
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Optional, List
+
+from aiohttp import web
+
+from benchmarks.corpus import build_corpus, build_perplexity_corpus
+
+SERVICES = ('perplexity', 'yandex_vision', 'cloudinary', 'storage_api', 'cbr', 'telegram')
+
+
+@dataclass
+class FaultProfile:
+    """Распределение задержки и ошибок одного сервиса"""
+    latency: float = 0.05
+    jitter: float = 0.3
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    error_status: int = 500
+
+    @classmethod
+    def parse(cls, spec: str) -> 'FaultProfile':
+        """
+        Разбирает профиль из строки вида "0.8,jitter=0.5,err=0.02,429=0.01"
+
+        Args:
+            spec: Медианная задержка в секундах и необязательные ключи
+                  jitter (sigma логнормального шума), err (доля 5xx), 429 (доля 429)
+
+        Returns:
+            FaultProfile
+        """
+        parts = [part.strip() for part in spec.split(',') if part.strip()]
+        profile = cls(latency=float(parts[0]))
+        for part in parts[1:]:
+            key, value = part.split('=', 1)
+            if key == 'jitter':
+                profile.jitter = float(value)
+            elif key == 'err':
+                profile.error_rate = float(value)
+            elif key == '429':
+                profile.rate_limit_rate = float(value)
+            elif key == 'status':
+                profile.error_status = int(value)
+            else:
+                raise ValueError(f"Неизвестный параметр профиля: {key}")
+        return profile
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.jitter <= 0:
+            return self.latency
+        return self.latency * rng.lognormvariate(0, self.jitter)
+
+    def sample_status(self, rng: random.Random) -> int:
+        roll = rng.random()
+        if roll < self.rate_limit_rate:
+            return 429
+        if roll < self.rate_limit_rate + self.error_rate:
+            return self.error_status
+        return 200
+
+
+# Профили по умолчанию - порядок задержек продакшена
+DEFAULT_PROFILES = {
+    'perplexity': FaultProfile(latency=3.0, jitter=0.4),
+    'yandex_vision': FaultProfile(latency=0.6, jitter=0.3),
+    'cloudinary': FaultProfile(latency=0.8, jitter=0.4),
+    'storage_api': FaultProfile(latency=0.03, jitter=0.3),
+    'cbr': FaultProfile(latency=0.2, jitter=0.2),
+    'telegram': FaultProfile(latency=1.2, jitter=0.4),
+}
+
+
+@dataclass
+class ServiceStats:
+    """Счетчики запросов к заглушке"""
+    requests: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    bytes_in: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+
+CBR_XML = (
+    '<?xml version="1.0" encoding="windows-1251"?>'
+    '<ValCurs Date="19.10.2026" name="Foreign Currency Market">'
+    '<Valute ID="R01235"><NumCode>840</NumCode><CharCode>USD</CharCode>'
+    '<Nominal>1</Nominal><Name>Доллар США</Name><Value>92,5000</Value></Valute>'
+    '</ValCurs>'
+)
+
+
+class FakeServices:
+    """Заглушки внешних HTTP-сервисов в фоновом потоке"""
+
+    def __init__(self, profiles: Optional[Dict[str, FaultProfile]] = None, seed: int = 42,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.profiles = {**DEFAULT_PROFILES, **(profiles or {})}
+        self.rng = random.Random(seed)
+        self.host = host
+        self.port = port
+        self.stats: Dict[str, ServiceStats] = defaultdict(ServiceStats)
+        self._responses = build_perplexity_corpus(size=50, seed=seed)
+        self._ocr_texts = build_corpus(size=50, seed=seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        # Таблица cars заглушки Storage API: custom_id -> запись (в порядке вставки)
+        self.cars: Dict[str, Dict] = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def env(self) -> Dict[str, str]:
+        """Переменные окружения, направляющие клиенты конвейера на заглушки"""
+        return {
+            'PERPLEXITY_BASE_URL': f"{self.base_url}/perplexity",
+            'YANDEX_VISION_URL': f"{self.base_url}/yandex/vision/v1/batchAnalyze",
+            'CLOUDINARY_UPLOAD_PREFIX': f"{self.base_url}/cloudinary",
+            'STORAGE_API_URL': f"{self.base_url}/storage",
+            'CBR_DAILY_URL': f"{self.base_url}/cbr/scripts/XML_daily.asp",
+        }
+
+    # --- Запуск ---
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, name='fake-services', daemon=True)
+        self._thread.start()
+        if not self._ready.wait(10):
+            raise RuntimeError("Заглушки не запустились")
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start_app())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _start_app(self):
+        app = web.Application(client_max_size=50 * 1024 * 1024)
+        app.router.add_post('/perplexity/chat/completions', self._perplexity)
+        app.router.add_post('/yandex/vision/v1/batchAnalyze', self._yandex)
+        app.router.add_post('/cloudinary/v1_1/{cloud}/image/upload', self._cloudinary)
+        app.router.add_get('/cloudinary/v1_1/{cloud}/folders', self._cloudinary_folders)
+        app.router.add_post('/storage/api/cars', self._storage_save)
+        app.router.add_post('/storage/api/cars/bulk', self._storage_save_bulk)
+        app.router.add_get('/storage/api/cars', self._storage_list)
+        app.router.add_put('/storage/api/cars/{custom_id}', self._storage_update)
+        app.router.add_get('/storage/api/custom-ids', self._storage_custom_ids)
+        app.router.add_get('/storage/api/health', self._storage_health)
+        app.router.add_get('/cbr/scripts/XML_daily.asp', self._cbr)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+    # --- Общая логика ---
+
+    async def _simulate(self, service: str, body_size: int) -> Optional[web.Response]:
+        """Задержка и внесение ошибок; возвращает ответ-ошибку или None"""
+        profile = self.profiles[service]
+        stats = self.stats[service]
+        stats.requests += 1
+        stats.bytes_in += body_size
+        delay = profile.sample_latency(self.rng)
+        stats.latencies.append(delay)
+        await asyncio.sleep(delay)
+        status = profile.sample_status(self.rng)
+        if status == 429:
+            stats.rate_limited += 1
+            return web.json_response({'error': {'message': 'Rate limit exceeded'}}, status=429)
+        if status != 200:
+            stats.errors += 1
+            return web.json_response({'error': {'message': 'Injected failure'}}, status=status)
+        return None
+
+    # --- Обработчики ---
+
+    async def _perplexity(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('perplexity', len(payload))
+        if error:
+            return error
+        content = self.rng.choice(self._responses)
+        return web.json_response({
+            'id': f"fake-{self.stats['perplexity'].requests}",
+            'model': 'sonar-pro',
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}}],
+            'usage': {'prompt_tokens': len(payload) // 4, 'completion_tokens': len(content) // 4,
+                      'total_tokens': (len(payload) + len(content)) // 4}
+        })
+
+    async def _yandex(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('yandex_vision', len(payload))
+        if error:
+            return error
+        lines = self.rng.choice(self._ocr_texts).split('\n')[:6]
+        blocks = [{'lines': [{'words': [{'text': line}]} for line in lines]}]
+        return web.json_response({
+            'results': [{'results': [{'textDetection': {'pages': [{'blocks': blocks}]}}]}]
+        })
+
+    async def _cloudinary(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('cloudinary', len(payload))
+        if error:
+            return error
+        cloud = request.match_info['cloud']
+        public_id = f"fake_{self.stats['cloudinary'].requests}"
+        return web.json_response({
+            'public_id': public_id,
+            'version': 1,
+            'format': 'jpg',
+            'resource_type': 'image',
+            'bytes': len(payload),
+            'width': 1280,
+            'height': 960,
+            'secure_url': f"https://res.cloudinary.com/{cloud}/image/upload/v1/{public_id}.jpg",
+            'url': f"http://res.cloudinary.com/{cloud}/image/upload/v1/{public_id}.jpg"
+        })
+
+    async def _cloudinary_folders(self, request: web.Request) -> web.Response:
+        # Admin API: CloudinaryClient проверяет конфигурацию при создании
+        return web.json_response({'folders': [], 'total_count': 0})
+
+    async def _storage_save(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('storage_api', len(payload))
+        if error:
+            return error
+        car = await request.json()
+        self.cars[car.get('custom_id')] = car
+        return web.json_response({'message': 'Car saved', 'success': True}, status=201)
+
+    async def _storage_save_bulk(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('storage_api', len(payload))
+        if error:
+            return error
+        # Как addCarsBulk: повтор того же поста - сохранен, другой автомобиль - конфликт
+        saved, failed = [], []
+        for car in (await request.json())['cars']:
+            existing = self.cars.setdefault(car['custom_id'], car)
+            same_source = (str(existing.get('source_message_id')) == str(car.get('source_message_id'))
+                           and existing.get('source_channel_name') == car.get('source_channel_name'))
+            if same_source:
+                saved.append(car['custom_id'])
+            else:
+                failed.append({'custom_id': car['custom_id'], 'error': f"custom_id {car['custom_id']} занят",
+                               'permanent': True, 'reason': 'conflict'})
+        return web.json_response({'saved': saved, 'failed': failed})
+
+    async def _storage_list(self, request: web.Request) -> web.Response:
+        error = await self._simulate('storage_api', 0)
+        if error:
+            return error
+        # Пагинация как в app/db/server_improved.js: курсор after по custom_id или page с 1
+        limit = int(request.query.get('limit', 10))
+        if 'after' in request.query:
+            after = request.query['after']
+            cars = sorted((car for car in self.cars.values() if car['custom_id'] > after),
+                          key=lambda car: car['custom_id'])[:limit]
+            next_after = cars[-1]['custom_id'] if len(cars) == limit else None
+            return web.json_response({
+                'cars': cars,
+                'pagination': {'after': after, 'limit': limit, 'next_after': next_after},
+            })
+        page = int(request.query.get('page', 1))
+        cars = list(self.cars.values())[(page - 1) * limit:page * limit]
+        return web.json_response({
+            'cars': cars,
+            'pagination': {'page': page, 'limit': limit, 'total': len(self.cars),
+                           'pages': -(-len(self.cars) // limit)},
+        })
+
+    async def _storage_update(self, request: web.Request) -> web.Response:
+        payload = await request.read()
+        error = await self._simulate('storage_api', len(payload))
+        if error:
+            return error
+        custom_id = request.match_info['custom_id']
+        if custom_id not in self.cars:
+            return web.json_response({'error': 'Car not found', 'custom_id': custom_id}, status=404)
+        car = {**self.cars.pop(custom_id), **await request.json()}
+        self.cars[car['custom_id']] = car
+        return web.json_response({'message': 'Car updated successfully', 'car': car})
+
+    async def _storage_custom_ids(self, request: web.Request) -> web.Response:
+        error = await self._simulate('storage_api', 0)
+        if error:
+            return error
+        return web.json_response({'custom_ids': list(self.cars), 'total': len(self.cars)})
+
+    async def _storage_health(self, request: web.Request) -> web.Response:
+        return web.json_response({'status': 'ok'})
+
+    async def _cbr(self, request: web.Request) -> web.Response:
+        error = await self._simulate('cbr', 0)
+        if error:
+            return error
+        return web.Response(body=CBR_XML.encode('windows-1251'), content_type='application/xml')
+
+
+class FakeTelegramSink:
+    """Канал публикации: вместо Telethon ждет задержку профиля и выдает id поста"""
+
+    def __init__(self, profile: Optional[FaultProfile] = None, seed: int = 42):
+        self.profile = profile or DEFAULT_PROFILES['telegram']
+        self.rng = random.Random(seed)
+        self.stats = ServiceStats()
+        self.published: List[int] = []
+
+    async def send_message_with_photos_to_channel(self, message, photo_paths, target_channel=None):
+        """Та же сигнатура и контракт, что у app.core.telegram"""
+        self.stats.requests += 1
+        self.stats.bytes_in += len(message.encode('utf-8'))
+        delay = self.profile.sample_latency(self.rng)
+        self.stats.latencies.append(delay)
+        await asyncio.sleep(delay)
+        status = self.profile.sample_status(self.rng)
+        if status == 429:
+            self.stats.rate_limited += 1
+            return None, None
+        if status != 200:
+            self.stats.errors += 1
+            return None, None
+        message_id = 100000 + len(self.published)
+        self.published.append(message_id)
+        return message_id, [f"fake_file_{message_id}_{i}" for i in range(len(photo_paths))]
@@ -0,0 +1,305 @@
+"""
+Нагрузочный стенд: N синтетических объявлений через реальный process_single_announcement
+
+Внешние сервисы заменены заглушками из fakes.py с настраиваемыми задержками
+и ошибками, Telegram-источник и канал публикации эмулируются в процессе.
+Объявления подаются с заданной частотой (открытая модель нагрузки, как
+new_post_handler), в конце печатается отчет: пропускная способность,
+перцентили задержки, ошибки, память, задержка event loop и p95 этапов.
+
+Запуск:
+    python -m loadtest.harness --announcements 200 --rate 2 --photos 4
+    python -m loadtest.harness -n 50 --rate 5 --perplexity "3,jitter=0.5,429=0.05" --json logs/loadtest.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import asyncio
+import argparse
+import resource
+import tempfile
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from PIL import Image, ImageDraw
+
+from benchmarks.corpus import build_corpus
+from .fakes import FakeServices, FakeTelegramSink, FaultProfile, SERVICES
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _fake_session_string() -> str:
+    """Синтаксически корректная строка StringSession (сеть не используется)"""
+    from telethon.sessions import StringSession
+    from telethon.crypto import AuthKey
+    session = StringSession()
+    session.set_dc(2, '127.0.0.1', 443)
+    session.auth_key = AuthKey(bytes(256))
+    return session.save()
+
+
+def configure_environment(workdir: str, services: Optional[FakeServices] = None):
+    """
+    Подставляет фиктивные учетные данные и направляет конвейер на заглушки
+
+    Вызывается до импорта app.utils.announcement_processor: модули Telethon и
+    Cloudinary читают окружение при импорте. Без services (воспроизведение
+    кассет) сеть не нужна вовсе.
+    """
+    os.environ.update({
+        'TELEGRAM_API_ID': '1',
+        'TELEGRAM_API_HASH': 'loadtest',
+        'TELEGRAM_SESSION_STRING': _fake_session_string(),
+        'PERPLEXITY_API_KEY': 'loadtest',
+        'YANDEX_IAM_TOKEN': 'loadtest',
+        'YANDEX_FOLDER_ID': 'loadtest',
+        'CLOUDINARY_CLOUD_NAME': 'loadtest',
+        'CLOUDINARY_API_KEY': 'loadtest',
+        'CLOUDINARY_API_SECRET': 'loadtest',
+        'TRACE_FILE': os.path.join(workdir, 'traces.jsonl'),
+        'CUSTOM_ID_BITMAP': os.path.join(workdir, 'custom_ids.bitmap'),
+        'STORAGE_SPOOL_PATH': os.path.join(workdir, 'storage_spool.sqlite3'),
+        'CLOUDINARY_MANIFEST': os.path.join(workdir, 'cloudinary_manifest.sqlite3'),
+        'OCR_TEXT_PREFILTER': os.getenv('OCR_TEXT_PREFILTER', 'off'),
+    })
+    os.environ.pop('CLOUDINARY_URL', None)
+    os.environ.pop('CASSETTE_DIR', None)
+    if services is not None:
+        os.environ.update(services.env())
+
+
+class FakeChannelSource:
+    """Источник объявлений: текст из корпуса и сгенерированные фото на диске"""
+
+    def __init__(self, workdir: str, photos_per_post: int = 4, seed: int = 42):
+        self.workdir = workdir
+        self.photos_per_post = photos_per_post
+        self.rng = random.Random(seed)
+        self.texts = build_corpus(size=200, seed=seed)
+        self._templates = [self._make_photo(i) for i in range(4)]
+
+    def _make_photo(self, index: int) -> str:
+        image = Image.new('RGB', (1280, 960), (40 + index * 40, 90, 140))
+        draw = ImageDraw.Draw(image)
+        for row in range(10):
+            draw.text((60, 60 + row * 60), f"Характеристика {row}: значение {index}", fill='white')
+        path = os.path.join(self.workdir, f"template_{index}.jpg")
+        image.save(path, quality=85)
+        return path
+
+    def announcement(self, message_id: int) -> Dict[str, Any]:
+        """Объявление в формате convert_telethon_message_to_announcement"""
+        temp_dir = os.path.join(self.workdir, 'temp', str(message_id))
+        os.makedirs(temp_dir, exist_ok=True)
+        photos = []
+        for i in range(self.photos_per_post):
+            path = os.path.join(temp_dir, f"photo_{message_id}_{i}.jpg")
+            shutil.copy(self.rng.choice(self._templates), path)
+            photos.append(path)
+        return {
+            'id': message_id,
+            'date': datetime.now(timezone.utc),
+            'text': self.rng.choice(self.texts),
+            'photos': photos,
+            'temp_dir': temp_dir
+        }
+
+
+async def run_load(announcements: int, rate: float, photos_per_post: int = 4,
+                   profiles: Optional[Dict[str, FaultProfile]] = None, concurrency: int = 0,
+                   trace_malloc: bool = False, seed: int = 42) -> Dict[str, Any]:
+    """
+    Прогоняет нагрузку и возвращает отчет
+
+    Args:
+        announcements: Количество объявлений
+        rate: Частота подачи, объявлений в секунду
+        photos_per_post: Фото в объявлении
+        profiles: Профили задержек и ошибок по сервисам
+        concurrency: Ограничение одновременных объявлений (0 - без ограничения)
+        trace_malloc: Измерять пиковую память Python (замедляет прогон)
+        seed: Зерно генераторов
+
+    Returns:
+        Словарь с результатами
+    """
+    profiles = profiles or {}
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    services = FakeServices({k: v for k, v in profiles.items() if k != 'telegram'}, seed=seed)
+    services.start()
+    configure_environment(workdir, services)
+
+    # Импорт только после настройки окружения
+    from app.utils import announcement_processor
+    from app.perplexity_api.legacy_wrapper import PerplexityProcessor
+    from app.monitoring import tracing
+    from app.monitoring.loop_monitor import LoopMonitor
+    from app.monitoring.trace_report import load_spans, span_stats
+    from app.storage_api.spool import shutdown_spool
+
+    sink = FakeTelegramSink(profiles.get('telegram'), seed=seed)
+    announcement_processor.send_message_with_photos_to_channel = sink.send_message_with_photos_to_channel
+    tracing.set_exporter(tracing.JsonlSpanExporter(os.environ['TRACE_FILE']))
+
+    source = FakeChannelSource(workdir, photos_per_post, seed=seed)
+    perplexity = PerplexityProcessor(os.environ['PERPLEXITY_API_KEY'])
+    semaphore = asyncio.Semaphore(concurrency) if concurrency > 0 else None
+    results: List[Dict[str, Any]] = []
+
+    async def handle(ann):
+        started = time.perf_counter()
+        error = None
+        try:
+            if semaphore:
+                async with semaphore:
+                    await announcement_processor.process_single_announcement(ann, perplexity, '@loadtest', 10)
+            else:
+                await announcement_processor.process_single_announcement(ann, perplexity, '@loadtest', 10)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append({'id': ann['id'], 'latency': time.perf_counter() - started, 'error': error})
+
+    monitor = LoopMonitor(interval=0.05, threshold=0.25)
+    monitor.start()
+    if trace_malloc:
+        tracemalloc.start()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    started = time.perf_counter()
+    tasks = []
+    for i in range(announcements):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(handle(source.announcement(1000 + i))))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    peak_python = tracemalloc.get_traced_memory()[1] if trace_malloc else None
+    if trace_malloc:
+        tracemalloc.stop()
+    await monitor.stop()
+    await perplexity.close()
+    tracing.get_exporter().close()
+    # Сохранения в базу идут фоном: досылаем очередь, пока заглушки работают
+    spool_pending = await asyncio.to_thread(shutdown_spool, 60)
+    services.stop()
+
+    latencies = [item['latency'] for item in results]
+    errors = [item for item in results if item['error']]
+    service_stats = {
+        name: {
+            'requests': stats.requests,
+            'errors': stats.errors,
+            'rate_limited': stats.rate_limited,
+            'mb_in': round(stats.bytes_in / 1024 / 1024, 2),
+        }
+        for name, stats in list(services.stats.items()) + [('telegram', sink.stats)]
+    }
+    stages = {
+        name: {'p50': round(stats['p50'], 3), 'p95': round(stats['p95'], 3), 'count': stats['count']}
+        for name, stats in span_stats(load_spans(os.environ['TRACE_FILE'])).items()
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'announcements': announcements,
+        'target_rate': rate,
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_per_second': round(len(results) / elapsed, 3) if elapsed else 0,
+        'latency_seconds': {
+            'p50': round(_percentile(latencies, 0.5), 3),
+            'p95': round(_percentile(latencies, 0.95), 3),
+            'p99': round(_percentile(latencies, 0.99), 3),
+            'max': round(max(latencies), 3) if latencies else 0,
+        },
+        'errors': len(errors),
+        'error_rate': round(len(errors) / len(results), 4) if results else 0,
+        'error_samples': [item['error'] for item in errors[:5]],
+        'published': len(sink.published),
+        'storage_saved': len(services.cars),
+        'storage_spool_pending': spool_pending,
+        'memory': {
+            'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            'rss_growth_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+            'python_peak_mb': round(peak_python / 1024 / 1024, 1) if peak_python is not None else None,
+        },
+        'event_loop_lag': {k: round(v, 3) for k, v in monitor.percentiles().items()},
+        'event_loop_blocks': monitor.stats()['top_sites'],
+        'services': service_stats,
+        'stages': stages,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Текстовый отчет"""
+    latency = report['latency_seconds']
+    lines = [
+        f"Объявлений: {report['announcements']} при {report['target_rate']}/с за {report['elapsed_seconds']}с",
+        f"Пропускная способность: {report['throughput_per_second']}/с, опубликовано: {report['published']}",
+        f"Задержка, с: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}",
+        f"Ошибки: {report['errors']} ({report['error_rate'] * 100:.1f}%)",
+        f"Сохранено в базу: {report['storage_saved']}, осталось в очереди: {report['storage_spool_pending']}",
+        f"Память: max RSS {report['memory']['max_rss_mb']} МБ (+{report['memory']['rss_growth_mb']} МБ)"
+        + (f", пик Python {report['memory']['python_peak_mb']} МБ" if report['memory']['python_peak_mb'] else ''),
+        f"Задержка event loop, с: {report['event_loop_lag']}",
+    ]
+    if report['event_loop_blocks']:
+        lines.append("Блокировки event loop: " + ', '.join(f"{site} x{count}" for site, count in report['event_loop_blocks']))
+    lines.append("\nСервисы:")
+    for name, stats in report['services'].items():
+        lines.append(
+            f"  {name:<14} запросов={stats['requests']:<6} ошибок={stats['errors']:<4} "
+            f"429={stats['rate_limited']:<4} вход={stats['mb_in']} МБ"
+        )
+    lines.append("\nЭтапы (p50 / p95, с):")
+    for name, stats in sorted(report['stages'].items(), key=lambda kv: kv[1]['p95'], reverse=True):
+        lines.append(f"  {name:<20} {stats['p50']:>8} / {stats['p95']:<8} n={stats['count']}")
+    for sample in report['error_samples']:
+        lines.append(f"  ошибка: {sample}")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Нагрузочный прогон конвейера против заглушек")
+    parser.add_argument('-n', '--announcements', type=int, default=50)
+    parser.add_argument('--rate', type=float, default=1.0, help="Объявлений в секунду")
+    parser.add_argument('--photos', type=int, default=4, help="Фото в объявлении")
+    parser.add_argument('--concurrency', type=int, default=0, help="Лимит одновременных объявлений (0 - нет)")
+    parser.add_argument('--tracemalloc', action='store_true', help="Измерять пиковую память Python")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help="Сохранить отчет в JSON")
+    for service in SERVICES:
+        parser.add_argument(
+            f"--{service.replace('_', '-')}", dest=service,
+            help="Профиль: задержка[,jitter=..][,err=..][,429=..][,status=..]"
+        )
+    args = parser.parse_args(argv)
+
+    profiles = {service: FaultProfile.parse(getattr(args, service)) for service in SERVICES if getattr(args, service)}
+    report = asyncio.run(run_load(
+        args.announcements, args.rate, args.photos, profiles,
+        concurrency=args.concurrency, trace_malloc=args.tracemalloc, seed=args.seed
+    ))
+    print(format_report(report))
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""
+Воспроизведение кассет: реальные объявления через конвейер без сети
+
+Кассеты пишет конвейер при заданном CASSETTE_DIR (app/monitoring/cassette.py).
+Каждая кассета превращается обратно в объявление с фото на диске и проходит
+через process_single_announcement; внешние вызовы отвечают записанным.
+
+Запуск:
+    python -m loadtest.replay logs/cassettes
+    python -m loadtest.replay logs/cassettes --timing recorded --json logs/replay.json
+    python -m loadtest.replay logs/cassettes/*.jsonl.gz --repeat 5 --concurrency 4
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from .harness import configure_environment, _percentile
+
+
+class _ReplayPerplexity:
+    """Заменяет PerplexityProcessor: ответы берутся из кассеты"""
+
+    async def process_text(self, prompt: str) -> str:
+        raise RuntimeError("Вызов Perplexity вне кассеты")
+
+
+def find_cassettes(paths: List[str]) -> List[str]:
+    """Файлы кассет из списка файлов и каталогов"""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            found += sorted(glob.glob(os.path.join(path, '*.jsonl.gz')))
+        else:
+            found.append(path)
+    return found
+
+
+def _recorded_at(cassette) -> float:
+    return datetime.fromisoformat(cassette.header['recorded_at']).timestamp()
+
+
+async def replay(paths: List[str], timing: str = 'fast', repeat: int = 1,
+                 concurrency: int = 1) -> Dict[str, Any]:
+    """
+    Воспроизводит кассеты и возвращает отчет
+
+    Args:
+        paths: Файлы кассет
+        timing: 'fast' - без задержек, 'recorded' - записанные задержки вызовов
+                и интервалы между объявлениями
+        repeat: Сколько раз прогнать набор
+        concurrency: Одновременных объявлений в режиме fast
+
+    Returns:
+        Словарь с результатами
+    """
+    workdir = tempfile.mkdtemp(prefix='replay_')
+    configure_environment(workdir)
+
+    # Импорт только после настройки окружения
+    from app.utils import announcement_processor
+    from app.monitoring import tracing
+    from app.monitoring.cassette import Cassette, use_cassette
+    from app.monitoring.shadow import shadow_entry
+    from app.monitoring.trace_report import load_spans, span_stats
+
+    tracing.set_exporter(tracing.JsonlSpanExporter(os.environ['TRACE_FILE']))
+    recorded = timing == 'recorded'
+    semaphore = asyncio.Semaphore(1 if recorded else max(1, concurrency))
+    perplexity = _ReplayPerplexity()
+    results: List[Dict[str, Any]] = []
+
+    async def run_one(path: str, run: int):
+        cassette = Cassette.load(path, timing=recorded)
+        ann = cassette.materialize(os.path.join(workdir, 'temp', f"{run}-{os.path.basename(path)}"))
+        started = time.perf_counter()
+        error = None
+        try:
+            # Как new_post_handler: SHADOW_MODE действует и при воспроизведении
+            with use_cassette(cassette), shadow_entry('listener'):
+                await announcement_processor.process_single_announcement(
+                    ann, perplexity, cassette.header['source_channel'], 10
+                )
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        results.append({
+            'cassette': os.path.basename(path),
+            'latency': time.perf_counter() - started,
+            'error': error,
+            'mismatches': cassette.mismatches,
+            'unused': cassette.unused,
+        })
+
+    async def guarded(path: str, run: int, delay: float = 0.0):
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if recorded:
+            await run_one(path, run)
+        else:
+            async with semaphore:
+                await run_one(path, run)
+
+    started = time.perf_counter()
+    for run in range(repeat):
+        if recorded:
+            # Интервалы между объявлениями как при записи
+            cassettes = sorted(((p, _recorded_at(Cassette.load(p))) for p in paths), key=lambda item: item[1])
+            first = cassettes[0][1] if cassettes else 0
+            await asyncio.gather(*(guarded(p, run, at - first) for p, at in cassettes))
+        else:
+            await asyncio.gather(*(guarded(p, run) for p in paths))
+    elapsed = time.perf_counter() - started
+
+    tracing.get_exporter().close()
+    stages = {
+        name: {'p50': round(stats['p50'], 3), 'p95': round(stats['p95'], 3), 'count': stats['count']}
+        for name, stats in span_stats(load_spans(os.environ['TRACE_FILE'])).items()
+    }
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = [item['latency'] for item in results]
+    mismatches = Counter(m['kind'] for item in results for m in item['mismatches'])
+    return {
+        'cassettes': len(paths),
+        'runs': len(results),
+        'timing': timing,
+        'elapsed_seconds': round(elapsed, 3),
+        'latency_seconds': {
+            'p50': round(_percentile(latencies, 0.5), 4),
+            'p95': round(_percentile(latencies, 0.95), 4),
+            'max': round(max(latencies), 4) if latencies else 0,
+        },
+        'errors': [f"{item['cassette']}: {item['error']}" for item in results if item['error']],
+        'mismatches': dict(mismatches),
+        'mismatch_samples': [
+            {'cassette': item['cassette'], **m} for item in results for m in item['mismatches']
+        ][:10],
+        'unused_calls': dict(sum((Counter(item['unused']) for item in results), Counter())),
+        'stages': stages,
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """Текстовый отчет"""
+    latency = report['latency_seconds']
+    lines = [
+        f"Кассет: {report['cassettes']}, прогонов: {report['runs']}, режим: {report['timing']}, "
+        f"время: {report['elapsed_seconds']}с",
+        f"Объявление, с: p50={latency['p50']} p95={latency['p95']} max={latency['max']}",
+        f"Ошибки: {len(report['errors'])}",
+        f"Расхождения с записью: {report['mismatches'] or 'нет'}",
+    ]
+    if report['unused_calls']:
+        lines.append(f"Невостребованные вызовы: {report['unused_calls']}")
+    for sample in report['mismatch_samples']:
+        lines.append(f"  {sample['cassette']}: {sample['kind']} записано={sample['recorded']} сейчас={sample['replayed']}")
+    for error in report['errors'][:5]:
+        lines.append(f"  ошибка: {error}")
+    lines.append("\nЭтапы (p50 / p95, с):")
+    for name, stats in sorted(report['stages'].items(), key=lambda kv: kv[1]['p95'], reverse=True):
+        lines.append(f"  {name:<20} {stats['p50']:>8} / {stats['p95']:<8} n={stats['count']}")
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Воспроизведение кассет через конвейер без сети")
+    parser.add_argument('paths', nargs='+', help="Файлы кассет или каталоги")
+    parser.add_argument('--timing', choices=('fast', 'recorded'), default='fast')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--json', help="Сохранить отчет в JSON")
+    parser.add_argument('--strict', action='store_true',
+                        help="Код возврата 1 при ошибках или расхождениях с записью")
+    args = parser.parse_args(argv)
+
+    paths = find_cassettes(args.paths)
+    if not paths:
+        print("Кассеты не найдены")
+        return 1
+    report = asyncio.run(replay(paths, args.timing, args.repeat, args.concurrency))
+    print(format_report(report))
+    if args.json:
+        os.makedirs(os.path.dirname(args.json) or '.', exist_ok=True)
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.strict and (report['errors'] or report['mismatches']):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
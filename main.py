@@ -15,73 +15,91 @@ from telethon import TelegramClient, events
 # --- Наши модули ---
 from app.utils.channel_parser import convert_telethon_message_to_announcement, fetch_announcements_from_channel
 from app.utils.announcement_processor import process_single_announcement
+from app.utils.channel_scheduler import ChannelScheduler, channel_key, parse_channels
 from app.perplexity_api.legacy_wrapper import PerplexityProcessor
 from app.utils.config import get_pricing_config, set_pricing_config
 from app.commands.start import register_handlers as register_start_handlers, leave_request_entry_callback, handle_leave_request, LEAVE_REQUEST
 from app.commands.chatid import chatid
 from app.commands.admin import register_admin_handlers
 from app.commands.getauto import getauto_command
+from app.commands.car_lookup import close_car_lookup
+from app.monitoring.metrics import BOT_STATUS, start_metrics_server
+from app.monitoring.health import get_health_checker
+from app.monitoring.profiling import configure_from_env as configure_profiling
+from app.monitoring.loop_monitor import install_event_loop_policy, start_loop_monitor
+from app.monitoring.freshness import get_freshness_tracker
+from app.monitoring.shadow import shadow_entry
+from app.utils.id_generator import seed_used_ids_from_storage
+from app.storage_api.spool import get_spool, get_flusher, shutdown_spool
 
 # --- Конфигурация ---
-load_dotenv()
-
-# --- ОТЛАДКА ---
-print("\n--- ДЕБАГ: ЧТЕНИЕ КАНАЛОВ ---")
-raw_channels_str = os.getenv("TELEGRAM_CHANNEL", "ПЕРЕМЕННАЯ TELEGRAM_CHANNEL НЕ НАЙДЕНА")
-print(f"1. Сырая строка из .env: '{raw_channels_str}'")
-parsed_channels_list = [channel.strip() for channel in raw_channels_str.split(',') if channel.strip()]
-print(f"2. Результат после парсинга: {parsed_channels_list}")
-print("--- КОНЕЦ ДЕБАГА ---\n")
-# --- КОНЕЦ ОТЛАДКИ ---
-
-# Telethon
-API_ID = os.getenv("TELEGRAM_API_ID")
-API_HASH = os.getenv("TELEGRAM_API_HASH")
+# Заполняется в configure() при запуске, а не при импорте: импорт main.py не
+# требует .env и не создает клиентов (проверка времени импорта, тесты)
 SESSION_NAME = "telegram_session"
-# Получаем список каналов из переменной окружения
-SOURCE_CHANNELS_STR = os.getenv("TELEGRAM_CHANNEL", "")
-SOURCE_CHANNELS = [channel.strip() for channel in SOURCE_CHANNELS_STR.split(',') if channel.strip()]
-
-TELEGRAM_PHONE = os.getenv("TELEGRAM_PHONE")
-TELEGRAM_PASSWORD = os.getenv("TELEGRAM_PASSWORD")
-
-# Telegram Bot
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-ADMIN_GROUP_ID = int(os.getenv("ADMIN_GROUP_ID"))
-ADMIN_USER_IDS = [int(admin_id) for admin_id in os.getenv("ADMIN_USER_IDS", "").split(',') if admin_id]
-
-
-# Общие ресурсы
-PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
-perplexity_processor = PerplexityProcessor(PERPLEXITY_API_KEY)
-MARKUP_PERCENTAGE = get_pricing_config()
-
-# --- Клиент Telethon для прослушивания ---
-client = TelegramClient(
-    SESSION_NAME, 
-    API_ID, 
-    API_HASH,
-    connection_retries=5,
-    timeout=20
-)
+SOURCE_CHANNELS = []
+TELEGRAM_PHONE = None
+TELEGRAM_PASSWORD = None
+BOT_TOKEN = None
+ADMIN_GROUP_ID = None
+ADMIN_USER_IDS = []
+perplexity_processor = None
+MARKUP_PERCENTAGE = None
+client = None
+scheduler = None
+
+def configure():
+    """Читает окружение и создает общие ресурсы (Perplexity, клиент Telethon, планировщик каналов)"""
+    global SOURCE_CHANNELS, TELEGRAM_PHONE, TELEGRAM_PASSWORD, BOT_TOKEN, ADMIN_GROUP_ID, ADMIN_USER_IDS
+    global perplexity_processor, MARKUP_PERCENTAGE, client, scheduler
+    load_dotenv()
+
+    # Получаем список каналов из переменной окружения
+    SOURCE_CHANNELS = parse_channels(os.getenv("TELEGRAM_CHANNEL", ""))
+    TELEGRAM_PHONE = os.getenv("TELEGRAM_PHONE")
+    TELEGRAM_PASSWORD = os.getenv("TELEGRAM_PASSWORD")
+
+    # Telegram Bot
+    BOT_TOKEN = os.getenv("BOT_TOKEN")
+    ADMIN_GROUP_ID = int(os.getenv("ADMIN_GROUP_ID"))
+    ADMIN_USER_IDS = [int(admin_id) for admin_id in os.getenv("ADMIN_USER_IDS", "").split(',') if admin_id]
+
+    # Общие ресурсы
+    perplexity_processor = PerplexityProcessor(os.getenv("PERPLEXITY_API_KEY"))
+    MARKUP_PERCENTAGE = get_pricing_config()
+
+    # --- Клиент Telethon для прослушивания ---
+    client = TelegramClient(
+        SESSION_NAME, 
+        os.getenv("TELEGRAM_API_ID"), 
+        os.getenv("TELEGRAM_API_HASH"),
+        connection_retries=5,
+        timeout=20
+    )
+    client.add_event_handler(new_post_handler, events.NewMessage(chats=SOURCE_CHANNELS))
+    # Очередь на каждый канал-донор: активный канал не задерживает посты остальных
+    scheduler = ChannelScheduler.from_config(process_channel_post, name='listener')
 
-@client.on(events.NewMessage(chats=SOURCE_CHANNELS))
 async def new_post_handler(event):
-    """Обрабатывает новые посты из каналов-доноров."""
-    source_channel_username = event.chat.username
-    source_channel_url = f"https://t.me/{source_channel_username}"
-    print(f"✅ Получен новый пост из {source_channel_url}. Начинаю обработку...")
+    """Ставит новый пост из канала-донора в очередь его канала."""
+    source_channel_url = f"https://t.me/{event.chat.username or event.chat_id}"
+    scheduler.submit(source_channel_url, event.message)
+    print(f"✅ Получен новый пост из {source_channel_url}. В очереди канала: {scheduler.backlog().get(channel_key(source_channel_url), 0)}")
+
+async def process_channel_post(source_channel_url, message):
+    """Обрабатывает пост канала-донора, выбранный планировщиком."""
     try:
-        announcement = await convert_telethon_message_to_announcement(event.message)
+        announcement = await convert_telethon_message_to_announcement(message, source_channel_url)
         if announcement:
-            await process_single_announcement(
-                ann=announcement,
-                perplexity_processor=perplexity_processor,
-                source_channel=source_channel_url, # Передаем конкретный канал
-                markup_percentage=MARKUP_PERCENTAGE
-            )
+            # SHADOW_MODE=1/listener: обработка без публикации и сохранения
+            with shadow_entry('listener'):
+                await process_single_announcement(
+                    ann=announcement,
+                    perplexity_processor=perplexity_processor,
+                    source_channel=source_channel_url, # Передаем конкретный канал
+                    markup_percentage=MARKUP_PERCENTAGE
+                )
     except Exception as e:
-        print(f"❌ Ошибка при обработке нового поста {event.message.id} из канала {source_channel_url}: {e}")
+        print(f"❌ Ошибка при обработке нового поста {message.id} из канала {source_channel_url}: {e}")
 
 # --- Обработчики команд бота (python-telegram-bot) ---
 # (start и chatid теперь только в app/commands/)
@@ -92,26 +110,69 @@ async def post_init(application: Application):
     await application.bot.set_my_commands([
         BotCommand("start", "Запуск бота"),
         BotCommand("admin", "Админ-панель"),
+        BotCommand("profile", "Профилирование (для администраторов)"),
         BotCommand("chatid", "Узнать ID чата"),
         BotCommand("getauto", "Получить информацию об автомобиле"),
         BotCommand("help", "Помощь"),
     ])
+    # Проверки здоровья в фоне: /healthz и /readyz отдают закэшированный результат
+    health = get_health_checker()
+    if SOURCE_CHANNELS:
+        health.add_check('telethon', client.is_connected)
+    health.start()
+    # Сервер метрик Prometheus и проб k8s (telegram-bot:8000/metrics, /healthz, /readyz)
+    application.bot_data['metrics_runner'] = await start_metrics_server(health=health)
+    BOT_STATUS.set(1)
+    # Карта custom ID: дополняем ID, уже сохраненными в базе
+    await asyncio.to_thread(seed_used_ids_from_storage)
+    # Очередь сохранений в Storage API: досылаем оставшееся с прошлого запуска
+    get_spool()
+    # Алерт об отклоненных базой записях очереди (из потока отправки)
+    loop = asyncio.get_running_loop()
+    def send_spool_alert(text):
+        asyncio.run_coroutine_threadsafe(application.bot.send_message(chat_id=ADMIN_GROUP_ID, text=text), loop)
+    get_flusher().alert_sender = send_spool_alert
+    # Профилирование: PROFILE_CALLS / PROFILE_WINDOW и SIGUSR2
+    configure_profiling()
+    # Задержка event loop и стеки блокирующих вызовов
+    application.bot_data['loop_monitor'] = start_loop_monitor()
+    # Алерты SLO свежести (источник -> публикация) в админ-группу
+    async def send_freshness_alert(text):
+        await application.bot.send_message(chat_id=ADMIN_GROUP_ID, text=text)
+    get_freshness_tracker().alert_sender = send_freshness_alert
     if not SOURCE_CHANNELS:
         print("⚠️  Каналы-источники не указаны в .env (TELEGRAM_CHANNEL). Клиент Telethon не будет запущен.")
         return
+    scheduler.start()
     await client.start(phone=TELEGRAM_PHONE, password=TELEGRAM_PASSWORD)
     print("Клиент Telethon для прослушивания канала запущен.")
     print(f"✅ Бот запущен и слушает новые посты в каналах: {', '.join(SOURCE_CHANNELS)}")
 
 async def post_shutdown(application: Application):
     """Действия при завершении работы бота."""
-    if client.is_connected():
+    BOT_STATUS.set(0)
+    if client is not None and client.is_connected():
         print("🔄 Отключение Telethon клиента...")
         await client.disconnect()
         print("✅ Telethon клиент отключен.")
+    if scheduler is not None:
+        await scheduler.stop()
+    # Последняя попытка отправить очередь; остаток сохранится в файле
+    await asyncio.to_thread(shutdown_spool)
+    await close_car_lookup()
+    loop_monitor = application.bot_data.get('loop_monitor')
+    if loop_monitor:
+        await loop_monitor.stop()
+    await get_health_checker().stop()
+    metrics_runner = application.bot_data.get('metrics_runner')
+    if metrics_runner:
+        await metrics_runner.cleanup()
 
 # --- Синхронный запуск ---
 def main():
+    # uvloop (USE_UVLOOP=1) нужно включить до создания event loop
+    install_event_loop_policy()
+    configure()
     # Создаём приложение Telegram Bot
     application = Application.builder().token(BOT_TOKEN).post_init(post_init).post_shutdown(post_shutdown).build()
     # Прокидываем переменные для команд
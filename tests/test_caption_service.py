@@ -0,0 +1,122 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.ocr_api.caption_service import CaptionService, CaptionConfig, BLIP_MODELS
+
+
+class FakeCaptionService(CaptionService):
+    """Сервис без модели: записывает батчи вместо инференса."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.batches = []
+        self.threads = []
+
+    def caption_batch_sync(self, image_paths):
+        self.batches.append(list(image_paths))
+        self.threads.append(threading.current_thread().name)
+        return [f"caption {path}" for path in image_paths]
+
+
+class TestCaptionService:
+    """Тесты батчинга сервиса описаний."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_are_batched(self):
+        """Одновременные запросы объединяются в один батч."""
+        service = FakeCaptionService(CaptionConfig(batch_size=8, batch_window=0.01))
+        captions = await asyncio.gather(*(service.caption(f"{i}.jpg") for i in range(3)))
+        assert captions == ["caption 0.jpg", "caption 1.jpg", "caption 2.jpg"]
+        assert service.batches == [["0.jpg", "1.jpg", "2.jpg"]]
+        service.close()
+
+    @pytest.mark.asyncio
+    async def test_batch_size_triggers_flush(self):
+        """Заполненный батч отправляется, не дожидаясь окна."""
+        service = FakeCaptionService(CaptionConfig(batch_size=2, batch_window=10))
+        captions = await asyncio.wait_for(
+            asyncio.gather(*(service.caption(f"{i}.jpg") for i in range(4))),
+            timeout=1
+        )
+        assert len(captions) == 4
+        assert service.batches == [["0.jpg", "1.jpg"], ["2.jpg", "3.jpg"]]
+        service.close()
+
+    @pytest.mark.asyncio
+    async def test_batch_task_is_referenced(self):
+        """Задача батча удерживается сервисом до завершения, а затем отпускается."""
+        service = FakeCaptionService(CaptionConfig(batch_size=1, batch_window=10))
+        caption = asyncio.ensure_future(service.caption("0.jpg"))
+        await asyncio.sleep(0)
+        assert len(service._tasks) == 1
+        assert await caption == "caption 0.jpg"
+        await asyncio.sleep(0)
+        assert service._tasks == set()
+        service.close()
+
+    def test_blocking_call_uses_service_thread(self):
+        """Синхронный вызов (blip_image_caption) идет через единственный поток модели."""
+        service = FakeCaptionService(CaptionConfig())
+        assert service.caption_batch_blocking(["0.jpg"]) == ["caption 0.jpg"]
+        assert service.threads[0].startswith('blip')
+        service.close()
+
+    def test_config_from_env(self, monkeypatch):
+        """Псевдоним модели и квантизация читаются из окружения."""
+        monkeypatch.setenv('BLIP_MODEL', 'base')
+        monkeypatch.setenv('BLIP_QUANTIZE', '1')
+        config = CaptionConfig.from_env()
+        assert config.model_name == BLIP_MODELS['base']
+        assert config.quantize is True
+
+
+class FakeModelCaptionService(CaptionService):
+    """Сервис с заглушкой инференса: падает на батче, где есть красное изображение."""
+
+    def _load(self):
+        pass
+
+    def _generate(self, images):
+        if len(images) > 1 and any(image.getpixel((0, 0)) == (255, 0, 0) for image in images):
+            raise RuntimeError('batch failed')
+        if images[0].getpixel((0, 0)) == (255, 0, 0):
+            raise RuntimeError('bad image')
+        return [f"caption {image.getpixel((0, 0))[2]}" for image in images]
+
+
+class TestCaptionErrors:
+    """Тесты изоляции ошибок отдельных изображений."""
+
+    def test_bad_images_do_not_fail_batch(self, tmp_path):
+        """Обрезанный файл и падающий инференс дают '' только для своего изображения."""
+        from PIL import Image
+
+        paths = []
+        for i, color in enumerate([(0, 0, 1), (255, 0, 0), (0, 0, 3)]):
+            path = tmp_path / f"{i}.png"
+            Image.new('RGB', (8, 8), color).save(path)
+            paths.append(str(path))
+        truncated = tmp_path / 'truncated.jpg'
+        truncated.write_bytes(b'\xff\xd8\xff\xe0 not a jpeg')
+        paths.append(str(truncated))
+
+        service = FakeModelCaptionService(CaptionConfig(batch_size=8))
+        captions = service.caption_batch_sync(paths)
+
+        assert captions == ['caption 1', '', 'caption 3', '']
+        assert service.stats['failed'] == 2
+        service.close()
+
+    def test_replacing_service_closes_previous(self, monkeypatch):
+        """Новая конфигурация закрывает прежний глобальный сервис."""
+        from app.ocr_api import caption_service
+
+        monkeypatch.setattr(caption_service, '_default_service', None)
+        first = caption_service.get_caption_service(CaptionConfig())
+        second = caption_service.get_caption_service(CaptionConfig(batch_size=2))
+
+        assert second is not first
+        assert first._executor._shutdown
+        second.close()
@@ -0,0 +1,76 @@
+import asyncio
+
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.commands.car_lookup import CarLookup
+
+
+async def _photo(request):
+    return web.Response(body=request.match_info['name'].encode())
+
+
+async def _with_server(handler, scenario):
+    app = web.Application()
+    if handler is not None:
+        app.router.add_get('/api/cars/{custom_id}', handler)
+    app.router.add_get('/photos/{name}', _photo)
+    server = TestServer(app)
+    await server.start_server()
+    lookup = CarLookup(api_url=str(server.make_url('/api')), cache_size=2)
+    try:
+        return await scenario(lookup, server)
+    finally:
+        await lookup.close()
+        await server.close()
+
+
+class TestCarLookup:
+    """Тесты кэша и single-flight для /getauto."""
+
+    def test_single_flight_and_cache(self):
+        """Сто одновременных запросов одного ID - один запрос к API."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request.match_info['custom_id'])
+            await asyncio.sleep(0.05)
+            if request.match_info['custom_id'] == '000-404':
+                return web.json_response({'error': 'Car not found'}, status=404)
+            return web.json_response({'custom_id': request.match_info['custom_id']})
+
+        async def scenario(lookup, server):
+            cars = await asyncio.gather(*(lookup.get_car('023-455') for _ in range(100)))
+            assert all(car == {'custom_id': '023-455'} for car in cars)
+            assert await lookup.get_car('000-404') is None
+            assert await lookup.get_car('000-404') is None
+            assert await lookup.get_car('023-455') == {'custom_id': '023-455'}
+
+        asyncio.run(_with_server(handler, scenario))
+        assert calls == ['023-455', '000-404']
+
+    def test_lru_eviction_and_errors_not_cached(self):
+        """Старые записи вытесняются, ошибки API не кэшируются."""
+        calls = []
+
+        async def handler(request):
+            calls.append(request.match_info['custom_id'])
+            if request.match_info['custom_id'] == '000-500':
+                return web.json_response({}, status=500)
+            return web.json_response({'custom_id': request.match_info['custom_id']})
+
+        async def scenario(lookup, server):
+            for custom_id in ('000-001', '000-002', '000-003', '000-001', '000-500', '000-500'):
+                await lookup.get_car(custom_id)
+
+        asyncio.run(_with_server(handler, scenario))
+        assert calls == ['000-001', '000-002', '000-003', '000-001', '000-500', '000-500']
+
+    def test_download_images_keeps_order(self):
+        """Параллельное скачивание сохраняет порядок и пропускает ошибки."""
+        async def scenario(lookup, server):
+            urls = [str(server.make_url(f'/photos/{name}')) for name in ('a', 'b', 'c')]
+            photos = await lookup.download_images(urls + ['http://127.0.0.1:9/missing.jpg'])
+            return [photo.getvalue() for photo in photos]
+
+        assert asyncio.run(_with_server(None, scenario)) == [b'a', b'b', b'c']
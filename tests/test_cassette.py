@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+from app.monitoring.cassette import (
+    Cassette, CassetteMismatch, CassetteRecorder, ReplayedError,
+    fingerprint, tape_call, tape_await, use_cassette
+)
+
+
+def make_announcement(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(b"\xff\xd8jpeg-bytes")
+    return {'id': 42, 'date': None, 'text': "Geely Monjaro 2024", 'photos': [str(photo)]}
+
+
+class TestCassette:
+    """Тесты записи и воспроизведения кассет."""
+
+    @pytest.mark.asyncio
+    async def test_record_and_replay(self, tmp_path):
+        """Записанные ответы возвращаются при воспроизведении без вызова функций."""
+        cassette = Cassette.from_announcement(make_announcement(tmp_path), '@source')
+
+        async def llm(prompt):
+            return f"ответ на {prompt}"
+
+        with use_cassette(cassette):
+            assert tape_call('exchange_rate', None, lambda: 92.5) == 92.5
+            assert await tape_await('perplexity', fingerprint("промпт"), llm, "промпт") == "ответ на промпт"
+            assert await tape_await('publish', 'x', lambda: _coro((7, ['f1']))) == (7, ['f1'])
+        path = cassette.save(str(tmp_path / "c.jsonl.gz"))
+
+        replayed = Cassette.load(path)
+        ann = replayed.materialize(str(tmp_path / "replay"))
+
+        def fail(*args):
+            raise AssertionError("функция не должна вызываться")
+
+        with use_cassette(replayed):
+            assert tape_call('exchange_rate', None, fail) == 92.5
+            assert await tape_await('perplexity', fingerprint("промпт"), fail) == "ответ на промпт"
+            assert await tape_await('publish', 'x', fail) == [7, ['f1']]
+
+        assert replayed.mismatches == []
+        assert replayed.unused == {}
+        with open(ann['photos'][0], 'rb') as f:
+            assert f.read() == b"\xff\xd8jpeg-bytes"
+
+    def test_mismatch_and_errors(self, tmp_path):
+        """Расхождение ключа фиксируется, записанная ошибка повторяется."""
+        cassette = Cassette.from_announcement(make_announcement(tmp_path), '@source')
+
+        def broken():
+            raise ConnectionError("timeout")
+
+        with use_cassette(cassette):
+            tape_call('cloudinary', 'car_1', lambda: {'secure_url': 'u'})
+            with pytest.raises(ConnectionError):
+                tape_call('save', '001-001', broken)
+        replayed = Cassette.load(cassette.save(str(tmp_path / "c.jsonl.gz")))
+
+        with use_cassette(replayed):
+            assert tape_call('cloudinary', 'car_2', None) == {'secure_url': 'u'}
+            with pytest.raises(ReplayedError, match="timeout"):
+                tape_call('save', '001-001', None)
+            with pytest.raises(CassetteMismatch):
+                tape_call('ocr', 0, None)
+
+        assert replayed.mismatches == [{'kind': 'cloudinary', 'recorded': 'car_1', 'replayed': 'car_2'}]
+
+    def test_passthrough_without_cassette(self):
+        """Без активной кассеты вызов идет напрямую."""
+        assert tape_call('exchange_rate', None, lambda: 1.0) == 1.0
+
+
+class TestCassetteRecorder:
+    """Тесты рекордера."""
+
+    def test_session_saves_on_error(self, tmp_path):
+        """Кассета сохраняется, даже если конвейер упал."""
+        recorder = CassetteRecorder(str(tmp_path / "cassettes"))
+
+        with pytest.raises(RuntimeError):
+            with recorder.session(make_announcement(tmp_path), 'https://t.me/source'):
+                tape_call('custom_id', None, lambda: '001-002')
+                raise RuntimeError("сбой")
+
+        files = os.listdir(tmp_path / "cassettes")
+        assert len(files) == 1 and files[0].startswith('source-42-')
+        assert Cassette.load(str(tmp_path / "cassettes" / files[0])).events[0]['response'] == '001-002'
+
+    def test_sampling(self, tmp_path):
+        """При нулевой доле кассеты не пишутся."""
+        recorder = CassetteRecorder(str(tmp_path / "cassettes"), sample_rate=0.0)
+
+        with recorder.session(make_announcement(tmp_path), '@source') as cassette:
+            assert cassette is None
+
+
+async def _coro(value):
+    return value
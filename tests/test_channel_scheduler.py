@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils import channel_parser, config
+from app.utils.channel_scheduler import ChannelQuota, ChannelScheduler, parse_channels
+
+
+def recorder(delay=0.0):
+    order = []
+
+    async def handle(channel, item):
+        order.append((channel, item))
+        await asyncio.sleep(delay)
+
+    return order, handle
+
+
+class TestChannelScheduler:
+    """Тесты справедливой очереди каналов-источников."""
+
+    @pytest.mark.asyncio
+    async def test_chatty_channel_does_not_starve(self):
+        """Посты тихого канала обрабатываются вперемешку с очередью активного, а не после нее."""
+        order, handle = recorder()
+        scheduler = ChannelScheduler(handle, workers=1)
+        for n in range(20):
+            scheduler.submit('@chatty', n)
+        scheduler.submit('https://t.me/quiet', 'a')
+        scheduler.submit('quiet', 'b')
+
+        assert scheduler.backlog() == {'chatty': 20, 'quiet': 2}
+        scheduler.start()
+        await asyncio.wait_for(scheduler.join(), 5)
+        await scheduler.stop()
+
+        positions = [i for i, (channel, _) in enumerate(order) if channel != '@chatty']
+        assert positions == [1, 3]
+        assert [item for channel, item in order if channel == '@chatty'] == list(range(20))
+        assert scheduler.processed == {'chatty': 20, 'quiet': 2}
+
+    @pytest.mark.asyncio
+    async def test_weights(self):
+        """Канал с весом 2 получает вдвое больше обработок, пока очереди есть у обоих."""
+        order, handle = recorder()
+        scheduler = ChannelScheduler(handle, workers=1, quotas={'@heavy': ChannelQuota(weight=2)})
+        for n in range(12):
+            scheduler.submit('heavy', n)
+            scheduler.submit('light', n)
+        scheduler.start()
+        await asyncio.wait_for(scheduler.join(), 5)
+        await scheduler.stop()
+
+        first = [channel for channel, _ in order[:9]]
+        assert first.count('heavy') == 6 and first.count('light') == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrency_and_rate_caps(self):
+        """Канал не занимает больше concurrency обработчиков и не превышает rate_per_minute."""
+        active = {'a': 0, 'b': 0}
+        peak = {'a': 0, 'b': 0}
+        started = {'a': [], 'b': []}
+
+        async def handle(channel, item):
+            started[channel].append(time.monotonic())
+            active[channel] += 1
+            peak[channel] = max(peak[channel], active[channel])
+            await asyncio.sleep(0.02)
+            active[channel] -= 1
+
+        scheduler = ChannelScheduler(handle, workers=4, default_quota=ChannelQuota(concurrency=2),
+                                     quotas={'b': ChannelQuota(concurrency=4, rate_per_minute=600)})
+        for n in range(6):
+            scheduler.submit('a', n)
+        for n in range(3):
+            scheduler.submit('b', n)
+        scheduler.start()
+        await asyncio.wait_for(scheduler.join(), 5)
+        await scheduler.stop()
+
+        assert peak['a'] == 2
+        gaps = [later - earlier for earlier, later in zip(started['b'], started['b'][1:])]
+        assert all(gap >= 0.09 for gap in gaps)
+
+    def test_config(self, tmp_path, monkeypatch):
+        """Квоты читаются из [channels] и [channel:<имя>], незаданные берутся по умолчанию."""
+        path = tmp_path / 'config.ini'
+        path.write_text(
+            "[channels]\nworkers = 2\nrate_per_minute = 30\n\n"
+            "[channel:Chatty_Cars]\nweight = 0.5\n",
+            encoding='utf-8',
+        )
+        monkeypatch.setattr(config, 'CONFIG_PATH', str(path))
+
+        scheduler = ChannelScheduler.from_config(recorder()[1])
+
+        assert scheduler.workers == 2
+        assert scheduler.quota('@chatty_cars') == ChannelQuota(weight=0.5, concurrency=1, rate_per_minute=30)
+        assert scheduler.quota('other') == ChannelQuota(weight=1.0, concurrency=1, rate_per_minute=30)
+        assert parse_channels(' @a, https://t.me/b ,,') == ['@a', 'https://t.me/b']
+
+
+class FakeChannelClient:
+    """Каналы с одинаковыми ID сообщений: фото 1, 2 и текст 3."""
+
+    async def start(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def iter_messages(self, channel, limit):
+        yield SimpleNamespace(id=3, photo=None, document=None, text=f"Объявление {channel}", date=None)
+        for message_id in (2, 1):
+            yield SimpleNamespace(id=message_id, photo=True, text='', date=None)
+
+    async def download_media(self, msg, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{path}")
+
+
+class TestMultiChannelFiles:
+    """Тесты раскладки файлов объявлений по каналам."""
+
+    @pytest.mark.asyncio
+    async def test_same_message_ids_do_not_collide(self, tmp_path, monkeypatch):
+        """Одинаковые ID сообщений разных каналов не делят фото и временные папки."""
+        monkeypatch.setattr(channel_parser, 'get_client', lambda: FakeChannelClient())
+        dirs = {'download_dir': str(tmp_path / 'downloads'), 'temp_dir': str(tmp_path / 'temp')}
+
+        first = await channel_parser.fetch_announcements_from_channel('@Alpha', **dirs)
+        second = await channel_parser.fetch_announcements_from_channel('https://t.me/beta', **dirs)
+
+        assert first[0]['temp_dir'] == os.path.join(dirs['temp_dir'], 'alpha', '3')
+        assert second[0]['temp_dir'] == os.path.join(dirs['temp_dir'], 'beta', '3')
+        assert os.path.exists(first[0]['photos'][0])
+        with open(second[0]['photos'][0], encoding='utf-8') as f:
+            assert 'beta' in f.read()
@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from app.cloudinary_api.cleanup import CleanupConflictError, CleanupJob
+from app.cloudinary_api.cloudinary_client import CloudinaryRateLimitError
+from app.cloudinary_api.manifest import AssetManifest
+
+
+class FakeAdminClient:
+    def __init__(self, rate_limited=0, partial_pages=0):
+        self.calls = []
+        self.rate_limited = rate_limited
+        self.partial_pages = partial_pages
+
+    @staticmethod
+    def _direct(func, *args):
+        return func(*args)
+
+    def _delete_ids(self, public_ids):
+        self.calls.append(('ids', list(public_ids)))
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise CloudinaryRateLimitError("Rate Limit Exceeded")
+        return {public_id: 'deleted' for public_id in public_ids}
+
+    def _delete_tag(self, tag):
+        self.calls.append(('tag', tag))
+        if self.rate_limited:
+            self.rate_limited -= 1
+            raise CloudinaryRateLimitError("Rate Limit Exceeded")
+        page = self.partial_pages
+        self.partial_pages = max(page - 1, 0)
+        return {'deleted': {f"{tag}_photo{page}": 'deleted'}, 'partial': page > 0}
+
+    def delete_images(self, public_ids, call=None):
+        return (call or self._direct)(self._delete_ids, public_ids)
+
+    def delete_images_by_tag(self, tag, call=None):
+        deleted = {}
+        while True:
+            result = (call or self._direct)(self._delete_tag, tag)
+            deleted.update(result['deleted'])
+            if not result['partial']:
+                return deleted
+
+    def _delete_prefix(self, prefix):
+        self.calls.append(('prefix', prefix))
+        return {}
+
+    def delete_images_by_prefix(self, prefix, call=None):
+        return (call or self._direct)(self._delete_prefix, prefix)
+
+
+def _manifest(tmp_path, photos):
+    manifest = AssetManifest(str(tmp_path / 'manifest.sqlite3'))
+    for custom_id, count in photos.items():
+        for n in range(1, count + 1):
+            manifest.record(custom_id, {'public_id': f"car_{custom_id}_{n}"})
+    return manifest
+
+
+class TestCleanupJob:
+    """Тесты пакетной очистки Cloudinary."""
+
+    def test_batches_and_legacy(self, tmp_path):
+        """Фото из индекса удаляются пачками до 100 public_id, остальные - по тегу и префиксу."""
+        manifest = _manifest(tmp_path, {'a': 60, 'b': 30, 'c': 20})
+        client = FakeAdminClient()
+        job = CleanupJob(['a', 'b', 'c', 'old'], str(tmp_path / 'cleanup.jsonl'),
+                         client=client, manifest=manifest, rate_per_hour=0)
+
+        progress = job.run()
+
+        assert [len(ids) for kind, ids in client.calls if kind == 'ids'] == [90, 20]
+        assert ('tag', 'car_id_old') in client.calls
+        assert ('prefix', 'car_old_') in client.calls
+        assert progress == {'total': 4, 'done': 4, 'deleted': 111, 'failed': 0, 'api_calls': 4}
+        assert manifest.custom_ids() == []
+
+    def test_resume_from_checkpoint(self, tmp_path, monkeypatch):
+        """После остановки продолжение обрабатывает только оставшиеся автомобили."""
+        checkpoint = tmp_path / 'cleanup.jsonl'
+        monkeypatch.setenv('CLOUDINARY_CLEANUP_CHECKPOINT', str(checkpoint))
+        manifest = _manifest(tmp_path, {'a': 60, 'b': 60})
+        job = CleanupJob(['a', 'b'], str(checkpoint), client=FakeAdminClient(),
+                         manifest=manifest, rate_per_hour=0)
+        job.run(on_progress=lambda progress: job.stop())
+
+        assert job.pending == ['b']
+        assert json.loads(checkpoint.read_text().splitlines()[0]) == {'job': ['a', 'b']}
+
+        client = FakeAdminClient()
+        resumed = CleanupJob.resume(client=client, manifest=manifest)
+        progress = resumed.run()
+
+        assert client.calls == [('ids', [f"car_b_{n}" for n in range(1, 61)])]
+        assert progress['done'] == 2 and progress['deleted'] == 120
+        assert CleanupJob.resume(client=client, manifest=manifest) is None
+
+    def test_rate_limit_retry(self, tmp_path, monkeypatch):
+        """При 420 пачка повторяется после паузы, а не помечается ошибкой."""
+        manifest = _manifest(tmp_path, {'a': 3})
+        client = FakeAdminClient(rate_limited=2)
+        job = CleanupJob(['a'], str(tmp_path / 'cleanup.jsonl'), client=client,
+                         manifest=manifest, rate_per_hour=0, max_backoff=0)
+        waits = []
+        monkeypatch.setattr(job._stopped, 'wait', lambda timeout: waits.append(timeout) or False)
+
+        progress = job.run()
+
+        assert len(client.calls) == 3
+        assert waits == [5.0, 0]
+        assert progress['deleted'] == 3 and progress['failed'] == 0
+
+    def test_partial_pages_rate_limited(self, tmp_path, monkeypatch):
+        """Каждое продолжение удаления по тегу (partial) ждет ограничения частоты Admin API."""
+        client = FakeAdminClient(partial_pages=2)
+        job = CleanupJob(['old'], str(tmp_path / 'cleanup.jsonl'), client=client,
+                         manifest=_manifest(tmp_path, {}), rate_per_hour=3600)
+        waits = []
+        monkeypatch.setattr(job._stopped, 'wait', lambda timeout: waits.append(timeout) or False)
+
+        progress = job.run()
+
+        assert client.calls == [('tag', 'car_id_old')] * 3 + [('prefix', 'car_old_')]
+        assert len(waits) == 3 and all(0 < wait <= 1.0 for wait in waits)
+        assert progress['api_calls'] == 4 and progress['deleted'] == 3
+
+    def test_other_unfinished_job_not_overwritten(self, tmp_path, monkeypatch):
+        """Новое задание не затирает checkpoint незавершенного: его нужно продолжить или сбросить."""
+        checkpoint = tmp_path / 'cleanup.jsonl'
+        monkeypatch.setenv('CLOUDINARY_CLEANUP_CHECKPOINT', str(checkpoint))
+        manifest = _manifest(tmp_path, {'a': 60, 'b': 60, 'c': 1})
+        first = CleanupJob(['a', 'b'], str(checkpoint), client=FakeAdminClient(),
+                           manifest=manifest, rate_per_hour=0)
+        first.run(on_progress=lambda progress: first.stop())
+        saved = checkpoint.read_text()
+
+        client = FakeAdminClient()
+        with pytest.raises(CleanupConflictError):
+            CleanupJob(['c'], str(checkpoint), client=client, manifest=manifest, rate_per_hour=0).run()
+        assert checkpoint.read_text() == saved and client.calls == []
+
+        assert CleanupJob.discard()
+        progress = CleanupJob(['c'], str(checkpoint), client=client, manifest=manifest, rate_per_hour=0).run()
+        assert progress['done'] == 1
@@ -0,0 +1,135 @@
+import cloudinary.api
+from cloudinary.utils import build_eager
+
+from app.cloudinary_api.image_manager import (
+    delete_car_photos, get_car_photo_thumbnails, get_car_photos_urls, upload_car_photos
+)
+from app.cloudinary_api.manifest import AssetManifest
+
+
+class FakeClient:
+    def __init__(self):
+        self.deleted = []
+        self.uploads = []
+
+    def upload_image(self, image_path, public_id, folder, tags, **kwargs):
+        self.uploads.append(kwargs)
+        return {'public_id': f"{folder}/{public_id}", 'version': 3, 'eager': [
+            {'status': 'processing', 'transformation': 'c_fill,h_200,q_auto,w_300'},
+            {'status': 'processing', 'transformation': 'c_limit,h_600,q_auto,w_800'},
+        ]}
+
+    def get_image_url(self, public_id, transformations=None, version=None):
+        return cloudinary.CloudinaryImage(public_id).build_url(
+            transformation=transformations, version=version, cloud_name='demo')
+
+    def delete_images(self, public_ids):
+        self.deleted.extend(public_ids)
+        return {public_id: 'deleted' for public_id in public_ids}
+
+
+class TestAssetManifest:
+    """Тесты индекса загруженных фото."""
+
+    def test_record_and_persist(self, tmp_path):
+        """Порядок по позиции, фильтр по папке, индекс переживает перезапуск."""
+        path = str(tmp_path / 'manifest.sqlite3')
+        manifest = AssetManifest(path)
+        manifest.record('023-455', {'public_id': 'car_023-455_2', 'version': 7, 'width': 1280, 'bytes': 1000})
+        manifest.record('023-455', {'public_id': 'car_023-455_1', 'version': 7})
+        manifest.record('023-455', {'public_id': 'cars/car_023-455_1'})
+        manifest.close()
+
+        reopened = AssetManifest(path)
+        assets = reopened.assets('023-455', folder='')
+        assert [asset.position for asset in assets] == [1, 2]
+        assert assets[1].width == 1280 and assets[1].version == 7
+        assert [asset.public_id for asset in reopened.assets('023-455', folder='cars')] == ['cars/car_023-455_1']
+
+    def test_sync_from_cloudinary(self, monkeypatch):
+        """Старый автомобиль: один запрос по префиксу, чужие ID отбрасываются."""
+        calls = []
+
+        def resources(**kwargs):
+            calls.append(kwargs['prefix'])
+            return {'resources': [
+                {'public_id': 'car_1_1', 'version': 1, 'secure_url': 'https://c/car_1_1.jpg'},
+                {'public_id': 'car_1_10', 'version': 1, 'secure_url': 'https://c/car_1_10.jpg'},
+                {'public_id': 'car_1_extra', 'version': 1},
+            ]}
+
+        monkeypatch.setattr(cloudinary.api, 'resources', resources)
+        manifest = AssetManifest(':memory:')
+
+        assert get_car_photos_urls('1', folder='', manifest=manifest) == ['https://c/car_1_1.jpg', 'https://c/car_1_10.jpg']
+        assert get_car_photos_urls('1', folder='', manifest=manifest) == ['https://c/car_1_1.jpg', 'https://c/car_1_10.jpg']
+        assert calls == ['car_1_']
+
+    def test_empty_sync_cached(self, monkeypatch):
+        """Автомобиль без фото не запрашивается в Admin API повторно, пока не истек sync_ttl."""
+        calls = []
+
+        def resources(**kwargs):
+            calls.append(kwargs['prefix'])
+            return {'resources': []}
+
+        monkeypatch.setattr(cloudinary.api, 'resources', resources)
+        manifest = AssetManifest(':memory:')
+
+        assert get_car_photos_urls('2', folder='', manifest=manifest) == []
+        assert get_car_photo_thumbnails('2', folder='', client=FakeClient(), manifest=manifest) == []
+        assert calls == ['car_2_']
+
+        manifest.sync_ttl = 0
+        get_car_photos_urls('2', folder='', manifest=manifest)
+        assert calls == ['car_2_', 'car_2_']
+
+    def test_delete_exact(self):
+        """Удаляются только фото из индекса, записи убираются."""
+        manifest = AssetManifest(':memory:')
+        for i in (1, 2, 3):
+            manifest.record('023-455', {'public_id': f'cars/car_023-455_{i}'})
+        client = FakeClient()
+
+        delete_car_photos('023-455', client=client, manifest=manifest)
+
+        assert client.deleted == ['cars/car_023-455_1', 'cars/car_023-455_2', 'cars/car_023-455_3']
+        assert manifest.assets('023-455') == []
+
+    def test_eager_derivatives(self, monkeypatch):
+        """Производные заказываются при загрузке, готовность отмечается по уведомлению."""
+        manifest = AssetManifest(':memory:')
+        client = FakeClient()
+
+        monkeypatch.setenv('CLOUDINARY_DERIVATIVE_FORMATS', 'webp')
+
+        upload_car_photos(['1.jpg', '2.jpg'], '023-455', client=client, manifest=manifest,
+                          derivatives=['thumbnail', 'large'])
+
+        # f_auto заранее не строится: каждый профиль заказан в формате загрузки и в webp
+        assert client.uploads[0]['eager_async'] is True
+        assert build_eager(client.uploads[0]['eager']) == (
+            'c_fill,h_200,q_auto,w_300|c_fill,h_200,q_auto,w_300/webp|'
+            'c_limit,h_600,q_auto,w_800|c_limit,h_600,q_auto,w_800/webp'
+        )
+        profiles = {'large': False, 'large/webp': False, 'thumbnail': False, 'thumbnail/webp': False}
+        assert manifest.derivatives('023-455') == {
+            'cars/car_023-455_1': profiles,
+            'cars/car_023-455_2': profiles,
+        }
+        assert manifest.pending_derivatives() == 8
+
+        notification = [{'transformation': 'c_fill,h_200,q_auto,w_300',
+                         'secure_url': 'https://c/c_fill,h_200,q_auto,w_300/v3/cars/car_023-455_1'}]
+        assert manifest.mark_derived('cars/car_023-455_1', notification) == 1
+        assert manifest.derivatives('023-455')['cars/car_023-455_1']['thumbnail'] is True
+        webp = [{'transformation': 'c_fill,h_200,q_auto,w_300/webp',
+                 'secure_url': 'https://c/c_fill,h_200,q_auto,w_300/v3/cars/car_023-455_1.webp'}]
+        assert manifest.mark_derived('cars/car_023-455_1', webp) == 1
+
+        # URL миниатюры - та же трансформация с f_auto: отдается одна из заказанных производных
+        thumbnails = get_car_photo_thumbnails('023-455', client=client, manifest=manifest)
+        assert thumbnails[0].endswith('/c_fill,f_auto,h_200,q_auto,w_300/v3/cars/car_023-455_1')
+
+        manifest.remove(['cars/car_023-455_1', 'cars/car_023-455_2'])
+        assert manifest.pending_derivatives() == 0
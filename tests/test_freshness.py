@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+
+from app.monitoring.freshness import FreshnessTracker, channel_label
+
+NOW = datetime(2026, 10, 19, 12, 0, tzinfo=timezone.utc)
+
+
+class TestFreshnessTracker:
+    """Тесты SLO свежести публикаций."""
+
+    def test_channel_label(self):
+        """Ссылка и @username приводятся к одному имени."""
+        assert channel_label('https://t.me/cars_china') == 'cars_china'
+        assert channel_label('@cars_china') == 'cars_china'
+
+    def test_observe_latency(self):
+        """Задержка считается от даты поста до публикации."""
+        tracker = FreshnessTracker()
+        latency = tracker.observe('@src', NOW - timedelta(minutes=5), published_at=NOW)
+        assert latency == pytest.approx(300)
+        assert tracker.p95('@src') == pytest.approx(300)
+
+    def test_backfill_ignored(self):
+        """Старые посты (догрузка истории) не учитываются."""
+        tracker = FreshnessTracker(ignore_older_than_hours=24)
+        assert tracker.observe('@src', NOW - timedelta(days=3), published_at=NOW) is None
+        assert tracker.p95('@src') == 0.0
+
+    @pytest.mark.asyncio
+    async def test_alert_on_breach_with_cooldown(self):
+        """При нарушении p95 отправляется один алерт до конца периода охлаждения."""
+        sent = []
+
+        async def sender(text):
+            sent.append(text)
+
+        tracker = FreshnessTracker(slo_p95_seconds=600, min_samples=3, alert_sender=sender)
+        for _ in range(5):
+            await tracker.record('https://t.me/src', NOW - timedelta(minutes=30), published_at=NOW)
+
+        assert len(sent) == 1
+        assert 'src' in sent[0]
+
+    @pytest.mark.asyncio
+    async def test_no_alert_within_slo(self):
+        """Пока p95 в пределах SLO, алертов нет."""
+        sent = []
+
+        async def sender(text):
+            sent.append(text)
+
+        tracker = FreshnessTracker(slo_p95_seconds=600, min_samples=3, alert_sender=sender)
+        for _ in range(5):
+            await tracker.record('@src', NOW - timedelta(minutes=2), published_at=NOW)
+        assert await tracker.record('@src', None) is None
+        assert sent == []
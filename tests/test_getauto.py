@@ -0,0 +1,71 @@
+import asyncio
+from types import SimpleNamespace
+
+from telegram.error import BadRequest
+
+from app.commands import getauto
+
+
+class FakeLookup:
+    def __init__(self):
+        self.saved = {}
+
+    async def save_photo_file_ids(self, custom_id, file_ids):
+        self.saved[custom_id] = file_ids
+        return True
+
+    async def download_images(self, urls):
+        return []
+
+
+class FakeBot:
+    """Принимает только URL и собственные file_id бота."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_media_group(self, chat_id, media):
+        refs = [item.media for item in media]
+        if any(ref.startswith('stale') for ref in refs):
+            raise BadRequest('Wrong file identifier/http url specified')
+        self.sent.append(refs)
+        return [SimpleNamespace(photo=[SimpleNamespace(file_id=f"small_{i}"), SimpleNamespace(file_id=f"bot_{i}")])
+                for i in range(len(refs))]
+
+
+def _send(car_data, monkeypatch):
+    lookup = FakeLookup()
+    monkeypatch.setattr(getauto, 'get_car_lookup', lambda: lookup)
+    bot = FakeBot()
+    update = SimpleNamespace(effective_chat=SimpleNamespace(id=1))
+    context = SimpleNamespace(bot=bot)
+    assert asyncio.run(getauto.send_car_photos(update, context, car_data, 'caption'))
+    return bot.sent, lookup.saved
+
+
+class TestSendCarPhotos:
+    """Тесты переиспользования file_id в /getauto."""
+
+    def test_file_ids_reused(self, monkeypatch):
+        """Сохраненные file_id отправляются без URL и без повторного сохранения."""
+        car = {'custom_id': '023-455', 'photos': ['https://c/1.jpg', 'https://c/2.jpg'],
+               'photo_file_ids': ['bot_0', 'bot_1']}
+        sent, saved = _send(car, monkeypatch)
+        assert sent == [['bot_0', 'bot_1']]
+        assert saved == {}
+
+    def test_stale_file_ids_refreshed_from_urls(self, monkeypatch):
+        """Непринятые file_id заменяются URL, новые file_id сохраняются."""
+        car = {'custom_id': '023-455', 'photos': ['https://c/1.jpg', 'https://c/2.jpg'],
+               'photo_file_ids': ['stale_0', 'stale_1']}
+        sent, saved = _send(car, monkeypatch)
+        assert sent == [['https://c/1.jpg', 'https://c/2.jpg']]
+        assert saved == {'023-455': ['bot_0', 'bot_1']}
+
+    def test_first_send_stores_bot_file_ids(self, monkeypatch):
+        """Первый /getauto после публикации отправляет URL сразу и сохраняет file_id бота."""
+        car = {'custom_id': '023-455', 'photos': ['https://c/1.jpg', 'https://c/2.jpg'],
+               'photo_file_ids': []}
+        sent, saved = _send(car, monkeypatch)
+        assert sent == [['https://c/1.jpg', 'https://c/2.jpg']]
+        assert saved == {'023-455': ['bot_0', 'bot_1']}
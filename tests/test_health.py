@@ -0,0 +1,82 @@
+import asyncio
+import socket
+
+import aiohttp
+import pytest
+
+from app.monitoring.health import HealthChecker
+from app.monitoring.metrics import QUEUE_DEPTH, record_api_error, start_metrics_server
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestHealthChecker:
+    """Тесты проверок liveness и readiness."""
+
+    @pytest.mark.asyncio
+    async def test_readiness_checks(self):
+        """Готовность снимают отключенный Telethon, длинная очередь и серия ошибок API."""
+        checker = HealthChecker(max_queue_depth=10, breaker_errors=3, breaker_window=60)
+        connected = {'value': True}
+        checker.add_check('telethon', lambda: connected['value'])
+
+        await checker.refresh()
+        assert checker.readiness()[0]
+
+        connected['value'] = False
+        QUEUE_DEPTH.labels(queue='test_health').set(11)
+        for _ in range(3):
+            record_api_error('test_health_api', 500)
+        await checker.refresh()
+        ready, body = checker.readiness()
+
+        assert not ready
+        assert body['checks']['telethon']['status'] == 'unhealthy'
+        assert body['checks']['queues']['depths']['test_health'] == 11
+        assert body['checks']['downstream']['open'] == ['test_health_api']
+        QUEUE_DEPTH.labels(queue='test_health').set(0)
+
+    @pytest.mark.asyncio
+    async def test_failing_check(self):
+        """Исключение или зависание проверки - unhealthy, а не ошибка обновления."""
+        checker = HealthChecker(check_timeout=0.05)
+
+        async def hangs():
+            await asyncio.sleep(1)
+
+        checker.add_check('broken', lambda: 1 / 0)
+        checker.add_check('hangs', hangs)
+        results = await checker.refresh()
+
+        assert 'ZeroDivisionError' in results['broken']['error']
+        assert 'TimeoutError' in results['hangs']['error']
+
+    def test_liveness_stalled(self):
+        """Liveness падает, только если фоновые проверки давно не обновлялись."""
+        checker = HealthChecker(interval=10, check_timeout=5)
+        assert checker.liveness()[0]
+        checker.refreshed_at = 0.0
+        assert not checker.liveness()[0]
+
+    @pytest.mark.asyncio
+    async def test_endpoints(self, monkeypatch):
+        """Сервер метрик отдает /healthz и /readyz из кэша проверок."""
+        monkeypatch.delenv('METRICS_ENABLED', raising=False)
+        checker = HealthChecker()
+        checker.add_check('telethon', lambda: False)
+        await checker.refresh()
+        port = free_port()
+        runner = await start_metrics_server('127.0.0.1', port, health=checker)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{port}/healthz') as response:
+                    assert response.status == 200
+                async with session.get(f'http://127.0.0.1:{port}/readyz') as response:
+                    assert response.status == 503
+                    assert (await response.json())['status'] == 'not_ready'
+        finally:
+            await runner.cleanup()
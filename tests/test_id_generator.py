@@ -0,0 +1,94 @@
+import multiprocessing
+
+import pytest
+
+from app.utils import id_generator
+from app.utils.id_allocator import IDAllocator, IDBitmap, IDSpaceExhausted, TOTAL_IDS
+from app.utils.id_generator import CustomIDGenerator
+
+
+def _allocate_many(path, count, queue):
+    allocator = IDAllocator(path, lease_size=8)
+    queue.put([allocator.allocate() for _ in range(count)])
+
+
+class TestIDBitmap:
+    """Тесты битовой карты номеров."""
+
+    def test_take_unique_until_full(self):
+        """Номера не повторяются, заполненная карта сообщает об исчерпании."""
+        import random
+        bitmap = IDBitmap(b'\xff' * (TOTAL_IDS // 8 - 2))
+        rng = random.Random(1)
+        numbers = {bitmap.take(rng) for _ in range(16)}
+        assert len(numbers) == 16
+        assert all(number >= TOTAL_IDS - 16 for number in numbers)
+        with pytest.raises(IDSpaceExhausted):
+            bitmap.take(rng)
+
+    def test_add_and_count(self):
+        """Повторная отметка не меняет счетчик."""
+        bitmap = IDBitmap()
+        assert bitmap.add(999_999)
+        assert not bitmap.add(999_999)
+        assert 999_999 in bitmap
+        assert bitmap.used == 1
+
+
+class TestIDAllocator:
+    """Тесты аллокатора на файле карты."""
+
+    def test_persisted_between_instances(self, tmp_path):
+        """Выданные номера занятыми видит и новый экземпляр."""
+        path = str(tmp_path / 'ids.bitmap')
+        first = IDAllocator(path, lease_size=4, seed=1)
+        number = first.allocate()
+        second = IDAllocator(path, seed=1)
+        assert number in second.bitmap
+        assert second.used_count == 4
+
+    def test_processes_do_not_collide(self, tmp_path):
+        """Два процесса с общим файлом получают разные номера."""
+        path = str(tmp_path / 'ids.bitmap')
+        queue = multiprocessing.get_context('fork').Queue()
+        workers = [
+            multiprocessing.get_context('fork').Process(target=_allocate_many, args=(path, 200, queue))
+            for _ in range(2)
+        ]
+        for worker in workers:
+            worker.start()
+        results = [queue.get(timeout=30) for _ in workers]
+        for worker in workers:
+            worker.join()
+        assert len(set(results[0]) | set(results[1])) == 400
+
+    def test_mark_used_drops_leased(self):
+        """Номер из аренды, найденный в базе, повторно не выдается."""
+        allocator = IDAllocator(seed=3)
+        allocator.lease_size = 1
+        allocator._leased.extend([10, 11])
+        allocator.bitmap.add(10)
+        allocator.bitmap.add(11)
+        allocator.mark_used([10])
+        assert allocator.allocate() == 11
+
+
+class TestCustomIDGenerator:
+    """Тесты генератора custom ID."""
+
+    def test_format_and_seed(self, monkeypatch, tmp_path):
+        """ID из Storage API не выдаются повторно."""
+        monkeypatch.setenv('CUSTOM_ID_BITMAP', str(tmp_path / 'ids.bitmap'))
+        monkeypatch.setattr(id_generator, '_global_generator', None)
+
+        class FakeClient:
+            def get_custom_ids(self):
+                return ['023-455', '023-455', 'old-id', '999-999']
+
+        monkeypatch.setattr('app.storage_api.database_client.get_client', lambda: FakeClient())
+        assert id_generator.seed_used_ids_from_storage() == 2
+        generator = id_generator.get_generator()
+        assert generator.get_used_ids_count() == 2
+        custom_id = id_generator.generate_custom_id()
+        assert CustomIDGenerator.is_valid_format(custom_id)
+        assert custom_id not in ('023-455', '999-999')
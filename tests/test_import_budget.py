@@ -0,0 +1,37 @@
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.import_budget import check_module, measure_import
+
+
+class TestImportSideEffects:
+    """Тесты импорта точек входа без окружения и без тяжелых бэкендов."""
+
+    @pytest.mark.parametrize('module', [
+        'main',
+        'get_auto',
+        'app.core.telegram',
+        'app.utils.channel_parser',
+        'app.text_reader',
+        'app.ocr_api',
+    ])
+    def test_imports_without_env(self, module):
+        """Модуль импортируется без TELEGRAM_* и не загружает cv2, paddleocr, transformers, torch."""
+        result = check_module(module, budget_ms=float('inf'), runs=1)
+
+        assert result['forbidden'] == []
+        assert result['ok']
+
+    def test_forbidden_detected(self):
+        """Загрузка запрещенного модуля при импорте делает проверку неуспешной."""
+        with patch('benchmarks.import_budget.measure_import', return_value=(10.0, ['json', 'cv2.gapi'])):
+            result = check_module('app.ocr_api', budget_ms=100, runs=2)
+
+        assert result['forbidden'] == ['cv2.gapi']
+        assert not result['ok']
+
+    def test_import_error(self):
+        """Падение импорта - ошибка, а не нулевое время."""
+        with pytest.raises(RuntimeError):
+            measure_import('app.no_such_module')
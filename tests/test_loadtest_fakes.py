@@ -0,0 +1,89 @@
+import random
+
+import pytest
+import requests
+
+from loadtest.fakes import FakeServices, FakeTelegramSink, FaultProfile
+
+
+class TestFaultProfile:
+    """Тесты разбора профилей задержек и ошибок."""
+
+    def test_parse(self):
+        """Строка профиля разбирается в задержку, шум и доли ошибок."""
+        profile = FaultProfile.parse("0.8,jitter=0.5,err=0.02,429=0.01,status=503")
+
+        assert profile.latency == 0.8
+        assert profile.jitter == 0.5
+        assert profile.error_rate == 0.02
+        assert profile.rate_limit_rate == 0.01
+        assert profile.error_status == 503
+
+    def test_parse_unknown_key(self):
+        """Неизвестный параметр - ошибка, а не молчаливый игнор."""
+        with pytest.raises(ValueError):
+            FaultProfile.parse("1,timeout=5")
+
+    def test_sample_status_rates(self):
+        """Доли 429 и 5xx соответствуют профилю."""
+        profile = FaultProfile(error_rate=0.1, rate_limit_rate=0.2)
+        rng = random.Random(1)
+        statuses = [profile.sample_status(rng) for _ in range(5000)]
+
+        assert 0.17 < statuses.count(429) / 5000 < 0.23
+        assert 0.08 < statuses.count(500) / 5000 < 0.12
+
+
+class TestFakeServices:
+    """Тесты HTTP-заглушек."""
+
+    def test_services_respond(self):
+        """Заглушки отвечают в формате настоящих API и считают запросы."""
+        fast = FaultProfile(latency=0.001, jitter=0)
+        services = FakeServices({name: fast for name in ('perplexity', 'storage_api', 'cbr')})
+        services.start()
+        try:
+            env = services.env()
+            completion = requests.post(f"{env['PERPLEXITY_BASE_URL']}/chat/completions", json={}).json()
+            saved = requests.post(f"{env['STORAGE_API_URL']}/api/cars", json={'custom_id': '001-001'})
+            rate = requests.get(env['CBR_DAILY_URL'])
+        finally:
+            services.stop()
+
+        assert completion['choices'][0]['message']['content']
+        assert saved.status_code == 201
+        assert 'USD' in rate.content.decode('windows-1251')
+        assert services.stats['perplexity'].requests == 1
+
+    def test_injected_rate_limit(self):
+        """При 429=1 заглушка всегда отвечает 429."""
+        services = FakeServices({'storage_api': FaultProfile(latency=0.001, jitter=0, rate_limit_rate=1.0)})
+        services.start()
+        try:
+            response = requests.post(f"{services.env()['STORAGE_API_URL']}/api/cars", json={})
+        finally:
+            services.stop()
+
+        assert response.status_code == 429
+        assert services.stats['storage_api'].rate_limited == 1
+
+
+class TestFakeTelegramSink:
+    """Тесты заглушки канала публикации."""
+
+    @pytest.mark.asyncio
+    async def test_publish_contract(self):
+        """Возвращает id поста и file_id на каждое фото, как Telethon-обертка."""
+        sink = FakeTelegramSink(FaultProfile(latency=0.001, jitter=0))
+        message_id, file_ids = await sink.send_message_with_photos_to_channel("текст", ["a.jpg", "b.jpg"])
+
+        assert message_id == sink.published[0]
+        assert len(file_ids) == 2
+
+    @pytest.mark.asyncio
+    async def test_publish_failure(self):
+        """Внесенная ошибка возвращает (None, None)."""
+        sink = FakeTelegramSink(FaultProfile(latency=0.001, jitter=0, error_rate=1.0))
+
+        assert await sink.send_message_with_photos_to_channel("текст", []) == (None, None)
+        assert sink.stats.errors == 1
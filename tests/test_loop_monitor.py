@@ -0,0 +1,54 @@
+import time
+import asyncio
+import pytest
+
+from app.monitoring.loop_monitor import LoopMonitor, install_event_loop_policy
+
+
+def blocking_call(seconds):
+    """Синхронный вызов, блокирующий event loop."""
+    time.sleep(seconds)
+
+
+class TestLoopMonitor:
+    """Тесты мониторинга задержки event loop."""
+
+    @pytest.mark.asyncio
+    async def test_detects_blocking_call(self):
+        """Блокировка дольше порога фиксируется со стеком виновника."""
+        monitor = LoopMonitor(interval=0.01, threshold=0.1)
+        monitor.start()
+        await asyncio.sleep(0.05)
+        blocking_call(0.4)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        assert monitor.block_count == 1
+        assert 'blocking_call' in monitor.last_block['site']
+        assert 'test_loop_monitor.py' in monitor.last_block['stack']
+        assert monitor.percentiles()['1'] >= 0.3
+
+    @pytest.mark.asyncio
+    async def test_idle_loop_has_no_blocks(self):
+        """Без блокирующих вызовов блокировки не фиксируются."""
+        monitor = LoopMonitor(interval=0.01, threshold=0.2)
+        monitor.start()
+        await asyncio.sleep(0.2)
+        await monitor.stop()
+
+        assert monitor.block_count == 0
+        assert monitor.percentiles()['0.5'] < 0.2
+
+    def test_percentiles(self):
+        """Перцентили считаются по скользящему окну."""
+        monitor = LoopMonitor(window=100)
+        for i in range(200):
+            monitor.record_lag(i / 1000)
+        stats = monitor.percentiles()
+        assert stats['1'] == pytest.approx(0.199)
+        assert stats['0.5'] == pytest.approx(0.15, abs=0.001)
+
+    def test_uvloop_disabled_by_default(self, monkeypatch):
+        """Без USE_UVLOOP политика event loop не меняется."""
+        monkeypatch.delenv('USE_UVLOOP', raising=False)
+        assert install_event_loop_policy() is False
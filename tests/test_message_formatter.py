@@ -0,0 +1,65 @@
+import json
+import os
+import time
+
+import pytest
+
+from app.utils.message_formatter import MessageFormatter, format_perplexity_response_with_quotes
+
+# Эталонные ответы записаны прежней (регулярными выражениями) реализацией
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'data', 'message_formatter_golden.json')
+
+with open(GOLDEN_PATH, encoding='utf-8') as f:
+    GOLDEN = json.load(f)
+
+
+class TestPerplexityQuotes:
+    """Тесты оформления ответа Perplexity в HTML."""
+
+    @pytest.mark.parametrize('case', GOLDEN['perplexity'], ids=lambda case: str(len(case['input'])))
+    def test_golden(self, case):
+        """Результат совпадает с эталоном побайтно."""
+        assert format_perplexity_response_with_quotes(case['input']) == case['output']
+
+    def test_section_quote(self):
+        """Заголовок оборачивается в <b>, содержимое - в <blockquote>."""
+        text = "🛠️ **Технические характеристики**:\nДвигатель: 2.0\n\nCustom ID: 001"
+        assert format_perplexity_response_with_quotes(text) == (
+            "🛠 <b>Технические характеристики</b>:\n<blockquote>Двигатель: 2.0\n\nCustom ID: 001</blockquote>"
+        )
+
+    def test_details_until_hashtags(self):
+        """Секция ⚙️ заканчивается перед хештегами, слипшиеся хештеги разделяются."""
+        text = "⚙️ Дополнительные детали\n- ESP\n- ABS\n\n#Geely#авто"
+        assert format_perplexity_response_with_quotes(text) == (
+            "⚙️ <b>Дополнительные детали</b>\n<blockquote>ESP\nABS</blockquote>\n\n#Geely #авто"
+        )
+
+    def test_long_section_without_hashtags(self):
+        """Длинная секция без хештегов обрабатывается за линейное время."""
+        text = "⚙️ Дополнительные детали\n" + "\n".join(f"- Опция {i}" for i in range(20000))
+        started = time.perf_counter()
+        result = format_perplexity_response_with_quotes(text)
+        assert time.perf_counter() - started < 1.0
+        assert '<blockquote>' not in result
+
+    def test_empty(self):
+        """Пустой ответ возвращается как есть."""
+        assert format_perplexity_response_with_quotes('') == ''
+        assert format_perplexity_response_with_quotes(None) is None
+
+
+class TestQuoteSections:
+    """Тесты цитирования блоков описания MessageFormatter."""
+
+    @pytest.mark.parametrize('case', GOLDEN['quote_sections'], ids=lambda case: str(len(case['input'])))
+    def test_golden(self, case):
+        """Результат совпадает с эталоном побайтно."""
+        assert MessageFormatter()._quote_sections(case['input']) == case['output']
+
+    def test_consecutive_headers(self):
+        """Строка сразу после заголовка остается текстом блока."""
+        text = "Преимущества:\nОсновные характеристики\nЭкономичный"
+        assert MessageFormatter()._quote_sections(text) == (
+            "Преимущества:\n> Основные характеристики\n> Экономичный"
+        )
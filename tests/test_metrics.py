@@ -0,0 +1,69 @@
+import socket
+
+import aiohttp
+import pytest
+from prometheus_client import REGISTRY
+
+from app.monitoring.metrics import (
+    track_stage,
+    record_perplexity_usage,
+    record_rate_limited,
+    start_metrics_server
+)
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class TestMetrics:
+    """Тесты метрик конвейера."""
+
+    def test_track_stage_observes_on_error(self):
+        """Длительность этапа учитывается и при исключении."""
+        before = sample('telegram_stage_duration_seconds_count', stage='test_stage')
+        with pytest.raises(RuntimeError):
+            with track_stage('test_stage'):
+                raise RuntimeError('boom')
+        assert sample('telegram_stage_duration_seconds_count', stage='test_stage') == before + 1
+
+    def test_perplexity_usage(self):
+        """Токены из поля usage попадают в счетчики."""
+        before = sample('telegram_perplexity_tokens_total', type='completion')
+        record_perplexity_usage({'prompt_tokens': 120, 'completion_tokens': 30})
+        record_perplexity_usage(None)
+        assert sample('telegram_perplexity_tokens_total', type='completion') == before + 30
+
+    def test_rate_limited_counts_as_error(self):
+        """429 учитывается и отдельно, и среди ошибок API."""
+        before = sample('telegram_api_errors_total', service='test_api', kind='429')
+        record_rate_limited('test_api')
+        assert sample('telegram_api_rate_limited_total', service='test_api') >= 1
+        assert sample('telegram_api_errors_total', service='test_api', kind='429') == before + 1
+
+    @pytest.mark.asyncio
+    async def test_metrics_endpoint(self, monkeypatch):
+        """Сервер отдает метрики в формате Prometheus."""
+        monkeypatch.delenv('METRICS_ENABLED', raising=False)
+        port = free_port()
+        runner = await start_metrics_server('127.0.0.1', port)
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f'http://127.0.0.1:{port}/metrics') as response:
+                    assert response.status == 200
+                    body = await response.text()
+            assert 'telegram_stage_duration_seconds' in body
+        finally:
+            await runner.cleanup()
+
+    @pytest.mark.asyncio
+    async def test_metrics_server_disabled(self, monkeypatch):
+        """METRICS_ENABLED=0 отключает сервер."""
+        monkeypatch.setenv('METRICS_ENABLED', '0')
+        assert await start_metrics_server('127.0.0.1', free_port()) is None
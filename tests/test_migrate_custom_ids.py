@@ -0,0 +1,103 @@
+import asyncio
+import json
+
+import aiohttp
+import pytest
+
+from app.utils import id_generator
+from app.utils.migrate_custom_ids import CustomIDMigrator, MigrationScan
+from loadtest.fakes import FakeServices, FaultProfile
+
+
+@pytest.fixture
+def isolated_ids(monkeypatch, tmp_path):
+    monkeypatch.setenv('CUSTOM_ID_BITMAP', str(tmp_path / 'ids.bitmap'))
+    monkeypatch.setattr(id_generator, '_global_generator', None)
+
+
+@pytest.fixture
+def storage():
+    services = FakeServices({'storage_api': FaultProfile(latency=0.002, jitter=0)})
+    services.start()
+    yield services
+    services.stop()
+
+
+class TestMigrationScan:
+    """Тесты анализа ID."""
+
+    def test_conflicts(self, isolated_ids):
+        """Конфликт - и с существующим ID, и между двумя старыми ID."""
+        scan = MigrationScan()
+        for custom_id in ('345-678', '12345678', '99111222', '77111222', '55000111'):
+            scan.add({'custom_id': custom_id})
+
+        plan, conflicts = scan.plan()
+
+        assert plan == [('99111222', '111-222'), ('55000111', '000-111')]
+        assert [c['old_id'] for c in conflicts] == ['12345678', '77111222']
+        assert scan.total_cars == 5
+
+
+class TestCustomIDMigrator:
+    """Тесты миграции через заглушку Storage API."""
+
+    def test_migrate_streaming_with_checkpoint(self, isolated_ids, storage, tmp_path):
+        """Постраничный обход, параллельные обновления и продолжение по checkpoint."""
+        for number in range(1200):
+            storage.cars[f"{number:08d}"] = {'custom_id': f"{number:08d}", 'brand': 'Geely'}
+        storage.cars['000-005'] = {'custom_id': '000-005'}
+        checkpoint = tmp_path / 'checkpoint.jsonl'
+        checkpoint.write_text(
+            json.dumps({'old_id': '00000001', 'new_id': '000-001', 'ok': True}) + '\n'
+            # Запись не из этого плана (другой новый ID) - не пропускается
+            + json.dumps({'old_id': '00000002', 'new_id': '999-999', 'ok': True}) + '\n'
+        )
+
+        migrator = CustomIDMigrator(f"{storage.base_url}/storage", page_size=100,
+                                    concurrency=32, checkpoint_path=str(checkpoint))
+        result = asyncio.run(migrator.migrate_ids(dry_run=False))
+
+        assert result['total_cars'] == 1201
+        assert result['conflicts'] == 1  # 00000005 -> 000-005 уже занят
+        assert result['successful_migrations'] == 1198
+        assert '00000001' in storage.cars and '000-002' in storage.cars
+        assert storage.cars['000-002']['brand'] == 'Geely'
+        assert not checkpoint.exists()
+
+    def test_conflicts_skip_planned_ids(self, isolated_ids, storage, tmp_path):
+        """Новые ID для конфликтов не совпадают с ID плана, еще не записанными в базу."""
+        storage.cars['00000005'] = {'custom_id': '00000005'}
+        storage.cars['000-005'] = {'custom_id': '000-005'}
+        storage.cars['00000007'] = {'custom_id': '00000007'}
+        # Свободны только 000-007 (ID плана для 00000007) и 000-100
+        id_generator.get_generator()._allocator.mark_used(
+            number for number in range(id_generator.TOTAL_IDS) if number not in (7, 100)
+        )
+
+        migrator = CustomIDMigrator(f"{storage.base_url}/storage", checkpoint_path=str(tmp_path / 'checkpoint.jsonl'))
+        result = asyncio.run(migrator.handle_conflicts())
+
+        assert result['conflicts_resolved'] == 1
+        assert '000-100' in storage.cars and '00000007' in storage.cars
+
+    def test_scan_survives_concurrent_insert(self, isolated_ids, storage):
+        """Запись, добавленная во время обхода, не сдвигает страницы курсора."""
+        for number in range(250):
+            storage.cars[f"{number:08d}"] = {'custom_id': f"{number:08d}"}
+        migrator = CustomIDMigrator(f"{storage.base_url}/storage", page_size=100, checkpoint_path=None)
+
+        async def collect():
+            seen = []
+            async with aiohttp.ClientSession() as session:
+                async for cars in migrator.iter_car_pages(session):
+                    if not seen:
+                        # Бот сохраняет новый автомобиль перед уже пройденными ID
+                        storage.cars['000-000'] = {'custom_id': '000-000'}
+                    seen.extend(car['custom_id'] for car in cars)
+            return seen
+
+        seen = asyncio.run(collect())
+
+        assert len(seen) == len(set(seen)) == 250
+        assert set(seen) == {f"{number:08d}" for number in range(250)}
@@ -0,0 +1,153 @@
+import pytest
+import numpy as np
+import cv2
+from unittest.mock import patch, AsyncMock
+
+from app.monitoring.metrics import OCR_CASCADE
+from app.ocr_api.ocr_client import OCRClient, OCRConfig
+from app.ocr_api.text_detector import TextPresenceResult
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "image.jpg"
+    cv2.imwrite(str(path), np.full((100, 100, 3), 255, np.uint8))
+    return str(path)
+
+
+def make_client(**kwargs):
+    config = OCRConfig(
+        use_cascade=True,
+        yandex_iam_token='token',
+        yandex_folder_id='folder',
+        text_prefilter='off',
+        cascade_min_confidence=70,
+        cascade_min_chars=10,
+        cascade_spec_sheet_lines=15,
+        **kwargs
+    )
+    return OCRClient(config)
+
+
+def presence(lines, likely_text=True):
+    return TextPresenceResult(
+        score=0.5, edge_density=0.1, text_lines=lines, text_area_ratio=0.01, likely_text=likely_text
+    )
+
+
+def cascade_count(tier, reason):
+    return OCR_CASCADE.labels(tier=tier, reason=reason)._value.get()
+
+
+class TestOCRCascade:
+    """Тесты каскада локальный OCR -> Yandex Vision."""
+
+    @pytest.mark.asyncio
+    async def test_confident_local_result(self, image_path):
+        """Уверенный локальный результат не отправляется в Yandex."""
+        client = make_client()
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(2)), \
+                patch.object(client, 'tesseract_with_confidence', return_value=('BMW X5 2019 года', 91.0)), \
+                patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='yandex')) as yandex:
+            result = await client.extract_text_cascade(image_path)
+        assert result.tier == 'tesseract'
+        assert result.confidence == 91.0
+        assert result.escalated is False
+        yandex.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_low_confidence_escalates(self, image_path):
+        """Низкая уверенность локального движка ведет к Yandex."""
+        client = make_client()
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(2)), \
+                patch.object(client, 'tesseract_with_confidence', return_value=('BMW X5 2019 года', 40.0)), \
+                patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='yandex')):
+            result = await client.extract_text_cascade(image_path)
+        assert result.tier == 'yandex'
+        assert result.reason == 'low_confidence'
+        assert result.text == 'yandex'
+        assert client.tier_stats == {'yandex': 1}
+
+    @pytest.mark.asyncio
+    async def test_low_yield_escalates(self, image_path):
+        """Слишком короткий текст ведет к Yandex."""
+        client = make_client()
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(2)), \
+                patch.object(client, 'tesseract_with_confidence', return_value=('BMW', 95.0)), \
+                patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='yandex')):
+            result = await client.extract_text_cascade(image_path)
+        assert result.reason == 'low_yield'
+        assert result.tier == 'yandex'
+
+    @pytest.mark.asyncio
+    async def test_spec_sheet_goes_to_yandex(self, image_path):
+        """Плотный лист характеристик сразу отправляется в Yandex."""
+        client = make_client()
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(30)), \
+                patch.object(client, 'tesseract_with_confidence') as local, \
+                patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='yandex')):
+            result = await client.extract_text_cascade(image_path)
+        assert result.tier == 'yandex'
+        assert result.reason == 'spec_sheet'
+        local.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_without_yandex_tokens_keeps_local(self, image_path, monkeypatch):
+        """Без токенов Yandex остается локальный результат."""
+        monkeypatch.delenv('YANDEX_IAM_TOKEN', raising=False)
+        monkeypatch.delenv('YANDEX_FOLDER_ID', raising=False)
+        client = make_client()
+        client.config.yandex_iam_token = None
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(2)), \
+                patch.object(client, 'tesseract_with_confidence', return_value=('BMW', 30.0)):
+            result = await client.extract_text_cascade(image_path)
+        assert result.tier == 'tesseract'
+        assert result.reason == 'low_confidence'
+
+    def test_invalid_local_engine(self):
+        """Неизвестный локальный движок отклоняется."""
+        with pytest.raises(ValueError):
+            OCRClient(OCRConfig(use_cascade=True, cascade_local='easyocr'))
+
+    @pytest.mark.asyncio
+    async def test_audit_mode_does_not_skip(self, image_path, caplog):
+        """В режиме audit изображение без текста только логируется и проходит каскад."""
+        caplog.set_level('INFO', logger='app.ocr_api.ocr_client')
+        client = make_client()
+        client.config.text_prefilter = 'audit'
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(0, likely_text=False)), \
+                patch.object(client, 'tesseract_with_confidence', return_value=('BMW X5 2019 года', 91.0)):
+            result = await client.extract_text_cascade(image_path)
+        assert result.tier == 'tesseract'
+        assert '[audit]' in caplog.text
+
+    @pytest.mark.asyncio
+    async def test_results_per_image_and_metric(self, image_path):
+        """Ступень возвращается для каждого изображения и учитывается в метрике."""
+        client = make_client()
+        before = cascade_count('yandex', 'low_confidence')
+
+        def local(path):
+            return ('BMW X5 2019 года', 91.0 if path.endswith('good.jpg') else 40.0)
+
+        with patch('app.ocr_api.text_detector.score_text_presence', return_value=presence(2)), \
+                patch.object(client, 'tesseract_with_confidence', side_effect=local), \
+                patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='yandex')):
+            results = await client.process_multiple_images([image_path, 'good.jpg'])
+
+        assert [result['tier'] for result in results] == ['yandex', 'tesseract']
+        assert results[1]['confidence'] == 91.0
+        assert cascade_count('yandex', 'low_confidence') == before + 1
+
+    def test_tesseract_language_codes(self, image_path):
+        """Tesseract получает коды ISO 639-3 (rus), а не 'ru' из конфигурации PaddleOCR."""
+        client = make_client(language='ru', preprocess_images=False)
+        data = {'text': ['BMW', ''], 'conf': ['90', '-1']}
+        with patch('pytesseract.image_to_data', return_value=data) as image_to_data:
+            assert client.tesseract_with_confidence(image_path) == ('BMW', 90.0)
+        assert image_to_data.call_args.kwargs['lang'] == 'rus'
+
+        client.config.language = 'ru+en'
+        with patch('pytesseract.image_to_data', return_value=data) as image_to_data:
+            client.tesseract_with_confidence(image_path)
+        assert image_to_data.call_args.kwargs['lang'] == 'rus+eng'
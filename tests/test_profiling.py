@@ -0,0 +1,80 @@
+import os
+import time
+import pstats
+import pytest
+
+from app.monitoring.profiling import Profiler, StackSampler
+
+
+def _busy_loop(seconds):
+    """Нагрузка для профилирования."""
+    deadline = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(100))
+    return total
+
+
+class TestProfiler:
+    """Тесты профилирования по вызовам и по окну."""
+
+    def test_calls_mode_dumps_after_n(self, tmp_path):
+        """После N вызовов сохраняются .prof и текстовая сводка."""
+        profiler = Profiler(output_dir=str(tmp_path))
+        profiler.arm_calls(2)
+        for _ in range(2):
+            with profiler.announcement():
+                _busy_loop(0.01)
+
+        path = profiler.last_outputs['calls']
+        assert os.path.exists(path)
+        assert os.path.exists(path.replace('.prof', '.txt'))
+        stats = pstats.Stats(path)
+        assert any(func[2] == '_busy_loop' for func in stats.stats)
+        assert profiler.status()['calls_remaining'] == 0
+
+    def test_not_armed_is_noop(self, tmp_path):
+        """Без включения вызовы не профилируются."""
+        profiler = Profiler(output_dir=str(tmp_path))
+        with profiler.announcement():
+            pass
+        assert profiler.last_outputs == {}
+        assert os.listdir(tmp_path) == []
+
+    def test_invalid_arguments(self, tmp_path):
+        """Неположительные значения отклоняются."""
+        profiler = Profiler(output_dir=str(tmp_path))
+        with pytest.raises(ValueError):
+            profiler.arm_calls(0)
+        with pytest.raises(ValueError):
+            profiler.start_window(0)
+
+    def test_window_writes_folded_stacks(self, tmp_path):
+        """Окно профилирования пишет стеки в формате folded."""
+        profiler = Profiler(output_dir=str(tmp_path), sample_interval=0.002)
+        path = profiler.start_window(0.2)
+        with pytest.raises(RuntimeError):
+            profiler.start_window(1)
+        _busy_loop(0.25)
+        profiler.wait_window(timeout=5)
+
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(' ', 1)
+        assert int(count) > 0
+        assert any('_busy_loop' in line for line in lines)
+        assert profiler.status()['window_running'] is False
+
+
+class TestStackSampler:
+    """Тесты выборочного профайлера."""
+
+    def test_sample_includes_thread_name(self):
+        """Стек начинается с имени потока."""
+        sampler = StackSampler(interval=0.001)
+        sampler.start(0.05)
+        _busy_loop(0.06)
+        sampler.join(timeout=5)
+        assert sampler.sample_count > 0
+        assert any(stack.startswith('MainThread;') for stack in sampler.samples)
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from app.monitoring.metrics import track_stage
+from app.monitoring.shadow import (
+    ShadowConfig, set_shadow_config, shadow_entry, record_run, is_shadow_run, note_output
+)
+from app.monitoring.shadow_report import load_records, compare
+
+
+@pytest.fixture(autouse=True)
+def reset_config():
+    yield
+    set_shadow_config(None)
+
+
+class TestShadowConfig:
+    """Тесты разбора SHADOW_MODE."""
+
+    @pytest.mark.parametrize("mode, scopes", [
+        ("0", set()),
+        ("1", {'listener', 'parser'}),
+        ("all", {'listener', 'parser'}),
+        ("parser", {'parser'}),
+        ("listener,parser", {'listener', 'parser'}),
+    ])
+    def test_modes(self, monkeypatch, mode, scopes):
+        """Режим задает точки входа, лог по умолчанию включается только в shadow."""
+        monkeypatch.setenv('SHADOW_MODE', mode)
+        monkeypatch.delenv('SHADOW_LOG', raising=False)
+        config = ShadowConfig.from_env()
+
+        assert config.scopes == scopes
+        assert bool(config.log_path) == bool(scopes)
+        assert config.variant == ('shadow' if scopes else 'primary')
+
+    def test_unknown_mode(self, monkeypatch):
+        """Опечатка в SHADOW_MODE - ошибка при старте, а не тихая публикация."""
+        monkeypatch.setenv('SHADOW_MODE', 'listner')
+        with pytest.raises(ValueError):
+            ShadowConfig.from_env()
+
+
+class TestShadowRun:
+    """Тесты точки входа и записи результатов."""
+
+    def test_entry_scope(self):
+        """Shadow включается только для заданной точки входа."""
+        set_shadow_config(ShadowConfig(scopes=frozenset({'parser'})))
+
+        with shadow_entry('listener') as shadow:
+            assert shadow is False and not is_shadow_run()
+        with shadow_entry('parser') as shadow:
+            assert shadow is True and is_shadow_run()
+        assert not is_shadow_run()
+
+    def test_record_run(self, tmp_path):
+        """Запись содержит этапы, результаты и ошибку."""
+        log = tmp_path / "shadow.jsonl"
+        set_shadow_config(ShadowConfig(scopes=frozenset({'listener'}), log_path=str(log), variant='shadow'))
+
+        with shadow_entry('listener'):
+            with pytest.raises(RuntimeError):
+                with record_run({'id': 7}, 'https://t.me/source'):
+                    with track_stage('ocr'):
+                        note_output('ocr', {'hash': 'abc', 'chars': 3})
+                    raise RuntimeError("сбой")
+
+        record = json.loads(log.read_text(encoding='utf-8'))
+        assert record['variant'] == 'shadow' and record['shadow'] is True
+        assert record['source_channel'] == 'source' and record['message_id'] == 7
+        assert 'ocr' in record['stages']
+        assert record['ocr'] == {'hash': 'abc', 'chars': 3}
+        assert record['status'] == 'error' and 'сбой' in record['error']
+
+    def test_no_log_in_production(self):
+        """Без SHADOW_LOG продакшен ничего не пишет."""
+        set_shadow_config(ShadowConfig())
+
+        with record_run({'id': 1}, '@source') as run:
+            assert run is None
+
+
+class TestShadowReport:
+    """Тесты сравнения вариантов."""
+
+    def test_compare(self, tmp_path):
+        """Расхождения разбора и похожесть постов считаются по общим объявлениям."""
+        base = {'variant': 'primary', 'source_channel': 'c', 'status': 'success', 'stages': {'ocr': 1.0},
+                'ocr': {'hash': 'h'}, 'car': {'brand': 'Geely', 'year': 2024}, 'message': 'пост'}
+        path = tmp_path / "log.jsonl"
+        records = [
+            {**base, 'message_id': 1, 'duration': 10.0},
+            {**base, 'message_id': 2, 'duration': 12.0},
+            {**base, 'variant': 'shadow', 'message_id': 1, 'duration': 6.0},
+            {**base, 'variant': 'shadow', 'message_id': 2, 'duration': 7.0, 'car': {'brand': 'Geely', 'year': 2023}},
+            {**base, 'variant': 'shadow', 'message_id': 3, 'duration': 7.0},
+        ]
+        path.write_text('\n'.join(json.dumps(r) for r in records), encoding='utf-8')
+
+        variants = load_records([str(path)])
+        result = compare(variants['primary'], variants['shadow'])
+
+        assert result['common'] == 2 and result['only_candidate'] == 1
+        assert result['duration']['candidate_p95'] < result['duration']['baseline_p95']
+        assert result['car_diffs'] == [{'key': ('c', 2), 'fields': {'year': (2024, 2023)}}]
+        assert result['message_similarity_p50'] == 1.0
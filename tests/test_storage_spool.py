@@ -0,0 +1,124 @@
+import pytest
+
+from app.monitoring.metrics import STORAGE_SPOOL_DEAD
+from app.storage_api import spool
+from app.storage_api.database_client import DatabaseClient
+from app.storage_api.spool import CarSpool, SpoolFlusher
+from loadtest.fakes import FakeServices, FaultProfile
+
+
+def _car(custom_id, brand='Geely'):
+    return {'custom_id': custom_id, 'source_message_id': 1, 'source_channel_name': '@test', 'brand': brand}
+
+
+@pytest.fixture
+def storage():
+    services = FakeServices({'storage_api': FaultProfile(latency=0.001, jitter=0)})
+    services.start()
+    yield services
+    services.stop()
+
+
+class TestCarSpool:
+    """Тесты очереди в SQLite."""
+
+    def test_put_is_idempotent_and_persistent(self, tmp_path):
+        """Повторная постановка заменяет запись, очередь переживает перезапуск."""
+        path = str(tmp_path / 'spool.sqlite3')
+        queue = CarSpool(path)
+        queue.put(_car('000-001'))
+        queue.put(_car('000-001', brand='Chery'))
+        queue.put(_car('000-002'))
+        queue.close()
+
+        reopened = CarSpool(path)
+        assert reopened.pending() == 2
+        assert reopened.due(10)[0]['brand'] == 'Chery'
+
+    def test_retry_backoff(self, tmp_path):
+        """Запись с ошибкой откладывается и остается в очереди."""
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'), base_delay=60)
+        queue.put(_car('000-001'))
+        queue.retry([('000-001', 'HTTP 503')])
+        assert queue.due(10) == []
+        assert queue.pending() == 1
+        queue.ack(['000-001'])
+        assert queue.pending() == 0
+
+    def test_reject_moves_to_dead_letter(self, tmp_path):
+        """Окончательный отказ после max_attempts попыток убирает запись из очереди в dead-letter."""
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'), base_delay=60, max_attempts=2)
+        queue.put(_car('000-001'))
+
+        assert queue.reject([('000-001', 'conflict', 'custom_id занят')]) == []
+        assert queue.pending() == 1
+        dead = queue.reject([('000-001', 'conflict', 'custom_id занят')])
+
+        assert [item['custom_id'] for item in dead] == ['000-001']
+        assert queue.pending() == 0
+        assert queue.dead_letters()[0]['payload']['brand'] == 'Geely'
+        assert queue.dead_letters()[0]['reason'] == 'conflict'
+
+
+class TestSpoolFlusher:
+    """Тесты пакетной отправки через заглушку Storage API."""
+
+    def test_flush_bulk(self, tmp_path, storage):
+        """Очередь уходит пачками и очищается."""
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'))
+        for number in range(120):
+            queue.put(_car(f"000-{number:03d}"))
+        flusher = SpoolFlusher(queue, DatabaseClient(f"{storage.base_url}/storage"), batch_size=50)
+
+        assert flusher.drain() == 0
+        assert len(storage.cars) == 120
+        assert storage.stats['storage_api'].requests == 3
+
+    def test_api_down_keeps_cars(self, tmp_path):
+        """Недоступный API - записи остаются до следующей попытки."""
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'), base_delay=60)
+        queue.put(_car('000-001'))
+        flusher = SpoolFlusher(queue, DatabaseClient('http://127.0.0.1:9'))
+
+        assert flusher.drain() == 1
+        assert queue.due(10) == []
+
+    def test_enqueue_and_shutdown(self, tmp_path, storage, monkeypatch):
+        """Глобальная очередь досылает автомобиль при остановке."""
+        monkeypatch.setenv('STORAGE_SPOOL_PATH', str(tmp_path / 'spool.sqlite3'))
+        monkeypatch.setenv('STORAGE_SPOOL_INTERVAL', '60')
+        monkeypatch.setattr('app.storage_api.database_client._client',
+                            DatabaseClient(f"{storage.base_url}/storage"))
+
+        spool.enqueue_car(_car('000-777'))
+        assert spool.shutdown_spool() == 0
+        assert '000-777' in storage.cars
+
+    def test_conflicting_custom_id_stays_queued(self, tmp_path, storage):
+        """Повтор того же поста подтверждается, другой автомобиль с занятым custom_id остается в очереди."""
+        storage.cars['000-001'] = _car('000-001')
+        storage.cars['000-002'] = {**_car('000-002'), 'source_message_id': 99}
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'))
+        queue.put(_car('000-001'))
+        queue.put(_car('000-002'))
+        flusher = SpoolFlusher(queue, DatabaseClient(f"{storage.base_url}/storage"))
+
+        flusher.flush_once()
+
+        assert queue.pending() == 1
+        assert storage.cars['000-002']['source_message_id'] == 99
+
+    def test_conflict_dead_letter_alert(self, tmp_path, storage):
+        """Конфликт не повторяется вечно: после max_attempts - dead-letter, метрика и алерт."""
+        storage.cars['000-002'] = {**_car('000-002'), 'source_message_id': 99}
+        queue = CarSpool(str(tmp_path / 'spool.sqlite3'), base_delay=0, max_attempts=2)
+        queue.put(_car('000-002'))
+        alerts = []
+        flusher = SpoolFlusher(queue, DatabaseClient(f"{storage.base_url}/storage"), alert_sender=alerts.append)
+        before = STORAGE_SPOOL_DEAD.labels(reason='conflict')._value.get()
+
+        assert flusher.drain() == 0
+
+        assert storage.stats['storage_api'].requests == 2
+        assert len(alerts) == 1 and '000-002' in alerts[0]
+        assert STORAGE_SPOOL_DEAD.labels(reason='conflict')._value.get() == before + 1
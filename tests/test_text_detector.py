@@ -0,0 +1,95 @@
+import threading
+import pytest
+import numpy as np
+import cv2
+from PIL import Image, ImageDraw
+from unittest.mock import patch, AsyncMock
+
+from app.ocr_api.ocr_client import OCRClient, OCRConfig
+from app.ocr_api.text_detector import score_text_presence
+
+
+@pytest.fixture
+def photo_path(tmp_path):
+    """Фото без текста: градиент с размытыми фигурами."""
+    rng = np.random.default_rng(0)
+    img = np.zeros((900, 1200, 3), np.uint8)
+    img[...] = np.linspace(30, 220, 1200, dtype=np.uint8)[None, :, None]
+    for _ in range(5):
+        center = (int(rng.integers(200, 1000)), int(rng.integers(200, 700)))
+        axes = (int(rng.integers(50, 250)), int(rng.integers(30, 150)))
+        color = tuple(int(v) for v in rng.integers(0, 255, 3))
+        cv2.ellipse(img, center, axes, 0, 0, 360, color, -1)
+    img = cv2.GaussianBlur(img, (9, 9), 0)
+    path = tmp_path / "photo.jpg"
+    cv2.imwrite(str(path), img)
+    return str(path)
+
+
+@pytest.fixture
+def text_path(tmp_path):
+    """Скан с несколькими строками текста."""
+    image = Image.new('RGB', (1200, 1600), 'white')
+    draw = ImageDraw.Draw(image)
+    for i in range(12):
+        draw.text((60, 60 + i * 48), 'Engine: 2.0 L, 245 HP, mileage 50000 km', fill='black')
+    image = image.resize((2400, 3200))
+    path = tmp_path / "text.jpg"
+    image.save(path)
+    return str(path)
+
+
+class TestTextDetector:
+    """Тесты предфильтра наличия текста."""
+
+    def test_photo_without_text(self, photo_path):
+        """Фото экстерьера не считается изображением с текстом."""
+        result = score_text_presence(photo_path)
+        assert result.likely_text is False
+        assert result.text_lines == 0
+
+    def test_image_with_text(self, text_path):
+        """Изображение с несколькими строками текста проходит порог."""
+        result = score_text_presence(text_path)
+        assert result.likely_text is True
+        assert result.text_lines > 0
+
+    def test_missing_file(self, tmp_path):
+        """Отсутствующий файл вызывает FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            score_text_presence(str(tmp_path / "missing.jpg"))
+
+    @pytest.mark.asyncio
+    async def test_prefilter_skips_yandex(self, photo_path):
+        """В режиме 'on' фото без текста не отправляется в Yandex."""
+        client = OCRClient(OCRConfig(use_yandex=True, text_prefilter='on'))
+        with patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='x')) as yandex:
+            assert await client.extract_text(photo_path) == ""
+            yandex.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_prefilter_audit_still_sends(self, photo_path):
+        """В режиме 'audit' фото отправляется, пропуск только логируется."""
+        client = OCRClient(OCRConfig(use_yandex=True, text_prefilter='audit'))
+        with patch.object(client, 'extract_text_yandex', new=AsyncMock(return_value='x')) as yandex:
+            assert await client.extract_text(photo_path) == 'x'
+            yandex.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_prefilter_runs_off_event_loop(self, photo_path):
+        """Детектор предфильтра выполняется в пуле потоков, а не в потоке event loop."""
+        client = OCRClient(OCRConfig(use_yandex=True, text_prefilter='on'))
+        threads = []
+
+        def detect(path, threshold=None):
+            threads.append(threading.get_ident())
+            return score_text_presence(path, threshold)
+
+        with patch('app.ocr_api.text_detector.score_text_presence', side_effect=detect):
+            assert await client.should_send_to_paid_ocr(photo_path) is False
+        assert threads and threads[0] != threading.get_ident()
+
+    def test_invalid_prefilter_mode(self):
+        """Неизвестный режим предфильтра отклоняется."""
+        with pytest.raises(ValueError):
+            OCRClient(OCRConfig(text_prefilter='maybe'))
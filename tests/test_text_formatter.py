@@ -0,0 +1,50 @@
+from app.perplexity_api.text_formatter import (
+    extract_car_info_from_text,
+    extract_car_info_batch
+)
+
+
+class TestExtractCarInfo:
+    """Тесты извлечения данных об автомобиле из текста."""
+
+    def test_compound_brand_in_first_line(self):
+        """Составная марка в первой строке имеет приоритет над короткой."""
+        car_info = extract_car_info_from_text("Land Rover Defender 2021\nЦена: 95 000$")
+        assert car_info.brand == 'Land Rover'
+        assert car_info.model == 'Defender'
+        assert car_info.year == 2021
+        assert car_info.price == 95000
+
+    def test_brand_without_dash(self):
+        """Марка с дефисом находится и при написании через пробел."""
+        car_info = extract_car_info_from_text("mercedes benz GLE 450 2020")
+        assert car_info.brand == 'Mercedes-Benz'
+        assert car_info.model == 'GLE 450'
+
+    def test_brand_in_text_body(self):
+        """Марка ищется по всему тексту как отдельное слово."""
+        text = "Авто из Китая под заказ\nОтличное состояние\nZeekr 001 2023 года, пробег 12,000 км"
+        car_info = extract_car_info_from_text(text)
+        assert car_info.brand == 'Zeekr'
+        assert car_info.model == '001'
+        assert car_info.mileage == 12000
+
+    def test_specs(self):
+        """КПП, привод и объем двигателя."""
+        car_info = extract_car_info_from_text("BMW X5 2018, двигатель 3.0л, автомат, полный привод")
+        assert car_info.engine_volume == '3.0л'
+        assert car_info.transmission == 'автомат'
+        assert car_info.drive_type == 'полный'
+
+    def test_no_stdout_output(self, capsys):
+        """Отладочный вывод не печатается в stdout."""
+        extract_car_info_from_text("Toyota Camry 2015")
+        assert capsys.readouterr().out == ""
+
+    def test_batch(self):
+        """Пакетный разбор сохраняет порядок и возвращает независимые объекты."""
+        texts = ["Kia Rio 2019", "Haval Jolion 2022", "Kia Rio 2019"]
+        results = extract_car_info_batch(texts)
+        assert [r.brand for r in results] == ['Kia', 'Haval', 'Kia']
+        results[0].model = 'changed'
+        assert results[2].model == 'Rio'
@@ -0,0 +1,125 @@
+import json
+import asyncio
+import threading
+import pytest
+
+from app.monitoring import tracing
+from app.monitoring.metrics import track_stage
+from app.monitoring.tracing import span, current_trace_id, incr_span_attribute, JsonlSpanExporter
+from app.monitoring.trace_report import load_spans, critical_path, slowest_traces, format_report, format_trace
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    """Экспортер, пишущий во временный файл."""
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlSpanExporter(str(path))
+    tracing.set_exporter(exporter)
+    yield str(path)
+    exporter.close()
+    tracing.set_exporter(None)
+
+
+class TestTracing:
+    """Тесты спанов и экспортера."""
+
+    def test_nested_spans_share_trace(self, trace_file):
+        """Вложенные спаны получают trace_id и parent_id корня."""
+        with span('announcement', message_id=1) as root:
+            with track_stage('ocr') as stage:
+                incr_span_attribute('retries')
+                incr_span_attribute('retries')
+            assert current_trace_id() == root.trace_id
+        assert current_trace_id() is None
+
+        tracing.get_exporter().flush()
+        spans = load_spans(trace_file)
+        by_name = {item['name']: item for item in spans}
+        assert by_name['ocr']['trace_id'] == by_name['announcement']['trace_id']
+        assert by_name['ocr']['parent_id'] == by_name['announcement']['span_id']
+        assert by_name['ocr']['attributes']['retries'] == 2
+        assert by_name['announcement']['attributes']['message_id'] == 1
+
+    def test_error_recorded(self, trace_file):
+        """Исключение помечает спан как ошибочный и пробрасывается дальше."""
+        with pytest.raises(ValueError):
+            with span('save'):
+                raise ValueError("boom")
+        tracing.get_exporter().flush()
+        record = json.loads(open(trace_file, encoding='utf-8').readline())
+        assert record['status'] == 'error'
+        assert 'boom' in record['error']
+
+    @pytest.mark.asyncio
+    async def test_concurrent_traces_isolated(self, trace_file):
+        """Параллельные задачи не смешивают трейсы."""
+        async def handle(message_id):
+            with span('announcement', message_id=message_id):
+                await asyncio.sleep(0.01)
+                with span('publish'):
+                    await asyncio.sleep(0.01)
+
+        await asyncio.gather(handle(1), handle(2))
+        traces = {}
+        tracing.get_exporter().flush()
+        for item in load_spans(trace_file):
+            traces.setdefault(item['trace_id'], []).append(item['name'])
+        assert sorted(map(sorted, traces.values())) == [['announcement', 'publish']] * 2
+
+    def test_export_writes_from_listener_thread(self, trace_file, monkeypatch):
+        """export не пишет файл в вызывающем потоке; flush и close дописывают очередь."""
+        exporter = tracing.get_exporter()
+        threads = []
+        original_emit = exporter._handler.emit
+
+        def record_emit(record):
+            threads.append(threading.current_thread())
+            original_emit(record)
+
+        monkeypatch.setattr(exporter._handler, 'emit', record_emit)
+        with span('ocr'):
+            pass
+        exporter.flush()
+        assert threads and threading.current_thread() not in threads
+        assert [item['name'] for item in load_spans(trace_file)] == ['ocr']
+        with span('publish'):
+            pass
+        exporter.close()
+        exporter.close()
+        assert [item['name'] for item in load_spans(trace_file)] == ['ocr', 'publish']
+
+    def test_disabled_exporter_is_noop(self):
+        """Без экспортера спаны работают, но ничего не пишут."""
+        tracing.set_exporter(None)
+        with span('ocr') as item:
+            item.set('bytes', 10)
+        assert item.duration is not None
+
+
+class TestTraceReport:
+    """Тесты CLI-сводки по трейсам."""
+
+    @staticmethod
+    def _span(name, span_id, parent_id, start, duration, trace_id='t1'):
+        return {'trace_id': trace_id, 'span_id': span_id, 'parent_id': parent_id, 'name': name,
+                'start': start, 'duration': duration, 'status': 'ok', 'error': None, 'attributes': {}}
+
+    def test_critical_path_follows_latest_child(self):
+        """Критический путь идет через потомка, завершившегося последним."""
+        trace = [
+            self._span('announcement', 'r', None, 0.0, 5.0),
+            self._span('ocr', 'a', 'r', 0.0, 1.0),
+            self._span('perplexity', 'b', 'r', 1.0, 3.5),
+            self._span('ocr.image', 'c', 'a', 0.0, 1.0),
+        ]
+        assert [item['name'] for item in critical_path(trace)] == ['announcement', 'perplexity']
+
+    def test_slowest_first(self):
+        """Трейсы сортируются по длительности корня."""
+        spans = [
+            self._span('announcement', 'r1', None, 0.0, 1.0, trace_id='fast'),
+            self._span('announcement', 'r2', None, 0.0, 9.0, trace_id='slow'),
+        ]
+        assert slowest_traces(spans, top=1)[0][0]['trace_id'] == 'slow'
+        assert 'slow' in format_report(spans, top=1)
+        assert 'announcement' in format_trace(spans, 'slow')